@@ -1,2 +1,18 @@
-from qtoolkit._version import __version__
-from qtoolkit.core.data_objects import QJob, QJobInfo, QResources, QState, QSubState
+from qtoolkit.utils import lazy_module_getattr
+
+# The objects are imported on first access, to keep the import of qtoolkit
+# cheap for short-lived processes that only need a subset of the package.
+_LAZY_OBJECTS = {
+    "__version__": "qtoolkit._version:__version__",
+    "QJob": "qtoolkit.core.data_objects:QJob",
+    "QJobInfo": "qtoolkit.core.data_objects:QJobInfo",
+    "QResources": "qtoolkit.core.data_objects:QResources",
+    "QState": "qtoolkit.core.data_objects:QState",
+    "QSubState": "qtoolkit.core.data_objects:QSubState",
+}
+
+__getattr__ = lazy_module_getattr(__name__, _LAZY_OBJECTS)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_OBJECTS))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import base64
+import codecs
+import re
+import zlib
+
+from qtoolkit.core.exceptions import OutputParsingError
+
+# First line of the outputs compressed on the host, followed by the name of
+# the compressor. Outputs without it were not compressed (fallback).
+COMPRESSED_HEADER = "QTK-COMPRESSED"
+# Marker appended to the output of the command with its exit code, as the
+# exit code of the whole pipeline is the one of base64.
+EXIT_CODE_MARKER = "QTK-EXIT-CODE"
+
+# Shell commands compressing the standard input on the host.
+COMPRESSORS = {
+    "zstd": "zstd -1 -q -c",
+    "gzip": "gzip -1 -c",
+}
+
+# Size of the base64 chunks decoded at once. Multiple of 4, so that each
+# chunk can be decoded separately.
+_CHUNK_SIZE = 4 * 65536
+
+_EXIT_CODE_RE = re.compile(rf"\n{EXIT_CODE_MARKER} (\d+)\n?$")
+
+
+def _zstd_decompressor():
+    """A zstd decompression object, None if zstandard is not installed."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def _get_decompressor(name: str):
+    if name == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if name == "zstd":
+        return _zstd_decompressor()
+    return None
+
+
+class OutputCompression:
+    """
+    Compression of the outputs of the commands on the host, to reduce the
+    data transferred for large outputs (e.g. squeue or qstat -f with many
+    jobs) on slow links.
+
+    The command is wrapped in a shell snippet that pipes its standard output
+    through the first compressor available on the host and base64, as the
+    hosts return the outputs as text. The standard error is not compressed.
+    If none of the compressors is available, the command is executed
+    unchanged, so that the compression can be safely enabled on any host.
+    Requires a POSIX shell on the host.
+
+    Parameters
+    ----------
+    compressors : list of str
+        Compressors to try on the host, in order of preference. Supported:
+        "zstd" (only used if the zstandard package is installed locally) and
+        "gzip".
+    """
+
+    def __init__(self, compressors: list[str] | tuple[str, ...] = ("zstd", "gzip")):
+        unknown = [c for c in compressors if c not in COMPRESSORS]
+        if unknown:
+            raise ValueError(f"Unsupported compressors: {', '.join(unknown)}")
+        self.compressors = [c for c in compressors if _get_decompressor(c) is not None]
+
+    def wrap_command(self, command: str) -> str:
+        """The command compressing the output of the given command."""
+        if not self.compressors:
+            return command
+        # the exit code is written after the output, on a new line removed
+        # when unwrapping. The command runs in a subshell, so that the code
+        # is written even if it calls exit.
+        body = f"{{ ({command}); printf '\\n{EXIT_CODE_MARKER} %d\\n' \"$?\"; }}"
+        branches = []
+        for name in self.compressors:
+            executable = COMPRESSORS[name].split()[0]
+            condition = (
+                f"command -v {executable} >/dev/null 2>&1 && "
+                "command -v base64 >/dev/null 2>&1"
+            )
+            action = (
+                f"echo '{COMPRESSED_HEADER} {name}'; "
+                f"{body} | {COMPRESSORS[name]} | base64"
+            )
+            branches.append((condition, action))
+
+        script = []
+        for i, (condition, action) in enumerate(branches):
+            keyword = "if" if i == 0 else "elif"
+            script.append(f"{keyword} {condition}; then {action};")
+        script.append(f"else {command}; fi")
+        return " ".join(script)
+
+    def unwrap_output(
+        self, stdout: str | bytes, stderr: str | bytes, exit_code: int
+    ) -> tuple[str, str, int]:
+        """
+        The output of the original command, from the output of the command
+        generated by wrap_command. Outputs that were not compressed are
+        returned unchanged.
+
+        Returns
+        -------
+        stdout : str
+        stderr : str
+        exit_code : int
+        """
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if not stdout.startswith(COMPRESSED_HEADER):
+            return stdout, stderr, exit_code
+
+        header, _, encoded = stdout.partition("\n")
+        name = header[len(COMPRESSED_HEADER) :].strip()
+        decoded = self.decompress(name, encoded)
+        match = _EXIT_CODE_RE.search(decoded)
+        if match is None:
+            msg = f"Exit code not found in the output compressed with {name}"
+            raise OutputParsingError(msg)
+        return decoded[: match.start()], stderr, int(match.group(1))
+
+    @staticmethod
+    def decompress(name: str, encoded: str) -> str:
+        """
+        Decode and decompress the base64 output of a compressor. The output
+        is not streamed: it is entirely in memory, as returned by the host,
+        and only decoded and decompressed in chunks.
+        """
+        decompressor = _get_decompressor(name)
+        if decompressor is None:
+            raise OutputParsingError(f"Cannot decompress the output of {name}")
+        # drop the line breaks added by base64
+        encoded = "".join(encoded.split())
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        parts = []
+        try:
+            for start in range(0, len(encoded), _CHUNK_SIZE):
+                chunk = base64.b64decode(encoded[start : start + _CHUNK_SIZE])
+                parts.append(decoder.decode(decompressor.decompress(chunk)))
+            parts.append(decoder.decode(decompressor.flush(), final=True))
+        except Exception as exc:
+            # zlib.error, binascii.Error, UnicodeDecodeError or
+            # zstandard.ZstdError
+            msg = f"Could not decompress the output compressed with {name}: {exc}"
+            raise OutputParsingError(msg) from exc
+        return "".join(parts)
@@ -2,10 +2,12 @@ from __future__ import annotations
 
 import abc
 from dataclasses import dataclass, fields
+from fnmatch import fnmatchcase
 from pathlib import Path
 
 from qtoolkit.core.base import QTKEnum, QTKObject
 from qtoolkit.core.exceptions import UnsupportedResourcesError
+from qtoolkit.hostlist import HostList
 
 
 class SubmissionStatus(QTKEnum):
@@ -328,6 +330,28 @@ class QJobInfo(QTKObject):
     time_limit: int | None = None
     """Time limit in seconds."""
 
+    max_rss: int | None = None
+    """Maximum resident memory used by the job in Kb."""
+
+    total_cpu: int | None = None
+    """CPU time used by all the processes of the job in seconds."""
+
+    elapsed: int | None = None
+    """Wall time elapsed since the start of the job in seconds."""
+
+    node_list: str | None = None
+    """Nodes allocated to the job, in the format of the scheduler."""
+
+    partition: str | None = None
+    """Partition (or queue) of the job."""
+
+    @property
+    def hostlist(self) -> HostList | None:
+        """The nodes allocated to the job as a HostList, if defined."""
+        if not self.node_list:
+            return None
+        return HostList(self.node_list)
+
 
 @dataclass
 class QJob(QTKObject):
@@ -357,3 +381,221 @@ class QJob(QTKObject):
 
     queue_name: str | None = None
     """Job execution queue name."""
+
+    other_properties: dict | None = None
+    """Additional properties of the job, e.g. from user-registered fields."""
+
+    username: str | None = None
+    """Owner of the job."""
+
+    qos: str | None = None
+    """Quality of service of the job."""
+
+
+@dataclass
+class QJobFilter(QTKObject):
+    """
+    Selection of the jobs for get_jobs_list.
+
+    Each attribute is a list of accepted values, None meaning no selection on
+    that attribute. A job is selected if it matches all the defined attributes.
+    The names can contain shell-style wildcards (e.g. "sweep-*").
+    The schedulers apply as much as possible of the selection in the
+    command itself, the rest is applied on the parsed jobs.
+    """
+
+    states: list[QState] | None = None
+    """Standardized states of the jobs."""
+
+    partitions: list[str] | None = None
+    """Partitions (queues) of the jobs."""
+
+    names: list[str] | None = None
+    """Names of the jobs, possibly with wildcards."""
+
+    accounts: list[str] | None = None
+    """Accounts of the jobs."""
+
+    qos: list[str] | None = None
+    """Quality of service of the jobs."""
+
+    def __post_init__(self):
+        for field in fields(self):
+            value = getattr(self, field.name)
+            if isinstance(value, (str, QState)):
+                value = [value]
+            if value is not None:
+                value = list(value)
+            setattr(self, field.name, value)
+        if self.states is not None:
+            self.states = [QState(s) for s in self.states]
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, f.name) is None for f in fields(self))
+
+    @property
+    def has_wildcard_names(self) -> bool:
+        return any(set(name) & set("*?[") for name in self.names or [])
+
+    def matches(self, job: QJob) -> bool:
+        """Whether the job satisfies all the criteria of the filter."""
+        if self.states is not None and job.state not in self.states:
+            return False
+        if self.partitions is not None:
+            partition = job.queue_name or (job.info and job.info.partition)
+            if partition not in self.partitions:
+                return False
+        if self.names is not None:
+            if job.name is None or not any(
+                fnmatchcase(job.name, name) for name in self.names
+            ):
+                return False
+        if self.accounts is not None and job.account not in self.accounts:
+            return False
+        if self.qos is not None and job.qos not in self.qos:
+            return False
+        return True
+
+
+@dataclass
+class CompletionMarker(QTKObject):
+    job_id: str
+    """Job ID."""
+
+    exit_code: int | None = None
+    """Exit code of the job script."""
+
+    start: int | None = None
+    """Start time of the job script, as a Unix timestamp."""
+
+    end: int | None = None
+    """End time of the job script, as a Unix timestamp."""
+
+
+@dataclass
+class HeartbeatStatus(QTKObject):
+    job_id: str
+    """Job ID."""
+
+    last_beat: float | None = None
+    """Time of the last update of the heartbeat file, as a Unix timestamp."""
+
+    age: float | None = None
+    """Time in seconds since the last update of the heartbeat file."""
+
+    stalled: bool = False
+    """Whether the heartbeat is older than the stall threshold."""
+
+
+@dataclass
+class PendingJob(QTKObject):
+    """Job waiting in the queue, with the estimate of its start time."""
+
+    job_id: str
+    """Job ID."""
+
+    partitions: list[str] | None = None
+    """Partitions where the job can run."""
+
+    cpus: int | None = None
+    """Number of CPUs requested."""
+
+    time_limit: int | None = None
+    """Time limit in seconds."""
+
+    start_time: float | None = None
+    """Start time estimated by the scheduler, as a Unix timestamp."""
+
+
+@dataclass
+class PartitionState(QTKObject):
+    """
+    Capacity of a partition (queue) of the cluster.
+
+    The nodes and CPUs are counted as allocated (at least partially used by
+    jobs), idle or other (down, drained, offline, ...).
+    """
+
+    name: str | None = None
+    """Name of the partition. None for the nodes not assigned to a queue."""
+
+    available: bool = True
+    """Whether the partition accepts and runs jobs."""
+
+    default: bool = False
+    """Whether the partition is the default one."""
+
+    time_limit: int | None = None
+    """Maximum time limit of the jobs in seconds. None if unlimited."""
+
+    nodes_allocated: int = 0
+    """Number of nodes (at least partially) allocated to jobs."""
+
+    nodes_idle: int = 0
+    """Number of idle nodes."""
+
+    nodes_other: int = 0
+    """Number of nodes not available (down, drained, offline, ...)."""
+
+    nodes_total: int = 0
+    """Total number of nodes."""
+
+    cpus_allocated: int = 0
+    """Number of CPUs allocated to jobs."""
+
+    cpus_idle: int = 0
+    """Number of idle CPUs."""
+
+    cpus_other: int = 0
+    """Number of CPUs not available."""
+
+    cpus_total: int = 0
+    """Total number of CPUs."""
+
+    memory_per_node: int | None = None
+    """Smallest memory of the nodes in Kb."""
+
+    gres: list[str] | None = None
+    """Generic resources of the nodes (e.g. gpu:a100:4), in the format of
+    the scheduler."""
+
+    def add(self, other: PartitionState) -> None:
+        """Add the nodes and CPUs of another group of nodes of the partition."""
+        for field in fields(self):
+            if field.name.startswith(("nodes_", "cpus_")):
+                value = getattr(self, field.name) + getattr(other, field.name)
+                setattr(self, field.name, value)
+        memories = [
+            m for m in (self.memory_per_node, other.memory_per_node) if m is not None
+        ]
+        self.memory_per_node = min(memories) if memories else None
+        if other.gres:
+            gres = list(self.gres or [])
+            gres.extend(g for g in other.gres if g not in gres)
+            self.gres = gres
+
+
+@dataclass
+class ClusterState(QTKObject):
+    """Snapshot of the capacity of the partitions of a cluster."""
+
+    partitions: list[PartitionState]
+    """State of each partition."""
+
+    timestamp: float | None = None
+    """Time of the snapshot, as a Unix timestamp."""
+
+    def get_partition(self, name: str | None) -> PartitionState | None:
+        """The state of the partition with the given name, if present."""
+        for partition in self.partitions:
+            if partition.name == name:
+                return partition
+        return None
+
+    @property
+    def default_partition(self) -> PartitionState | None:
+        """The state of the default partition, if known."""
+        for partition in self.partitions:
+            if partition.default:
+                return partition
+        return None
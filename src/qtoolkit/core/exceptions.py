@@ -1,3 +1,6 @@
+from __future__ import annotations
+
+
 class QTKException(Exception):
     """
     Base class for all the exceptions generated by qtoolkit.
@@ -8,8 +11,31 @@ class CommandFailedError(QTKException):
     """
     Exception raised when the execution of a command has failed,
     typically by a non-zero return code.
+
+    The optional attributes give structured details about the failure,
+    so that the callers can react without parsing the message.
     """
 
+    def __init__(
+        self,
+        msg: str = "",
+        command: str | None = None,
+        exit_code: int | None = None,
+        stdout: str | None = None,
+        stderr: str | None = None,
+        timed_out: bool = False,
+        attempts: int | None = None,
+        cancelled: bool = False,
+    ):
+        super().__init__(msg)
+        self.command = command
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.attempts = attempts
+        self.cancelled = cancelled
+
 
 class OutputParsingError(QTKException):
     """
@@ -23,3 +49,22 @@ class UnsupportedResourcesError(QTKException):
     Exception raised when the resources requested are not supported
     in qtoolkit for the chosen scheduler.
     """
+
+
+class RateLimitExceededError(QTKException):
+    """
+    Exception raised when a command cannot be executed without exceeding
+    the configured rate limit.
+    """
+
+    def __init__(
+        self,
+        msg: str = "",
+        command_class: str | None = None,
+        host: str | None = None,
+        retry_after: float | None = None,
+    ):
+        super().__init__(msg)
+        self.command_class = command_class
+        self.host = host
+        self.retry_after = retry_after
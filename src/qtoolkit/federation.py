@@ -0,0 +1,385 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import math
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
+
+from qtoolkit.core.data_objects import (
+    CancelResult,
+    PartitionState,
+    PendingJob,
+    QJob,
+    QJobFilter,
+    QResources,
+    SubmissionResult,
+)
+from qtoolkit.routing import PartitionRouter, get_pending_jobs
+
+if TYPE_CHECKING:
+    from qtoolkit.core.data_objects import ClusterState
+    from qtoolkit.manager import QueueManager
+
+logger = logging.getLogger(__name__)
+
+# Separator between the name of the cluster and the id of the job in the
+# cluster-qualified job ids, e.g. "cluster1:12345".
+CLUSTER_SEPARATOR = ":"
+
+
+def qualify_job_id(cluster: str, job_id: str) -> str:
+    """The cluster-qualified id of a job of a cluster."""
+    return f"{cluster}{CLUSTER_SEPARATOR}{job_id}"
+
+
+def split_job_id(job_id: QJob | str) -> tuple[str, str]:
+    """
+    The name of the cluster and the id of the job in the cluster from a
+    cluster-qualified job id.
+    """
+    if isinstance(job_id, QJob):
+        job_id = job_id.job_id
+    cluster, sep, local_id = str(job_id).partition(CLUSTER_SEPARATOR)
+    if not sep or not cluster or not local_id:
+        raise ValueError(f"{job_id} is not a cluster-qualified job id")
+    return cluster, local_id
+
+
+@dataclass
+class PlacementDecision:
+    """Outcome of the choice of the cluster for a submission."""
+
+    selected: str
+    """Cluster selected for the submission."""
+
+    scores: dict[str, float] = field(default_factory=dict)
+    """Weighted load of each compatible cluster, the lower the better."""
+
+    errors: dict[str, str] = field(default_factory=dict)
+    """Errors of the clusters whose state could not be obtained."""
+
+    timestamp: float | None = None
+    """Time of the decision, as a Unix timestamp."""
+
+
+class FederatedQueueManager:
+    """
+    Several clusters, each with its own QueueManager, used as a single one.
+
+    The submissions are placed on the cluster with the lowest weighted load:
+    the CPUs allocated and queued in the target partition (the one requested
+    in the QResources, the default one or the whole cluster) divided by its
+    usable CPUs and by the weight of the cluster. The state of the clusters
+    is queried in parallel, in a pool of threads, and cached for the TTL of
+    the managers (see QueueManager.get_cluster_state). Clusters without the requested
+    partition, incompatible with the resources, or whose state is not
+    available, are not selected, unless no cluster is suitable: then the
+    first one is used.
+
+    The jobs are identified by cluster-qualified ids, "<cluster>:<job id>",
+    returned by submit and get_jobs_list and accepted by the other methods.
+
+    The pool of threads is created at the first parallel query and reused
+    for the following ones. Call close (or use the manager as a context
+    manager) to shut it down.
+
+    Parameters
+    ----------
+    managers : dict
+        QueueManager of each cluster, by name of the cluster. The names
+        cannot contain the separator of the qualified ids (":").
+    weights : dict
+        Weight of each cluster, by name. A cluster with twice the weight of
+        another one receives jobs up to twice its relative load. Defaults to 1.
+    max_age : float
+        Maximum age in seconds of the cached state of the clusters. If None,
+        the cluster_state_ttl of each manager.
+    history_size : int
+        Number of decisions kept in the decisions attribute.
+    executor : Executor
+        Executor used to query the clusters, instead of a pool of threads
+        created by the manager. It is not shut down by close.
+    clock
+        Object with a time() method, used for the age of the cached queued
+        jobs. Real time if None.
+    """
+
+    def __init__(
+        self,
+        managers: dict[str, QueueManager],
+        weights: dict[str, float] | None = None,
+        max_age: float | None = None,
+        history_size: int = 100,
+        executor: Executor | None = None,
+        clock=None,
+    ):
+        if not managers:
+            raise ValueError("At least one QueueManager should be defined")
+        invalid = [name for name in managers if CLUSTER_SEPARATOR in name or not name]
+        if invalid:
+            raise ValueError(f"Invalid cluster names: {', '.join(invalid)}")
+        weights = weights or {}
+        unknown = [name for name in weights if name not in managers]
+        if unknown:
+            raise ValueError(f"Weights of unknown clusters: {', '.join(unknown)}")
+        if any(w <= 0 for w in weights.values()):
+            raise ValueError("The weights of the clusters should be positive")
+
+        self.managers = dict(managers)
+        self.weights = {name: weights.get(name, 1.0) for name in self.managers}
+        self.max_age = max_age
+        self.clock = clock
+        self.decisions: deque[PlacementDecision] = deque(maxlen=history_size)
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._pending: dict[str, tuple[float, list[PendingJob]]] = {}
+
+    def map(
+        self, function: Callable[[str, QueueManager], object], clusters=None
+    ) -> dict[str, object]:
+        """
+        Call function(name, manager) for each cluster in parallel.
+
+        Returns
+        -------
+        dict
+            The result of each cluster, by name, or the exception raised.
+        """
+        clusters = list(self.managers) if clusters is None else list(clusters)
+        if len(clusters) == 1:
+            futures = None
+        else:
+            executor = self._get_executor()
+            futures = {
+                name: executor.submit(function, name, self.managers[name])
+                for name in clusters
+            }
+        results: dict[str, object] = {}
+        for name in clusters:
+            try:
+                if futures is None:
+                    results[name] = function(name, self.managers[name])
+                else:
+                    results[name] = futures[name].result()
+            except Exception as exc:
+                results[name] = exc
+        return results
+
+    def select_cluster(self, resources: QResources | None = None) -> PlacementDecision:
+        """
+        Choose the cluster for the submission of a job with the resources,
+        without submitting it.
+        """
+        decision = PlacementDecision(
+            selected=next(iter(self.managers)), timestamp=self._time()
+        )
+        results = self.map(self._get_load_state)
+        idle_cpus = {}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                decision.errors[name] = str(result)
+                continue
+            cluster_state, pending_jobs = result
+            partition = self._get_target_partition(cluster_state, resources)
+            if partition is None:
+                continue
+            if resources is not None and not PartitionRouter.is_compatible(
+                partition, resources
+            ):
+                continue
+            load = self.load(partition, pending_jobs)
+            decision.scores[name] = load / self.weights[name]
+            idle_cpus[name] = partition.cpus_idle
+
+        if decision.scores:
+            best = min(
+                decision.scores, key=lambda n: (decision.scores[n], -idle_cpus[n])
+            )
+            if not math.isinf(decision.scores[best]):
+                decision.selected = best
+        return decision
+
+    @staticmethod
+    def load(partition: PartitionState, pending_jobs: list[PendingJob]) -> float:
+        """
+        The CPUs allocated and queued in the partition relative to its usable
+        CPUs. Infinite if the partition has no usable CPUs.
+        """
+        usable = partition.cpus_allocated + partition.cpus_idle
+        if not partition.available or usable == 0:
+            return math.inf
+        queued = sum(
+            j.cpus or 1
+            for j in pending_jobs
+            if partition.name is None or partition.name in (j.partitions or [])
+        )
+        return (partition.cpus_allocated + queued) / usable
+
+    def submit(
+        self,
+        commands: str | list[str] | None,
+        options=None,
+        work_dir=None,
+        environment=None,
+        script_fname="submit.script",
+        create_submit_dir=False,
+        cluster: str | None = None,
+    ) -> SubmissionResult:
+        """
+        Submit a job to the cluster given or to the one selected by
+        select_cluster. The job_id of the result is cluster-qualified.
+        """
+        if cluster is None:
+            resources = options if isinstance(options, QResources) else None
+            decision = self.select_cluster(resources)
+            self.decisions.append(decision)
+            scores = ", ".join(f"{n}={s:.2f}" for n, s in decision.scores.items())
+            logger.info(
+                "Cluster %s selected (weighted loads: %s)", decision.selected, scores
+            )
+            cluster = decision.selected
+        result = self._get_manager(cluster).submit(
+            commands,
+            options=options,
+            work_dir=work_dir,
+            environment=environment,
+            script_fname=script_fname,
+            create_submit_dir=create_submit_dir,
+        )
+        if result.job_id is None:
+            return result
+        return dataclasses.replace(
+            result, job_id=qualify_job_id(cluster, result.job_id)
+        )
+
+    def cancel(self, job: QJob | str) -> CancelResult:
+        cluster, job_id = split_job_id(job)
+        return self._get_manager(cluster).cancel(job_id)
+
+    def get_job(self, job: QJob | str) -> QJob | None:
+        cluster, job_id = split_job_id(job)
+        qjob = self._get_manager(cluster).get_job(job_id)
+        return self._qualify(cluster, qjob) if qjob is not None else None
+
+    def get_jobs_list(
+        self,
+        jobs: list[QJob | str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
+        ignore_errors: bool = False,
+    ) -> list[QJob]:
+        """
+        Get the list of jobs of all the clusters, queried in parallel.
+
+        Parameters
+        ----------
+        jobs : list
+            Jobs to get, with cluster-qualified ids. Only the clusters of the
+            jobs are queried. If None, all the jobs of the clusters.
+        user, filters, fields
+            As in QueueManager.get_jobs_list.
+        ignore_errors : bool
+            If True, the clusters that could not be queried are skipped
+            (and logged). Otherwise the first error is raised.
+
+        Returns
+        -------
+        list of QJob
+            The jobs, with cluster-qualified ids, in the order of the clusters.
+        """
+        job_ids: dict[str, list[str]] | None = None
+        if jobs is not None:
+            job_ids = {}
+            for job in jobs:
+                cluster, job_id = split_job_id(job)
+                self._get_manager(cluster)
+                job_ids.setdefault(cluster, []).append(job_id)
+
+        def get_jobs(name, manager):
+            ids = job_ids[name] if job_ids is not None else None
+            return manager.get_jobs_list(
+                jobs=ids, user=user, filters=filters, fields=fields
+            )
+
+        clusters = list(job_ids) if job_ids is not None else None
+        results = self.map(get_jobs, clusters)
+        jobs_list = []
+        for name in self.managers:
+            if name not in results:
+                continue
+            result = results[name]
+            if isinstance(result, Exception):
+                if not ignore_errors:
+                    raise result
+                logger.warning("Could not get the jobs of %s: %s", name, result)
+                continue
+            jobs_list.extend(self._qualify(name, job) for job in result)
+        return jobs_list
+
+    def close(self) -> None:
+        """Shut down the pool of threads, if created by the manager."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_manager(self, cluster: str) -> QueueManager:
+        try:
+            return self.managers[cluster]
+        except KeyError:
+            raise ValueError(f"Unknown cluster {cluster}") from None
+
+    @staticmethod
+    def _qualify(cluster: str, job: QJob) -> QJob:
+        return dataclasses.replace(job, job_id=qualify_job_id(cluster, job.job_id))
+
+    @staticmethod
+    def _get_target_partition(
+        cluster_state: ClusterState, resources: QResources | None
+    ) -> PartitionState | None:
+        """
+        The requested partition, the default one or, if there is no default
+        partition (e.g. PBS), all the partitions together.
+        """
+        if resources is not None and resources.queue_name:
+            return cluster_state.get_partition(resources.queue_name)
+        if cluster_state.default_partition is not None:
+            return cluster_state.default_partition
+        partition = PartitionState(name=None)
+        for other in cluster_state.partitions:
+            partition.add(other)
+        return partition
+
+    def _get_load_state(
+        self, name: str, manager: QueueManager
+    ) -> tuple[ClusterState, list[PendingJob]]:
+        """The state of a cluster and its queued jobs, cached."""
+        cluster_state = manager.get_cluster_state(max_age=self.max_age)
+        max_age = (
+            self.max_age if self.max_age is not None else manager.cluster_state_ttl
+        )
+        now = self._time()
+        cached = self._pending.get(name)
+        if cached is not None and max_age is not None and now - cached[0] < max_age:
+            return cluster_state, cached[1]
+        pending_jobs = get_pending_jobs(manager)
+        self._pending[name] = (now, pending_jobs)
+        return cluster_state, pending_jobs
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self.managers))
+        return self._executor
+
+    def _time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
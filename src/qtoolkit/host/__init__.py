@@ -0,0 +1,12 @@
+from qtoolkit.utils import LazyImportMapping
+
+# The host modules are only imported when the corresponding entry is accessed,
+# e.g. fabric and paramiko are imported only when the remote host is needed.
+host_mapping = LazyImportMapping(
+    {
+        "local": "qtoolkit.host.local:LocalHost",
+        "remote": "qtoolkit.host.remote:RemoteHost",
+        "mock": "qtoolkit.host.mock:MockHost",
+        "rest": "qtoolkit.host.rest:RestHost",
+    }
+)
@@ -1,10 +1,61 @@
 from __future__ import annotations
 
 import abc
+import random
+import re
+import time
 from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING, Callable
 
 from qtoolkit.core.base import QTKObject
+from qtoolkit.core.exceptions import CommandFailedError
+
+if TYPE_CHECKING:
+    import threading
+
+# Error messages of the schedulers that usually disappear when the command is
+# executed again after a short delay, e.g. during a stall of slurmctld.
+TRANSIENT_ERROR_PATTERNS = [
+    r"Socket timed out on send/recv",
+    r"slurm_load_jobs error",
+    r"slurm_load_partitions error",
+    r"Unable to contact slurm controller",
+    r"Connection refused",
+    r"Resource temporarily unavailable",
+    r"Transport endpoint is not connected",
+    r"pbs_iff: cannot connect to host",
+    r"cannot connect to server",
+    r"Communication failure",
+]
+
+_TRANSIENT_ERROR_REGEX = re.compile("|".join(TRANSIENT_ERROR_PATTERNS))
+
+
+def is_transient_error(exit_code: int, stdout: str, stderr: str) -> bool:
+    """
+    Classify the outcome of a command as a transient scheduler error,
+    i.e. a failure that is expected to succeed if the command is repeated.
+
+    Parameters
+    ----------
+    exit_code : int
+        Exit code of the command.
+    stdout : str
+        Standard output of the command.
+    stderr : str
+        Standard error of the command.
+
+    Returns
+    -------
+    bool
+        True if the command failed with a transient error.
+    """
+    if exit_code == 0:
+        return False
+    return bool(_TRANSIENT_ERROR_REGEX.search(stderr or "")) or bool(
+        _TRANSIENT_ERROR_REGEX.search(stdout or "")
+    )
 
 
 @dataclass
@@ -15,6 +66,10 @@ class HostConfig(QTKObject):
 class BaseHost(QTKObject):
     """Base Host class."""
 
+    # Whether the commands are executed by a POSIX shell, so that they can be
+    # wrapped, e.g. to compress their output (see OutputCompression).
+    shell_commands: bool = True
+
     # def __init__(self, config, user):
     def __init__(self, config: HostConfig | None = None) -> None:
         self.config = config
@@ -26,6 +81,10 @@ class BaseHost(QTKObject):
         self,
         command: str | list[str],
         workdir: str | Path | None = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        cancel_event: threading.Event | None = None,
         # stdin=None,
         # stdout=None,
         # stderr=None,
@@ -38,6 +97,19 @@ class BaseHost(QTKObject):
             Command to execute, as a str or list of str
         workdir: str or None
             path where the command will be executed.
+        timeout: float or None
+            Maximum time in seconds allowed for each execution of the command.
+            If exceeded, the command is killed. None means no timeout.
+        retries: int
+            Number of additional attempts if the command times out or fails
+            with a transient error (see is_transient_error).
+        backoff: float
+            Base delay in seconds between the attempts. The delay grows
+            exponentially with the attempt number and is randomly jittered.
+        cancel_event: threading.Event or None
+            Event that, when set, stops the execution: no other attempt is
+            made and, if supported by the host, the running command is killed.
+            A CommandFailedError with cancelled=True is raised.
         stdin: None, PIPE or file-like
             Standard input, /dev/null if None
         stdout: None, PIPE or file-like
@@ -68,3 +140,91 @@ class BaseHost(QTKObject):
         # TODO: define a common error that is raised or a returned in case the procedure
         # fails to avoid handling different kind of errors for the different hosts
         raise NotImplementedError
+
+    def execute_with_retries(
+        self,
+        run_once: Callable[[], tuple[str, str, int]],
+        command: str,
+        retries: int = 0,
+        backoff: float = 1.0,
+        cancel_event: threading.Event | None = None,
+    ) -> tuple[str, str, int]:
+        """
+        Run a single execution of a command, repeating it when it times out or
+        fails with a transient error.
+
+        This is the retry policy used by execute. It can be used directly to
+        retry an execution that includes other steps before each attempt, e.g.
+        waiting for a rate limiter, with the same policy.
+
+        Parameters
+        ----------
+        run_once : callable
+            Function executing the command once and returning stdout, stderr
+            and exit code. Should raise a CommandFailedError with timed_out=True
+            if the command timed out.
+        command : str
+            The command being executed. Only used to report the errors.
+        retries : int
+            Number of additional attempts.
+        backoff : float
+            Base delay in seconds between the attempts.
+        cancel_event : threading.Event
+            Event checked before each attempt and interrupting the delay
+            between the attempts. run_once should raise a CommandFailedError
+            with cancelled=True if it is interrupted by the event.
+
+        Returns
+        -------
+        stdout : str
+        stderr : str
+        exit_code : int
+        """
+        attempts = retries + 1
+        for attempt in range(1, attempts + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise CommandFailedError(
+                    f"command {command} cancelled",
+                    command=command,
+                    attempts=attempt - 1,
+                    cancelled=True,
+                )
+            try:
+                stdout, stderr, exit_code = run_once()
+            except CommandFailedError as exc:
+                if not exc.timed_out or attempt == attempts:
+                    exc.attempts = attempt
+                    raise
+            else:
+                if retries == 0 or not is_transient_error(exit_code, stdout, stderr):
+                    return stdout, stderr, exit_code
+                if attempt == attempts:
+                    msg = (
+                        f"command {command} failed with a transient error "
+                        f"after {attempts} attempts: {stderr}"
+                    )
+                    raise CommandFailedError(
+                        msg,
+                        command=command,
+                        exit_code=exit_code,
+                        stdout=stdout,
+                        stderr=stderr,
+                        attempts=attempt,
+                    )
+            self._sleep(self._backoff_delay(backoff, attempt), cancel_event)
+
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    @staticmethod
+    def _backoff_delay(backoff: float, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given attempt (from 1)."""
+        return random.uniform(0, backoff * 2 ** (attempt - 1))
+
+    def _sleep(
+        self, seconds: float, cancel_event: threading.Event | None = None
+    ) -> None:
+        if cancel_event is not None:
+            # returns as soon as the event is set
+            cancel_event.wait(seconds)
+        else:
+            time.sleep(seconds)
@@ -1,16 +1,36 @@
 from __future__ import annotations
 
+import os
+import signal
 import subprocess
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+from qtoolkit.core.exceptions import CommandFailedError
 from qtoolkit.host.base import BaseHost
 from qtoolkit.utils import cd
 
+if TYPE_CHECKING:
+    import threading
+
+# Interval in seconds between the checks of the cancel event while a command
+# is running.
+CANCEL_CHECK_INTERVAL = 0.1
+
 
 class LocalHost(BaseHost):
     # def __init__(self, config):
     #     self.config = config
-    def execute(self, command: str | list[str], workdir: str | Path | None = None):
+    def execute(
+        self,
+        command: str | list[str],
+        workdir: str | Path | None = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        cancel_event: threading.Event | None = None,
+    ):
         """Execute the given command on the host
 
         Note that the command is executed with shell=True, so commands can
@@ -21,6 +41,18 @@ class LocalHost(BaseHost):
         ----------
         command: str or list of str
             Command to execute, as a str or list of str
+        workdir: str or None
+            path where the command will be executed.
+        timeout: float or None
+            Maximum time in seconds for each attempt. On timeout the whole
+            process group of the command is killed.
+        retries: int
+            Number of additional attempts on timeouts or transient errors.
+        backoff: float
+            Base delay in seconds between the attempts.
+        cancel_event: threading.Event or None
+            Event stopping the execution. The process group of a running
+            command is killed when the event is set.
 
         Returns
         -------
@@ -37,9 +69,69 @@ class LocalHost(BaseHost):
             workdir = Path.cwd()
         else:
             workdir = str(workdir)
-        with cd(workdir):
-            proc = subprocess.run(command, capture_output=True, shell=True)
-        return proc.stdout.decode(), proc.stderr.decode(), proc.returncode
+
+        def run_once():
+            with cd(workdir):
+                return self._run(command, timeout, cancel_event)
+
+        return self.execute_with_retries(
+            run_once,
+            command,
+            retries=retries,
+            backoff=backoff,
+            cancel_event=cancel_event,
+        )
+
+    @staticmethod
+    def _run(
+        command: str,
+        timeout: float | None,
+        cancel_event: threading.Event | None = None,
+    ) -> tuple[str, str, int]:
+        # start a new session so that on timeout all the processes spawned
+        # by the shell can be killed, and not only the shell itself. Killing
+        # only the shell would leave the children holding the pipes open.
+        proc = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=True,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if cancel_event is not None and (
+                wait is None or wait > CANCEL_CHECK_INTERVAL
+            ):
+                wait = CANCEL_CHECK_INTERVAL
+            try:
+                # no output is lost when communicate is called again
+                stdout, stderr = proc.communicate(timeout=wait)
+            except subprocess.TimeoutExpired:
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if cancelled or (deadline is not None and time.monotonic() >= deadline):
+                    break
+            else:
+                return stdout.decode(), stderr.decode(), proc.returncode
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:  # pragma: no cover
+            pass
+        stdout, stderr = proc.communicate()
+        if cancelled:
+            msg = f"command {command} cancelled"
+        else:
+            msg = f"command {command} timed out after {timeout} seconds"
+        raise CommandFailedError(
+            msg,
+            command=command,
+            exit_code=proc.returncode,
+            stdout=stdout.decode(),
+            stderr=stderr.decode(),
+            timed_out=not cancelled,
+            cancelled=cancelled,
+        )
 
     def mkdir(self, directory, recursive=True, exist_ok=True) -> bool:
         try:
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import random
+import re
+import shlex
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.base import BaseHost
+
+
+class RealClock:
+    """Clock based on the real monotonic time."""
+
+    def time(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Clock where sleeping only advances the time, so that simulations
+    with large latencies run instantly and are fully deterministic.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._lock:
+                self._now += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.sleep(seconds)
+
+
+@dataclass
+class MockResponse:
+    """Output returned by the MockHost for the commands matching a pattern."""
+
+    pattern: str
+    stdout: str = ""
+    stderr: str = ""
+    exit_code: int = 0
+    regex: bool = False
+
+    def matches(self, command: str) -> bool:
+        if self.regex:
+            return re.search(self.pattern, command) is not None
+        return command == self.pattern
+
+
+@dataclass
+class CallRecord:
+    """Details of a command executed by the MockHost."""
+
+    command: str
+    workdir: str | None
+    start: float
+    duration: float
+    bytes_transferred: int
+    exit_code: int | None
+
+
+class MockHost(BaseHost):
+    """
+    Host serving canned or simulated command outputs from memory, with
+    configurable per-call latency, jitter and bandwidth.
+
+    The time is measured and spent through a pluggable clock. With a
+    VirtualClock the network conditions are simulated without actually
+    waiting, so that different strategies can be compared deterministically.
+    """
+
+    # the commands are not executed by a shell: the simulator cannot handle
+    # the snippets wrapping them (e.g. the "if command -v" of the compression)
+    shell_commands = False
+
+    def __init__(
+        self,
+        responses: list[MockResponse] | None = None,
+        handler: Callable[[str, str | None], tuple[str, str, int] | None] | None = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        bandwidth: float | None = None,
+        clock: RealClock | VirtualClock | None = None,
+        seed: int | None = 0,
+    ):
+        """
+        Parameters
+        ----------
+        responses : list of MockResponse
+            Canned outputs. The first one matching the command is used.
+        handler : callable
+            Function called with the command and the working directory for
+            the commands without a canned response. Should return stdout,
+            stderr and exit code, or None if the command is unknown.
+        latency : float
+            Time in seconds spent for each call (round trip).
+        jitter : float
+            Maximum random additional latency for each call, in seconds.
+        bandwidth : float or None
+            Transfer rate in bytes per second for the command, its outputs and
+            the written files. None means infinite bandwidth.
+        clock : RealClock or VirtualClock
+            Clock used to spend and measure the time. VirtualClock by default.
+        seed : int or None
+            Seed of the random generator of the jitter.
+        """
+        self.responses = list(responses or [])
+        self.handler = handler
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.clock = clock or VirtualClock()
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self.files: dict[str, str] = {}
+        self.directories: set[str] = set()
+        self.calls: list[CallRecord] = []
+
+    def add_response(
+        self,
+        pattern: str,
+        stdout: str = "",
+        stderr: str = "",
+        exit_code: int = 0,
+        regex: bool = False,
+    ) -> None:
+        self.responses.append(
+            MockResponse(
+                pattern=pattern,
+                stdout=stdout,
+                stderr=stderr,
+                exit_code=exit_code,
+                regex=regex,
+            )
+        )
+
+    def _transfer_time(self, n_bytes: int) -> float:
+        delay = self.latency
+        if self.jitter:
+            delay += self._rng.uniform(0, self.jitter)
+        if self.bandwidth:
+            delay += n_bytes / self.bandwidth
+        return delay
+
+    def _get_output(self, command: str, workdir: str | None) -> tuple[str, str, int]:
+        for response in self.responses:
+            if response.matches(command):
+                return response.stdout, response.stderr, response.exit_code
+        if self.handler is not None:
+            output = self.handler(command, workdir)
+            if output is not None:
+                return output
+        name = command.split()[0] if command.split() else command
+        return "", f"/bin/sh: 1: {name}: not found\n", 127
+
+    def execute(
+        self,
+        command: str | list[str],
+        workdir: str | Path | None = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        cancel_event: threading.Event | None = None,
+    ):
+        """Execute the given command on the host
+
+        Parameters
+        ----------
+        command: str or list of str
+            Command to execute, as a str or list of str.
+        workdir: str or None
+            path where the command will be executed.
+        timeout: float or None
+            Maximum time in seconds for each attempt.
+        retries: int
+            Number of additional attempts on timeouts or transient errors.
+        backoff: float
+            Base delay in seconds between the attempts.
+        cancel_event: threading.Event or None
+            Event stopping the execution between the attempts.
+
+        Returns
+        -------
+        stdout : str
+            Standard output of the command
+        stderr : str
+            Standard error of the command
+        exit_code : int
+            Exit code of the command.
+        """
+        if isinstance(command, (list, tuple)):
+            command = " ".join(command)
+        workdir = str(workdir) if workdir else None
+
+        def run_once():
+            start = self.clock.time()
+            stdout, stderr, exit_code = self._get_output(command, workdir)
+            n_bytes = len(command) + len(stdout) + len(stderr)
+            delay = self._transfer_time(n_bytes)
+            if timeout is not None and delay > timeout:
+                self.clock.sleep(timeout)
+                self.calls.append(
+                    CallRecord(command, workdir, start, timeout, n_bytes, None)
+                )
+                msg = f"command {command} timed out after {timeout} seconds"
+                raise CommandFailedError(msg, command=command, timed_out=True)
+            self.clock.sleep(delay)
+            self.calls.append(
+                CallRecord(command, workdir, start, delay, n_bytes, exit_code)
+            )
+            return stdout, stderr, exit_code
+
+        return self.execute_with_retries(
+            run_once,
+            command,
+            retries=retries,
+            backoff=backoff,
+            cancel_event=cancel_event,
+        )
+
+    def mkdir(self, directory, recursive: bool = True, exist_ok: bool = True) -> bool:
+        """Create directory on the host."""
+        self.clock.sleep(self._transfer_time(len(str(directory))))
+        directory = str(directory)
+        if directory in self.directories and not exist_ok:
+            return False
+        path = Path(directory)
+        if not recursive and str(path.parent) not in self.directories:
+            return False
+        self.directories.add(directory)
+        if recursive:
+            self.directories.update(str(p) for p in path.parents)
+        return True
+
+    def write_text_file(self, filepath, content):
+        """Write content to a file on the host."""
+        self.clock.sleep(self._transfer_time(len(content)))
+        self.files[str(filepath)] = content
+
+    def read_text_file(self, filepath) -> str:
+        return self.files[str(filepath)]
+
+    def _sleep(
+        self, seconds: float, cancel_event: threading.Event | None = None
+    ) -> None:
+        self.clock.sleep(seconds)
+
+    @property
+    def total_time(self) -> float:
+        """Total time spent in the executed commands."""
+        return sum(c.duration for c in self.calls)
+
+    @property
+    def total_bytes(self) -> int:
+        """Total bytes transferred by the executed commands."""
+        return sum(c.bytes_transferred for c in self.calls)
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+
+
+def split_command(command: str) -> tuple[str, list[str]]:
+    """
+    Split a shell command in the executable and its arguments, skipping
+    the leading environment variables assignments (e.g. SLURM_TIME_FORMAT=...).
+    """
+    tokens = shlex.split(command)
+    while tokens and re.match(r"^[A-Za-z_][A-Za-z0-9_]*=", tokens[0]):
+        tokens.pop(0)
+    if not tokens:
+        return "", []
+    return tokens[0], tokens[1:]
@@ -1,16 +1,143 @@
 from __future__ import annotations
 
 import io
+import threading
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import fabric
-
+from qtoolkit.core.base import QTKObject
+from qtoolkit.core.exceptions import CommandFailedError
 from qtoolkit.host.base import BaseHost, HostConfig
 
+if TYPE_CHECKING:
+    import fabric
+
+# fabric (and paramiko) are imported only when needed, as their import is slow.
 # from fabric import Connection, Config
 
 
+def _default_fabric_config():
+    import fabric
+
+    return fabric.Config()
+
+
+def configure_transport(
+    transport,
+    keepalive: int | None = None,
+    window_size: int | None = None,
+    max_packet_size: int | None = None,
+) -> None:
+    """
+    Set the options of an open paramiko Transport. The window and packet
+    sizes apply to the channels opened afterwards.
+    """
+    if keepalive:
+        transport.set_keepalive(keepalive)
+    if window_size:
+        transport.default_window_size = window_size
+    if max_packet_size:
+        transport.default_max_packet_size = max_packet_size
+
+
+@dataclass
+class GatewayConfig(QTKObject):
+    """
+    SSH jump host (bastion) through which the connections to the remote
+    hosts are opened.
+
+    All the RemoteHosts with a GatewayConfig with the same host, user and
+    port share a single authenticated connection to the gateway (see
+    GatewayPool): the connections to the remote hosts are opened as
+    direct-tcpip channels of its transport, so that the authentication on
+    the gateway is done only once.
+    """
+
+    host: str
+    user: str = None
+    port: int = None
+    connect_timeout: int = None
+    connect_kwargs: dict = None
+    keepalive: int = None
+    """Interval in seconds of the keepalive packets. Disabled if None."""
+
+    @property
+    def key(self) -> tuple:
+        return self.host, self.user, self.port
+
+
+class GatewayPool:
+    """
+    Connections to the gateways shared among the RemoteHosts.
+
+    A connection is created when first acquired and closed when released
+    by all the hosts using it. The connect_kwargs of the first GatewayConfig
+    acquired for a gateway are used.
+    """
+
+    def __init__(self):
+        self._connections: dict[tuple, fabric.Connection] = {}
+        self._configs: dict[int, GatewayConfig] = {}
+        self._users: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, config: GatewayConfig) -> fabric.Connection:
+        """The shared connection to the gateway, created if needed."""
+        import fabric
+
+        with self._lock:
+            connection = self._connections.get(config.key)
+            if connection is None:
+                kwargs = {
+                    "host": config.host,
+                    "user": config.user,
+                    "port": config.port,
+                    "connect_timeout": config.connect_timeout,
+                    "connect_kwargs": config.connect_kwargs,
+                }
+                connection = fabric.Connection(
+                    **{k: v for k, v in kwargs.items() if v is not None}
+                )
+                self._connections[config.key] = connection
+                self._configs[id(connection)] = config
+                self._users[config.key] = 0
+            self._users[config.key] += 1
+            return connection
+
+    def release(self, config: GatewayConfig) -> None:
+        """Release the connection, closing it if not used by other hosts."""
+        with self._lock:
+            if config.key not in self._users:
+                return
+            self._users[config.key] -= 1
+            if self._users[config.key] <= 0:
+                del self._users[config.key]
+                connection = self._connections.pop(config.key)
+                self._configs.pop(id(connection), None)
+                connection.close()
+
+    def open(self, connection: fabric.Connection) -> None:
+        """
+        Open the connection to the gateway, if not already open. Serialized,
+        so that concurrent hosts do not open more than one transport.
+        """
+        with self._lock:
+            if connection.is_connected:
+                return
+            connection.open()
+            config = self._configs.get(id(connection))
+            if config is not None:
+                configure_transport(connection.transport, keepalive=config.keepalive)
+
+    def __len__(self) -> int:
+        return len(self._connections)
+
+
+# Pool used by default by the RemoteHosts.
+shared_gateways = GatewayPool()
+
+
 @dataclass
 class RemoteConfig(HostConfig):
     # Fabric's Connection init args:
@@ -18,13 +145,41 @@ class RemoteConfig(HostConfig):
     user: str = None
     port: int = None
     # Here we could just provide a config_filename
-    config: fabric.Config = field(default_factory=fabric.Config)
-    gateway: fabric.Connection | str = None
+    config: fabric.Config = field(default_factory=_default_fabric_config)
+    gateway: fabric.Connection | GatewayConfig | str = None
+    """
+    Gateway used to reach the host: a GatewayConfig (the connection to the
+    gateway is shared with the other hosts), a fabric Connection (shared by
+    the hosts using the same object) or a ProxyCommand string.
+    """
+
     forward_agent: bool = None
     connect_timeout: int = None
     connect_kwargs: dict = None
     inline_ssh_env: bool = True
 
+    # Tuning of the SSH transport:
+    compress: bool = False
+    """
+    Whether to enable the zlib compression of the SSH transport. Reduces the
+    data transferred for large outputs (e.g. qstat -f, sacct) on slow links,
+    at the cost of CPU time on both sides.
+    """
+
+    keepalive: int = None
+    """Interval in seconds of the keepalive packets. Disabled if None."""
+
+    window_size: int = None
+    """
+    Size in bytes of the window of the SSH channels, i.e. the data that the
+    host can send before waiting for an acknowledgement. Larger windows
+    improve the throughput of large outputs on links with high latency.
+    Default of paramiko (2 MiB) if None.
+    """
+
+    max_packet_size: int = None
+    """Maximum size in bytes of the SSH packets. Default of paramiko if None."""
+
 
 # connect_kwargs in paramiko:
 # hostname,
@@ -131,18 +286,80 @@ class RemoteHost(BaseHost):
     For some commands assumes the remote can run unix
     """
 
-    def __init__(self, config: RemoteConfig):
+    def __init__(self, config: RemoteConfig, gateway_pool: GatewayPool | None = None):
+        import fabric
+
         self.config = config
+        self._gateway_pool = (
+            gateway_pool if gateway_pool is not None else shared_gateways
+        )
+        self._gateway_config = None
+        gateway = config.gateway
+        if isinstance(gateway, GatewayConfig):
+            self._gateway_config = gateway
+            gateway = self._gateway_pool.acquire(gateway)
+        self._gateway = gateway
+
+        connect_kwargs = config.connect_kwargs
+        if config.compress:
+            connect_kwargs = {"compress": True, **(connect_kwargs or {})}
+
+        kwargs = {
+            "host": config.host,
+            "user": config.user,
+            "port": config.port,
+            "config": config.config,
+            "gateway": gateway,
+            "forward_agent": config.forward_agent,
+            "connect_timeout": config.connect_timeout,
+            "connect_kwargs": connect_kwargs,
+            "inline_ssh_env": config.inline_ssh_env,
+        }
         self._connection = fabric.Connection(
-            host=self.config.host,
-            user=self.config.user,
+            **{k: v for k, v in kwargs.items() if v is not None}
         )
 
     @property
     def connection(self):
         return self._connection
 
-    def execute(self, command: str | list[str], workdir: str | Path | None = None):
+    def connect(self) -> None:
+        """
+        Open the connection to the host, and to the gateway if needed.
+        Done automatically when a command is executed.
+        """
+        if self._connection.is_connected:
+            return
+        # fabric.Connection can be given as gateway to several hosts as well
+        if self._gateway is not None and not isinstance(self._gateway, str):
+            self._gateway_pool.open(self._gateway)
+        self._connection.open()
+        configure_transport(
+            self._connection.transport,
+            keepalive=self.config.keepalive,
+            window_size=self.config.window_size,
+            max_packet_size=self.config.max_packet_size,
+        )
+
+    def close(self) -> None:
+        """
+        Close the connection to the host. The shared connection to the
+        gateway is closed when it is not used by any other host.
+        """
+        self._connection.close()
+        if self._gateway_config is not None:
+            self._gateway_pool.release(self._gateway_config)
+            self._gateway_config = None
+
+    def execute(
+        self,
+        command: str | list[str],
+        workdir: str | Path | None = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        cancel_event: threading.Event | None = None,
+    ):
         """Execute the given command on the host
 
         Parameters
@@ -151,6 +368,15 @@ class RemoteHost(BaseHost):
             Command to execute, as a str or list of str.
         workdir: str or None
             path where the command will be executed.
+        timeout: float or None
+            Maximum time in seconds for each attempt. On timeout the channel
+            running the command is closed.
+        retries: int
+            Number of additional attempts on timeouts or transient errors.
+        backoff: float
+            Base delay in seconds between the attempts.
+        cancel_event: threading.Event or None
+            Event stopping the execution between the attempts.
 
         Returns
         -------
@@ -173,10 +399,36 @@ class RemoteHost(BaseHost):
             workdir = "."
         else:
             workdir = str(workdir)
-        with self.connection.cd(workdir):
-            out = self.connection.run(command, hide=True, warn=True)
 
-        return out.stdout, out.stderr, out.exited
+        from invoke.exceptions import CommandTimedOut
+
+        def run_once():
+            self.connect()
+            try:
+                with self.connection.cd(workdir):
+                    # in_stream=False: the local stdin is not forwarded to
+                    # the commands, which are never interactive
+                    out = self.connection.run(
+                        command, hide=True, warn=True, timeout=timeout, in_stream=False
+                    )
+            except CommandTimedOut as exc:
+                msg = f"command {command} timed out after {timeout} seconds"
+                raise CommandFailedError(
+                    msg,
+                    command=command,
+                    stdout=exc.result.stdout,
+                    stderr=exc.result.stderr,
+                    timed_out=True,
+                ) from exc
+            return out.stdout, out.stderr, out.exited
+
+        return self.execute_with_retries(
+            run_once,
+            command,
+            retries=retries,
+            backoff=backoff,
+            cancel_event=cancel_event,
+        )
 
     def mkdir(self, directory, recursive: bool = True, exist_ok: bool = True) -> bool:
         """Create directory on the host."""
@@ -194,4 +446,5 @@ class RemoteHost(BaseHost):
         """Write content to a file on the host."""
         f = io.StringIO(content)
 
+        self.connect()
         self.connection.put(f, str(filepath))
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import http.client
+import json
+import queue
+import socket
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.base import BaseHost, HostConfig
+
+# Errors raised when a connection taken from the pool has been closed by the
+# server in the meantime. The request can be safely sent again.
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+@dataclass
+class RestConfig(HostConfig):
+    url: str
+    """Base URL of the REST API, e.g. http://slurmrestd:6820."""
+
+    user: str | None = None
+    """User name, sent in the X-SLURM-USER-NAME header."""
+
+    token: str | None = None
+    """Authentication token, sent in the X-SLURM-USER-TOKEN header."""
+
+    headers: dict = field(default_factory=dict)
+    """Additional headers sent with all the requests."""
+
+    pool_size: int = 4
+    """Maximum number of idle keep-alive connections kept in the pool."""
+
+    connect_timeout: float | None = None
+    """Timeout in seconds for the connections, if no timeout is given."""
+
+
+class RestHost(BaseHost):
+    """
+    Host sending requests to a REST API over pooled keep-alive HTTP connections.
+
+    The commands are JSON request descriptors, as generated by the REST
+    scheduler IO classes (e.g. SlurmRestIO), with the keys:
+
+    - method: HTTP method.
+    - path: path of the request, including the query string.
+    - body: JSON body of the request (optional).
+    - body_file: path of a file previously written with write_text_file,
+      whose content is used as the JSON body (optional).
+
+    The body of the response is returned as stdout. The exit code is 0 for
+    2xx responses and 1 otherwise, with the status in stderr.
+    Files are only stored in memory, as the content of the submission
+    scripts is sent in the body of the requests.
+    """
+
+    # the commands are JSON request descriptors
+    shell_commands = False
+
+    def __init__(self, config: RestConfig):
+        self.config = config
+        url = urlsplit(config.url)
+        if url.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme in {config.url}")
+        self._connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self._netloc = url.netloc
+        self._base_path = url.path.rstrip("/")
+        self._pool: queue.LifoQueue = queue.LifoQueue(maxsize=config.pool_size)
+        self._lock = threading.Lock()
+        self.files: dict[str, str] = {}
+        self.connections_created = 0
+
+    def execute(
+        self,
+        command: str | dict,
+        workdir: str | Path | None = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        cancel_event: threading.Event | None = None,
+    ):
+        """Send the request described by the command.
+
+        Parameters
+        ----------
+        command: str or dict
+            JSON request descriptor.
+        workdir: str or None
+            Working directory. For job submissions it is used as the
+            current_working_directory of the job, if not already defined.
+        timeout: float or None
+            Maximum time in seconds for each attempt.
+        retries: int
+            Number of additional attempts on timeouts or transient errors.
+        backoff: float
+            Base delay in seconds between the attempts.
+        cancel_event: threading.Event or None
+            Event stopping the execution between the attempts.
+
+        Returns
+        -------
+        stdout : str
+            Body of the response.
+        stderr : str
+            Status of the response, if not successful.
+        exit_code : int
+            0 if the request was successful, 1 otherwise.
+        """
+        request = json.loads(command) if isinstance(command, str) else dict(command)
+        body = request.get("body")
+        if "body_file" in request:
+            body = json.loads(self.read_text_file(request["body_file"]))
+        if workdir is not None and isinstance(body, dict) and "job" in body:
+            body["job"].setdefault("current_working_directory", str(workdir))
+
+        method = request.get("method", "GET")
+        path = self._base_path + request["path"]
+        payload = json.dumps(body).encode() if body is not None else None
+        description = f"{method} {path}"
+
+        def run_once():
+            return self._request(method, path, payload, timeout, description)
+
+        return self.execute_with_retries(
+            run_once,
+            description,
+            retries=retries,
+            backoff=backoff,
+            cancel_event=cancel_event,
+        )
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        payload: bytes | None,
+        timeout: float | None,
+        description: str,
+    ) -> tuple[str, str, int]:
+        headers = {"Accept": "application/json", **self.config.headers}
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+        if self.config.user:
+            headers["X-SLURM-USER-NAME"] = self.config.user
+        if self.config.token:
+            headers["X-SLURM-USER-TOKEN"] = self.config.token
+
+        connection, reused = self._get_connection()
+        try:
+            connection.timeout = timeout or self.config.connect_timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(connection.timeout)
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                # the server closed the idle connection, retry on a new one
+                connection.close()
+                connection = self._new_connection()
+                connection.timeout = timeout or self.config.connect_timeout
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+            data = response.read().decode()
+        except (socket.timeout, TimeoutError) as exc:
+            connection.close()
+            msg = f"request {description} timed out after {timeout} seconds"
+            raise CommandFailedError(msg, command=description, timed_out=True) from exc
+        except (OSError, http.client.HTTPException) as exc:
+            connection.close()
+            msg = f"request {description} failed: {exc}"
+            raise CommandFailedError(msg, command=description) from exc
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release_connection(connection)
+
+        if 200 <= response.status < 300:
+            return data, "", 0
+        return data, f"HTTP {response.status} {response.reason}", 1
+
+    def _new_connection(self):
+        with self._lock:
+            self.connections_created += 1
+        return self._connection_class(self._netloc, timeout=self.config.connect_timeout)
+
+    def _get_connection(self):
+        """Get an idle connection from the pool, or a new one if none is left."""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release_connection(self, connection) -> None:
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self) -> None:
+        """Close all the idle connections of the pool."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def mkdir(self, directory, recursive: bool = True, exist_ok: bool = True) -> bool:
+        """
+        Directories cannot be created through the REST API. The working
+        directory of the jobs should already exist on the cluster.
+        """
+        return True
+
+    def write_text_file(self, filepath, content) -> None:
+        self.files[str(filepath)] = content
+
+    def read_text_file(self, filepath) -> str:
+        try:
+            return self.files[str(filepath)]
+        except KeyError:
+            raise FileNotFoundError(f"File {filepath} was not written on the host")
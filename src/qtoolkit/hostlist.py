@@ -0,0 +1,526 @@
+"""
+Expansion and compression of Slurm hostlist expressions.
+
+A hostlist expression is a comma separated list of host names, where the
+numeric parts can be given as bracketed ranges, e.g. ``nid[0001-4096,5000]``
+or ``rack[1-2]-node[01-16]`` (multi-dimensional). This is the format of the
+node lists in the output of squeue (%N), scontrol (NodeList) and sacct
+(NodeList) and of the --nodelist and --exclude options of sbatch.
+
+HostList stores the hosts as ranges of numbers, grouped by the text around
+the last number of the host names, so that large lists of nodes are kept in
+a compact form and the set operations are performed on the ranges, without
+expanding the host names.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from itertools import product, repeat
+
+# Last number in a host name, with the text before and after it.
+_HOST_NUMBER_RE = re.compile(r"^(.*?)(\d+)(\D*)$")
+
+
+class RangeSet:
+    """
+    Immutable set of non-negative integers, stored as sorted, disjoint and
+    non-adjacent inclusive intervals.
+
+    Parameters
+    ----------
+    intervals : iterable of tuple
+        (start, end) inclusive intervals, in any order. They can overlap.
+    """
+
+    __slots__ = ("_intervals", "_starts")
+
+    def __init__(self, intervals: Iterable[tuple[int, int]] = ()):
+        merged: list[tuple[int, int]] = []
+        for start, end in sorted(intervals):
+            if end < start:
+                raise ValueError(f"Invalid range {start}-{end}")
+            if merged and start <= merged[-1][1] + 1:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        self._set_intervals(merged)
+
+    @classmethod
+    def _from_merged(cls, intervals: list[tuple[int, int]]) -> RangeSet:
+        """Create a RangeSet from intervals already sorted and merged."""
+        range_set = cls.__new__(cls)
+        range_set._set_intervals(intervals)
+        return range_set
+
+    def _set_intervals(self, intervals: list[tuple[int, int]]) -> None:
+        self._intervals = tuple(intervals)
+        self._starts = [start for start, _ in intervals]
+
+    @property
+    def intervals(self) -> tuple[tuple[int, int], ...]:
+        return self._intervals
+
+    def __len__(self) -> int:
+        return sum(end - start + 1 for start, end in self._intervals)
+
+    def __bool__(self) -> bool:
+        return bool(self._intervals)
+
+    def __iter__(self) -> Iterator[int]:
+        for start, end in self._intervals:
+            yield from range(start, end + 1)
+
+    def __contains__(self, number) -> bool:
+        i = bisect_right(self._starts, number) - 1
+        return i >= 0 and number <= self._intervals[i][1]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RangeSet):
+            return NotImplemented
+        return self._intervals == other._intervals
+
+    def __hash__(self) -> int:
+        return hash(self._intervals)
+
+    def __repr__(self) -> str:
+        return f"RangeSet({list(self._intervals)})"
+
+    def union(self, other: RangeSet) -> RangeSet:
+        return RangeSet(self._intervals + other._intervals)
+
+    def intersection(self, other: RangeSet) -> RangeSet:
+        result = []
+        a, b = self._intervals, other._intervals
+        i = j = 0
+        while i < len(a) and j < len(b):
+            start = max(a[i][0], b[j][0])
+            end = min(a[i][1], b[j][1])
+            if start <= end:
+                result.append((start, end))
+            if a[i][1] < b[j][1]:
+                i += 1
+            else:
+                j += 1
+        return RangeSet._from_merged(result)
+
+    def difference(self, other: RangeSet) -> RangeSet:
+        result = []
+        b = other._intervals
+        j = 0
+        for start, end in self._intervals:
+            while j < len(b) and b[j][1] < start:
+                j += 1
+            k = j
+            while k < len(b) and b[k][0] <= end:
+                if b[k][0] > start:
+                    result.append((start, b[k][0] - 1))
+                start = max(start, b[k][1] + 1)
+                k += 1
+            if start <= end:
+                result.append((start, end))
+        return RangeSet._from_merged(result)
+
+    def split(self, number: int) -> tuple[RangeSet, RangeSet]:
+        """The numbers smaller than number and the others."""
+        below = self.intersection(RangeSet._from_merged([(0, number - 1)]))
+        return below, self.difference(below)
+
+    def format(self, width: int = 0) -> str:
+        """
+        The ranges as in the brackets of a hostlist expression, e.g. 1-4,7,
+        padding the numbers with zeros to the given width.
+        """
+        parts = []
+        for start, end in self._intervals:
+            if start == end:
+                parts.append(f"{start:0{width}d}")
+            else:
+                parts.append(f"{start:0{width}d}-{end:0{width}d}")
+        return ",".join(parts)
+
+
+def _split_top_level(expression: str) -> list[str]:
+    """Split the expression at the commas outside of the brackets."""
+    parts = []
+    depth = 0
+    current = 0
+    for i, char in enumerate(expression):
+        if char == "[":
+            depth += 1
+            if depth > 1:
+                raise ValueError(f"Nested brackets in hostlist {expression}")
+        elif char == "]":
+            depth -= 1
+            if depth < 0:
+                raise ValueError(f"Unbalanced brackets in hostlist {expression}")
+        elif char == "," and depth == 0:
+            parts.append(expression[current:i])
+            current = i + 1
+    if depth != 0:
+        raise ValueError(f"Unbalanced brackets in hostlist {expression}")
+    parts.append(expression[current:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _parse_ranges(ranges: str) -> list[tuple[RangeSet, int]]:
+    """
+    Parse the content of a bracket, e.g. 0001-4096,5000, in RangeSets of
+    numbers with the same zero padding width.
+    """
+    by_width: dict[int, list[tuple[int, int]]] = {}
+    for item in ranges.split(","):
+        item = item.strip()
+        start_str, sep, end_str = item.partition("-")
+        if not start_str.isdigit() or (sep and not end_str.isdigit()):
+            raise ValueError(f"Invalid range {item!r} in hostlist")
+        start = int(start_str)
+        end = int(end_str) if sep else start
+        if end < start:
+            raise ValueError(f"Invalid range {item!r} in hostlist")
+        # the width of the lower bound defines the padding of the range
+        by_width.setdefault(len(start_str), []).append((start, end))
+    return [(RangeSet(intervals), width) for width, intervals in by_width.items()]
+
+
+def _split_brackets(pattern: str) -> list[str]:
+    """Split a pattern in text and bracket contents, alternating."""
+    pieces = re.split(r"\[([^\]]*)\]", pattern)
+    if "[" in "".join(pieces[::2]) or "]" in "".join(pieces[::2]):
+        raise ValueError(f"Unbalanced brackets in hostlist {pattern}")
+    return pieces
+
+
+def _join_brackets(pieces: list[str]) -> list[str]:
+    """Join back the pieces from _split_brackets in a pattern."""
+    return [p if i % 2 == 0 else f"[{p}]" for i, p in enumerate(pieces)]
+
+
+def _expand_pattern(pattern: str) -> Iterator[str]:
+    """Host names of a single pattern, in order."""
+    pieces = _split_brackets(pattern)
+    choices: list[Iterable[str]] = []
+    for i, piece in enumerate(pieces):
+        if i % 2 == 0:
+            choices.append((piece,))
+        else:
+            choices.append(
+                [
+                    f"{n:0{width}d}"
+                    for range_set, width in _parse_ranges(piece)
+                    for n in range_set
+                ]
+            )
+    for names in product(*choices):
+        yield "".join(names)
+
+
+def expand_hostlist(expression: str) -> list[str]:
+    """
+    Expand a hostlist expression in the list of host names, preserving the
+    order and the duplicates, as scontrol show hostnames.
+
+    Parameters
+    ----------
+    expression : str
+        Hostlist expression, e.g. nid[0001-0004,0010].
+
+    Returns
+    -------
+    list of str
+        Host names.
+    """
+    hosts = []
+    for pattern in _split_top_level(expression):
+        hosts.extend(_expand_pattern(pattern))
+    return hosts
+
+
+def compress_hostlist(hosts: str | Iterable[str] | HostList) -> str:
+    """
+    Compress a list of host names (or a hostlist expression) in the
+    shortest hostlist expression, as scontrol show hostlist.
+    """
+    if not isinstance(hosts, HostList):
+        hosts = HostList(hosts)
+    return hosts.compress()
+
+
+def _normalize_width(range_set: RangeSet, width: int) -> list[tuple[RangeSet, int]]:
+    """
+    Split the numbers by the zero padding actually needed to print them.
+
+    The numbers with at least width digits are printed in the same way with
+    or without padding (e.g. 100 with width 3 is the same host as 100 without
+    padding), so they are stored with width 0, to make the host names unique.
+    """
+    if width <= 1:
+        return [(range_set, 0)]
+    padded, unpadded = range_set.split(10 ** (width - 1))
+    return [(padded, width), (unpadded, 0)]
+
+
+class HostList:
+    """
+    Set of host names, stored as ranges of numbers.
+
+    The host names are grouped by the text before and after their last
+    number and by the zero padding of the number, e.g. nid0001 and nid0002
+    are both in the group ("nid", "", 4). The names without numbers are stored
+    as they are. The set operations (union, intersection, difference) are
+    performed on the ranges of each group, without expanding the names.
+
+    HostList objects are immutable.
+
+    Parameters
+    ----------
+    hosts : str or iterable of str
+        Hostlist expression (e.g. nid[0001-4096,5000]) or host names.
+    """
+
+    __slots__ = ("_groups", "_names")
+
+    def __init__(self, hosts: str | Iterable[str] | None = None):
+        self._groups: dict[tuple[str, str, int], RangeSet] = {}
+        self._names: frozenset[str] = frozenset()
+        if hosts is None:
+            return
+        if isinstance(hosts, str):
+            patterns = _split_top_level(hosts)
+        else:
+            patterns = [h.strip() for h in hosts if h.strip()]
+
+        groups: dict[tuple[str, str, int], list[RangeSet]] = {}
+        names = set()
+        for pattern in patterns:
+            for key, range_set in self._parse_pattern(pattern, names):
+                groups.setdefault(key, []).append(range_set)
+        for key, range_sets in groups.items():
+            intervals = [i for r in range_sets for i in r.intervals]
+            self._add_group(key, RangeSet(intervals))
+        self._names = frozenset(names)
+
+    @staticmethod
+    def _parse_pattern(pattern: str, names: set[str]):
+        """
+        Yield the groups ((prefix, suffix, width), RangeSet) of a pattern.
+        The brackets before the last one are expanded. The names without
+        numbers are added to names.
+        """
+        pieces = _split_brackets(pattern)
+        if len(pieces) == 1:
+            match = _HOST_NUMBER_RE.match(pattern)
+            if not match:
+                names.add(pattern)
+                return
+            prefix, digits, suffix = match.groups()
+            number = int(digits)
+            yield (prefix, suffix, len(digits)), RangeSet([(number, number)])
+            return
+
+        suffix = pieces[-1]
+        ranges = _parse_ranges(pieces[-2])
+        for prefix in _expand_pattern("".join(_join_brackets(pieces[:-2]))):
+            for range_set, width in ranges:
+                yield (prefix, suffix, width), range_set
+
+    def _add_group(self, key: tuple[str, str, int], range_set: RangeSet) -> None:
+        prefix, suffix, width = key
+        for part, part_width in _normalize_width(range_set, width):
+            if not part:
+                continue
+            part_key = (prefix, suffix, part_width)
+            if part_key in self._groups:
+                part = self._groups[part_key].union(part)
+            self._groups[part_key] = part
+
+    @classmethod
+    def _from_parts(
+        cls, groups: dict[tuple[str, str, int], RangeSet], names: Iterable[str]
+    ) -> HostList:
+        hostlist = cls()
+        hostlist._groups = {k: v for k, v in groups.items() if v}
+        hostlist._names = frozenset(names)
+        return hostlist
+
+    def __len__(self) -> int:
+        return len(self._names) + sum(len(r) for r in self._groups.values())
+
+    def __bool__(self) -> bool:
+        return bool(self._names) or bool(self._groups)
+
+    def __iter__(self) -> Iterator[str]:
+        """The host names, sorted by group and number."""
+        yield from sorted(self._names)
+        by_affix: dict[tuple[str, str], list] = {}
+        for (prefix, suffix, width), range_set in self._groups.items():
+            by_affix.setdefault((prefix, suffix), []).append(
+                zip(range_set, repeat(width))
+            )
+        for prefix, suffix in sorted(by_affix):
+            for number, width in heapq.merge(*by_affix[(prefix, suffix)]):
+                yield f"{prefix}{number:0{width}d}{suffix}"
+
+    def __contains__(self, host) -> bool:
+        if not isinstance(host, str):
+            return False
+        match = _HOST_NUMBER_RE.match(host)
+        if not match:
+            return host in self._names
+        prefix, digits, suffix = match.groups()
+        number = int(digits)
+        # the width is 0 if no padding is needed, see _normalize_width
+        width = len(digits) if len(digits) > len(str(number)) else 0
+        range_set = self._groups.get((prefix, suffix, width))
+        return range_set is not None and number in range_set
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, HostList):
+            return NotImplemented
+        return self._names == other._names and self._groups == other._groups
+
+    def __hash__(self) -> int:
+        return hash((self._names, frozenset(self._groups.items())))
+
+    def __repr__(self) -> str:
+        return f"HostList({self.compress()!r})"
+
+    def __str__(self) -> str:
+        return self.compress()
+
+    def union(self, *others: HostList | str | Iterable[str]) -> HostList:
+        groups = dict(self._groups)
+        names = set(self._names)
+        for other in others:
+            other = self._as_hostlist(other)
+            for key, range_set in other._groups.items():
+                groups[key] = (
+                    groups[key].union(range_set) if key in groups else range_set
+                )
+            names.update(other._names)
+        return self._from_parts(groups, names)
+
+    def intersection(self, other: HostList | str | Iterable[str]) -> HostList:
+        other = self._as_hostlist(other)
+        groups = {
+            key: range_set.intersection(other._groups[key])
+            for key, range_set in self._groups.items()
+            if key in other._groups
+        }
+        return self._from_parts(groups, self._names & other._names)
+
+    def difference(self, other: HostList | str | Iterable[str]) -> HostList:
+        other = self._as_hostlist(other)
+        groups = {
+            key: (
+                range_set.difference(other._groups[key])
+                if key in other._groups
+                else range_set
+            )
+            for key, range_set in self._groups.items()
+        }
+        return self._from_parts(groups, self._names - other._names)
+
+    def issubset(self, other: HostList | str | Iterable[str]) -> bool:
+        return not self.difference(other)
+
+    def isdisjoint(self, other: HostList | str | Iterable[str]) -> bool:
+        return not self.intersection(other)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+    __le__ = issubset
+
+    @classmethod
+    def _as_hostlist(cls, hosts) -> HostList:
+        return hosts if isinstance(hosts, HostList) else cls(hosts)
+
+    def compress(self) -> str:
+        """
+        The shortest hostlist expression of the hosts, e.g. nid[0001-0004].
+
+        The groups that only differ by a number in the text before the
+        brackets and have the same ranges are merged in multi-dimensional
+        expressions, e.g. rack[1-2]-node[01-16].
+        """
+        # (text before the brackets, formatted brackets and text after them)
+        entries = []
+        by_affix: dict[tuple[str, str], list[tuple[int, RangeSet]]] = {}
+        for (prefix, suffix, width), range_set in self._groups.items():
+            by_affix.setdefault((prefix, suffix), []).append((width, range_set))
+        for (prefix, suffix), widths in by_affix.items():
+            for width, range_set in self._merge_widths(widths):
+                entries.append((prefix, self._format_ranges(range_set, width) + suffix))
+
+        entries = self._fold_entries(entries)
+        patterns = sorted(self._names) + sorted(head + tail for head, tail in entries)
+        return ",".join(patterns)
+
+    @staticmethod
+    def _merge_widths(
+        widths: list[tuple[int, RangeSet]],
+    ) -> list[tuple[int, RangeSet]]:
+        """
+        Merge the numbers without padding in the group with the largest
+        padding, if they are printed in the same way (see _normalize_width).
+        """
+        widths = dict(widths)
+        max_width = max(widths)
+        if max_width > 0 and 0 in widths:
+            below, above = widths[0].split(10 ** (max_width - 1))
+            widths[max_width] = widths[max_width].union(above)
+            if below:
+                widths[0] = below
+            else:
+                del widths[0]
+        return sorted(widths.items())
+
+    @staticmethod
+    def _format_ranges(range_set: RangeSet, width: int) -> str:
+        if len(range_set.intervals) == 1 and len(range_set) == 1:
+            return range_set.format(width)
+        return f"[{range_set.format(width)}]"
+
+    @classmethod
+    def _fold_entries(cls, entries: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """
+        Merge the entries with the same tail whose heads only differ by
+        their last number, adding a dimension to the expression. Repeated
+        until no entries can be merged.
+        """
+        while True:
+            groups: dict[tuple[str, str, str, int], list[int]] = {}
+            others = []
+            for head, tail in entries:
+                match = _HOST_NUMBER_RE.match(head)
+                if not match:
+                    others.append((head, tail))
+                    continue
+                prefix, digits, suffix = match.groups()
+                number = int(digits)
+                width = len(digits) if len(digits) > len(str(number)) else 0
+                key = (prefix, suffix + tail, suffix, width)
+                groups.setdefault(key, []).append(number)
+
+            folded = False
+            new_entries = others
+            for (prefix, full_tail, suffix, width), numbers in groups.items():
+                if len(numbers) > 1:
+                    folded = True
+                    range_set = RangeSet((n, n) for n in numbers)
+                    new_entries.append(
+                        (prefix, cls._format_ranges(range_set, width) + full_tail)
+                    )
+                else:
+                    tail = full_tail[len(suffix) :]
+                    new_entries.append(
+                        (f"{prefix}{numbers[0]:0{width}d}{suffix}", tail)
+                    )
+            entries = new_entries
+            if not folded:
+                return entries
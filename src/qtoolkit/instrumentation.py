@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+class Instrument:
+    """
+    Base class for the instruments.
+
+    Instruments receive a notification before and after each operation (span)
+    with a set of tags identifying it. The hooks do nothing by default,
+    subclasses can override only the ones they need.
+    """
+
+    def pre(self, operation: str, tags: dict) -> None:
+        """Called before the operation starts.
+
+        Parameters
+        ----------
+        operation : str
+            Name of the operation, e.g. "submit.execute".
+        tags : dict
+            Tags identifying the context of the operation (scheduler, host, ...).
+        """
+
+    def post(
+        self,
+        operation: str,
+        duration: float,
+        tags: dict,
+        error: BaseException | None = None,
+    ) -> None:
+        """Called after the operation has completed.
+
+        Parameters
+        ----------
+        operation : str
+            Name of the operation, e.g. "submit.execute".
+        duration : float
+            Duration of the operation in seconds.
+        tags : dict
+            Tags identifying the context of the operation (scheduler, host, ...).
+        error : Exception or None
+            The exception raised by the operation, if any.
+        """
+
+
+@contextmanager
+def span(instruments: list[Instrument] | None, operation: str, **tags):
+    """
+    Context manager measuring the duration of an operation and notifying
+    the instruments.
+
+    Parameters
+    ----------
+    instruments : list of Instrument
+        The instruments to be notified. Nothing is measured if empty.
+    operation : str
+        Name of the operation.
+    tags
+        Tags identifying the context of the operation.
+    """
+    if not instruments:
+        yield
+        return
+
+    for instrument in instruments:
+        instrument.pre(operation, tags)
+    start = time.monotonic()
+    error = None
+    try:
+        yield
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        duration = time.monotonic() - start
+        for instrument in instruments:
+            instrument.post(operation, duration, tags, error)
+
+
+@dataclass
+class Histogram:
+    """Latency histogram with fixed upper bounds for the buckets."""
+
+    buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+    min: float | None = None
+    max: float | None = None
+    errors: int = 0
+
+    def __post_init__(self):
+        if not self.counts:
+            # last bucket is +Inf
+            self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float, error: bool = False) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if error:
+            self.errors += 1
+
+    @property
+    def mean(self) -> float | None:
+        return self.sum / self.count if self.count else None
+
+    def as_dict(self) -> dict:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "errors": self.errors,
+        }
+
+
+class LatencyCollector(Instrument):
+    """
+    Instrument collecting the latency histograms of the operations, grouped
+    by operation and scheduler.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def post(
+        self,
+        operation: str,
+        duration: float,
+        tags: dict,
+        error: BaseException | None = None,
+    ) -> None:
+        key = (operation, tags.get("scheduler", ""))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = Histogram(buckets=self.buckets)
+                self.histograms[key] = histogram
+            histogram.observe(duration, error=error is not None)
+
+    def get(self, operation: str, scheduler: str = "") -> Histogram | None:
+        return self.histograms.get((operation, scheduler))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+
+    def to_dict(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"operation": operation, "scheduler": scheduler, **h.as_dict()}
+                for (operation, scheduler), h in sorted(self.histograms.items())
+            ]
+
+    def export_json(self, filepath: str | Path) -> None:
+        """Write the collected histograms to a JSON file."""
+        Path(filepath).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def to_prometheus(self, metric_name: str = "qtoolkit_operation_seconds") -> str:
+        """Convert the collected histograms to the Prometheus text format."""
+        lines = [
+            f"# HELP {metric_name} Duration of the qtoolkit operations in seconds.",
+            f"# TYPE {metric_name} histogram",
+        ]
+        for data in self.to_dict():
+            labels = f'operation="{data["operation"]}",scheduler="{data["scheduler"]}"'
+            cumulative = 0
+            bounds = [str(b) for b in data["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, data["counts"]):
+                cumulative += count
+                lines.append(
+                    f'{metric_name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                )
+            lines.append(f"{metric_name}_sum{{{labels}}} {data['sum']}")
+            lines.append(f"{metric_name}_count{{{labels}}} {data['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export_prometheus(
+        self, filepath: str | Path, metric_name: str = "qtoolkit_operation_seconds"
+    ) -> None:
+        """
+        Write the collected histograms to a file in the Prometheus text format,
+        e.g. to be read by the textfile collector of the node exporter.
+        The file is written atomically.
+        """
+        filepath = Path(filepath)
+        tmp_path = filepath.with_name(filepath.name + ".tmp")
+        tmp_path.write_text(self.to_prometheus(metric_name))
+        tmp_path.replace(filepath)
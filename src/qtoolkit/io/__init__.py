@@ -1,6 +1,30 @@
-from qtoolkit.io.base import BaseSchedulerIO
-from qtoolkit.io.pbs import PBSIO, PBSState
-from qtoolkit.io.shell import ShellIO, ShellState
-from qtoolkit.io.slurm import SlurmIO, SlurmState
+from qtoolkit.utils import LazyImportMapping, lazy_module_getattr
 
-scheduler_mapping = {"slurm": SlurmIO, "pbs": PBSIO, "shell": ShellIO}
+_LAZY_OBJECTS = {
+    "BaseSchedulerIO": "qtoolkit.io.base:BaseSchedulerIO",
+    "ParallelParser": "qtoolkit.io.parallel:ParallelParser",
+    "PBSIO": "qtoolkit.io.pbs:PBSIO",
+    "PBSState": "qtoolkit.io.pbs:PBSState",
+    "ShellIO": "qtoolkit.io.shell:ShellIO",
+    "ShellState": "qtoolkit.io.shell:ShellState",
+    "SlurmIO": "qtoolkit.io.slurm:SlurmIO",
+    "SlurmRestIO": "qtoolkit.io.slurmrest:SlurmRestIO",
+    "SlurmState": "qtoolkit.io.slurm:SlurmState",
+}
+
+__getattr__ = lazy_module_getattr(__name__, _LAZY_OBJECTS)
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_OBJECTS))
+
+
+# The backend modules are only imported when the corresponding entry is accessed.
+scheduler_mapping = LazyImportMapping(
+    {
+        "slurm": _LAZY_OBJECTS["SlurmIO"],
+        "pbs": _LAZY_OBJECTS["PBSIO"],
+        "shell": _LAZY_OBJECTS["ShellIO"],
+        "slurmrest": _LAZY_OBJECTS["SlurmRestIO"],
+    }
+)
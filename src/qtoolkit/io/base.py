@@ -3,13 +3,30 @@ from __future__ import annotations
 import abc
 import difflib
 import shlex
-from dataclasses import fields
+from dataclasses import dataclass, fields
 from pathlib import Path
 from string import Template
+from typing import Any, Callable
 
 from qtoolkit.core.base import QTKObject
-from qtoolkit.core.data_objects import CancelResult, QJob, QResources, SubmissionResult
-from qtoolkit.core.exceptions import UnsupportedResourcesError
+from qtoolkit.core.data_objects import (
+    CancelResult,
+    ClusterState,
+    PendingJob,
+    QJob,
+    QJobFilter,
+    QJobInfo,
+    QResources,
+    QSubState,
+    SubmissionResult,
+)
+from qtoolkit.core.exceptions import OutputParsingError, UnsupportedResourcesError
+
+# Suffix of the completion markers written by the jobs.
+MARKER_SUFFIX = ".done"
+# Shell variable holding the exit code of the job commands, written in the
+# completion marker.
+EXIT_CODE_VARIABLE = "_qtk_rc"
 
 
 class QTemplate(Template):
@@ -38,6 +55,49 @@ class QTemplate(Template):
         return ids
 
 
+@dataclass(frozen=True)
+class JobField:
+    """
+    Field of the jobs that can be requested in a projection of get_jobs_list.
+
+    Attributes
+    ----------
+    key : str
+        Key identifying the field in the scheduler, e.g. a format code of
+        squeue or the name of an attribute in the output of qstat -f.
+    converter : callable
+        Function converting the raw string to the value of the field. Can raise
+        OutputParsingError if the value is not defined. The string is used
+        unchanged if None.
+    attribute : str
+        Attribute of the QJob where the value is set, "info.<name>" for the
+        attributes of QJobInfo. If None, the value is stored in the
+        other_properties dict of the QJob, with the name of the field as key.
+    """
+
+    key: str
+    converter: Callable[[str], Any] | None = None
+    attribute: str | None = None
+
+
+def convert_int(value: str) -> int:
+    """Convert a string to int, raising an OutputParsingError if not possible."""
+    try:
+        return int(value)
+    except ValueError:
+        raise OutputParsingError(f"{value} is not an integer")
+
+
+# Fields needed to check the criteria of a QJobFilter on the parsed jobs.
+_FILTER_FIELDS = {
+    "states": "state",
+    "partitions": "partition",
+    "names": "name",
+    "accounts": "account",
+    "qos": "qos",
+}
+
+
 class BaseSchedulerIO(QTKObject, abc.ABC):
     """Base class for job queues."""
 
@@ -48,24 +108,62 @@ class BaseSchedulerIO(QTKObject, abc.ABC):
 
     shebang: str = "#!/bin/bash"
 
+    # Shell expression giving the id of the job from inside the job script.
+    job_id_expression: str = "$$"
+
+    # Fields that can be requested in a projection of get_jobs_list.
+    # Backends without fields always return the full jobs.
+    job_fields: dict[str, JobField] = {}
+
+    # Beginning of the lines starting a new job in the output of the command
+    # listing the jobs ("" if each line is a job), used to split the output
+    # in chunks that can be parsed independently. None if it cannot be split.
+    jobs_list_record_start: str | None = None
+
     def get_submission_script(
         self,
         commands: str | list[str],
         options: dict | QResources | None = None,
+        marker_dir: str | Path | None = None,
+        post_commands: str | list[str] | None = None,
     ) -> str:
-        """Get the submission script for the given commands and options."""
+        """Get the submission script for the given commands and options.
+
+        If marker_dir is given, the script writes a completion marker for the
+        job in that directory when it ends (see generate_marker_setup), with
+        the exit code of the commands. The post_commands are executed after
+        the commands and do not change the exit code in the marker.
+        """
         script_blocks = [self.shebang]
         if header := self.generate_header(options):
             script_blocks.append(header)
-
-        run_commands = self.generate_run_commands(commands)
-        script_blocks.append(run_commands)
-
-        if footer := self.generate_footer():
+        if marker_dir:
+            script_blocks.append(self.generate_marker_setup(marker_dir))
+        script_blocks.extend(
+            self._generate_job_commands(commands, post_commands, marker_dir)
+        )
+        if footer := self.generate_footer(marker_dir):
             script_blocks.append(footer)
 
         return "\n".join(script_blocks)
 
+    def _generate_job_commands(
+        self,
+        commands: str | list[str],
+        post_commands: str | list[str] | None = None,
+        marker_dir: str | Path | None = None,
+    ) -> list[str]:
+        """
+        The blocks of the commands and of the post_commands. If marker_dir is
+        given, the exit code of the commands is saved before the post_commands.
+        """
+        blocks = [self.generate_run_commands(commands)]
+        if marker_dir:
+            blocks.append(f"{EXIT_CODE_VARIABLE}=$?")
+        if post_commands:
+            blocks.append(self.generate_run_commands(post_commands))
+        return blocks
+
     def generate_header(self, options: dict | QResources | None) -> str:
         # needs info from self.meta_info (email, job name [also execution])
         # queuing_options (priority, account, qos and submit as hold)
@@ -121,7 +219,39 @@ class BaseSchedulerIO(QTKObject, abc.ABC):
 
         return commands
 
-    def generate_footer(self) -> str:
+    def generate_marker_setup(self, marker_dir: str | Path) -> str:
+        """
+        Generate the block that prepares the writing of the completion marker.
+
+        The block records the start time of the job and sets an EXIT trap,
+        so that the marker is also written if the script exits early. The
+        marker, named "<job_id>.done", contains a JSON object with the exit
+        code, start and end timestamps of the job. It is written to a
+        temporary file and then renamed, so that readers never see a partial
+        marker. Note that jobs killed with SIGKILL cannot write the marker.
+
+        Parameters
+        ----------
+        marker_dir : str or Path
+            Directory where the marker is written. Should be an absolute path.
+        """
+        return f"""_qtk_marker_dir={shlex.quote(str(marker_dir))}
+_qtk_start=$(date +%s)
+_qtk_write_marker() {{
+    _qtk_exit_code=$1
+    _qtk_job_id={self.job_id_expression}
+    mkdir -p "$_qtk_marker_dir"
+    printf '{{"exit_code": %d, "start": %s, "end": %s}}\\n' "$_qtk_exit_code" \\
+        "$_qtk_start" "$(date +%s)" > "$_qtk_marker_dir/.$_qtk_job_id.tmp"
+    mv -f "$_qtk_marker_dir/.$_qtk_job_id.tmp" "$_qtk_marker_dir/$_qtk_job_id{MARKER_SUFFIX}"
+}}
+trap '_qtk_write_marker $?' EXIT"""
+
+    def generate_footer(self, marker_dir: str | Path | None = None) -> str:
+        if marker_dir:
+            # write the marker with the exit code of the job commands and
+            # disable the trap, that would write it again
+            return f"_qtk_write_marker ${EXIT_CODE_VARIABLE}\ntrap - EXIT"
         return ""
 
     def generate_ids_list(self, jobs: list[QJob | int | str] | None) -> list[str]:
@@ -184,6 +314,101 @@ class BaseSchedulerIO(QTKObject, abc.ABC):
     def parse_job_output(self, exit_code, stdout, stderr) -> QJob | None:
         pass
 
+    def get_jobs_details_cmd(self, jobs: list[QJob | int | str] | None = None) -> str:
+        """
+        Get the command returning the detailed information of several jobs
+        (all the jobs if None) at once.
+
+        By default, the same command used to list the jobs.
+        The output may contain other jobs than the requested ones.
+        """
+        return self.get_jobs_list_cmd(jobs, None)
+
+    def parse_jobs_details_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        """Parse the output of the command of get_jobs_details_cmd."""
+        return self.parse_jobs_list_output(exit_code, stdout, stderr)
+
+    def get_jobs_accounting_cmd(self, jobs: list[QJob | int | str]) -> str:
+        """
+        Get the command returning the information of several jobs from the
+        accounting (or history) of the scheduler, including finished jobs that
+        are not listed anymore.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the accounting of the jobs"
+        )
+
+    def parse_jobs_accounting_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        """Parse the output of the command of get_jobs_accounting_cmd."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the accounting of the jobs"
+        )
+
+    def get_jobs_usage_cmd(self, jobs: list[QJob | int | str]) -> str:
+        """
+        Get the command returning the exit status and the resources used
+        (max_rss, total_cpu, elapsed, node_list) by several jobs.
+
+        By default, the same command used for the accounting.
+        """
+        return self.get_jobs_accounting_cmd(jobs)
+
+    def parse_jobs_usage_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        """Parse the output of the command of get_jobs_usage_cmd."""
+        return self.parse_jobs_accounting_output(exit_code, stdout, stderr)
+
+    def get_live_usage_cmd(self, jobs: list[QJob | int | str]) -> str:
+        """
+        Get the command returning the resources used so far by running jobs,
+        if not available from get_jobs_usage_cmd while the jobs are running.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the live usage of the jobs"
+        )
+
+    def parse_live_usage_output(self, exit_code, stdout, stderr) -> dict[str, dict]:
+        """
+        Parse the output of the command of get_live_usage_cmd.
+
+        Returns
+        -------
+        dict
+            Values of the usage fields of QJobInfo, by job id.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the live usage of the jobs"
+        )
+
+    def get_pending_jobs_cmd(self) -> str:
+        """
+        Get the command returning the jobs of all the users waiting in the
+        queue, with the estimates of their start time (e.g. squeue --start).
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the estimates of the start times"
+        )
+
+    def parse_pending_jobs_output(self, exit_code, stdout, stderr) -> list[PendingJob]:
+        """Parse the output of the command of get_pending_jobs_cmd."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the estimates of the start times"
+        )
+
+    def get_cluster_state_cmd(self) -> str:
+        """
+        Get the command returning the capacity (nodes, CPUs, memory and
+        generic resources) of the partitions of the cluster.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the state of the cluster"
+        )
+
+    def parse_cluster_state_output(self, exit_code, stdout, stderr) -> ClusterState:
+        """Parse the output of the command of get_cluster_state_cmd."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support the state of the cluster"
+        )
+
     def check_convert_qresources(self, resources: QResources) -> dict:
         """
         Converts a Qresources instance to a dict that will be used to fill in the
@@ -225,19 +450,202 @@ class BaseSchedulerIO(QTKObject, abc.ABC):
         return []
 
     def get_jobs_list_cmd(
-        self, jobs: list[QJob | int | str] | None, user: str | None
+        self,
+        jobs: list[QJob | int | str] | None,
+        user: str | None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
     ) -> str:
         job_ids = self.generate_ids_list(jobs)
         if user:
             user = shlex.quote(user)
-        return self._get_jobs_list_cmd(job_ids, user)
+        pushed, _ = self.split_filter(filters, job_ids, user)
+        fields = self.get_projection(fields, filters, job_ids, user)
+        return self._get_jobs_list_cmd(job_ids, user, pushed, fields)
 
     @abc.abstractmethod
     def _get_jobs_list_cmd(
-        self, job_ids: list[str] | None = None, user: str | None = None
+        self,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
     ) -> str:
         pass
 
+    def register_job_field(
+        self,
+        name: str,
+        key: str,
+        converter: Callable[[str], Any] | None = None,
+        attribute: str | None = None,
+    ) -> None:
+        """
+        Register an additional field that can be requested in get_jobs_list.
+
+        Parameters
+        ----------
+        name : str
+            Name of the field, used in the fields argument of get_jobs_list.
+        key : str
+            Key of the field in the scheduler (see JobField).
+        converter : callable
+            Function converting the raw string to the value of the field.
+        attribute : str
+            Attribute of the QJob where the value is set. By default, the value
+            is stored in QJob.other_properties[name].
+        """
+        if "job_fields" not in self.__dict__:
+            # do not modify the fields of the class
+            self.job_fields = dict(self.job_fields)
+        self.job_fields[name] = JobField(
+            key=key, converter=converter, attribute=attribute
+        )
+
+    def get_projection(
+        self,
+        fields: list[str] | None,
+        filters: QJobFilter | None = None,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+    ) -> list[str] | None:
+        """
+        Get the list of fields to be requested for a projection of the jobs.
+
+        The job_id is always included, as well as the fields needed to apply
+        the part of the filters that is checked on the parsed jobs.
+        None means that all the fields are requested.
+        """
+        if fields is None or not self.job_fields:
+            return None
+        unknown = [f for f in fields if f not in self.job_fields]
+        if unknown:
+            msg = (
+                f"Unknown fields: {', '.join(unknown)}. "
+                f"Available fields: {', '.join(sorted(self.job_fields))}"
+            )
+            raise ValueError(msg)
+        projection = ["job_id"] + [f for f in fields if f != "job_id"]
+        residual = self.get_residual_filter(filters, job_ids, user)
+        if residual is not None:
+            for attr, field in _FILTER_FIELDS.items():
+                if getattr(residual, attr) is not None and field in self.job_fields:
+                    projection.append(field)
+        # remove duplicates, keeping the order
+        return list(dict.fromkeys(projection))
+
+    @staticmethod
+    def _set_job_field(qjob: QJob, name: str, field: JobField, raw: str) -> None:
+        """Convert the raw value of a field and set it in the QJob."""
+        value = raw.strip() if raw is not None else None
+        if not value:
+            value = None
+        elif field.converter is not None:
+            try:
+                value = field.converter(value)
+            except OutputParsingError:
+                value = None
+            except ValueError:
+                msg = f"Could not convert value {value} of field {name} for job {qjob.job_id}"
+                raise OutputParsingError(msg)
+
+        if field.attribute is None:
+            if qjob.other_properties is None:
+                qjob.other_properties = {}
+            qjob.other_properties[name] = value
+        elif field.attribute.startswith("info."):
+            if qjob.info is None:
+                qjob.info = QJobInfo()
+            setattr(qjob.info, field.attribute[5:], value)
+        else:
+            setattr(qjob, field.attribute, value)
+
+        if isinstance(value, QSubState):
+            qjob.state = value.qstate
+
+    def split_filter(
+        self,
+        filters: QJobFilter | None,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+    ) -> tuple[QJobFilter | None, QJobFilter | None]:
+        """
+        Split the filter in the part that can be applied by the command
+        listing the jobs and the part that should be applied on the parsed jobs.
+
+        By default, nothing is applied by the command.
+
+        Returns
+        -------
+        pushed : QJobFilter or None
+            Criteria applied by the command.
+        residual : QJobFilter or None
+            Criteria to be applied on the parsed jobs.
+        """
+        if filters is None or filters.is_empty():
+            return None, None
+        return None, filters
+
+    def get_residual_filter(
+        self,
+        filters: QJobFilter | None,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+    ) -> QJobFilter | None:
+        """Part of the filter that cannot be applied by the command."""
+        return self.split_filter(filters, job_ids, user)[1]
+
     @abc.abstractmethod
-    def parse_jobs_list_output(self, exit_code, stdout, stderr) -> list[QJob]:
-        pass
+    def parse_jobs_list_output(
+        self, exit_code, stdout, stderr, fields: list[str] | None = None
+    ) -> list[QJob]:
+        """
+        Parse the output of the command listing the jobs.
+
+        If fields is given, the output is expected to contain only the fields
+        of the projection, as generated by get_jobs_list_cmd with the same
+        fields. Only those fields are set in the QJobs.
+        """
+
+    def split_jobs_list_output(self, stdout: str, n_chunks: int) -> list[str]:
+        """
+        Split the output of the command listing the jobs in (at most) n_chunks
+        chunks of similar size, at the beginning of the records of the jobs.
+
+        Each chunk can be parsed independently with parse_jobs_list_output and
+        the concatenation of the results is the same as parsing the whole
+        output. The output is not split if the backend does not define
+        jobs_list_record_start.
+        """
+        if self.jobs_list_record_start is None or n_chunks <= 1:
+            return [stdout]
+        boundary = "\n" + self.jobs_list_record_start
+        size = len(stdout) // n_chunks
+        chunks = []
+        start = 0
+        while start < len(stdout):
+            end = -1
+            if len(chunks) < n_chunks - 1:
+                end = stdout.find(boundary, start + size)
+            # split after the newline, the chunks start with a record
+            end = len(stdout) if end == -1 else end + 1
+            chunks.append(stdout[start:end])
+            start = end
+        return chunks
+
+    def filter_jobs_list(
+        self,
+        jobs: list[QJob],
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+    ) -> list[QJob]:
+        """
+        Filter the parsed jobs list according to the selection passed to
+        get_jobs_list_cmd. Only the part of the filters that could not be
+        applied by the command is checked on the jobs.
+        """
+        residual = self.get_residual_filter(filters, job_ids, user)
+        if residual is None:
+            return jobs
+        return [job for job in jobs if residual.matches(job)]
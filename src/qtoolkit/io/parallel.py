@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from qtoolkit.core.data_objects import QJob
+from qtoolkit.io.base import BaseSchedulerIO
+
+# Size in characters of the outputs below which the parsing is done in the
+# current process. Below a few MB the cost of sending the chunks to the
+# workers and the parsed jobs back is larger than the gain.
+DEFAULT_PARALLEL_THRESHOLD = 4_000_000
+
+
+def _parse_chunk(
+    scheduler_io: BaseSchedulerIO,
+    exit_code: int,
+    stdout: str,
+    stderr: str,
+    fields: list[str] | None,
+) -> list[QJob]:
+    return scheduler_io.parse_jobs_list_output(
+        exit_code=exit_code, stdout=stdout, stderr=stderr, fields=fields
+    )
+
+
+class ParallelParser:
+    """
+    Parse the outputs of the commands listing the jobs in a pool of processes.
+
+    Large outputs are split in chunks at the boundaries of the records of the
+    jobs (see BaseSchedulerIO.split_jobs_list_output), the chunks are parsed
+    in parallel and the jobs are merged in the original order. Outputs smaller
+    than the threshold, failed commands and outputs of backends that cannot
+    be split are parsed in the current process.
+
+    The pool is created at the first parallel parse and reused for the
+    following ones. Call close (or use the parser as a context manager) to
+    shut it down.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes. Defaults to the number of CPUs.
+    threshold : int
+        Minimum size in characters of the output to be parsed in parallel.
+    executor : Executor
+        Executor used to parse the chunks, instead of a pool created by the
+        parser. It is not shut down by close.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        threshold: int = DEFAULT_PARALLEL_THRESHOLD,
+        executor: Executor | None = None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        self._executor = executor
+        self._owns_executor = executor is None
+
+    def use_parallel(self, scheduler_io: BaseSchedulerIO, exit_code, stdout) -> bool:
+        """Whether the output should be parsed in parallel."""
+        return (
+            self.workers > 1
+            and exit_code == 0
+            and scheduler_io.jobs_list_record_start is not None
+            and len(stdout) >= self.threshold
+        )
+
+    def parse_jobs_list_output(
+        self,
+        scheduler_io: BaseSchedulerIO,
+        exit_code,
+        stdout,
+        stderr,
+        fields: list[str] | None = None,
+    ) -> list[QJob]:
+        """
+        Parse the output of the command listing the jobs, with the same
+        result as scheduler_io.parse_jobs_list_output.
+        """
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+
+        if not self.use_parallel(scheduler_io, exit_code, stdout):
+            return scheduler_io.parse_jobs_list_output(
+                exit_code=exit_code, stdout=stdout, stderr=stderr, fields=fields
+            )
+
+        chunks = scheduler_io.split_jobs_list_output(stdout, self.workers)
+        if len(chunks) == 1:
+            return scheduler_io.parse_jobs_list_output(
+                exit_code=exit_code, stdout=stdout, stderr=stderr, fields=fields
+            )
+
+        n = len(chunks)
+        results = self._get_executor().map(
+            _parse_chunk,
+            [scheduler_io] * n,
+            [exit_code] * n,
+            chunks,
+            [stderr] * n,
+            [fields] * n,
+        )
+        jobs_list = []
+        for jobs in results:
+            jobs_list.extend(jobs)
+        return jobs_list
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self) -> None:
+        """Shut down the pool of processes, if created by the parser."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
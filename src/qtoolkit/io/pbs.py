@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+import json
 import re
+import shlex
 from datetime import timedelta
 
 from qtoolkit.core.data_objects import (
     CancelResult,
     CancelStatus,
+    ClusterState,
+    PartitionState,
     ProcessPlacement,
     QJob,
+    QJobFilter,
     QJobInfo,
     QResources,
     QState,
@@ -15,8 +20,12 @@ from qtoolkit.core.data_objects import (
     SubmissionResult,
     SubmissionStatus,
 )
-from qtoolkit.core.exceptions import OutputParsingError, UnsupportedResourcesError
-from qtoolkit.io.base import BaseSchedulerIO
+from qtoolkit.core.exceptions import (
+    CommandFailedError,
+    OutputParsingError,
+    UnsupportedResourcesError,
+)
+from qtoolkit.io.base import BaseSchedulerIO, JobField, convert_int
 
 # States in PBS from qstat's man.
 # B  Array job: at least one subjob has started.
@@ -79,6 +88,38 @@ _STATUS_MAPPING = {
 }
 
 
+# Converters of the job_fields. Module level functions, so that the
+# scheduler IO objects can be pickled and sent to worker processes.
+def _convert_time_field(value: str) -> int | None:
+    return PBSIO._convert_str_to_time(value)
+
+
+def _convert_memory_field(value: str) -> int | None:
+    return PBSIO._convert_memory_str(value)
+
+
+# States of the nodes in pbsnodes in which no job can run.
+_UNAVAILABLE_NODE_STATES = {
+    "down",
+    "offline",
+    "state-unknown",
+    "stale",
+    "unresolvable",
+    "maintenance",
+}
+
+# States of the nodes fully used by the running jobs or reservations.
+_EXCLUSIVE_NODE_STATES = {"job-busy", "job-exclusive", "resv-exclusive", "busy"}
+
+# Consumable resources of the default_chunk of the queues. The other ones
+# (e.g. Qlist) select the nodes of the queue among their resources_available.
+_CONSUMABLE_RESOURCES = {"ncpus", "mem", "vmem", "ngpus", "mpiprocs", "ompthreads"}
+
+# Attribute of a record of the text outputs of pbsnodes -a and qstat -f, with
+# its continuation lines (starting with a tab) if the value is wrapped.
+_ATTRIBUTE_REGEX = re.compile(r"^\s+([A-Za-z_][\w.]*) = (.*(?:\n\t.*)*)", re.MULTILINE)
+
+
 class PBSIO(BaseSchedulerIO):
     header_template: str = """
 #PBS -q $${queue}
@@ -98,6 +139,8 @@ class PBSIO(BaseSchedulerIO):
 #PBS -J $${array}
 $${qverbatim}"""
 
+    job_id_expression: str = "$PBS_JOBID"
+
     SUBMIT_CMD: str | None = "qsub"
     CANCEL_CMD: str | None = "qdel"
 
@@ -160,32 +203,315 @@ $${qverbatim}"""
 
         return cmd
 
+    def get_jobs_accounting_cmd(self, jobs: list[QJob | int | str]) -> str:
+        job_ids = self.generate_ids_list(jobs)
+        if not job_ids:
+            raise ValueError("The ids of the jobs should be defined for qstat -x")
+        # -x includes the finished jobs kept in the history of the server
+        return f"qstat -x -f {' '.join(shlex.quote(i) for i in job_ids)}"
+
+    def parse_jobs_accounting_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        return self.parse_jobs_list_output(exit_code, stdout, stderr)
+
+    def get_cluster_state_cmd(self) -> str:
+        # the queues and the server are needed to map the nodes to the queues.
+        # The JSON output is only available in PBS Pro and OpenPBS, the text
+        # output is used if it fails (e.g. with Torque).
+        json_cmd = "pbsnodes -a -F json && qstat -Q -f -F json && qstat -B -f -F json"
+        text_cmd = "pbsnodes -a && qstat -Q -f && qstat -B -f"
+        return f"{{ {json_cmd}; }} 2>/dev/null || {{ {text_cmd}; }}"
+
+    def parse_cluster_state_output(self, exit_code, stdout, stderr) -> ClusterState:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            msg = f"command pbsnodes failed: {stderr}"
+            raise CommandFailedError(msg)
+        stdout = stdout.strip()
+        if stdout.startswith("{"):
+            nodes, queues, servers = self._load_json_cluster_state(stdout)
+        else:
+            nodes, queues, servers = self._load_text_cluster_state(stdout)
+
+        node_partitions = [
+            (node, self._get_node_partition(node)) for node in nodes.values()
+        ]
+        if queues is None:
+            # without the queues, the nodes are grouped by their queue
+            # attribute, usually only set on Torque
+            partitions: dict[str | None, PartitionState] = {}
+            for _, partition in node_partitions:
+                if partition.name in partitions:
+                    partitions[partition.name].add(partition)
+                else:
+                    partitions[partition.name] = partition
+            return ClusterState(partitions=list(partitions.values()))
+
+        default_queue = next((s.get("default_queue") for s in servers.values()), None)
+        partitions_list = []
+        for name, queue in queues.items():
+            if str(queue.get("queue_type", "")).lower() != "execution":
+                continue
+            walltime = queue.get("resources_max", {}).get("walltime")
+            partition = PartitionState(
+                name=name,
+                available=all(
+                    str(queue.get(key, "")).lower() == "true"
+                    for key in ("enabled", "started")
+                ),
+                default=name == default_queue,
+                time_limit=self._convert_str_to_time(walltime) if walltime else None,
+            )
+            for node, node_partition in node_partitions:
+                if self._is_queue_node(name, queue, node):
+                    partition.add(node_partition)
+            partitions_list.append(partition)
+        return ClusterState(partitions=partitions_list)
+
+    @staticmethod
+    def _load_json_cluster_state(stdout: str) -> tuple[dict, dict | None, dict]:
+        """
+        The nodes, the queues (None if not listed) and the servers from the
+        JSON outputs of pbsnodes -a, qstat -Q -f and qstat -B -f.
+        """
+        # one JSON document for each command
+        decoder = json.JSONDecoder()
+        documents = []
+        index = 0
+        try:
+            while index < len(stdout):
+                document, index = decoder.raw_decode(stdout, index)
+                documents.append(document)
+                while index < len(stdout) and stdout[index].isspace():
+                    index += 1
+            nodes = documents[0].get("nodes", {})
+        except (ValueError, AttributeError, IndexError) as exc:
+            raise OutputParsingError("Could not parse the output of pbsnodes") from exc
+        queues = next((d["Queue"] for d in documents[1:] if "Queue" in d), None)
+        servers = next((d["Server"] for d in documents[1:] if "Server" in d), {})
+        return nodes, queues, servers
+
+    @classmethod
+    def _load_text_cluster_state(cls, stdout: str) -> tuple[dict, dict | None, dict]:
+        """
+        The nodes, the queues (None if not listed) and the servers from the
+        text outputs of pbsnodes -a, qstat -Q -f and qstat -B -f, with the
+        same structure as the JSON outputs.
+        """
+        records: dict[str, dict] = {"nodes": {}, "Queue": {}, "Server": {}}
+        # each record starts with a line without indentation
+        for chunk in re.split(r"\n(?=\S)", stdout):
+            header, _, body = chunk.partition("\n")
+            kind, name = "nodes", header.strip()
+            for prefix in ("Queue", "Server"):
+                if header.startswith(f"{prefix}: "):
+                    kind, name = prefix, header[len(prefix) + 2 :].strip()
+            attributes = _ATTRIBUTE_REGEX.findall(body)
+            if not attributes:
+                msg = f"Could not parse the output of pbsnodes: {header}"
+                raise OutputParsingError(msg)
+            data: dict = {}
+            for key, value in attributes:
+                # e.g. resources_available.ncpus, as in the JSON output
+                *parents, last = key.split(".")
+                target = data
+                for parent in parents:
+                    target = target.setdefault(parent, {})
+                target[last] = "".join(line.strip() for line in value.split("\n"))
+            if kind == "nodes":
+                data = cls._convert_torque_node(data)
+            records[kind][name] = data
+        return records["nodes"], records["Queue"] or None, records["Server"]
+
+    @staticmethod
+    def _convert_torque_node(node: dict) -> dict:
+        """
+        Convert the attributes of a node in the output of pbsnodes of Torque
+        (np, gpus, status and jobs) to the resources of PBS Pro.
+        """
+        if "np" not in node or "resources_available" in node:
+            return node
+        status = dict(
+            item.partition("=")[::2] for item in node.get("status", "").split(",")
+        )
+        available = {"ncpus": node["np"]}
+        if "gpus" in node:
+            available["ngpus"] = node["gpus"]
+        if status.get("physmem"):
+            available["mem"] = status["physmem"]
+        # the slots used by the jobs, e.g. "0-3/12.server,4/13.server"
+        used = 0
+        for slots in node.get("jobs", "").split(","):
+            slots = slots.split("/")[0].strip()
+            if not slots:
+                continue
+            first, _, last = slots.partition("-")
+            try:
+                used += int(last or first) - int(first) + 1
+            except ValueError as exc:
+                msg = f"Could not parse the jobs of the node: {node.get('jobs')}"
+                raise OutputParsingError(msg) from exc
+        return {
+            **node,
+            "resources_available": available,
+            "resources_assigned": {"ncpus": used},
+        }
+
+    @staticmethod
+    def _is_queue_node(name: str, queue: dict, node: dict) -> bool:
+        """
+        Whether the jobs of the queue can run on the node: the nodes assigned
+        to the queue or, if none, the nodes not assigned to any queue whose
+        resources_available match the non-consumable resources of the
+        default_chunk of the queue (e.g. Qlist).
+        """
+        node_queue = node.get("queue")
+        if node_queue or str(queue.get("hasnodes", "")).lower() == "true":
+            return node_queue == name
+        available = node.get("resources_available", {})
+        for resource, value in queue.get("default_chunk", {}).items():
+            if resource in _CONSUMABLE_RESOURCES:
+                continue
+            if str(value) not in str(available.get(resource, "")).split(","):
+                return False
+        return True
+
+    def _get_node_partition(self, node: dict) -> PartitionState:
+        """The capacity of a single node from pbsnodes, as a PartitionState."""
+        states = set(node.get("state", "").split(","))
+        available = node.get("resources_available", {})
+        assigned = node.get("resources_assigned", {})
+        try:
+            cpus = int(available.get("ncpus", 0))
+            cpus_assigned = min(int(assigned.get("ncpus", 0)), cpus)
+            gpus = int(available.get("ngpus", 0))
+        except (TypeError, ValueError) as exc:
+            msg = f"Could not parse the resources of the node {node.get('Mom')}"
+            raise OutputParsingError(msg) from exc
+
+        partition = PartitionState(
+            name=node.get("queue"),
+            nodes_total=1,
+            cpus_total=cpus,
+            memory_per_node=self._convert_memory_str(available.get("mem")),
+            gres=[f"ngpus={gpus}"] if gpus else None,
+        )
+        if states & _UNAVAILABLE_NODE_STATES:
+            partition.nodes_other = 1
+            partition.cpus_other = cpus
+        elif states & _EXCLUSIVE_NODE_STATES:
+            partition.nodes_allocated = 1
+            partition.cpus_allocated = cpus
+        else:
+            if cpus_assigned:
+                partition.nodes_allocated = 1
+            else:
+                partition.nodes_idle = 1
+            partition.cpus_allocated = cpus_assigned
+            partition.cpus_idle = cpus - cpus_assigned
+        return partition
+
     def parse_job_output(self, exit_code, stdout, stderr) -> QJob | None:
         out = self.parse_jobs_list_output(exit_code, stdout, stderr)
         if out:
             return out[0]
         return None
 
+    def split_filter(
+        self,
+        filters: QJobFilter | None,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+    ) -> tuple[QJobFilter | None, QJobFilter | None]:
+        if filters is None or filters.is_empty():
+            return None, None
+        # qselect cannot select a list of job ids
+        if job_ids:
+            return None, filters
+        pushed = QJobFilter(states=filters.states)
+        residual = QJobFilter(qos=filters.qos)
+        # qselect accepts a single value for the queue, name and account
+        for attr in ("partitions", "names", "accounts"):
+            values = getattr(filters, attr)
+            if values is None:
+                continue
+            if len(values) == 1 and not (
+                attr == "names" and filters.has_wildcard_names
+            ):
+                setattr(pushed, attr, values)
+            else:
+                setattr(residual, attr, values)
+        return (
+            pushed if not pushed.is_empty() else None,
+            residual if not residual.is_empty() else None,
+        )
+
     def _get_jobs_list_cmd(
-        self, job_ids: list[str] | None = None, user: str | None = None
+        self,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
     ) -> str:
         if user and job_ids:
             raise ValueError("Cannot query by user and job(s) in PBS")
 
-        command = [
-            "qstat",
-            "-f",
-        ]
+        if filters is not None:
+            command = self._get_qselect_cmd(user, filters)
+        else:
+            command = ["qstat", "-f"]
+            if user:
+                command.append(f"-u {user}")
+            if job_ids:
+                command.append(" ".join(job_ids))
+            command = " ".join(command)
+
+        if fields is not None:
+            command = f"{command} | {self._get_projection_filter(fields)}"
+        return command
+
+    def _get_projection_filter(self, fields: list[str]) -> str:
+        """
+        awk command keeping only the lines of the output of qstat -f with the
+        job ids and the attributes of the given fields, including their
+        continuation lines.
+        """
+        keys = sorted({self.job_fields[f].key for f in fields} - {"Id"})
+        if not keys:
+            return "awk '/^Job Id:/'"
+        condition = "||".join(f'$1=="{key}"' for key in keys)
+        return (
+            "awk '/^Job Id:/{print;k=0;next} "
+            f"/^ +[A-Za-z_.]+ = /{{k=({condition})}} k'"
+        )
 
+    @staticmethod
+    def _get_qselect_cmd(user: str | None, filters: QJobFilter) -> str:
+        """
+        Command selecting the job ids with qselect and getting the details of
+        the selected jobs only with qstat.
+        """
+        qselect = ["qselect"]
         if user:
-            command.append(f"-u {user}")
-
-        if job_ids:
-            command.append(" ".join(job_ids))
-
-        return " ".join(command)
-
-    def parse_jobs_list_output(self, exit_code, stdout, stderr) -> list[QJob]:
+            qselect.append(f"-u {user}")
+        if filters.states is not None:
+            states = "".join(s.value for s in PBSState if s.qstate in filters.states)
+            qselect.append(f"-s {states}")
+        for option, values in (
+            ("-q", filters.partitions),
+            ("-N", filters.names),
+            ("-A", filters.accounts),
+        ):
+            if values is not None:
+                qselect.append(f"{option} {shlex.quote(values[0])}")
+        # qstat without ids would list all the jobs
+        return f"ids=$({' '.join(qselect)}) && " '{ [ -z "$ids" ] || qstat -f $ids; }'
+
+    def parse_jobs_list_output(
+        self, exit_code, stdout, stderr, fields: list[str] | None = None
+    ) -> list[QJob]:
         if isinstance(stdout, bytes):
             stdout = stdout.decode()
         if isinstance(stderr, bytes):
@@ -200,42 +526,14 @@ $${qverbatim}"""
         #   obtain historical job information
         # TODO raise if these two kinds of error are not present and exit_code != 0?
 
-        # Split by the beginning of "Job Id:" and iterate on the different chunks.
-        # Matching the beginning of the line to avoid problems in case the "Job Id"
-        # string is present elsewhere.
-        jobs_chunks = re.split(r"^\s*Job Id: ", stdout, flags=re.MULTILINE)
-
-        # regex to split the key-values pairs separated by " = "
-        # Explanation:
-        #  - \s*([A-Za-z_.]+)\s+=\s+ matches the key in the key-value pair,
-        #       allowing for leading and trailing whitespace before and after the
-        #       equals sign, and allowing for a dot in the key.
-        #  - ([\s\S]*?) matches the value in the key-value pair, allowing for any
-        #       character including newlines.
-        #  - (?=\n\s*[A-Za-z_.]+\s+=|\Z) is a positive lookahead that matches a
-        #       newline followed by a key with optional leading and trailing
-        #       whitespace and an equals sign or the end of the string,
-        #       without including the lookahead match in the result.
-        # The key_pattern is separated in case needs to be updated.
-        key_pattern = r"[A-Za-z_.]+"
-        values_regex = re.compile(
-            rf"\s*({key_pattern})\s+=\s+([\s\S]*?)(?=\n\s*{key_pattern}\s+=|\Z)"
-        )
+        if fields is not None:
+            return self._parse_projected_jobs_list(stdout, fields)
 
         jobs_list = []
-        for chunk in jobs_chunks:
-            chunk = chunk.strip()
-            if not chunk:
+        for job_id, data in self._iter_qstat_records(stdout):
+            if not data:
                 continue
 
-            # first line is the id:
-            job_id, chunk_data = chunk.split("\n", 1)
-            job_id = job_id.strip()
-            results = values_regex.findall(chunk_data)
-            if not results:
-                continue
-            data = dict(results)
-
             qjob = QJob()
             qjob.job_id = job_id
 
@@ -250,6 +548,8 @@ $${qverbatim}"""
             qjob.state = pbs_job_state.qstate
 
             qjob.username = data["Job_Owner"]
+            # only defined by some PBS flavors, e.g. with qsub -l qos=...
+            qjob.qos = data.get("Resource_List.qos")
 
             info = QJobInfo()
 
@@ -285,7 +585,26 @@ $${qverbatim}"""
             except OutputParsingError:
                 qjob.runtime = None
 
+            # usage, mostly available for the finished jobs (qstat -x)
+            info.elapsed = qjob.runtime
+            try:
+                info.total_cpu = self._convert_str_to_time(
+                    data.get("resources_used.cput")
+                )
+            except OutputParsingError:
+                info.total_cpu = None
+            try:
+                info.max_rss = self._convert_memory_str(data.get("resources_used.mem"))
+            except OutputParsingError:
+                info.max_rss = None
+            info.node_list = self._get_node_list(data.get("exec_host"))
+            try:
+                qjob.exit_status = int(data["Exit_status"])
+            except (KeyError, ValueError):
+                qjob.exit_status = None
+
             qjob.name = data.get("Job_Name")
+            qjob.account = data.get("Account_Name")
             qjob.info = info
 
             # I append to the list of jobs to return
@@ -293,6 +612,68 @@ $${qverbatim}"""
 
         return jobs_list
 
+    def _parse_projected_jobs_list(self, stdout: str, fields: list[str]) -> list[QJob]:
+        """Parse the output of qstat -f filtered to the given fields."""
+        jobs_list = []
+        for job_id, data in self._iter_qstat_records(stdout):
+            qjob = QJob()
+            qjob.job_id = job_id
+            for name in fields:
+                field = self.job_fields[name]
+                if field.key != "Id":
+                    self._set_job_field(qjob, name, field, data.get(field.key))
+            jobs_list.append(qjob)
+        return jobs_list
+
+    @staticmethod
+    def _get_node_list(exec_host: str | None) -> str | None:
+        """
+        Comma separated list of the nodes in the exec_host attribute,
+        e.g. node1/0*4+node2/0*4 gives node1,node2.
+        """
+        if not exec_host:
+            return None
+        nodes = [chunk.split("/", 1)[0] for chunk in exec_host.split("+")]
+        return ",".join(dict.fromkeys(n for n in nodes if n))
+
+    @staticmethod
+    def _iter_qstat_records(stdout: str):
+        """
+        Iterate over the records of the output of qstat -f, yielding the
+        job id and a dict with the attributes of each job.
+        """
+        # Split by the beginning of "Job Id:" and iterate on the different chunks.
+        # Matching the beginning of the line to avoid problems in case the "Job Id"
+        # string is present elsewhere.
+        jobs_chunks = re.split(r"^\s*Job Id: ", stdout, flags=re.MULTILINE)
+
+        # regex to split the key-values pairs separated by " = "
+        # Explanation:
+        #  - \s*([A-Za-z_.]+)\s+=\s+ matches the key in the key-value pair,
+        #       allowing for leading and trailing whitespace before and after the
+        #       equals sign, and allowing for a dot in the key.
+        #  - ([\s\S]*?) matches the value in the key-value pair, allowing for any
+        #       character including newlines.
+        #  - (?=\n\s*[A-Za-z_.]+\s+=|\Z) is a positive lookahead that matches a
+        #       newline followed by a key with optional leading and trailing
+        #       whitespace and an equals sign or the end of the string,
+        #       without including the lookahead match in the result.
+        # The key_pattern is separated in case needs to be updated.
+        key_pattern = r"[A-Za-z_.]+"
+        values_regex = re.compile(
+            rf"\s*({key_pattern})\s+=\s+([\s\S]*?)(?=\n\s*{key_pattern}\s+=|\Z)"
+        )
+
+        for chunk in jobs_chunks:
+            chunk = chunk.strip()
+            if not chunk:
+                continue
+
+            # first line is the id:
+            job_id, _, chunk_data = chunk.partition("\n")
+            job_id = job_id.strip()
+            yield job_id, dict(values_regex.findall(chunk_data))
+
     @staticmethod
     def _convert_str_to_time(time_str: str | None):
         """
@@ -436,6 +817,38 @@ $${qverbatim}"""
 
         return header_dict
 
+    jobs_list_record_start = "Job Id:"
+
+    # Fields that can be requested in get_jobs_list, with the name of the
+    # attribute in the output of qstat -f. Additional attributes can be added
+    # with register_job_field.
+    job_fields: dict[str, JobField] = {
+        "job_id": JobField("Id", attribute="job_id"),
+        "state": JobField("job_state", PBSState, "sub_state"),
+        "name": JobField("Job_Name", attribute="name"),
+        "username": JobField("Job_Owner", attribute="username"),
+        "partition": JobField("queue", attribute="info.partition"),
+        "account": JobField("Account_Name", attribute="account"),
+        "qos": JobField("Resource_List.qos", attribute="qos"),
+        "time_limit": JobField(
+            "Resource_List.walltime",
+            _convert_time_field,
+            "info.time_limit",
+        ),
+        "nodes": JobField("Resource_List.nodect", convert_int, "info.nodes"),
+        "cpus": JobField("Resource_List.ncpus", convert_int, "info.cpus"),
+        "runtime": JobField(
+            "resources_used.walltime",
+            _convert_time_field,
+            "runtime",
+        ),
+        "memory_per_cpu": JobField(
+            "Resource_List.mem",
+            _convert_memory_field,
+            "info.memory_per_cpu",
+        ),
+    }
+
     @property
     def supported_qresources_keys(self) -> list:
         """
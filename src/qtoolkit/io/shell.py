@@ -1,11 +1,14 @@
 from __future__ import annotations
 
+import dataclasses
+import shlex
 from pathlib import Path
 
 from qtoolkit.core.data_objects import (
     CancelResult,
     CancelStatus,
     QJob,
+    QJobFilter,
     QResources,
     QState,
     QSubState,
@@ -178,8 +181,31 @@ $${qverbatim}
             return out[0]
         return None
 
+    def split_filter(
+        self,
+        filters: QJobFilter | None,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+    ) -> tuple[QJobFilter | None, QJobFilter | None]:
+        if filters is None or filters.is_empty():
+            return None, None
+        # the selection options of ps are combined with a logical OR, so the
+        # names can be selected with -C only if no other selection is used.
+        # The other criteria (e.g. the qos) are evaluated on the parsed jobs.
+        if filters.names is None or job_ids or user or filters.has_wildcard_names:
+            return None, filters
+        residual = dataclasses.replace(filters, names=None)
+        return (
+            QJobFilter(names=filters.names),
+            residual if not residual.is_empty() else None,
+        )
+
     def _get_jobs_list_cmd(
-        self, job_ids: list[str] | None = None, user: str | None = None
+        self,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
     ) -> str:
 
         if user and job_ids:
@@ -201,9 +227,14 @@ $${qverbatim}
         if job_ids:
             command.append("-p " + ",".join(job_ids))
 
+        if filters is not None and filters.names is not None:
+            command.append(f"-C {shlex.quote(','.join(filters.names))}")
+
         return " ".join(command)
 
-    def parse_jobs_list_output(self, exit_code, stdout, stderr) -> list[QJob]:
+    def parse_jobs_list_output(
+        self, exit_code, stdout, stderr, fields: list[str] | None = None
+    ) -> list[QJob]:
         """Parse the output of the ps command to list jobs.
 
         Parameters
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import dataclasses
 import re
+import shlex
 from datetime import timedelta
 
 from qtoolkit.core.data_objects import (
     CancelResult,
     CancelStatus,
+    ClusterState,
+    PartitionState,
+    PendingJob,
     QJob,
+    QJobFilter,
     QJobInfo,
     QResources,
     QState,
@@ -15,7 +21,8 @@ from qtoolkit.core.data_objects import (
     SubmissionStatus,
 )
 from qtoolkit.core.exceptions import CommandFailedError, OutputParsingError
-from qtoolkit.io.base import BaseSchedulerIO
+from qtoolkit.hostlist import compress_hostlist
+from qtoolkit.io.base import BaseSchedulerIO, JobField, convert_int
 
 # States in Slurm from squeue's manual. We currently only take the most important ones.
 #     JOB STATE CODES
@@ -145,6 +152,29 @@ _STATUS_MAPPING = {
 }
 
 
+# Commas separating the generic resources in sinfo, not the ones in the
+# socket affinity, e.g. gpu:a100:4(S:0,1),mps:400
+_GRES_SEPARATOR_RE = re.compile(r",(?![^(]*\))")
+
+# Keys of the output of scontrol -o, e.g. JobId, CPUs/Task or ReqB:S:C:T,
+# preceded by a whitespace (or at the beginning of the line).
+_SCONTROL_KEY_RE = re.compile(r"(?:^|\s)([A-Za-z][\w/:.\-]*)=")
+
+
+# Converters of the job_fields. Module level functions, so that the
+# scheduler IO objects can be pickled and sent to worker processes.
+def _convert_time_field(value: str) -> int | None:
+    return SlurmIO._convert_str_to_time(value)
+
+
+def _convert_memory_field(value: str) -> int | None:
+    return SlurmIO._convert_memory_str(value)
+
+
+def _convert_node_list_field(value: str) -> str | None:
+    return SlurmIO._convert_node_list(value)
+
+
 class SlurmIO(BaseSchedulerIO):
     header_template: str = """
 #SBATCH --partition=$${partition}
@@ -175,6 +205,8 @@ class SlurmIO(BaseSchedulerIO):
 #SBATCH --exclusive=$${exclusive}
 $${qverbatim}"""
 
+    job_id_expression: str = "$SLURM_JOB_ID"
+
     SUBMIT_CMD: str | None = "sbatch"
     CANCEL_CMD: str | None = (
         "scancel -v"  # The -v is needed as the default is to report nothing
@@ -192,6 +224,53 @@ $${qverbatim}"""
         ("%C", "number_cpus"),  # number of allocated cores (if already running)
         ("%M", "time_used"),  # Time used by the job in days-hours:minutes:seconds
         ("%m", "min_memory"),  # Minimum size of memory (in MB) requested by the job
+        ("%q", "qos"),  # quality of service
+    ]
+
+    # fields of squeue --start for the jobs waiting in the queue
+    squeue_start_fields = [
+        ("%i", "job_id"),
+        ("%P", "partition"),  # partitions requested, separated by commas
+        ("%C", "cpus"),  # number of CPUs requested
+        ("%l", "time_limit"),
+        ("%S", "start_time"),  # estimated start time
+    ]
+
+    sinfo_fields = [
+        ("%P", "partition"),  # partition name, with a "*" for the default one
+        ("%a", "available"),  # state of the partition (up, down, drain, inact)
+        ("%l", "time_limit"),  # maximum time limit of the jobs
+        ("%F", "nodes"),  # nodes allocated/idle/other/total
+        ("%C", "cpus"),  # CPUs allocated/idle/other/total
+        ("%m", "memory"),  # memory of the nodes in MB
+        ("%G", "gres"),  # generic resources of the nodes
+    ]
+
+    # fields of sacct for the exit status and the resources used by the jobs
+    sacct_usage_fields = [
+        "JobID",
+        "State",
+        "ExitCode",
+        "Elapsed",
+        "TotalCPU",
+        "MaxRSS",
+        "NodeList",
+    ]
+
+    # fields of sacct, read from the accounting database (slurmdbd)
+    sacct_fields = [
+        "JobID",
+        "JobName",
+        "State",
+        "ExitCode",
+        "User",
+        "Account",
+        "Partition",
+        "QOS",
+        "Timelimit",
+        "Elapsed",
+        "NNodes",
+        "NCPUS",
     ]
 
     def __init__(
@@ -283,8 +362,8 @@ $${qverbatim}"""
         if self.get_job_executable == "scontrol":
             # -o is to get the output as a one-liner
             cmd = f"SLURM_TIME_FORMAT='standard' scontrol show job -o {job_id}"
-        elif self.get_job_executable == "sacct":  # pragma: no cover
-            raise NotImplementedError("sacct for get_job not yet implemented.")
+        elif self.get_job_executable == "sacct":
+            cmd = self.get_jobs_accounting_cmd([job_id])
         else:  # pragma: no cover
             raise RuntimeError(
                 f'"{self.get_job_executable}" is not a valid get_job_executable.'
@@ -303,8 +382,9 @@ $${qverbatim}"""
 
         if self.get_job_executable == "scontrol":
             parsed_output = self._parse_scontrol_cmd_output(stdout=stdout)
-        elif self.get_job_executable == "sacct":  # pragma: no cover
-            raise NotImplementedError("sacct for get_job not yet implemented.")
+        elif self.get_job_executable == "sacct":
+            jobs = self.parse_jobs_accounting_output(exit_code, stdout, stderr)
+            return jobs[0] if jobs else None
         else:  # pragma: no cover
             raise RuntimeError(
                 f'"{self.get_job_executable}" is not a valid get_job_executable.'
@@ -313,7 +393,339 @@ $${qverbatim}"""
         if not parsed_output:
             return None
 
-        slurm_state = SlurmState(parsed_output["JobState"])
+        return self._get_scontrol_job(parsed_output)
+
+    def get_jobs_details_cmd(self, jobs: list[QJob | int | str] | None = None) -> str:
+        # scontrol shows either one or all the jobs. For more than one job all
+        # the jobs are listed and the others are discarded after parsing.
+        job_ids = self.generate_ids_list(jobs)
+        cmd = "SLURM_TIME_FORMAT='standard' scontrol show job -o"
+        if job_ids and len(job_ids) == 1:
+            cmd += f" {shlex.quote(job_ids[0])}"
+        return cmd
+
+    def parse_jobs_details_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            # a single job that is not known anymore
+            if "Invalid job id specified" in stderr:
+                return []
+            msg = f"command scontrol failed: {stderr}"
+            raise CommandFailedError(msg)
+
+        jobs_list = []
+        for line in stdout.splitlines():
+            line = line.strip()
+            if not line or line.startswith("No jobs in the system"):
+                continue
+            jobs_list.append(self._get_scontrol_job(self._tokenize_scontrol(line)))
+        return jobs_list
+
+    def get_jobs_accounting_cmd(self, jobs: list[QJob | int | str]) -> str:
+        job_ids = self.generate_ids_list(jobs)
+        if not job_ids:
+            raise ValueError("The ids of the jobs should be defined for sacct")
+        # -X to get only the allocations, not the job steps.
+        # -P to separate the fields with "|".
+        return (
+            "SLURM_TIME_FORMAT='standard' sacct -X -n -P "
+            f"-o {','.join(self.sacct_fields)} "
+            f"-j {','.join(shlex.quote(i) for i in job_ids)}"
+        )
+
+    def parse_jobs_accounting_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            msg = f"command sacct failed: {stderr}"
+            raise CommandFailedError(msg)
+
+        jobs_list = []
+        for line in stdout.splitlines():
+            if not line.strip():
+                continue
+            values = line.split("|")
+            if len(values) != len(self.sacct_fields):
+                msg = (
+                    f"Wrong number of fields in sacct. Found {len(values)}, "
+                    f"expected {len(self.sacct_fields)}"
+                )
+                raise OutputParsingError(msg)
+            jobs_list.append(self._get_sacct_job(dict(zip(self.sacct_fields, values))))
+        return jobs_list
+
+    def get_jobs_usage_cmd(self, jobs: list[QJob | int | str]) -> str:
+        job_ids = self.generate_ids_list(jobs)
+        if not job_ids:
+            raise ValueError("The ids of the jobs should be defined for sacct")
+        # the job steps are included, as the memory is only measured for them
+        return (
+            "SLURM_TIME_FORMAT='standard' sacct -n -P "
+            f"-o {','.join(self.sacct_usage_fields)} "
+            f"-j {','.join(shlex.quote(i) for i in job_ids)}"
+        )
+
+    def parse_jobs_usage_output(self, exit_code, stdout, stderr) -> list[QJob]:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            msg = f"command sacct failed: {stderr}"
+            raise CommandFailedError(msg)
+
+        jobs: dict[str, QJob] = {}
+        steps_rss: dict[str, list[int]] = {}
+        for line in stdout.splitlines():
+            if not line.strip():
+                continue
+            values = line.split("|")
+            if len(values) != len(self.sacct_usage_fields):
+                msg = (
+                    f"Wrong number of fields in sacct. Found {len(values)}, "
+                    f"expected {len(self.sacct_usage_fields)}"
+                )
+                raise OutputParsingError(msg)
+            data = dict(zip(self.sacct_usage_fields, values))
+            job_id, _, step = data["JobID"].partition(".")
+            if step:
+                rss = self._convert_rss(data["MaxRSS"])
+                if rss is not None:
+                    steps_rss.setdefault(job_id, []).append(rss)
+                continue
+
+            qjob = self._get_sacct_job_state(data)
+            qjob.info = QJobInfo(
+                elapsed=self._convert_usage_time(data["Elapsed"]),
+                total_cpu=self._convert_usage_time(data["TotalCPU"]),
+                node_list=self._convert_node_list(data["NodeList"]),
+                max_rss=self._convert_rss(data["MaxRSS"]),
+            )
+            qjob.runtime = qjob.info.elapsed
+            jobs[job_id] = qjob
+
+        for job_id, rss in steps_rss.items():
+            if job_id in jobs:
+                info = jobs[job_id].info
+                info.max_rss = max(rss + [info.max_rss or 0])
+        return list(jobs.values())
+
+    def get_live_usage_cmd(self, jobs: list[QJob | int | str]) -> str:
+        job_ids = self.generate_ids_list(jobs)
+        if not job_ids:
+            raise ValueError("The ids of the jobs should be defined for sstat")
+        # -a for all the steps of the jobs
+        return (
+            "sstat -a -n -P -o JobID,MaxRSS "
+            f"-j {','.join(shlex.quote(i) for i in job_ids)}"
+        )
+
+    def parse_live_usage_output(self, exit_code, stdout, stderr) -> dict[str, dict]:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        # sstat fails if some of the jobs are not running anymore, but still
+        # prints the data of the others
+        usage: dict[str, dict] = {}
+        for line in stdout.splitlines():
+            if "|" not in line:
+                continue
+            step_id, rss = line.split("|")[:2]
+            job_id = step_id.partition(".")[0]
+            rss = self._convert_rss(rss)
+            if rss is None:
+                continue
+            job_usage = usage.setdefault(job_id, {"max_rss": 0})
+            job_usage["max_rss"] = max(job_usage["max_rss"], rss)
+        if not usage and exit_code != 0:
+            msg = f"command sstat failed: {stderr}"
+            raise CommandFailedError(msg)
+        return usage
+
+    def get_pending_jobs_cmd(self) -> str:
+        # the start times are printed as Unix timestamps
+        fmt = "|".join(code for code, _ in self.squeue_start_fields)
+        return f"SLURM_TIME_FORMAT=%s squeue --start --noheader -t PD -o '{fmt}'"
+
+    def parse_pending_jobs_output(self, exit_code, stdout, stderr) -> list[PendingJob]:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            msg = f"command squeue failed: {stderr}"
+            raise CommandFailedError(msg)
+
+        jobs = []
+        for line in stdout.splitlines():
+            if not line.strip():
+                continue
+            values = [v.strip() for v in line.split("|")]
+            if len(values) != len(self.squeue_start_fields):
+                msg = (
+                    f"Wrong number of fields in squeue. Found {len(values)}, "
+                    f"expected {len(self.squeue_start_fields)}"
+                )
+                raise OutputParsingError(msg)
+            data = dict(zip((name for _, name in self.squeue_start_fields), values))
+            try:
+                time_limit = self._convert_str_to_time(data["time_limit"])
+            except OutputParsingError:
+                time_limit = None
+            # N/A if the start time was not estimated yet
+            start_time = data["start_time"]
+            jobs.append(
+                PendingJob(
+                    job_id=data["job_id"],
+                    partitions=(
+                        data["partition"].split(",") if data["partition"] else None
+                    ),
+                    cpus=int(data["cpus"]) if data["cpus"].isdigit() else None,
+                    time_limit=time_limit,
+                    start_time=float(start_time) if start_time.isdigit() else None,
+                )
+            )
+        return jobs
+
+    def get_cluster_state_cmd(self) -> str:
+        # sinfo prints one line for each group of nodes of a partition with
+        # the same memory and generic resources.
+        fmt = "|".join(code for code, _ in self.sinfo_fields)
+        return f"sinfo -h -o '{fmt}'"
+
+    def parse_cluster_state_output(self, exit_code, stdout, stderr) -> ClusterState:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            msg = f"command sinfo failed: {stderr}"
+            raise CommandFailedError(msg)
+
+        partitions: dict[str, PartitionState] = {}
+        for line in stdout.splitlines():
+            if not line.strip():
+                continue
+            values = line.split("|")
+            if len(values) != len(self.sinfo_fields):
+                msg = (
+                    f"Wrong number of fields in sinfo. Found {len(values)}, "
+                    f"expected {len(self.sinfo_fields)}"
+                )
+                raise OutputParsingError(msg)
+            data = dict(zip((name for _, name in self.sinfo_fields), values))
+            partition = self._get_sinfo_partition(data)
+            if partition.name in partitions:
+                partitions[partition.name].add(partition)
+            else:
+                partitions[partition.name] = partition
+        return ClusterState(partitions=list(partitions.values()))
+
+    def _get_sinfo_partition(self, data: dict) -> PartitionState:
+        name = data["partition"].strip()
+        default = name.endswith("*")
+        time_limit = data["time_limit"].strip()
+        if time_limit in ("infinite", "n/a"):
+            time_limit = None
+        try:
+            nodes = [int(v) for v in data["nodes"].split("/")]
+            cpus = [int(v) for v in data["cpus"].split("/")]
+            if len(nodes) != 4 or len(cpus) != 4:
+                raise ValueError
+        except ValueError as exc:
+            msg = f"Could not parse the nodes and CPUs of the partition {name}"
+            raise OutputParsingError(msg) from exc
+        # the memory is suffixed with "+" if the nodes have different sizes
+        memory = data["memory"].strip().rstrip("+")
+        gres = data["gres"].strip()
+        return PartitionState(
+            name=name.rstrip("*"),
+            available=data["available"].strip() == "up",
+            default=default,
+            time_limit=self._convert_str_to_time(time_limit),
+            nodes_allocated=nodes[0],
+            nodes_idle=nodes[1],
+            nodes_other=nodes[2],
+            nodes_total=nodes[3],
+            cpus_allocated=cpus[0],
+            cpus_idle=cpus[1],
+            cpus_other=cpus[2],
+            cpus_total=cpus[3],
+            memory_per_node=int(memory) * 1024 if memory.isdigit() else None,
+            gres=_GRES_SEPARATOR_RE.split(gres) if gres and gres != "(null)" else None,
+        )
+
+    def _get_sacct_job_state(self, data: dict) -> QJob:
+        """Create a QJob with the id, state and exit status from sacct."""
+        qjob = QJob()
+        qjob.job_id = data["JobID"]
+
+        # e.g. "CANCELLED by 1000"
+        state_string = data["State"].split(" ", 1)[0]
+        try:
+            slurm_state = SlurmState(state_string)
+        except ValueError:
+            msg = f"Unknown job state {state_string} for job id {qjob.job_id}"
+            raise OutputParsingError(msg)
+        qjob.sub_state = slurm_state
+        qjob.state = slurm_state.qstate
+
+        # exit code and signal, e.g. "1:0"
+        exit_code, _, _ = data["ExitCode"].partition(":")
+        try:
+            qjob.exit_status = int(exit_code)
+        except ValueError:
+            qjob.exit_status = None
+        return qjob
+
+    def _get_sacct_job(self, data: dict) -> QJob:
+        """Create a QJob from the values of a line of sacct."""
+        qjob = self._get_sacct_job_state(data)
+        qjob.name = data["JobName"] or None
+        qjob.username = data["User"] or None
+        qjob.account = data["Account"] or None
+        qjob.queue_name = data["Partition"] or None
+        qjob.qos = data["QOS"] or None
+
+        info = QJobInfo()
+        info.partition = qjob.queue_name
+        try:
+            info.time_limit = self._convert_str_to_time(data["Timelimit"])
+        except OutputParsingError:
+            # e.g. Partition_Limit
+            info.time_limit = None
+        try:
+            info.nodes = int(data["NNodes"])
+        except ValueError:
+            info.nodes = None
+        try:
+            info.cpus = int(data["NCPUS"])
+        except ValueError:
+            info.cpus = None
+        qjob.info = info
+
+        try:
+            qjob.runtime = self._convert_str_to_time(data["Elapsed"])
+        except OutputParsingError:
+            qjob.runtime = None
+        return qjob
+
+    def _get_scontrol_job(self, parsed_output: dict) -> QJob:
+        """Create a QJob from the key-value pairs of a job in scontrol."""
+        try:
+            slurm_state = SlurmState(parsed_output["JobState"])
+        except (KeyError, ValueError):
+            msg = (
+                f"Unknown job state {parsed_output.get('JobState')} "
+                f"for job id {parsed_output.get('JobId')}"
+            )
+            raise OutputParsingError(msg)
         job_state = slurm_state.qstate
 
         try:
@@ -343,36 +755,84 @@ $${qverbatim}"""
 
         info = QJobInfo(
             memory=memory_per_cpu,
+            memory_per_cpu=memory_per_cpu,
             nodes=nodes,
             cpus=cpus,
             threads_per_process=cpus_task,
             time_limit=time_limit,
         )
-        return QJob(
-            name=parsed_output["JobName"],
-            job_id=parsed_output["JobId"],
+        info.node_list = self._convert_node_list(parsed_output.get("NodeList"))
+        info.partition = parsed_output.get("Partition")
+        qjob = QJob(
+            name=parsed_output.get("JobName"),
+            job_id=parsed_output.get("JobId"),
             state=job_state,
             sub_state=slurm_state,
             info=info,
-            account=parsed_output["UserId"],
-            queue_name=parsed_output["Partition"],
+            account=parsed_output.get("UserId"),
+            queue_name=parsed_output.get("Partition"),
         )
+        # UserId is in the form user(uid)
+        user_id = parsed_output.get("UserId")
+        qjob.username = user_id.split("(", 1)[0] if user_id else None
+        qjob.qos = parsed_output.get("QOS")
+        return qjob
 
     def _parse_scontrol_cmd_output(self, stdout):
-        return {
-            data.split("=", maxsplit=1)[0]: data.split("=", maxsplit=1)[1]
-            for data in stdout.split()
-        }
+        for line in stdout.splitlines():
+            if line.strip():
+                return self._tokenize_scontrol(line)
+        return {}
+
+    @staticmethod
+    def _tokenize_scontrol(line: str) -> dict[str, str]:
+        """
+        Split a line of scontrol -o in a dictionary of key-value pairs.
+
+        The values can contain spaces (e.g. Command, Reason or Comment) and
+        "=" signs (e.g. TRES=cpu=1,mem=4G): a new key starts only after a
+        whitespace and is followed by "=".
+        """
+        matches = list(_SCONTROL_KEY_RE.finditer(line))
+        data = {}
+        for match, next_match in zip(matches, matches[1:] + [None]):
+            end = next_match.start() if next_match is not None else len(line)
+            data[match.group(1)] = line[match.end() : end].strip()
+        return data
+
+    def split_filter(
+        self,
+        filters: QJobFilter | None,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+    ) -> tuple[QJobFilter | None, QJobFilter | None]:
+        if filters is None or filters.is_empty():
+            return None, None
+        pushed = dataclasses.replace(filters)
+        residual = QJobFilter()
+        # squeue -n only accepts exact names
+        if filters.has_wildcard_names:
+            pushed.names = None
+            residual.names = filters.names
+        return pushed, residual if not residual.is_empty() else None
 
     def _get_jobs_list_cmd(
-        self, job_ids: list[str] | None = None, user: str | None = None
+        self,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
     ) -> str:
         if user and job_ids:
             raise ValueError("Cannot query by user and job(s) in SLURM")
 
+        if fields is not None:
+            codes = [self.job_fields[f].key for f in fields]
+        else:
+            codes = [f[0] for f in self.squeue_fields]
         # also leave one empty space to clarify how the split happens in case
         # some columns are empty
-        fields = f"{self.split_separator} ".join(f[0] for f in self.squeue_fields)
+        fields = f"{self.split_separator} ".join(codes)
 
         command = [
             "SLURM_TIME_FORMAT='standard'",
@@ -392,18 +852,45 @@ $${qverbatim}"""
 
             command.append(f"--jobs={','.join(job_ids)}")
 
+        if filters is not None:
+            command.extend(self._get_filter_options(filters))
+
         return " ".join(command)
 
-    def parse_jobs_list_output(self, exit_code, stdout, stderr) -> list[QJob]:
+    @staticmethod
+    def _get_filter_options(filters: QJobFilter) -> list[str]:
+        options = []
+        if filters.states is not None:
+            states = [s.value for s in SlurmState if s.qstate in filters.states]
+            options.append(f"-t {','.join(states)}")
+        for option, values in (
+            ("-p", filters.partitions),
+            ("-n", filters.names),
+            ("-A", filters.accounts),
+            ("-q", filters.qos),
+        ):
+            if values is not None:
+                options.append(f"{option} {shlex.quote(','.join(values))}")
+        return options
+
+    def parse_jobs_list_output(
+        self, exit_code, stdout, stderr, fields: list[str] | None = None
+    ) -> list[QJob]:
         if isinstance(stdout, bytes):
             stdout = stdout.decode()
         if isinstance(stderr, bytes):
             stderr = stderr.decode()
 
         if exit_code != 0:
+            # none of the requested jobs is known anymore
+            if "Invalid job id specified" in stderr:
+                return []
             msg = f"command {self.get_job_executable} failed: {stderr}"
             raise CommandFailedError(msg)
 
+        if fields is not None:
+            return self._parse_projected_jobs_list(stdout, fields)
+
         num_fields = len(self.squeue_fields)
 
         # assume the split chosen does not appear in the output. (e.g. in the
@@ -439,6 +926,7 @@ $${qverbatim}"""
             qjob.state = slurm_job_state.qstate
 
             qjob.username = thisjob_dict["username"]
+            qjob.qos = thisjob_dict["qos"] or None
 
             info = QJobInfo()
 
@@ -480,6 +968,29 @@ $${qverbatim}"""
 
         return jobs_list
 
+    def _parse_projected_jobs_list(self, stdout: str, fields: list[str]) -> list[QJob]:
+        """Parse the output of squeue containing only the given fields."""
+        job_fields = [(name, self.job_fields[name]) for name in fields]
+        num_fields = len(job_fields)
+
+        jobs_list = []
+        for line in stdout.splitlines():
+            if num_fields > 1 and self.split_separator not in line:
+                continue
+            data = line.split(self.split_separator)
+            if not line.strip():
+                continue
+            if len(data) != num_fields:
+                msg = (
+                    f"Wrong number of fields. Found {len(data)}, expected {num_fields}"
+                )
+                raise OutputParsingError(msg)
+            qjob = QJob()
+            for (name, field), raw in zip(job_fields, data):
+                self._set_job_field(qjob, name, field, raw)
+            jobs_list.append(qjob)
+        return jobs_list
+
     @staticmethod
     def _convert_str_to_time(time_str: str | None) -> int | None:
         """
@@ -516,6 +1027,60 @@ $${qverbatim}"""
 
         return days * 86400 + hours * 3600 + minutes * 60 + seconds
 
+    @classmethod
+    def _convert_usage_time(cls, time_str: str | None) -> int | None:
+        """
+        Convert a time used by a job, possibly with fractions of seconds
+        (e.g. TotalCPU=01:02.345), to a number of seconds.
+        """
+        if not time_str:
+            return None
+        seconds = 0.0
+        if "." in time_str:
+            time_str, fraction = time_str.rsplit(".", 1)
+            seconds = float(f"0.{fraction}") if fraction.isdigit() else 0.0
+        try:
+            total = cls._convert_str_to_time(time_str)
+        except OutputParsingError:
+            return None
+        return None if total is None else round(total + seconds)
+
+    @staticmethod
+    def _convert_rss(rss: str | None) -> int | None:
+        """
+        Convert a memory measured by SLURM (e.g. MaxRSS=1.50G) to Kb. The
+        values without units are in bytes.
+        """
+        match = re.fullmatch(r"([\d.]+)([KMGTP]?)", (rss or "").strip())
+        if not match:
+            return None
+        value, units = match.groups()
+        if not units:
+            return int(float(value) / 1024)
+        return int(float(value) * 1024 ** "KMGTP".index(units))
+
+    @staticmethod
+    def _convert_node_list(node_list: str | None) -> str | None:
+        """
+        The hostlist expression of the allocated nodes, e.g. nid[0001-0004],
+        None if no node is allocated yet.
+        """
+        if not node_list or node_list in ("(null)", "None assigned"):
+            return None
+        return node_list
+
+    @staticmethod
+    def _convert_node_lists(header_dict: dict) -> dict:
+        """
+        Compress the lists of nodes given for the nodelist and exclude_nodes
+        options (list of host names or HostList) in hostlist expressions.
+        """
+        for key in ("nodelist", "exclude_nodes"):
+            value = header_dict.get(key)
+            if value is not None and not isinstance(value, str):
+                header_dict = {**header_dict, key: compress_hostlist(value)}
+        return header_dict
+
     @staticmethod
     def _convert_memory_str(memory: str | None) -> int | None:
         if not memory:
@@ -563,6 +1128,11 @@ $${qverbatim}"""
         "error_filepath": "qerr_path",
     }
 
+    def generate_header(self, options: dict | QResources | None) -> str:
+        if isinstance(options, dict):
+            options = self._convert_node_lists(options)
+        return super().generate_header(options)
+
     def _convert_qresources(self, resources: QResources) -> dict:
         """
         Converts a Qresources instance to a dict that will be used to fill in the
@@ -602,7 +1172,7 @@ $${qverbatim}"""
         if resources.scheduler_kwargs:
             header_dict.update(resources.scheduler_kwargs)
 
-        return header_dict
+        return self._convert_node_lists(header_dict)
 
     @property
     def supported_qresources_keys(self) -> list:
@@ -625,3 +1195,24 @@ $${qverbatim}"""
             "scheduler_kwargs",
         ]
         return supported
+
+    jobs_list_record_start = ""
+
+    # Fields that can be requested in get_jobs_list, with their squeue format
+    # code. Additional codes can be added with register_job_field.
+    job_fields: dict[str, JobField] = {
+        "job_id": JobField("%i", attribute="job_id"),
+        "state": JobField("%t", SlurmState, "sub_state"),
+        "reason": JobField("%r"),
+        "name": JobField("%j", attribute="name"),
+        "username": JobField("%u", attribute="username"),
+        "partition": JobField("%P", attribute="info.partition"),
+        "account": JobField("%a", attribute="account"),
+        "qos": JobField("%q", attribute="qos"),
+        "time_limit": JobField("%l", _convert_time_field, "info.time_limit"),
+        "nodes": JobField("%D", convert_int, "info.nodes"),
+        "cpus": JobField("%C", convert_int, "info.cpus"),
+        "runtime": JobField("%M", _convert_time_field, "runtime"),
+        "memory_per_cpu": JobField("%m", _convert_memory_field, "info.memory_per_cpu"),
+        "node_list": JobField("%N", _convert_node_list_field, "info.node_list"),
+    }
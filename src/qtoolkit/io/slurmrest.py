@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import json
+import math
+import time
+from pathlib import Path
+
+from qtoolkit.core.data_objects import (
+    CancelResult,
+    CancelStatus,
+    QJob,
+    QJobFilter,
+    QJobInfo,
+    QResources,
+    SubmissionResult,
+    SubmissionStatus,
+)
+from qtoolkit.core.exceptions import CommandFailedError, OutputParsingError
+from qtoolkit.hostlist import HostList
+from qtoolkit.io.base import BaseSchedulerIO
+from qtoolkit.io.slurm import SlurmIO, SlurmState
+
+# Conversion of the keys of the SLURM header, as generated by
+# SlurmIO._convert_qresources, to the fields of the job description of the
+# REST API. The values are converted by SlurmRestIO._convert_header_value.
+_HEADER_TO_REST = {
+    "partition": "partition",
+    "job_name": "name",
+    "mem_per_cpu": "memory_per_cpu",
+    "account": "account",
+    "qos": "qos",
+    "priority": "priority",
+    "qout_path": "standard_output",
+    "qerr_path": "standard_error",
+    "array": "array",
+    "time": "time_limit",
+    "ntasks": "tasks",
+    "ntasks_per_node": "tasks_per_node",
+    "nodes": "minimum_nodes",
+    "cpus_per_task": "cpus_per_task",
+    "gres": "tres_per_job",
+    "mail_user": "mail_user",
+    "mail_type": "mail_type",
+    "nodelist": "required_nodes",
+    "exclude_nodes": "excluded_nodes",
+}
+
+
+class SlurmRestIO(BaseSchedulerIO):
+    """
+    Scheduler IO for the SLURM REST API (slurmrestd), to be used with a RestHost.
+
+    The commands are JSON request descriptors and the outputs are the JSON
+    bodies of the responses. The submission "script" is the JSON payload of
+    the job submission, containing the job description, built from the same
+    header values as SlurmIO, and the script to be executed.
+
+    The API returns all the details in the list of the jobs. The accounting,
+    usage, pending jobs and cluster state queries are not supported.
+    """
+
+    # the job description replaces the header of the script
+    header_template: str = ""
+
+    job_id_expression: str = SlurmIO.job_id_expression
+
+    SUBMIT_CMD: str | None = None
+    CANCEL_CMD: str | None = None
+
+    def __init__(
+        self,
+        api_version: str = "v0.0.39",
+        environment: list[str] | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        api_version: str
+            Version of the SLURM REST API, used in the paths of the requests.
+        environment: list of str
+            Environment of the jobs, as a list of NAME=VALUE strings. Required
+            by the API. By default only a minimal PATH is set, the environment
+            can be completed in the script.
+        """
+        self.api_version = api_version
+        self.environment = environment or ["PATH=/bin:/usr/bin:/usr/local/bin"]
+        # the conversion of the resources is the same as for sbatch
+        self._slurm_io = SlurmIO()
+
+    def _path(self, path: str) -> str:
+        return f"/slurm/{self.api_version}/{path}"
+
+    def get_submission_script(
+        self,
+        commands: str | list[str],
+        options: dict | QResources | None = None,
+        marker_dir: str | Path | None = None,
+        post_commands: str | list[str] | None = None,
+    ) -> str:
+        """Get the JSON payload for the submission of the given commands."""
+        script_blocks = [self.shebang]
+        if marker_dir:
+            script_blocks.append(self.generate_marker_setup(marker_dir))
+        script_blocks.extend(
+            self._generate_job_commands(commands, post_commands, marker_dir)
+        )
+        if footer := self.generate_footer(marker_dir):
+            script_blocks.append(footer)
+
+        job = {"environment": list(self.environment)}
+        job.update(self.generate_job_description(options))
+        return json.dumps({"job": job, "script": "\n".join(script_blocks)})
+
+    def generate_job_description(self, options: dict | QResources | None) -> dict:
+        """
+        Convert the options to the job description of the REST API.
+
+        The options are either a QResources or a dict with the same keys used
+        to fill the header of SlurmIO. Unknown keys are passed unchanged.
+        """
+        options = options or {}
+        if isinstance(options, QResources):
+            options = (
+                self.check_convert_qresources(options)
+                if not options.check_empty()
+                else {}
+            )
+
+        job = {}
+        for key, value in options.items():
+            job[_HEADER_TO_REST.get(key, key)] = self._convert_header_value(key, value)
+        if "minimum_nodes" in job:
+            job["maximum_nodes"] = job["minimum_nodes"]
+        return job
+
+    def _convert_qresources(self, resources: QResources) -> dict:
+        return self._slurm_io._convert_qresources(resources)
+
+    @property
+    def supported_qresources_keys(self) -> list:
+        return self._slurm_io.supported_qresources_keys
+
+    def _convert_header_value(self, key: str, value):
+        if key == "time":
+            seconds = (
+                self._slurm_io._convert_str_to_time(value)
+                if isinstance(value, str)
+                else value
+            )
+            # the API expects minutes
+            return math.ceil(seconds / 60)
+        if key == "gres" and isinstance(value, str) and value.startswith("gpu:"):
+            return f"gres/{value}"
+        if key in ("qout_path", "qerr_path"):
+            return str(value)
+        if key in ("nodelist", "exclude_nodes"):
+            # lists of host names in the API
+            return list(HostList(value))
+        return value
+
+    def get_submit_cmd(self, script_file: str | Path | None = "submit.script") -> str:
+        return json.dumps(
+            {
+                "method": "POST",
+                "path": self._path("job/submit"),
+                "body_file": str(script_file),
+            }
+        )
+
+    def parse_submit_output(self, exit_code, stdout, stderr) -> SubmissionResult:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        data = self._load_response(stdout, strict=exit_code == 0)
+        if exit_code != 0 or data.get("errors"):
+            return SubmissionResult(
+                exit_code=exit_code,
+                stdout=stdout,
+                stderr=stderr or self._format_errors(data),
+                status=SubmissionStatus("FAILED"),
+            )
+        job_id = data.get("job_id")
+        job_id = str(job_id) if job_id is not None else None
+        status = (
+            SubmissionStatus("SUCCESSFUL")
+            if job_id
+            else SubmissionStatus("JOB_ID_UNKNOWN")
+        )
+        return SubmissionResult(
+            job_id=job_id,
+            exit_code=exit_code,
+            stdout=stdout,
+            stderr=stderr,
+            status=status,
+        )
+
+    def get_cancel_cmd(self, job: QJob | int | str) -> str:
+        job_id = job.job_id if isinstance(job, QJob) else job
+        if job_id is None or job_id == "":
+            received = None if job_id is None else "'' (empty string)"
+            raise ValueError(
+                f"The id of the job to be cancelled should be defined. Received: {received}"
+            )
+        return json.dumps({"method": "DELETE", "path": self._path(f"job/{job_id}")})
+
+    def parse_cancel_output(self, exit_code, stdout, stderr) -> CancelResult:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        data = self._load_response(stdout, strict=False)
+        if exit_code != 0 or data.get("errors"):
+            return CancelResult(
+                exit_code=exit_code,
+                stdout=stdout,
+                stderr=stderr or self._format_errors(data),
+                status=CancelStatus("FAILED"),
+            )
+        # the id of the job is not part of the response
+        return CancelResult(
+            exit_code=exit_code,
+            stdout=stdout,
+            stderr=stderr,
+            status=CancelStatus("SUCCESSFUL"),
+        )
+
+    def _get_job_cmd(self, job_id: str) -> str:
+        return json.dumps({"method": "GET", "path": self._path(f"job/{job_id}")})
+
+    def parse_job_output(self, exit_code, stdout, stderr) -> QJob | None:
+        jobs = self.parse_jobs_list_output(exit_code, stdout, stderr)
+        return jobs[0] if jobs else None
+
+    def _get_jobs_list_cmd(
+        self,
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
+    ) -> str:
+        if user and job_ids:
+            raise ValueError("Cannot query by user and job(s) in SLURM")
+        if job_ids:
+            # the job endpoint accepts a comma separated list of ids
+            path = self._path(f"job/{','.join(job_ids)}")
+        else:
+            # the API lists all the jobs, they are filtered in filter_jobs_list
+            path = self._path("jobs")
+        return json.dumps({"method": "GET", "path": path})
+
+    def filter_jobs_list(
+        self,
+        jobs: list[QJob],
+        job_ids: list[str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+    ) -> list[QJob]:
+        if job_ids:
+            ids = set(job_ids)
+            jobs = [j for j in jobs if j.job_id in ids]
+        if user:
+            jobs = [j for j in jobs if j.username == user]
+        return super().filter_jobs_list(jobs, job_ids, user, filters)
+
+    def parse_jobs_list_output(
+        self, exit_code, stdout, stderr, fields: list[str] | None = None
+    ) -> list[QJob]:
+        if isinstance(stdout, bytes):
+            stdout = stdout.decode()
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode()
+        if exit_code != 0:
+            data = self._load_response(stdout, strict=False)
+            msg = f"request to the SLURM REST API failed: {stderr} {self._format_errors(data)}"
+            raise CommandFailedError(msg)
+
+        data = self._load_response(stdout)
+        return [self._parse_job(job_data) for job_data in data.get("jobs", [])]
+
+    def _parse_job(self, data: dict) -> QJob:
+        state_raw = data.get("job_state")
+        # a list of states in the most recent versions of the API
+        if isinstance(state_raw, list):
+            state_raw = state_raw[0] if state_raw else None
+        try:
+            slurm_state = SlurmState(state_raw)
+        except ValueError:
+            msg = f"Unknown job state {state_raw} for job id {data.get('job_id')}"
+            raise OutputParsingError(msg)
+
+        qjob = QJob()
+        qjob.job_id = str(data.get("job_id"))
+        qjob.name = data.get("name")
+        qjob.sub_state = slurm_state
+        qjob.state = slurm_state.qstate
+        qjob.username = data.get("user_name")
+        qjob.account = data.get("account")
+        qjob.queue_name = data.get("partition")
+        qjob.qos = data.get("qos")
+
+        info = QJobInfo()
+        info.nodes = self._get_number(data.get("node_count"))
+        info.cpus = self._get_number(data.get("cpus"))
+        info.threads_per_process = self._get_number(data.get("cpus_per_task"))
+        memory_per_cpu = self._get_number(data.get("memory_per_cpu"))
+        # in MB in the API, in Kb in QJobInfo
+        info.memory_per_cpu = (
+            memory_per_cpu * 1024 if memory_per_cpu is not None else None
+        )
+        time_limit = self._get_number(data.get("time_limit"))
+        info.time_limit = time_limit * 60 if time_limit is not None else None
+        info.partition = data.get("partition")
+        info.node_list = data.get("nodes") or None
+        qjob.info = info
+
+        start_time = self._get_number(data.get("start_time"))
+        if slurm_state == SlurmState.RUNNING and start_time:
+            qjob.runtime = max(0, int(time.time()) - start_time)
+        return qjob
+
+    @staticmethod
+    def _get_number(value) -> int | None:
+        """
+        Get the value of a numeric field, that can be an object with the
+        "set", "infinite" and "number" keys in the recent versions of the API.
+        """
+        if isinstance(value, dict):
+            if not value.get("set", True) or value.get("infinite", False):
+                return None
+            value = value.get("number")
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _load_response(stdout: str, strict: bool = True) -> dict:
+        try:
+            return json.loads(stdout) if stdout else {}
+        except ValueError:
+            if strict:
+                raise OutputParsingError(f"Invalid JSON response: {stdout}")
+            return {}
+
+    @staticmethod
+    def _format_errors(data: dict) -> str:
+        return "; ".join(
+            str(e.get("error") or e.get("description") or e)
+            for e in data.get("errors") or []
+        )
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+from qtoolkit.core.data_objects import QJob, QJobInfo, QState
+from qtoolkit.utils import import_object
+
+TERMINAL_STATES = (QState.DONE, QState.FAILED)
+
+
+@dataclass
+class CachedJob:
+    """A job in a terminal state stored in the TerminalStateCache."""
+
+    job: QJob
+    stored: float
+    """Time at which the job was stored."""
+
+    source: str
+    """Source of the information, e.g. "squeue", "sacct" or "marker"."""
+
+
+def job_to_dict(job: QJob) -> dict:
+    """Convert a QJob to a JSON serializable dict."""
+    data = {}
+    for f in fields(QJob):
+        value = getattr(job, f.name)
+        if f.name == "state" and value is not None:
+            value = value.value
+        elif f.name == "sub_state" and value is not None:
+            cls = type(value)
+            value = {
+                "class": f"{cls.__module__}:{cls.__qualname__}",
+                "value": value.value,
+            }
+        elif f.name == "info" and value is not None:
+            value = {i.name: getattr(value, i.name) for i in fields(QJobInfo)}
+        data[f.name] = value
+    return data
+
+
+def job_from_dict(data: dict) -> QJob:
+    """Create a QJob from the output of job_to_dict."""
+    data = dict(data)
+    if data.get("state") is not None:
+        data["state"] = QState(data["state"])
+    if data.get("sub_state") is not None:
+        sub_state = data["sub_state"]
+        data["sub_state"] = import_object(sub_state["class"])(sub_state["value"])
+    if data.get("info") is not None:
+        data["info"] = QJobInfo(**data["info"])
+    return QJob(**data)
+
+
+class TerminalStateCache:
+    """
+    Store of the jobs that reached a terminal state (DONE or FAILED).
+
+    Once a job is finished its state cannot change anymore, so the
+    QueueManager looks up the cache before querying the scheduler and only
+    asks for the jobs that are not stored. The cache is filled with the
+    finished jobs returned by any source (the scheduler queries, the
+    accounting or the completion markers).
+
+    If a path is given, the cache is stored in a JSON file shared among the
+    processes, protected by a lock file. The file is only read again when
+    modified. Otherwise it is kept in memory. The job ids are not qualified
+    by cluster: use different files for different clusters.
+
+    Parameters
+    ----------
+    path : str or Path
+        JSON file where the cache is stored. Requires the fcntl module, i.e.
+        not supported on Windows.
+    retention : float
+        Time in seconds after which a stored job is discarded. None means
+        that the jobs are kept forever.
+    clock
+        Object with a time() method. Real time if None.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        retention: float | None = None,
+        clock=None,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.retention = retention
+        self.clock = clock
+        self._entries: dict[str, dict] = {}
+        self._file_version: tuple | None = None
+        self._lock = threading.Lock()
+
+    def get(self, job_id: int | str) -> CachedJob | None:
+        """The stored job with the given id, if any and not expired."""
+        return self.get_many([job_id]).get(str(job_id))
+
+    def get_many(self, job_ids: list[int | str]) -> dict[str, CachedJob]:
+        """The stored jobs among the given ids, by job id."""
+        now = self._time()
+        with self._lock:
+            entries = self._read()
+            found = {}
+            for job_id in job_ids:
+                entry = entries.get(str(job_id))
+                if entry is not None and not self._expired(entry, now):
+                    found[str(job_id)] = CachedJob(
+                        job=job_from_dict(entry["job"]),
+                        stored=entry["stored"],
+                        source=entry["source"],
+                    )
+        return found
+
+    def store(self, jobs: list[QJob], source: str, overwrite: bool = True) -> int:
+        """
+        Store the jobs in a terminal state, ignoring the others.
+
+        Parameters
+        ----------
+        jobs : list of QJob
+            Jobs to store.
+        source : str
+            Source of the information.
+        overwrite : bool
+            Whether to replace the jobs already stored.
+
+        Returns
+        -------
+        int
+            Number of jobs stored.
+        """
+        finished = [j for j in jobs if j.job_id and j.state in TERMINAL_STATES]
+        if not finished:
+            return 0
+        now = self._time()
+        stored = 0
+        with self._lock, self._transaction() as entries:
+            for job in finished:
+                if not overwrite and str(job.job_id) in entries:
+                    continue
+                stored += 1
+                entries[str(job.job_id)] = {
+                    "job": job_to_dict(job),
+                    "stored": now,
+                    "source": source,
+                }
+            self._purge(entries, now)
+        return stored
+
+    def remove(self, job_ids: list[int | str]) -> None:
+        with self._lock, self._transaction() as entries:
+            for job_id in job_ids:
+                entries.pop(str(job_id), None)
+
+    def purge(self) -> int:
+        """Remove the expired jobs. Returns the number of removed jobs."""
+        with self._lock, self._transaction() as entries:
+            return self._purge(entries, self._time())
+
+    def clear(self) -> None:
+        with self._lock, self._transaction() as entries:
+            entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._read())
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return self.retention is not None and now - entry["stored"] > self.retention
+
+    def _purge(self, entries: dict, now: float) -> int:
+        expired = [k for k, e in entries.items() if self._expired(e, now)]
+        for job_id in expired:
+            del entries[job_id]
+        return len(expired)
+
+    def _version(self) -> tuple | None:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _read(self) -> dict[str, dict]:
+        """The entries, read from the file only if it changed."""
+        if self.path is None:
+            return self._entries
+        version = self._version()
+        if version != self._file_version:
+            with self._file_lock(exclusive=False):
+                self._load()
+        return self._entries
+
+    def _load(self) -> None:
+        self._file_version = self._version()
+        if self._file_version is None:
+            self._entries = {}
+        else:
+            self._entries = json.loads(self.path.read_text() or "{}")
+
+    @contextmanager
+    def _transaction(self):
+        """Yield the entries and write them back to the file, if any."""
+        if self.path is None:
+            yield self._entries
+            return
+        with self._file_lock(exclusive=True):
+            self._load()
+            yield self._entries
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+            tmp_path.write_text(json.dumps(self._entries))
+            tmp_path.replace(self.path)
+            self._file_version = self._version()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        # not available on Windows, where the file is not supported
+        import fcntl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(f"{self.path.name}.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
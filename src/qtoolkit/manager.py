@@ -1,12 +1,48 @@
 from __future__ import annotations
 
+import json
+import logging
+import os
+import shlex
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from qtoolkit.core.base import QTKObject
-from qtoolkit.core.data_objects import CancelResult, QJob, QResources, SubmissionResult
+from qtoolkit.core.data_objects import (
+    CancelResult,
+    ClusterState,
+    CompletionMarker,
+    HeartbeatStatus,
+    PendingJob,
+    QJob,
+    QJobFilter,
+    QJobInfo,
+    QResources,
+    QState,
+    SubmissionResult,
+)
+from qtoolkit.core.exceptions import CommandFailedError, OutputParsingError
 from qtoolkit.host.base import BaseHost
 from qtoolkit.host.local import LocalHost
-from qtoolkit.io.base import BaseSchedulerIO
+from qtoolkit.instrumentation import Instrument, span
+from qtoolkit.io.base import MARKER_SUFFIX, BaseSchedulerIO
+from qtoolkit.ratelimit import CANCEL, QUERY, SUBMIT, RateLimiter
+
+if TYPE_CHECKING:
+    from qtoolkit.compression import OutputCompression
+    from qtoolkit.io.parallel import ParallelParser
+    from qtoolkit.jobcache import CachedJob, TerminalStateCache
+    from qtoolkit.routing import PartitionRouter
+
+logger = logging.getLogger(__name__)
+
+# Sources of the information of the jobs for resolve_jobs.
+JOB_SOURCES = ("list", "details", "accounting")
+DEFAULT_JOB_SOURCES = ("list", "accounting")
+
+# Suffix of the heartbeat files of the jobs.
+HEARTBEAT_SUFFIX = ".heartbeat"
 
 
 class QueueManager(QTKObject):
@@ -18,13 +54,123 @@ class QueueManager(QTKObject):
         Name of the queue
     host : BaseHost
         Host where the command should be executed.
+    timeout : float
+        Maximum time in seconds allowed for a single execution of a command.
+        None means no timeout.
+    retries : int
+        Number of additional attempts for commands that time out or fail with
+        a transient scheduler error. The submissions are never retried: the
+        scheduler may have accepted the job even if the command failed (e.g.
+        "Socket timed out on send/recv" from sbatch), so that a new attempt
+        could create a duplicate job.
+    backoff : float
+        Base delay in seconds between the attempts.
+    instruments : list of Instrument
+        Instruments notified with the timing of each phase (render, write,
+        execute, parse) of the operations of the manager.
+    rate_limiter : RateLimiter
+        Limiter for the commands executed on the host, possibly shared with
+        other managers. The time spent waiting is reported to the instruments
+        as "ratelimit.<command class>" operations.
+    marker_dir : str or Path
+        If defined, the submitted jobs write a completion marker in this
+        directory, that can be checked with check_completed. Should be an
+        absolute path on the host.
+    heartbeat_dir : str or Path
+        If defined, the submitted jobs start a background loop updating the
+        modification time of a heartbeat file in this directory, that can be
+        checked with check_heartbeats. Should be an absolute path on the host.
+    heartbeat_interval : int
+        Interval in seconds between the updates of the heartbeat files.
+    parallel_parser : ParallelParser
+        If defined, used to parse large outputs of get_jobs_list in a pool
+        of processes.
+    terminal_cache : TerminalStateCache
+        If defined, the finished jobs found by any query are stored in the
+        cache and are not requested to the scheduler anymore by get_job,
+        get_jobs_list and get_jobs_details.
+    job_sources : list of str
+        If defined, get_job resolves the job through this chain of sources
+        (see resolve_jobs), instead of a single get_job command.
+    output_compression : OutputCompression
+        If defined, the outputs of the bulk queries (get_jobs_list,
+        get_jobs_details, get_jobs_accounting and get_jobs_usage) are
+        compressed on the host before being transferred. Ignored for hosts
+        not executing shell commands (e.g. RestHost).
+    cluster_state_ttl : float
+        Time in seconds during which the state of the cluster returned by
+        get_cluster_state is reused, without querying the scheduler again.
+        None means that the state is always queried.
+    clock
+        Object with a time() method, used for the age of the cached state of
+        the cluster. Real time if None.
+    router : PartitionRouter
+        If defined, the partition (queue_name) of the jobs submitted with
+        QResources is chosen by the router among its candidates, based on
+        the expected wait in the queues.
     """
 
-    def __init__(self, scheduler_io: BaseSchedulerIO, host: BaseHost = None):
+    def __init__(
+        self,
+        scheduler_io: BaseSchedulerIO,
+        host: BaseHost = None,
+        timeout: float | None = None,
+        retries: int = 0,
+        backoff: float = 1.0,
+        instruments: list[Instrument] | None = None,
+        rate_limiter: RateLimiter | None = None,
+        marker_dir: str | Path | None = None,
+        heartbeat_dir: str | Path | None = None,
+        heartbeat_interval: int = 60,
+        parallel_parser: ParallelParser | None = None,
+        terminal_cache: TerminalStateCache | None = None,
+        job_sources: list[str] | None = None,
+        output_compression: OutputCompression | None = None,
+        cluster_state_ttl: float | None = 60.0,
+        clock=None,
+        router: PartitionRouter | None = None,
+    ):
         self.scheduler_io = scheduler_io
         self.host = host or LocalHost()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.instruments = instruments or []
+        self.rate_limiter = rate_limiter
+        self.marker_dir = marker_dir
+        self.heartbeat_dir = heartbeat_dir
+        self.heartbeat_interval = heartbeat_interval
+        self.parallel_parser = parallel_parser
+        self.terminal_cache = terminal_cache
+        self.job_sources = job_sources
+        self.output_compression = output_compression
+        self.cluster_state_ttl = cluster_state_ttl
+        self.clock = clock
+        self._cluster_state: ClusterState | None = None
+        self.router = router
+        # source that found each finished job not listed by the first source
+        self.resolved_sources: dict[str, str] = {}
 
-    def execute_cmd(self, cmd: str, workdir: str | Path | None = None):
+    def _span(self, operation: str, **tags):
+        """Span measuring an operation of the manager for the instruments."""
+        return span(
+            self.instruments,
+            operation,
+            scheduler=type(self.scheduler_io).__name__,
+            host=type(self.host).__name__,
+            **tags,
+        )
+
+    def _host_key(self) -> str:
+        """Identifier of the host for the rate limiter."""
+        return getattr(getattr(self.host, "config", None), "host", None) or ""
+
+    def execute_cmd(
+        self,
+        cmd: str,
+        workdir: str | Path | None = None,
+        cmd_class: str | None = None,
+    ):
         """Execute a command.
 
         Parameters
@@ -33,6 +179,10 @@ class QueueManager(QTKObject):
             Command to be executed
         workdir: str or None
             path where the command will be executed.
+        cmd_class: str or None
+            Class of the command for the rate limiter ("submit", "query" or
+            "cancel"). Commands without a class are not rate limited. The
+            "submit" commands are not retried.
 
         Returns
         -------
@@ -40,7 +190,39 @@ class QueueManager(QTKObject):
         stderr : str
         exit_code : int
         """
-        return self.host.execute(cmd, workdir)
+        retries = self.retries if cmd_class != SUBMIT else 0
+        if self.rate_limiter is None or cmd_class is None:
+            return self.host.execute(
+                cmd,
+                workdir,
+                timeout=self.timeout,
+                retries=retries,
+                backoff=self.backoff,
+            )
+
+        def run_once():
+            with self._span(f"ratelimit.{cmd_class}"):
+                self.rate_limiter.acquire(cmd_class, self._host_key())
+            return self.host.execute(cmd, workdir, timeout=self.timeout)
+
+        # a token is taken for each attempt, so that the retries of the host
+        # are rate limited as well
+        return self.host.execute_with_retries(
+            run_once, cmd, retries=retries, backoff=self.backoff
+        )
+
+    def _execute_query(self, cmd: str):
+        """
+        Execute a query whose output can be large, compressing the output on
+        the host if output_compression is defined.
+        """
+        compression = self.output_compression
+        if compression is None or not self.host.shell_commands:
+            return self.execute_cmd(cmd, cmd_class=QUERY)
+        stdout, stderr, returncode = self.execute_cmd(
+            compression.wrap_command(cmd), cmd_class=QUERY
+        )
+        return compression.unwrap_output(stdout, stderr, returncode)
 
     def get_submission_script(
         self,
@@ -61,9 +243,14 @@ class QueueManager(QTKObject):
             commands_list.append(pre_run)
         if run_commands := self.get_run_commands(commands):
             commands_list.append(run_commands)
-        if post_run := self.get_post_run(post_run):
-            commands_list.append(post_run)
-        return self.scheduler_io.get_submission_script(commands_list, options)
+        # the post_run commands are separated, so that the exit code of the
+        # job in the completion marker is the one of the commands
+        return self.scheduler_io.get_submission_script(
+            commands_list,
+            options,
+            marker_dir=self.marker_dir,
+            post_commands=self.get_post_run(post_run) or None,
+        )
 
     def get_environment_setup(self, env_config) -> str:
         if env_config:
@@ -97,7 +284,31 @@ class QueueManager(QTKObject):
         return ""
 
     def get_pre_run(self, pre_run) -> str:
-        pass
+        pre_run_list = []
+        if self.heartbeat_dir:
+            pre_run_list.append(self.get_heartbeat_start())
+        if pre_run:
+            pre_run_list.append(self.get_run_commands(pre_run))
+        return "\n".join(pre_run_list)
+
+    def get_heartbeat_start(self) -> str:
+        """
+        Commands starting the background loop updating the heartbeat file.
+
+        The loop stops by itself when the job script exits, and is also
+        explicitly killed at the end of the script (see get_post_run).
+        """
+        heartbeat_dir = shlex.quote(str(self.heartbeat_dir))
+        job_id = self.scheduler_io.job_id_expression
+        return f"""mkdir -p {heartbeat_dir}
+_qtk_heartbeat_file={heartbeat_dir}/{job_id}{HEARTBEAT_SUFFIX}
+(
+    while kill -0 $$ 2>/dev/null; do
+        touch "$_qtk_heartbeat_file"
+        sleep {self.heartbeat_interval}
+    done
+) &
+_qtk_heartbeat_pid=$!"""
 
     def get_run_commands(self, commands) -> str:
         if isinstance(commands, str):
@@ -108,7 +319,12 @@ class QueueManager(QTKObject):
             raise ValueError("commands should be a str or a list of str.")
 
     def get_post_run(self, post_run) -> str:
-        pass
+        post_run_list = []
+        if post_run:
+            post_run_list.append(self.get_run_commands(post_run))
+        if self.heartbeat_dir:
+            post_run_list.append("kill $_qtk_heartbeat_pid 2>/dev/null")
+        return "\n".join(post_run_list)
 
     def submit(
         self,
@@ -119,48 +335,640 @@ class QueueManager(QTKObject):
         script_fname="submit.script",
         create_submit_dir=False,
     ) -> SubmissionResult:
-        script_str = self.get_submission_script(
-            commands=commands,
-            options=options,
-            # TODO: Do we need the submit_dir here ?
-            #  Should we distinguish submit_dir and work_dir ?
-            work_dir=work_dir,
-            environment=environment,
-        )
-        # TODO: deal with remote directory directly on the host here.
-        #  Will currently only work on the localhost.
-        work_dir = Path(work_dir) if work_dir is not None else Path.cwd()
-        if create_submit_dir:
-            created = self.host.mkdir(work_dir, recursive=True, exist_ok=True)
-            if not created:
-                raise RuntimeError("failed to create directory")
-        script_fpath = Path(work_dir, script_fname)
-        self.host.write_text_file(script_fpath, script_str)
-        submit_cmd = self.scheduler_io.get_submit_cmd(script_fpath)
-        stdout, stderr, returncode = self.execute_cmd(submit_cmd, work_dir)
-        return self.scheduler_io.parse_submit_output(
-            exit_code=returncode, stdout=stdout, stderr=stderr
-        )
+        with self._span("submit"):
+            if self.router is not None and isinstance(options, QResources):
+                with self._span("submit.route"):
+                    options = self.router.route(self, options)
+            with self._span("submit.render"):
+                script_str = self.get_submission_script(
+                    commands=commands,
+                    options=options,
+                    # TODO: Do we need the submit_dir here ?
+                    #  Should we distinguish submit_dir and work_dir ?
+                    work_dir=work_dir,
+                    environment=environment,
+                )
+            # TODO: deal with remote directory directly on the host here.
+            #  Will currently only work on the localhost.
+            work_dir = Path(work_dir) if work_dir is not None else Path.cwd()
+            if create_submit_dir:
+                with self._span("submit.mkdir"):
+                    created = self.host.mkdir(work_dir, recursive=True, exist_ok=True)
+                if not created:
+                    raise RuntimeError("failed to create directory")
+            script_fpath = Path(work_dir, script_fname)
+            with self._span("submit.write"):
+                self.host.write_text_file(script_fpath, script_str)
+            submit_cmd = self.scheduler_io.get_submit_cmd(script_fpath)
+            with self._span("submit.execute"):
+                stdout, stderr, returncode = self.execute_cmd(
+                    submit_cmd, work_dir, cmd_class=SUBMIT
+                )
+            with self._span("submit.parse"):
+                return self.scheduler_io.parse_submit_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
 
     def cancel(self, job: QJob | int | str) -> CancelResult:
-        cancel_cmd = self.scheduler_io.get_cancel_cmd(job)
-        stdout, stderr, returncode = self.execute_cmd(cancel_cmd)
-        return self.scheduler_io.parse_cancel_output(
-            exit_code=returncode, stdout=stdout, stderr=stderr
-        )
+        with self._span("cancel"):
+            cancel_cmd = self.scheduler_io.get_cancel_cmd(job)
+            with self._span("cancel.execute"):
+                stdout, stderr, returncode = self.execute_cmd(
+                    cancel_cmd, cmd_class=CANCEL
+                )
+            with self._span("cancel.parse"):
+                return self.scheduler_io.parse_cancel_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
 
     def get_job(self, job: QJob | int | str) -> QJob | None:
-        job_cmd = self.scheduler_io.get_job_cmd(job)
-        stdout, stderr, returncode = self.execute_cmd(job_cmd)
-        return self.scheduler_io.parse_job_output(
-            exit_code=returncode, stdout=stdout, stderr=stderr
-        )
+        if self.job_sources is not None:
+            jobs = self.resolve_jobs([job])
+            return jobs[0] if jobs else None
+        if self.terminal_cache is not None:
+            job_id = self.scheduler_io.generate_ids_list([job])[0]
+            cached = self.terminal_cache.get(job_id)
+            if cached is not None:
+                return cached.job
+        with self._span("get_job"):
+            job_cmd = self.scheduler_io.get_job_cmd(job)
+            with self._span("get_job.execute"):
+                stdout, stderr, returncode = self.execute_cmd(job_cmd, cmd_class=QUERY)
+            with self._span("get_job.parse"):
+                qjob = self.scheduler_io.parse_job_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
+        if qjob is not None:
+            self._store_terminal([qjob], "get_job")
+        return qjob
+
+    def get_jobs_details(
+        self, jobs: list[QJob | int | str] | None = None
+    ) -> list[QJob]:
+        """
+        Get the detailed information of several jobs with a single command.
+
+        Parameters
+        ----------
+        jobs : list
+            Jobs to get. If None, all the jobs known to the scheduler.
+
+        Returns
+        -------
+        list of QJob
+            The jobs found, in the order of the scheduler. Jobs not known to
+            the scheduler anymore are not included.
+        """
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        cached, remaining = self._lookup_terminal(job_ids)
+        jobs_list = []
+        if remaining is None or remaining:
+            with self._span("get_jobs_details"):
+                cmd = self.scheduler_io.get_jobs_details_cmd(remaining)
+                with self._span("get_jobs_details.execute"):
+                    stdout, stderr, returncode = self._execute_query(cmd)
+                with self._span("get_jobs_details.parse"):
+                    jobs_list = self.scheduler_io.parse_jobs_details_output(
+                        exit_code=returncode, stdout=stdout, stderr=stderr
+                    )
+            if remaining is not None:
+                # the command may return more jobs than requested
+                wanted = set(remaining)
+                jobs_list = [j for j in jobs_list if j.job_id in wanted]
+            self._store_terminal(jobs_list, "get_jobs_details")
+        return self._merge_terminal(jobs_list, cached, job_ids)
 
     def get_jobs_list(
-        self, jobs: list[QJob | int | str] | None = None, user: str | None = None
+        self,
+        jobs: list[QJob | int | str] | None = None,
+        user: str | None = None,
+        filters: QJobFilter | None = None,
+        fields: list[str] | None = None,
     ) -> list[QJob]:
-        job_cmd = self.scheduler_io.get_jobs_list_cmd(jobs, user)
-        stdout, stderr, returncode = self.execute_cmd(job_cmd)
-        return self.scheduler_io.parse_jobs_list_output(
-            exit_code=returncode, stdout=stdout, stderr=stderr
+        """
+        Get the list of jobs, selected by ids or user and optionally filtered.
+
+        The scheduler applies as much as possible of the filters in the
+        command, the rest is applied on the parsed jobs.
+        If fields is given, only those fields (plus the job_id and the ones
+        needed by the filters) are requested to the scheduler and set in
+        the returned jobs, when supported by the scheduler.
+        """
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        cached, remaining = self._lookup_terminal(job_ids)
+        if filters is not None:
+            cached = {k: c for k, c in cached.items() if filters.matches(c.job)}
+        if remaining is not None and not remaining:
+            return self._merge_terminal([], cached, job_ids)
+
+        with self._span("get_jobs_list"):
+            projection = self.scheduler_io.get_projection(
+                fields, filters, remaining, user
+            )
+            job_cmd = self.scheduler_io.get_jobs_list_cmd(
+                remaining, user, filters, projection
+            )
+            with self._span("get_jobs_list.execute"):
+                stdout, stderr, returncode = self._execute_query(job_cmd)
+            with self._span("get_jobs_list.parse"):
+                if self.parallel_parser is not None:
+                    jobs_list = self.parallel_parser.parse_jobs_list_output(
+                        self.scheduler_io, returncode, stdout, stderr, projection
+                    )
+                else:
+                    jobs_list = self.scheduler_io.parse_jobs_list_output(
+                        exit_code=returncode,
+                        stdout=stdout,
+                        stderr=stderr,
+                        fields=projection,
+                    )
+                jobs_list = self.scheduler_io.filter_jobs_list(
+                    jobs_list,
+                    remaining,
+                    user,
+                    filters,
+                )
+        # partial jobs from a projection are not stored
+        if projection is None:
+            self._store_terminal(jobs_list, "get_jobs_list")
+        return self._merge_terminal(jobs_list, cached, job_ids)
+
+    def get_jobs_accounting(self, jobs: list[QJob | int | str]) -> list[QJob]:
+        """
+        Get the jobs from the accounting of the scheduler (e.g. sacct for
+        SLURM), including the finished jobs not listed anymore, with a single
+        command.
+
+        Raises NotImplementedError if not supported by the scheduler.
+        """
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        with self._span("get_jobs_accounting"):
+            cmd = self.scheduler_io.get_jobs_accounting_cmd(job_ids)
+            with self._span("get_jobs_accounting.execute"):
+                stdout, stderr, returncode = self._execute_query(cmd)
+            with self._span("get_jobs_accounting.parse"):
+                jobs_list = self.scheduler_io.parse_jobs_accounting_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
+        wanted = set(job_ids)
+        jobs_list = [j for j in jobs_list if j.job_id in wanted]
+        self._store_terminal(jobs_list, "get_jobs_accounting")
+        return jobs_list
+
+    def get_jobs_usage(
+        self, jobs: list[QJob | int | str], live: bool = True
+    ) -> list[QJob]:
+        """
+        Get the exit status and the resources used by several jobs.
+
+        A single command is used for all the jobs (e.g. sacct for SLURM,
+        qstat -x -f for PBS). The usage fields of QJobInfo (max_rss,
+        total_cpu, elapsed, node_list) are set, when available.
+
+        Parameters
+        ----------
+        jobs : list
+            Jobs to get.
+        live : bool
+            If True and the scheduler measures the memory of the running jobs
+            with a different command (e.g. sstat for SLURM), a second command
+            is executed for the running jobs without a max_rss.
+
+        Returns
+        -------
+        list of QJob
+            The jobs found.
+        """
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        with self._span("get_jobs_usage"):
+            cmd = self.scheduler_io.get_jobs_usage_cmd(job_ids)
+            with self._span("get_jobs_usage.execute"):
+                stdout, stderr, returncode = self._execute_query(cmd)
+            with self._span("get_jobs_usage.parse"):
+                jobs_list = self.scheduler_io.parse_jobs_usage_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
+        wanted = set(job_ids)
+        jobs_list = [j for j in jobs_list if j.job_id in wanted]
+
+        running = [
+            j
+            for j in jobs_list
+            if j.state == QState.RUNNING and (j.info is None or j.info.max_rss is None)
+        ]
+        if live and running:
+            try:
+                self._add_live_usage(running)
+            except NotImplementedError:
+                pass
+        return jobs_list
+
+    def get_pending_jobs(self) -> list[PendingJob]:
+        """
+        Get the jobs of all the users waiting in the queue, with the start
+        times estimated by the scheduler (e.g. squeue --start for SLURM).
+
+        Raises NotImplementedError if not supported by the scheduler.
+        """
+        with self._span("get_pending_jobs"):
+            cmd = self.scheduler_io.get_pending_jobs_cmd()
+            with self._span("get_pending_jobs.execute"):
+                stdout, stderr, returncode = self._execute_query(cmd)
+            with self._span("get_pending_jobs.parse"):
+                return self.scheduler_io.parse_pending_jobs_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
+
+    def get_cluster_state(self, max_age: float | None = None) -> ClusterState:
+        """
+        Get the capacity (nodes, CPUs, memory and generic resources) of the
+        partitions of the cluster, e.g. with sinfo for SLURM.
+
+        The state is cached: the scheduler is only queried if the cached
+        state is older than max_age, so that frequent decisions (e.g. where
+        to submit) cost a single query.
+
+        Raises NotImplementedError if not supported by the scheduler.
+
+        Parameters
+        ----------
+        max_age : float
+            Maximum age in seconds of the cached state. If None,
+            cluster_state_ttl is used. 0 always queries the scheduler.
+
+        Returns
+        -------
+        ClusterState
+        """
+        if max_age is None:
+            max_age = self.cluster_state_ttl
+        cached = self._cluster_state
+        now = self._time()
+        if (
+            cached is not None
+            and max_age is not None
+            and now - cached.timestamp < max_age
+        ):
+            return cached
+
+        with self._span("get_cluster_state"):
+            cmd = self.scheduler_io.get_cluster_state_cmd()
+            with self._span("get_cluster_state.execute"):
+                stdout, stderr, returncode = self.execute_cmd(cmd, cmd_class=QUERY)
+            with self._span("get_cluster_state.parse"):
+                state = self.scheduler_io.parse_cluster_state_output(
+                    exit_code=returncode, stdout=stdout, stderr=stderr
+                )
+        state.timestamp = now
+        self._cluster_state = state
+        return state
+
+    def _time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
+
+    def _add_live_usage(self, jobs: list[QJob]) -> None:
+        with self._span("get_live_usage"):
+            cmd = self.scheduler_io.get_live_usage_cmd(jobs)
+            stdout, stderr, returncode = self.execute_cmd(cmd, cmd_class=QUERY)
+            usage = self.scheduler_io.parse_live_usage_output(
+                exit_code=returncode, stdout=stdout, stderr=stderr
+            )
+        for job in jobs:
+            if job.job_id in usage:
+                if job.info is None:
+                    job.info = QJobInfo()
+                for key, value in usage[job.job_id].items():
+                    setattr(job.info, key, value)
+
+    def resolve_jobs(
+        self,
+        jobs: list[QJob | int | str],
+        sources: list[str] | None = None,
+    ) -> list[QJob]:
+        """
+        Get the jobs asking a chain of sources, from the cheapest to the most
+        expensive, each with a single command for all the jobs not found yet.
+
+        The sources are "list" (get_jobs_list, e.g. squeue), "details"
+        (get_jobs_details, e.g. scontrol) and "accounting"
+        (get_jobs_accounting, e.g. sacct). Sources not supported by the
+        scheduler are skipped, as well as the sources whose command fails
+        (the error is logged), unless all of them fail. The finished jobs in
+        the terminal cache are not requested. Without a terminal cache, the
+        source of the finished jobs found by a later source is stored in
+        resolved_sources, and the following resolutions of those jobs start
+        from it: e.g. a job that had to be found in the accounting is not
+        requested again to squeue. The jobs still running are always
+        requested to the first source.
+
+        Parameters
+        ----------
+        jobs : list
+            Jobs to get.
+        sources : list of str
+            Chain of sources. Defaults to the job_sources of the manager or,
+            if not defined, to ["list", "accounting"].
+
+        Returns
+        -------
+        list of QJob
+            The jobs found, in the order of the requested ids.
+        """
+        sources = sources or self.job_sources or list(DEFAULT_JOB_SOURCES)
+        unknown = set(sources) - set(JOB_SOURCES)
+        if unknown:
+            raise ValueError(f"Unknown job sources: {', '.join(sorted(unknown))}")
+
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        cached, remaining = self._lookup_terminal(job_ids)
+        for job_id in cached:
+            self.resolved_sources.pop(job_id, None)
+        found: dict[str, QJob] = {}
+        errors: list[CommandFailedError] = []
+        answered = False
+        for i, source in enumerate(sources):
+            ids = [
+                job_id
+                for job_id in remaining
+                if job_id not in found and self._first_source(job_id, sources) <= i
+            ]
+            if not ids:
+                continue
+            try:
+                jobs_list = self._query_source(source, ids)
+            except NotImplementedError:
+                continue
+            except CommandFailedError as exc:
+                logger.warning("Could not get the jobs from %s: %s", source, exc)
+                errors.append(exc)
+                continue
+            answered = True
+            for job in jobs_list:
+                if job.job_id not in ids:
+                    continue
+                found[job.job_id] = job
+                terminal = job.state in (QState.DONE, QState.FAILED)
+                if i == 0 or not terminal or self.terminal_cache is not None:
+                    # running jobs should be asked again to the first source,
+                    # the finished ones are looked up in the cache
+                    self.resolved_sources.pop(job.job_id, None)
+                else:
+                    self.resolved_sources[job.job_id] = source
+
+        if errors and not answered:
+            raise errors[0]
+        return self._merge_terminal(list(found.values()), cached, job_ids, sort=True)
+
+    def _first_source(self, job_id: str, sources: list[str]) -> int:
+        """Index of the source from which the resolution of a job starts."""
+        source = self.resolved_sources.get(job_id)
+        return sources.index(source) if source in sources else 0
+
+    def _query_source(self, source: str, job_ids: list[str]) -> list[QJob]:
+        if source == "list":
+            return self.get_jobs_list(job_ids)
+        if source == "details":
+            return self.get_jobs_details(job_ids)
+        return self.get_jobs_accounting(job_ids)
+
+    def _lookup_terminal(
+        self, job_ids: list[str] | None
+    ) -> tuple[dict[str, CachedJob], list[str] | None]:
+        """
+        Split the job ids in the finished jobs stored in the terminal cache
+        and the ids that should be requested to the scheduler.
+        """
+        if self.terminal_cache is None or not job_ids:
+            return {}, job_ids
+        cached = self.terminal_cache.get_many(job_ids)
+        return cached, [i for i in job_ids if i not in cached]
+
+    def _store_terminal(
+        self, jobs: list[QJob], source: str, overwrite: bool = True
+    ) -> None:
+        if self.terminal_cache is not None:
+            self.terminal_cache.store(jobs, source, overwrite=overwrite)
+
+    @staticmethod
+    def _merge_terminal(
+        jobs_list: list[QJob],
+        cached: dict[str, CachedJob],
+        job_ids: list[str] | None,
+        sort: bool = False,
+    ) -> list[QJob]:
+        """
+        Add the cached jobs, in the order of the requested ids. The jobs
+        are only sorted if some were cached or if sort is True.
+        """
+        if not cached and not sort:
+            return jobs_list
+        order = {job_id: i for i, job_id in enumerate(job_ids)}
+        merged = jobs_list + [c.job for c in cached.values()]
+        return sorted(merged, key=lambda j: order.get(j.job_id, len(order)))
+
+    def check_completed(
+        self,
+        jobs: list[QJob | int | str] | None = None,
+        marker_dir: str | Path | None = None,
+    ) -> dict[str, CompletionMarker]:
+        """
+        Get the completion markers written by the jobs, without querying
+        the scheduler.
+
+        The marker directory is scanned once: with os.scandir on a LocalHost,
+        with a single command on other hosts.
+
+        Parameters
+        ----------
+        jobs : list
+            Jobs to check. If None, all the markers in the directory are returned.
+        marker_dir : str or Path
+            Directory of the markers. Defaults to the marker_dir of the manager.
+
+        Returns
+        -------
+        dict
+            Completion markers of the finished jobs, by job id. The jobs still
+            running (or that could not write the marker) are not included.
+        """
+        marker_dir = marker_dir or self.marker_dir
+        if not marker_dir:
+            raise ValueError("The directory of the completion markers is not defined")
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        with self._span("check_completed"):
+            if isinstance(self.host, LocalHost):
+                contents = self._read_local_markers(marker_dir)
+            else:
+                contents = self._read_remote_markers(marker_dir)
+
+        markers = {}
+        wanted = set(job_ids) if job_ids is not None else None
+        for job_id, content in contents.items():
+            if wanted is not None and job_id not in wanted:
+                continue
+            markers[job_id] = self._parse_marker(job_id, content)
+        self._store_terminal(
+            [
+                QJob(
+                    job_id=m.job_id,
+                    exit_status=m.exit_code,
+                    state=QState.DONE if m.exit_code == 0 else QState.FAILED,
+                )
+                for m in markers.values()
+                if m.exit_code is not None
+            ],
+            "marker",
+            # keep the more complete information obtained from the scheduler
+            overwrite=False,
+        )
+        return markers
+
+    @staticmethod
+    def _parse_marker(job_id: str, content: str) -> CompletionMarker:
+        """
+        The completion marker from the content of its file. The values of
+        the corrupted or malformed markers are not set.
+        """
+        # a marker is never partially written, but could be corrupted
+        try:
+            data = json.loads(content)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return CompletionMarker(job_id=job_id)
+        values = {key: data.get(key) for key in ("exit_code", "start", "end")}
+        if not all(isinstance(v, (int, type(None))) for v in values.values()):
+            return CompletionMarker(job_id=job_id)
+        return CompletionMarker(job_id=job_id, **values)
+
+    @staticmethod
+    def _read_local_markers(marker_dir: str | Path) -> dict[str, str]:
+        contents = {}
+        try:
+            entries = list(os.scandir(marker_dir))
+        except FileNotFoundError:
+            return contents
+        for entry in entries:
+            if entry.name.endswith(MARKER_SUFFIX) and not entry.name.startswith("."):
+                with open(entry.path) as f:
+                    contents[entry.name[: -len(MARKER_SUFFIX)]] = f.read()
+        return contents
+
+    def _read_remote_markers(self, marker_dir: str | Path) -> dict[str, str]:
+        # print all the markers with their file names in a single command.
+        # find is used instead of a glob to avoid limits on the arguments.
+        cmd = (
+            f"cd {shlex.quote(str(marker_dir))} 2>/dev/null || exit 0; "
+            f"find . -maxdepth 1 -name '[!.]*{MARKER_SUFFIX}' -exec grep -H . {{}} +"
+        )
+        stdout, stderr, returncode = self.execute_cmd(cmd)
+        if returncode not in (0, 1):
+            msg = f"command {cmd} failed: {stderr}"
+            raise CommandFailedError(
+                msg, command=cmd, exit_code=returncode, stdout=stdout, stderr=stderr
+            )
+        contents = {}
+        for line in stdout.splitlines():
+            filename, _, content = line.partition(":")
+            filename = os.path.basename(filename)
+            if filename.endswith(MARKER_SUFFIX):
+                contents[filename[: -len(MARKER_SUFFIX)]] = content
+        return contents
+
+    def check_heartbeats(
+        self,
+        jobs: list[QJob | int | str] | None = None,
+        heartbeat_dir: str | Path | None = None,
+        stall_after: float | None = None,
+    ) -> dict[str, HeartbeatStatus]:
+        """
+        Get the age of the heartbeat files of the jobs and flag the stalled ones.
+
+        The modification times of all the heartbeat files are obtained at once:
+        with os.scandir on a LocalHost, with a single command on other hosts.
+        The ages are computed with the clock of the host.
+
+        Parameters
+        ----------
+        jobs : list
+            Jobs to check. If None, all the heartbeat files are considered.
+        heartbeat_dir : str or Path
+            Directory of the heartbeat files. Defaults to the heartbeat_dir of
+            the manager.
+        stall_after : float
+            Age in seconds after which a heartbeat is considered stalled.
+            Defaults to three times the heartbeat interval.
+
+        Returns
+        -------
+        dict
+            Status of the heartbeat of the jobs, by job id. Jobs that have not
+            started yet have no heartbeat file and are not included. Note that
+            the heartbeat of finished jobs is stalled as well.
+        """
+        heartbeat_dir = heartbeat_dir or self.heartbeat_dir
+        if not heartbeat_dir:
+            raise ValueError("The directory of the heartbeat files is not defined")
+        if stall_after is None:
+            stall_after = 3 * self.heartbeat_interval
+        job_ids = self.scheduler_io.generate_ids_list(jobs)
+        with self._span("check_heartbeats"):
+            if isinstance(self.host, LocalHost):
+                now, mtimes = self._stat_local_heartbeats(heartbeat_dir)
+            else:
+                now, mtimes = self._stat_remote_heartbeats(heartbeat_dir)
+
+        statuses = {}
+        wanted = set(job_ids) if job_ids is not None else None
+        for job_id, mtime in mtimes.items():
+            if wanted is not None and job_id not in wanted:
+                continue
+            age = max(0.0, now - mtime)
+            statuses[job_id] = HeartbeatStatus(
+                job_id=job_id, last_beat=mtime, age=age, stalled=age > stall_after
+            )
+        return statuses
+
+    @staticmethod
+    def _stat_local_heartbeats(
+        heartbeat_dir: str | Path,
+    ) -> tuple[float, dict[str, float]]:
+        mtimes = {}
+        try:
+            entries = list(os.scandir(heartbeat_dir))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.name.endswith(HEARTBEAT_SUFFIX):
+                job_id = entry.name[: -len(HEARTBEAT_SUFFIX)]
+                mtimes[job_id] = entry.stat().st_mtime
+        return time.time(), mtimes
+
+    def _stat_remote_heartbeats(
+        self, heartbeat_dir: str | Path
+    ) -> tuple[float, dict[str, float]]:
+        # the current time of the host is printed first, so that the ages do
+        # not depend on the clock skew between the hosts.
+        cmd = (
+            f"date +%s; cd {shlex.quote(str(heartbeat_dir))} 2>/dev/null || exit 0; "
+            f"find . -maxdepth 1 -name '*{HEARTBEAT_SUFFIX}' -printf '%f %T@\\n'"
         )
+        stdout, stderr, returncode = self.execute_cmd(cmd)
+        if returncode != 0:
+            msg = f"command {cmd} failed: {stderr}"
+            raise CommandFailedError(
+                msg, command=cmd, exit_code=returncode, stdout=stdout, stderr=stderr
+            )
+        lines = stdout.splitlines()
+        try:
+            now = float(lines[0])
+            mtimes = {}
+            for line in lines[1:]:
+                filename, mtime = line.rsplit(" ", 1)
+                if filename.endswith(HEARTBEAT_SUFFIX):
+                    mtimes[filename[: -len(HEARTBEAT_SUFFIX)]] = float(mtime)
+        except (IndexError, ValueError) as exc:
+            raise OutputParsingError(
+                f"Could not parse the heartbeat files: {stdout}"
+            ) from exc
+        return now, mtimes
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import heapq
+import math
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
+
+from qtoolkit.core.data_objects import QJob, QState
+
+if TYPE_CHECKING:
+    from qtoolkit.manager import QueueManager
+
+FINISHED_STATES = (QState.DONE, QState.FAILED)
+QUEUED_STATES = (QState.QUEUED, QState.REQUEUED)
+HELD_STATES = (QState.QUEUED_HELD, QState.REQUEUED_HELD, QState.SUSPENDED)
+
+
+@dataclass
+class PollingPolicy:
+    """Parameters of the adaptive polling schedule.
+
+    All the values are in seconds, except backoff_factor and history_size.
+    """
+
+    min_interval: float = 10.0
+    """Minimum interval between two checks of the same job."""
+
+    max_interval: float = 1800.0
+    """Maximum interval between two checks of the same job."""
+
+    queued_interval: float = 60.0
+    """Base interval for the queued jobs."""
+
+    held_interval: float = 600.0
+    """Base interval for the held and suspended jobs."""
+
+    running_interval: float = 30.0
+    """Base interval for the running jobs."""
+
+    unknown_interval: float = 30.0
+    """Interval for the jobs with an undetermined state."""
+
+    backoff_factor: float = 1.5
+    """Growth of the interval for each check without a change of state."""
+
+    queue_wait_fraction: float = 0.5
+    """
+    Fraction of the expected remaining queue time (from the observed
+    waits of the other jobs) that can be skipped for queued jobs.
+    """
+
+    end_margin: float = 10.0
+    """Delay after the time limit of a running job for its next check."""
+
+    history_size: int = 50
+    """Number of observed queue waits kept to estimate the expected wait."""
+
+
+@dataclass
+class JobPollRecord:
+    """Polling history of a single job."""
+
+    job_id: str
+    next_check: float
+    state: QState | None = None
+    last_check: float | None = None
+    last_transition: float | None = None
+    unchanged: int = 0
+    queued_since: float | None = None
+    transitions: list[tuple[float, QState | None]] = field(default_factory=list)
+
+
+@dataclass
+class PollResult:
+    """Outcome of a polling cycle."""
+
+    jobs: list[QJob] = field(default_factory=list)
+    """Jobs returned by the scheduler."""
+
+    finished: list[QJob] = field(default_factory=list)
+    """Jobs found in a final state, removed from the schedule."""
+
+    missing: list[str] = field(default_factory=list)
+    """Ids of the jobs not returned by the scheduler, removed from the schedule."""
+
+
+class PollScheduler:
+    """
+    Adaptive polling of the state of the jobs of a QueueManager.
+
+    The time of the next check is chosen for each job based on its state,
+    runtime and time limit, and on the history of the observed transitions.
+    The interval grows while the state of a job does not change and is reset
+    to its base value after each transition. At each cycle all the jobs that
+    are due are checked with a single get_jobs_list call.
+
+    Parameters
+    ----------
+    manager : QueueManager
+        Manager used to query the state of the jobs.
+    policy : PollingPolicy
+        Parameters of the schedule.
+    clock
+        Object with time() and sleep() methods. Real time if None.
+    """
+
+    def __init__(
+        self,
+        manager: QueueManager,
+        policy: PollingPolicy | None = None,
+        clock=None,
+    ):
+        self.manager = manager
+        self.policy = policy or PollingPolicy()
+        self.clock = clock
+        self.records: dict[str, JobPollRecord] = {}
+        self.queue_waits: list[float] = []
+        self._heap: list[tuple[float, str]] = []
+
+    def add_job(self, job: QJob | int | str, delay: float | None = None) -> None:
+        """
+        Add a job to the schedule.
+
+        Parameters
+        ----------
+        job : QJob, int or str
+            The job or its id.
+        delay : float
+            Time before the first check. Defaults to the minimum interval.
+        """
+        job_id = str(job.job_id if isinstance(job, QJob) else job)
+        now = self._time()
+        if delay is None:
+            delay = self.policy.min_interval
+        record = JobPollRecord(job_id=job_id, next_check=now + delay)
+        if isinstance(job, QJob) and job.state is not None:
+            self._observe(record, job, now)
+            record.next_check = now + delay
+        self.records[job_id] = record
+        heapq.heappush(self._heap, (record.next_check, job_id))
+
+    def remove_job(self, job: QJob | int | str) -> None:
+        job_id = str(job.job_id if isinstance(job, QJob) else job)
+        # the stale heap entries are discarded when popped
+        self.records.pop(job_id, None)
+
+    def next_check_time(self) -> float | None:
+        """Time of the next check among all the jobs, None if no jobs."""
+        while self._heap:
+            next_check, job_id = self._heap[0]
+            record = self.records.get(job_id)
+            if record is not None and record.next_check == next_check:
+                return next_check
+            heapq.heappop(self._heap)
+        return None
+
+    def due_jobs(self, now: float | None = None) -> list[str]:
+        """Ids of the jobs whose check is due."""
+        now = self._time() if now is None else now
+        return sorted(
+            job_id
+            for job_id, record in self.records.items()
+            if record.next_check <= now
+        )
+
+    def poll(self) -> PollResult:
+        """
+        Check all the due jobs with a single get_jobs_list call and schedule
+        their next check.
+        """
+        now = self._time()
+        due = self.due_jobs(now)
+        result = PollResult()
+        if not due:
+            return result
+
+        jobs = self.manager.get_jobs_list(jobs=due)
+        now = self._time()
+        result.jobs = jobs
+        returned = set()
+        for job in jobs:
+            job_id = str(job.job_id)
+            record = self.records.get(job_id)
+            if record is None:
+                continue
+            returned.add(job_id)
+            self._observe(record, job, now)
+            if job.state in FINISHED_STATES:
+                result.finished.append(job)
+                del self.records[job_id]
+                continue
+            record.next_check = now + self.next_interval(record, job)
+            heapq.heappush(self._heap, (record.next_check, job_id))
+
+        for job_id in due:
+            if job_id not in returned:
+                result.missing.append(job_id)
+                self.records.pop(job_id, None)
+        return result
+
+    def run(
+        self,
+        callback: Callable[[PollResult], None] | None = None,
+        max_cycles: int | None = None,
+    ) -> None:
+        """
+        Poll the jobs until none is left in the schedule, sleeping until the
+        next due check between the cycles.
+
+        Parameters
+        ----------
+        callback : callable
+            Function called with the result of each cycle.
+        max_cycles : int
+            Maximum number of polling cycles. No limit if None.
+        """
+        cycles = 0
+        while max_cycles is None or cycles < max_cycles:
+            next_check = self.next_check_time()
+            if next_check is None:
+                return
+            delay = next_check - self._time()
+            if delay > 0:
+                self._sleep(delay)
+            result = self.poll()
+            cycles += 1
+            if callback is not None:
+                callback(result)
+
+    def expected_queue_wait(self) -> float | None:
+        """Mean of the queue waits observed for the jobs that started."""
+        if not self.queue_waits:
+            return None
+        return sum(self.queue_waits) / len(self.queue_waits)
+
+    def next_interval(self, record: JobPollRecord, job: QJob) -> float:
+        """
+        Interval until the next check of a job, given its last observed state.
+        """
+        policy = self.policy
+        exponent = record.unchanged
+        if policy.backoff_factor > 1:
+            # the intervals are capped anyway, avoid overflowing the growth
+            exponent = min(exponent, self._max_backoff_steps())
+        growth = policy.backoff_factor**exponent
+        state = job.state
+
+        if state in QUEUED_STATES:
+            interval = policy.queued_interval * growth
+            expected_wait = self.expected_queue_wait()
+            if expected_wait is not None and record.queued_since is not None:
+                waited = record.last_check - record.queued_since
+                remaining_wait = expected_wait - waited
+                interval = max(interval, policy.queue_wait_fraction * remaining_wait)
+        elif state in HELD_STATES:
+            interval = policy.held_interval * growth
+        elif state == QState.RUNNING:
+            interval = policy.running_interval * growth
+            time_limit = job.info.time_limit if job.info is not None else None
+            if time_limit and job.runtime is not None:
+                # the job cannot run past its time limit
+                remaining = time_limit - job.runtime + policy.end_margin
+                interval = min(interval, remaining)
+        else:
+            interval = policy.unknown_interval
+
+        return min(max(interval, policy.min_interval), policy.max_interval)
+
+    def _max_backoff_steps(self) -> int:
+        """
+        Number of checks without a change of state after which the growth
+        brings all the base intervals to max_interval.
+        """
+        policy = self.policy
+        intervals = (
+            policy.min_interval,
+            policy.queued_interval,
+            policy.held_interval,
+            policy.running_interval,
+        )
+        base = min((i for i in intervals if i > 0), default=policy.max_interval)
+        if base >= policy.max_interval:
+            return 0
+        return math.ceil(math.log(policy.max_interval / base, policy.backoff_factor))
+
+    def _observe(self, record: JobPollRecord, job: QJob, now: float) -> None:
+        """Update the history of a job with its last observed state."""
+        state = job.state
+        if state != record.state or record.last_check is None:
+            if state in QUEUED_STATES and record.queued_since is None:
+                record.queued_since = now
+            if state == QState.RUNNING and record.queued_since is not None:
+                self.queue_waits.append(now - record.queued_since)
+                del self.queue_waits[: -self.policy.history_size]
+                record.queued_since = None
+            record.transitions.append((now, state))
+            record.last_transition = now
+            record.state = state
+            record.unchanged = 0
+        else:
+            record.unchanged += 1
+        record.last_check = now
+
+    def _time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
+
+    def _sleep(self, seconds: float) -> None:
+        if self.clock is not None:
+            self.clock.sleep(seconds)
+        else:
+            time.sleep(seconds)
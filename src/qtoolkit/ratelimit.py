@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from qtoolkit.core.exceptions import RateLimitExceededError
+
+SUBMIT = "submit"
+QUERY = "query"
+CANCEL = "cancel"
+
+COMMAND_CLASSES = (SUBMIT, QUERY, CANCEL)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket parameters.
+
+    Attributes
+    ----------
+    rate : float
+        Number of tokens added to the bucket per second, i.e. the sustained
+        number of commands per second.
+    burst : float
+        Capacity of the bucket, i.e. the number of commands that can be
+        executed at once after a period of inactivity.
+    """
+
+    rate: float
+    burst: float = 1.0
+
+    def __post_init__(self):
+        if self.rate <= 0:
+            raise ValueError("The rate of a RateLimit should be positive.")
+        if self.burst < 1:
+            raise ValueError("The burst of a RateLimit should be at least 1.")
+
+
+@dataclass
+class RateLimitStats:
+    """Statistics of the waits imposed by the limiter for a command class."""
+
+    acquired: int = 0
+    waited: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "rejected": self.rejected,
+            "total_wait": self.total_wait,
+            "max_wait": self.max_wait,
+            "mean_wait": self.mean_wait,
+        }
+
+
+class RateLimiter:
+    """
+    Token bucket limiter for the commands sent to the schedulers.
+
+    A bucket is kept for each pair of host and command class (submit, query,
+    cancel). Command classes without a configured limit are not limited.
+    The same limiter can be shared among several QueueManager instances and
+    threads. If a lock_file is given, the state of the buckets is stored in
+    that file and shared with all the processes using the same file.
+
+    Parameters
+    ----------
+    limits : dict
+        RateLimit for each command class, applied to all the hosts.
+    host_limits : dict
+        RateLimit for each command class for specific hosts, overriding limits.
+        The keys are the host identifiers, e.g. the host name for remote hosts.
+    mode : str
+        "wait" to wait until a token is available, "fail" to raise a
+        RateLimitExceededError immediately if no token is available.
+    max_wait : float
+        In "wait" mode, maximum time in seconds to wait for a token before
+        raising a RateLimitExceededError. None means no maximum.
+    lock_file : str or Path
+        File used to share the state of the buckets among processes. Requires
+        the fcntl module, i.e. not supported on Windows.
+    clock
+        Object with time() and sleep() methods. Real time if None.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, RateLimit] | None = None,
+        host_limits: dict[str, dict[str, RateLimit]] | None = None,
+        mode: str = "wait",
+        max_wait: float | None = None,
+        lock_file: str | Path | None = None,
+        clock=None,
+    ):
+        if mode not in ("wait", "fail"):
+            raise ValueError(f"Unknown rate limiter mode {mode}.")
+        self.limits = dict(limits or {})
+        self.host_limits = {h: dict(l) for h, l in (host_limits or {}).items()}
+        self.mode = mode
+        self.max_wait = max_wait
+        self.lock_file = Path(lock_file) if lock_file is not None else None
+        self.clock = clock
+        self.stats: dict[str, RateLimitStats] = {}
+        self._buckets: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def get_limit(self, command_class: str, host: str = "") -> RateLimit | None:
+        """The limit applying to a command class on a host, if any."""
+        host_limits = self.host_limits.get(host, {})
+        if command_class in host_limits:
+            return host_limits[command_class]
+        return self.limits.get(command_class)
+
+    def acquire(self, command_class: str, host: str = "") -> float:
+        """
+        Take a token from the bucket of the command class on the host.
+
+        Parameters
+        ----------
+        command_class : str
+            Class of the command, e.g. "submit", "query" or "cancel".
+        host : str
+            Identifier of the host on which the command is executed.
+
+        Returns
+        -------
+        float
+            Time in seconds spent waiting for the token.
+        """
+        limit = self.get_limit(command_class, host)
+        if limit is None:
+            return 0.0
+
+        key = f"{host}:{command_class}"
+        start = self._time()
+        while True:
+            delay = self._take(key, limit)
+            waited = self._time() - start
+            if delay == 0:
+                self._record(command_class, waited)
+                return waited
+            if self.mode == "fail" or (
+                self.max_wait is not None and waited + delay > self.max_wait
+            ):
+                with self._lock:
+                    self._get_stats(command_class).rejected += 1
+                msg = (
+                    f"Rate limit exceeded for {command_class} commands on "
+                    f"host {host or 'default'}: next token in {delay:.3f} s"
+                )
+                raise RateLimitExceededError(
+                    msg, command_class=command_class, host=host, retry_after=delay
+                )
+            self._sleep(delay)
+
+    def get_stats(self) -> dict[str, dict]:
+        """Wait-time metrics for each command class."""
+        with self._lock:
+            return {cls: s.as_dict() for cls, s in sorted(self.stats.items())}
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def _take(self, key: str, limit: RateLimit) -> float:
+        """
+        Try to take a token. Return 0 if taken, otherwise the time until the
+        next token is available.
+        """
+        with self._lock, self._state() as buckets:
+            now = self._time()
+            tokens, last = buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + max(0.0, now - last) * limit.rate)
+            if tokens >= 1:
+                buckets[key] = [tokens - 1, now]
+                return 0.0
+            buckets[key] = [tokens, now]
+            return (1 - tokens) / limit.rate
+
+    @contextmanager
+    def _state(self):
+        """
+        Yield the dict with the state of the buckets. If a lock file is
+        defined, the state is read from the file while holding an exclusive
+        lock and written back when exiting the context.
+        """
+        if self.lock_file is None:
+            yield self._buckets
+            return
+
+        # not available on Windows, where the lock file is not supported
+        import fcntl
+
+        with open(self.lock_file, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read()
+                buckets = json.loads(content) if content else {}
+                yield buckets
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(buckets))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _record(self, command_class: str, waited: float) -> None:
+        with self._lock:
+            stats = self._get_stats(command_class)
+            stats.acquired += 1
+            if waited > 0:
+                stats.waited += 1
+                stats.total_wait += waited
+                stats.max_wait = max(stats.max_wait, waited)
+
+    def _get_stats(self, command_class: str) -> RateLimitStats:
+        if command_class not in self.stats:
+            self.stats[command_class] = RateLimitStats()
+        return self.stats[command_class]
+
+    def _time(self) -> float:
+        # wall clock time, so that it can be compared among processes
+        return self.clock.time() if self.clock is not None else time.time()
+
+    def _sleep(self, seconds: float) -> None:
+        if self.clock is not None:
+            self.clock.sleep(seconds)
+        else:
+            time.sleep(seconds)
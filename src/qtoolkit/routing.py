@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import dataclasses
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from qtoolkit.core.data_objects import (
+    PartitionState,
+    PendingJob,
+    QJobFilter,
+    QResources,
+    QState,
+)
+from qtoolkit.core.exceptions import QTKException
+
+if TYPE_CHECKING:
+    from qtoolkit.manager import QueueManager
+
+logger = logging.getLogger(__name__)
+
+
+def get_pending_jobs(manager: QueueManager) -> list[PendingJob]:
+    """
+    The jobs waiting in the queue of the manager, with the estimates of their
+    start time if supported by the scheduler, otherwise from the queued jobs
+    of get_jobs_list.
+    """
+    try:
+        return manager.get_pending_jobs()
+    except NotImplementedError:
+        pass
+    jobs = manager.get_jobs_list(filters=QJobFilter(states=[QState.QUEUED]))
+    pending_jobs = []
+    for job in jobs:
+        # the parsers set either the queue_name or the partition of the info
+        partition = job.queue_name or (job.info and job.info.partition)
+        pending_jobs.append(
+            PendingJob(
+                job_id=job.job_id,
+                partitions=[partition] if partition else None,
+                cpus=job.info.cpus if job.info is not None else None,
+                time_limit=job.info.time_limit if job.info is not None else None,
+            )
+        )
+    return pending_jobs
+
+
+@dataclass
+class RoutingDecision:
+    """Outcome of the choice of the partition for a submission."""
+
+    requested: str | None
+    """Partition requested in the resources."""
+
+    selected: str | None
+    """Partition selected for the submission."""
+
+    waits: dict[str, float] = field(default_factory=dict)
+    """Expected wait in seconds for each compatible candidate partition."""
+
+    reason: str = ""
+    """Short description of the reason of the choice."""
+
+    timestamp: float | None = None
+    """Time of the decision, as a Unix timestamp."""
+
+    @property
+    def rerouted(self) -> bool:
+        """Whether the selected partition differs from the requested one."""
+        return self.selected != self.requested
+
+
+class PartitionRouter:
+    """
+    Choice of the partition (queue) with the lowest expected wait for the
+    jobs submitted by a QueueManager.
+
+    The expected wait in each candidate partition is estimated from the
+    capacity of the cluster (see QueueManager.get_cluster_state) and from the
+    jobs waiting in the queue. If the idle CPUs are enough for the waiting
+    jobs and the new one, no wait is expected. Otherwise the latest start
+    time estimated by the scheduler for the waiting jobs (e.g. squeue
+    --start) is used, or, if not available, the time needed by the usable
+    CPUs to run the CPUs requested in excess.
+
+    Both the queries are cached for max_age seconds, so that a burst of
+    submissions costs a single query of each. The decisions are logged and
+    the most recent ones are kept in the decisions attribute.
+
+    A router keeps the state of a single cluster: do not share it among
+    managers of different clusters.
+
+    Parameters
+    ----------
+    partitions : list of str
+        Candidate partitions. If None, all the available partitions
+        compatible with the resources. If the resources request a partition
+        that is not a candidate, the submission is not rerouted.
+    max_age : float
+        Maximum age in seconds of the cached state of the cluster and of the
+        waiting jobs. If None, the cluster_state_ttl of the manager.
+    default_runtime : float
+        Runtime in seconds assumed for the waiting jobs without a time limit.
+    history_size : int
+        Number of decisions kept in the decisions attribute.
+    clock
+        Object with a time() method, used for the age of the cached waiting
+        jobs and for the estimated start times. Real time if None.
+    """
+
+    def __init__(
+        self,
+        partitions: list[str] | None = None,
+        max_age: float | None = None,
+        default_runtime: float = 3600.0,
+        history_size: int = 100,
+        clock=None,
+    ):
+        self.partitions = list(partitions) if partitions is not None else None
+        self.max_age = max_age
+        self.default_runtime = default_runtime
+        self.clock = clock
+        self.decisions: deque[RoutingDecision] = deque(maxlen=history_size)
+        self._pending_jobs: list[PendingJob] | None = None
+        self._pending_time: float | None = None
+
+    def route(self, manager: QueueManager, resources: QResources) -> QResources:
+        """
+        Select the partition with the lowest expected wait for the resources.
+
+        Parameters
+        ----------
+        manager : QueueManager
+            Manager used to query the scheduler.
+        resources : QResources
+            Resources of the job to be submitted.
+
+        Returns
+        -------
+        QResources
+            A copy of the resources with the selected queue_name, or the
+            resources unchanged if the partition is not rerouted.
+        """
+        decision = self.evaluate(manager, resources)
+        self.decisions.append(decision)
+        logger.info(
+            "Partition %s selected (requested: %s): %s",
+            decision.selected,
+            decision.requested,
+            decision.reason,
+        )
+        if not decision.rerouted:
+            return resources
+        return dataclasses.replace(resources, queue_name=decision.selected)
+
+    def evaluate(self, manager: QueueManager, resources: QResources) -> RoutingDecision:
+        """
+        Estimate the wait in the candidate partitions for the resources,
+        without recording the decision.
+        """
+        requested = resources.queue_name
+        decision = RoutingDecision(
+            requested=requested, selected=requested, timestamp=self._time()
+        )
+        if (
+            requested is not None
+            and self.partitions is not None
+            and requested not in self.partitions
+        ):
+            decision.reason = "requested partition is not a candidate"
+            return decision
+
+        try:
+            cluster_state = manager.get_cluster_state(max_age=self.max_age)
+            pending_jobs = self._get_pending_jobs(manager)
+        except (QTKException, NotImplementedError) as exc:
+            logger.warning("Could not get the state of the queues: %s", exc)
+            decision.reason = f"state of the queues not available ({exc})"
+            return decision
+
+        cpus = self._get_cpus(resources)
+        names = self.partitions
+        if names is None:
+            names = [p.name for p in cluster_state.partitions if p.name is not None]
+        now = self._time()
+        for name in names:
+            partition = cluster_state.get_partition(name)
+            if partition is None or not self.is_compatible(partition, resources):
+                continue
+            decision.waits[name] = self.expected_wait(
+                partition, pending_jobs, cpus, now
+            )
+        if not decision.waits:
+            decision.reason = "no compatible candidate partition"
+            return decision
+
+        # in case of ties, keep the requested partition (or the default one)
+        # and then prefer the one with more idle CPUs
+        default = cluster_state.default_partition
+        preferred = requested or (default.name if default is not None else None)
+
+        def sort_key(name):
+            partition = cluster_state.get_partition(name)
+            return (decision.waits[name], name != preferred, -partition.cpus_idle)
+
+        waits = ", ".join(f"{n}={w:.0f}s" for n, w in decision.waits.items())
+        selected = min(decision.waits, key=sort_key)
+        if math.isinf(decision.waits[selected]):
+            decision.reason = f"no usable candidate partition ({waits})"
+            return decision
+        decision.selected = selected
+        decision.reason = f"expected waits: {waits}"
+        return decision
+
+    def expected_wait(
+        self,
+        partition: PartitionState,
+        pending_jobs: list[PendingJob],
+        cpus: int,
+        now: float,
+    ) -> float:
+        """
+        Expected wait in seconds of a job requesting cpus in the partition.
+        Infinite if the partition has no usable CPUs.
+        """
+        usable = partition.cpus_allocated + partition.cpus_idle
+        if not partition.available or usable == 0:
+            return math.inf
+        waiting = [j for j in pending_jobs if partition.name in (j.partitions or [])]
+        excess = sum(j.cpus or 1 for j in waiting) + cpus - partition.cpus_idle
+        if excess <= 0:
+            return 0.0
+        start_times = [j.start_time for j in waiting if j.start_time is not None]
+        if start_times:
+            return max(max(start_times) - now, 0.0)
+        runtimes = [j.time_limit for j in waiting if j.time_limit]
+        runtime = sum(runtimes) / len(runtimes) if runtimes else self.default_runtime
+        return excess * runtime / usable
+
+    @staticmethod
+    def is_compatible(partition: PartitionState, resources: QResources) -> bool:
+        """Whether the partition can run a job with the resources."""
+        if (
+            resources.time_limit
+            and partition.time_limit is not None
+            and resources.time_limit > partition.time_limit
+        ):
+            return False
+        if resources.nodes and resources.nodes > partition.nodes_total:
+            return False
+        if resources.gpus_per_job and not partition.gres:
+            return False
+        return PartitionRouter._get_cpus(resources) <= partition.cpus_total
+
+    @staticmethod
+    def _get_cpus(resources: QResources) -> int:
+        """Number of CPUs requested by the resources."""
+        if resources.process_placement is None:
+            return 1
+        nodes, processes, processes_per_node = resources.get_processes_distribution()
+        if not processes:
+            processes = (nodes or 1) * (processes_per_node or 1)
+        return processes * (resources.threads_per_process or 1)
+
+    def _get_pending_jobs(self, manager: QueueManager) -> list[PendingJob]:
+        """The jobs waiting in the queue, cached for max_age seconds."""
+        max_age = (
+            self.max_age if self.max_age is not None else manager.cluster_state_ttl
+        )
+        now = self._time()
+        if (
+            self._pending_jobs is not None
+            and max_age is not None
+            and now - self._pending_time < max_age
+        ):
+            return self._pending_jobs
+        pending_jobs = get_pending_jobs(manager)
+        self._pending_jobs = pending_jobs
+        self._pending_time = now
+        return pending_jobs
+
+    def _time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
@@ -0,0 +1,2 @@
+from qtoolkit.simulator.cli import install_simulator, run_command, simulator_handler
+from qtoolkit.simulator.store import SimulatorConfig, SimulatorStore
@@ -0,0 +1,5 @@
+import sys
+
+from qtoolkit.simulator.cli import main
+
+sys.exit(main())
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import os
+import stat
+import sys
+import time
+from pathlib import Path
+
+from qtoolkit.simulator import pbs, slurm
+from qtoolkit.simulator.store import SimulatorConfig, SimulatorStore, get_rng
+
+COMMANDS = {**slurm.COMMANDS, **pbs.COMMANDS}
+TRANSIENT_ERRORS = {**slurm.TRANSIENT_ERRORS, **pbs.TRANSIENT_ERRORS}
+
+STATE_DIR_ENV = "QTK_SIM_DIR"
+
+
+def run_command(
+    store: SimulatorStore, command: str, argv: list[str]
+) -> tuple[str, str, int]:
+    """
+    Run a simulated scheduler command, including the injection of the
+    latency and of the transient failures defined in the configuration.
+    """
+    config = store.config
+    if config.seed is not None:
+        rng = get_rng(config, "command", store.next_command())
+    else:
+        rng = get_rng(config)
+    latency = config.command_latency
+    if config.command_latency_jitter:
+        latency += rng.uniform(0, config.command_latency_jitter)
+    if latency:
+        time.sleep(latency)
+    if rng.random() < config.failure_rate(command):
+        return "", TRANSIENT_ERRORS[command] + "\n", 1
+    return COMMANDS[command](store, argv)
+
+
+def simulator_handler(store: SimulatorStore):
+    """
+    Handler for the MockHost, answering the scheduler commands through the
+    simulator without executing any process.
+
+    Parameters
+    ----------
+    store : SimulatorStore
+        The store of the simulator. Set its clock and files to the ones of
+        the MockHost to have a fully in-memory and deterministic simulation.
+    """
+    from qtoolkit.host.mock import split_command
+
+    def handler(command: str, workdir: str | None):
+        name, argv = split_command(command)
+        if name not in COMMANDS:
+            return None
+        if name in ("sbatch", "qsub") and workdir:
+            argv = [str(Path(workdir, a)) if not a.startswith("-") else a for a in argv]
+        return run_command(store, name, argv)
+
+    return handler
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write(f"usage: {', '.join(COMMANDS)} [args]\n")
+        return 2
+    state_dir = os.environ.get(STATE_DIR_ENV)
+    if not state_dir:
+        sys.stderr.write(f"{STATE_DIR_ENV} is not set\n")
+        return 2
+    stdout, stderr, exit_code = run_command(
+        SimulatorStore(state_dir), argv[0], argv[1:]
+    )
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    return exit_code
+
+
+def install_simulator(
+    bin_dir: str | Path,
+    state_dir: str | Path,
+    config: SimulatorConfig | None = None,
+    commands: list[str] | None = None,
+) -> SimulatorStore:
+    """
+    Install the stand-in executables of the scheduler commands and initialize
+    the state of the simulated scheduler.
+
+    The bin_dir should then be prepended to the PATH of the processes that
+    should use the simulator instead of the real scheduler.
+
+    Parameters
+    ----------
+    bin_dir : str or Path
+        Directory where the executables are written.
+    state_dir : str or Path
+        Directory where the state of the simulated scheduler is stored.
+    config : SimulatorConfig
+        Configuration of the simulator.
+    commands : list of str
+        Commands to be installed. All of them if None.
+
+    Returns
+    -------
+    SimulatorStore
+        The store of the simulator, that can be used to change the
+        configuration or to inspect the state.
+    """
+    bin_dir = Path(bin_dir)
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    state_dir = Path(state_dir).resolve()
+    store = SimulatorStore(state_dir)
+    store.initialize(config)
+    for command in commands or list(COMMANDS):
+        exe = bin_dir / command
+        exe.write_text(
+            "#!/bin/sh\n"
+            f'{STATE_DIR_ENV}="${{{STATE_DIR_ENV}:-{state_dir}}}" '
+            f'exec "{sys.executable}" -m qtoolkit.simulator {command} "$@"\n'
+        )
+        exe.chmod(exe.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return store
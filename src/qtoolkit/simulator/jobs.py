@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import getpass
+
+from qtoolkit.simulator.store import SimulatorConfig, get_rng
+
+
+def new_job(state: dict, now: float, config: SimulatorConfig, **attributes) -> dict:
+    """Create a new job in the state and return it."""
+    job_id = state["next_id"]
+    state["next_id"] += 1
+    # the draws depend on the job, so that each job gets different ones
+    rng = get_rng(config, "job", job_id)
+
+    def jittered(value):
+        if not config.time_jitter:
+            return value
+        return max(0.0, value * (1 + rng.uniform(-1, 1) * config.time_jitter))
+
+    failed = rng.random() < config.job_failure_rate
+    job = {
+        "id": job_id,
+        "name": "submit.script",
+        "user": config.user or getpass.getuser(),
+        "partition": "main",
+        "account": None,
+        "qos": "normal",
+        "time_limit": None,
+        "nodes": 1,
+        "ntasks": 1,
+        "cpus_per_task": 1,
+        "mem_per_cpu": 1024,
+        "workdir": None,
+        "submit": now,
+        "queue_time": jittered(config.queue_time),
+        "run_time": jittered(config.run_time),
+        "exit_code": 1 if failed else 0,
+        "cancelled_at": None,
+    }
+    job.update({k: v for k, v in attributes.items() if v is not None})
+    state["jobs"][str(job_id)] = job
+    return job
+
+
+def job_times(job: dict) -> tuple[float, float | None, float]:
+    """Start time (None if never started) and end time of a job."""
+    start = job["submit"] + job["queue_time"]
+    run_time = job["run_time"]
+    if job["time_limit"] is not None:
+        run_time = min(run_time, job["time_limit"])
+    end = start + run_time
+    cancelled_at = job["cancelled_at"]
+    if cancelled_at is not None and cancelled_at < end:
+        end = cancelled_at
+        if cancelled_at < start:
+            return job["submit"], None, end
+    return job["submit"], start, end
+
+
+def job_status(job: dict, now: float) -> str:
+    """
+    Status of the job at the given time. One of PENDING, RUNNING, COMPLETED,
+    FAILED, CANCELLED and TIMEOUT.
+    """
+    _, start, end = job_times(job)
+    if job["cancelled_at"] is not None and job["cancelled_at"] <= now:
+        if now >= end:
+            return "CANCELLED"
+    if start is None or now < start:
+        return "PENDING"
+    if now < end:
+        return "RUNNING"
+    if job["time_limit"] is not None and job["run_time"] > job["time_limit"]:
+        return "TIMEOUT"
+    return "COMPLETED" if job["exit_code"] == 0 else "FAILED"
+
+
+def job_elapsed(job: dict, now: float) -> float:
+    _, start, end = job_times(job)
+    if start is None or now < start:
+        return 0.0
+    return min(now, end) - start
+
+
+def job_exit_code(job: dict, now: float) -> int:
+    status = job_status(job, now)
+    if status in ("PENDING", "RUNNING", "COMPLETED"):
+        return 0
+    if status == "TIMEOUT":
+        return 0
+    return job["exit_code"] or 1
+
+
+def is_finished(job: dict, now: float) -> bool:
+    return job_status(job, now) not in ("PENDING", "RUNNING")
+
+
+def job_node_list(job: dict) -> str:
+    first = job["id"] % 1000
+    if job["nodes"] == 1:
+        return f"sim{first:04d}"
+    return f"sim[{first:04d}-{first + job['nodes'] - 1:04d}]"
+
+
+def format_duration(seconds: float | None, days_separator: str = "-") -> str:
+    """Duration in the [D-]HH:MM:SS format."""
+    if seconds is None:
+        return "UNLIMITED"
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}{days_separator}{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def parse_duration(value: str) -> float:
+    """Parse durations in the [D-]HH:MM:SS, HH:MM:SS, MM:SS or MM formats."""
+    days = 0
+    if "-" in value:
+        days_str, value = value.split("-", 1)
+        days = int(days_str)
+    parts = [int(p) for p in value.split(":")]
+    if len(parts) == 1:
+        # slurm interprets a single number as minutes
+        parts = [0, parts[0], 0]
+    while len(parts) < 3:
+        parts.insert(0, 0)
+    hours, minutes, seconds = parts
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
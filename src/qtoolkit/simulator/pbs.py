@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from qtoolkit.simulator.jobs import (
+    format_duration,
+    is_finished,
+    job_elapsed,
+    job_exit_code,
+    job_node_list,
+    job_status,
+    new_job,
+    parse_duration,
+)
+from qtoolkit.simulator.store import SimulatorStore
+
+STATE_CODES = {
+    "PENDING": "Q",
+    "RUNNING": "R",
+    "COMPLETED": "F",
+    "FAILED": "F",
+    "CANCELLED": "F",
+    "TIMEOUT": "F",
+}
+
+_PBS_REGEX = re.compile(r"^#PBS\s+-(\w)\s+(\S+)")
+
+
+def _parse_resources(value: str, attributes: dict) -> None:
+    for resource in value.split(","):
+        key, _, val = resource.partition("=")
+        if key == "walltime":
+            attributes["time_limit"] = parse_duration(val)
+        elif key == "select":
+            chunks = val.split(":")
+            nodes = int(chunks[0])
+            chunk_resources = dict(c.partition("=")[::2] for c in chunks[1:])
+            ncpus = int(chunk_resources.get("ncpus", 1))
+            mpiprocs = int(chunk_resources.get("mpiprocs", ncpus))
+            attributes["nodes"] = nodes
+            attributes["ntasks"] = nodes * mpiprocs
+            attributes["cpus_per_task"] = max(1, ncpus // mpiprocs)
+
+
+def _job_id(job: dict, server_name: str) -> str:
+    return f"{job['id']}.{server_name}"
+
+
+def _strip_server(job_id: str) -> str:
+    return job_id.split(".", 1)[0]
+
+
+def qsub(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    script = next((a for a in argv if not a.startswith("-")), None)
+    if script is None:
+        return "", "qsub: script file required\n", 2
+    try:
+        lines = store.read_script(script).splitlines()
+    except OSError:
+        return "", f"qsub: script file:: No such file or directory {script}\n", 2
+
+    attributes: dict = {"workdir": str(Path.cwd()), "partition": "workq"}
+    for line in lines:
+        match = _PBS_REGEX.match(line.strip())
+        if not match:
+            continue
+        option, value = match.groups()
+        if option == "N":
+            attributes["name"] = value
+        elif option == "q":
+            attributes["partition"] = value
+        elif option == "A":
+            attributes["account"] = value
+        elif option == "l":
+            _parse_resources(value, attributes)
+    attributes.setdefault("name", Path(script).name)
+
+    config = store.config
+    with store.transaction() as state:
+        job = new_job(state, store.now(state), config, **attributes)
+    return f"{_job_id(job, config.server_name)}\n", "", 0
+
+
+def qdel(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    job_ids = [a for a in argv if not a.startswith("-")]
+    stderr = []
+    exit_code = 0
+    with store.transaction() as state:
+        now = store.now(state)
+        for job_id in job_ids:
+            job = state["jobs"].get(_strip_server(job_id))
+            if job is None:
+                stderr.append(f"qdel: Unknown Job Id {job_id}")
+                exit_code = 153
+            elif is_finished(job, now):
+                stderr.append(f"qdel: Job has finished {job_id}")
+                exit_code = 35
+            else:
+                job["cancelled_at"] = now
+    return "", "".join(f"{line}\n" for line in stderr), exit_code
+
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%a %b %d %H:%M:%S %Y", time.localtime(timestamp))
+
+
+def _qstat_chunk(job: dict, now: float, server_name: str) -> str:
+    status = job_status(job, now)
+    cpus = job["ntasks"] * job["cpus_per_task"]
+    lines = [
+        f"Job Id: {_job_id(job, server_name)}",
+        f"    Job_Name = {job['name']}",
+        f"    Job_Owner = {job['user']}@login01",
+    ]
+    if status != "PENDING":
+        elapsed = job_elapsed(job, now)
+        lines += [
+            f"    resources_used.cpupercent = {90 * job['cpus_per_task']}",
+            f"    resources_used.cput = {format_duration(elapsed * cpus * 0.9, ':')}",
+            f"    resources_used.mem = {job['mem_per_cpu'] * 512}kb",
+            f"    resources_used.ncpus = {cpus}",
+            f"    resources_used.walltime = {format_duration(elapsed, ':')}",
+        ]
+    lines += [
+        f"    job_state = {STATE_CODES[status]}",
+        f"    queue = {job['partition']}",
+        f"    server = {server_name}",
+        f"    ctime = {_format_time(job['submit'])}",
+    ]
+    if status != "PENDING":
+        lines.append(f"    exec_host = {job_node_list(job)}/0*{job['cpus_per_task']}")
+    if job["account"]:
+        lines.append(f"    Account_Name = {job['account']}")
+    lines += [
+        f"    Resource_List.mem = {job['mem_per_cpu'] * cpus}mb",
+        f"    Resource_List.ncpus = {cpus}",
+        f"    Resource_List.nodect = {job['nodes']}",
+    ]
+    if job["time_limit"] is not None:
+        walltime = format_duration(job["time_limit"], ":")
+        lines.append(f"    Resource_List.walltime = {walltime}")
+    if is_finished(job, now):
+        lines.append(f"    Exit_status = {job_exit_code(job, now)}")
+    workdir = job["workdir"] or "/tmp"
+    lines += [
+        f"    Variable_List = PBS_O_HOME=/home/{job['user']},PBS_O_LANG=C,",
+        f"\tPBS_O_LOGNAME={job['user']},PBS_O_WORKDIR={workdir}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def qstat(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    parser = argparse.ArgumentParser(prog="qstat", add_help=False)
+    parser.add_argument("-f", action="store_true")
+    parser.add_argument("-x", action="store_true")
+    parser.add_argument("-u", "--user", action="append")
+    parser.add_argument("job_ids", nargs="*")
+    args, _ = parser.parse_known_args(argv)
+
+    config = store.config
+    state = store.read()
+    now = store.now(state)
+    jobs = state["jobs"]
+    users = {u for value in args.user or [] for u in value.split(",")}
+
+    chunks = []
+    errors = []
+    exit_code = 0
+    if args.job_ids:
+        selected = []
+        for job_id in args.job_ids:
+            job = jobs.get(_strip_server(job_id))
+            if job is None:
+                errors.append(f"qstat: Unknown Job Id {job_id}")
+                exit_code = 153
+            elif is_finished(job, now) and not args.x:
+                errors.append(
+                    f"qstat: {job_id} Job has finished, use -x or -H to "
+                    "obtain historical job information"
+                )
+                exit_code = 35
+            else:
+                selected.append(job)
+    else:
+        selected = [
+            job
+            for job in jobs.values()
+            if (args.x or not is_finished(job, now))
+            and (not users or job["user"] in users)
+        ]
+
+    for job in selected:
+        chunks.append(_qstat_chunk(job, now, config.server_name))
+    stderr = "".join(f"{line}\n" for line in errors)
+    return "\n".join(chunks), stderr, exit_code
+
+
+COMMANDS = {
+    "qsub": qsub,
+    "qdel": qdel,
+    "qstat": qstat,
+}
+
+TRANSIENT_ERRORS = {
+    name: f"{name}: cannot connect to server simserver (errno=15010)"
+    for name in COMMANDS
+}
@@ -0,0 +1,394 @@
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from qtoolkit.simulator.jobs import (
+    format_duration,
+    is_finished,
+    job_elapsed,
+    job_exit_code,
+    job_node_list,
+    job_status,
+    job_times,
+    new_job,
+    parse_duration,
+)
+from qtoolkit.simulator.store import SimulatorStore
+
+STATE_CODES = {
+    "PENDING": "PD",
+    "RUNNING": "R",
+    "COMPLETED": "CD",
+    "FAILED": "F",
+    "CANCELLED": "CA",
+    "TIMEOUT": "TO",
+}
+
+_SBATCH_OPTIONS = {
+    "job-name": ("name", str),
+    "J": ("name", str),
+    "partition": ("partition", str),
+    "p": ("partition", str),
+    "account": ("account", str),
+    "A": ("account", str),
+    "qos": ("qos", str),
+    "time": ("time_limit", parse_duration),
+    "t": ("time_limit", parse_duration),
+    "nodes": ("nodes", int),
+    "N": ("nodes", int),
+    "ntasks": ("ntasks", int),
+    "n": ("ntasks", int),
+    "cpus-per-task": ("cpus_per_task", int),
+    "c": ("cpus_per_task", int),
+    "mem-per-cpu": ("mem_per_cpu", lambda v: int(re.sub(r"[^0-9]", "", v))),
+}
+
+_SBATCH_REGEX = re.compile(r"^#SBATCH\s+-{1,2}([\w-]+)(?:[=\s]\s*(\S+))?")
+
+
+def _format_time(timestamp: float | None) -> str:
+    if timestamp is None:
+        return "Unknown"
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(timestamp))
+
+
+def _elapsed_str(seconds: float) -> str:
+    # squeue prints the time used as [days-][hours:]minutes:seconds
+    seconds = int(seconds)
+    if seconds < 3600:
+        return f"{seconds // 60}:{seconds % 60:02d}"
+    return format_duration(seconds)
+
+
+def _cpus(job: dict) -> int:
+    return job["ntasks"] * job["cpus_per_task"]
+
+
+def sbatch(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    script = next((a for a in argv if not a.startswith("-")), None)
+    if script is None:
+        return "", "sbatch: error: Batch job submission failed: no script\n", 1
+    try:
+        lines = store.read_script(script).splitlines()
+    except OSError as exc:
+        return "", f"sbatch: error: Unable to open file {script}: {exc}\n", 1
+
+    attributes = {"workdir": str(Path.cwd())}
+    for line in lines:
+        match = _SBATCH_REGEX.match(line.strip())
+        if match and match.group(1) in _SBATCH_OPTIONS and match.group(2):
+            key, converter = _SBATCH_OPTIONS[match.group(1)]
+            attributes[key] = converter(match.group(2))
+    if "name" not in attributes:
+        attributes["name"] = Path(script).name
+
+    config = store.config
+    with store.transaction() as state:
+        job = new_job(state, store.now(state), config, **attributes)
+    return f"Submitted batch job {job['id']}\n", "", 0
+
+
+def scancel(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    job_ids = [a for a in argv if not a.startswith("-")]
+    if not job_ids:
+        return "", "scancel: error: No job identification provided\n", 1
+    stderr = []
+    exit_code = 0
+    with store.transaction() as state:
+        now = store.now(state)
+        for job_id in job_ids:
+            job = state["jobs"].get(job_id)
+            if job is None:
+                stderr.append(
+                    f"scancel: error: Kill job error on job id {job_id}: "
+                    "Invalid job id specified"
+                )
+                exit_code = 1
+            elif is_finished(job, now):
+                stderr.append(
+                    f"scancel: error: Kill job error on job id {job_id}: "
+                    "Job/step already completing or completed"
+                )
+            else:
+                job["cancelled_at"] = now
+                stderr.append(f"scancel: Terminating job {job_id}")
+    return "", "\n".join(stderr) + "\n", exit_code
+
+
+def _squeue_field(code: str, job: dict, now: float) -> str:
+    status = job_status(job, now)
+    if code == "i" or code == "A":
+        return str(job["id"])
+    if code == "t":
+        return STATE_CODES[status]
+    if code == "T":
+        return status
+    if code == "r":
+        return "Priority" if status == "PENDING" else "None"
+    if code == "j":
+        return job["name"]
+    if code == "u":
+        return job["user"]
+    if code == "P":
+        return job["partition"]
+    if code == "a":
+        return job["account"] or "(null)"
+    if code == "q":
+        return job["qos"]
+    if code == "l":
+        return format_duration(job["time_limit"])
+    if code == "D":
+        return str(job["nodes"])
+    if code == "C":
+        return str(_cpus(job))
+    if code == "M":
+        return _elapsed_str(job_elapsed(job, now))
+    if code == "m":
+        return f"{job['mem_per_cpu']}M"
+    if code == "N":
+        return "" if status == "PENDING" else job_node_list(job)
+    if code == "S":
+        _, start, _ = job_times(job)
+        return _format_time(start)
+    if code == "V":
+        return _format_time(job["submit"])
+    return "N/A"
+
+
+def _format_squeue_line(fmt: str, job: dict, now: float) -> str:
+    return re.sub(
+        r"%[.-]?\d*([A-Za-z])",
+        lambda m: _squeue_field(m.group(1), job, now),
+        fmt,
+    )
+
+
+def _split_list(values: list[str] | None) -> set[str] | None:
+    if not values:
+        return None
+    return {v for value in values for v in value.split(",") if v}
+
+
+def squeue(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    parser = argparse.ArgumentParser(prog="squeue", add_help=False)
+    parser.add_argument("-o", "--format", default="%i %P %j %u %t %M %D %N")
+    parser.add_argument("-h", "--noheader", action="store_true")
+    parser.add_argument("-u", "--user", action="append")
+    parser.add_argument("-j", "--jobs", action="append")
+    parser.add_argument("-t", "--states", action="append")
+    parser.add_argument("-p", "--partition", action="append")
+    parser.add_argument("-n", "--name", action="append")
+    parser.add_argument("-A", "--account", action="append")
+    parser.add_argument("-q", "--qos", action="append")
+    parser.add_argument("--start", action="store_true")
+    args, _ = parser.parse_known_args(argv)
+
+    job_ids = _split_list(args.jobs)
+    users = _split_list(args.user)
+    states = _split_list(args.states)
+    if states:
+        states = {s.upper() for s in states}
+    partitions = _split_list(args.partition)
+    names = _split_list(args.name)
+    accounts = _split_list(args.account)
+    qos = _split_list(args.qos)
+
+    config = store.config
+    state = store.read()
+    now = store.now(state)
+    jobs = state["jobs"]
+    if job_ids:
+        unknown = [i for i in job_ids if i not in jobs]
+        if unknown and len(unknown) == len(job_ids):
+            return "", "slurm_load_jobs error: Invalid job id specified\n", 1
+    lines = []
+    if not args.noheader:
+        lines.append(re.sub(r"%[.-]?\d*([A-Za-z])", r"\1", args.format))
+    for job_id, job in jobs.items():
+        if job_ids and job_id not in job_ids:
+            continue
+        _, _, end = job_times(job)
+        if is_finished(job, now) and now > end + config.completed_retention:
+            continue
+        status = job_status(job, now)
+        if states and not {status, STATE_CODES[status]} & states:
+            continue
+        if args.start and status != "PENDING":
+            continue
+        if users and job["user"] not in users:
+            continue
+        if partitions and job["partition"] not in partitions:
+            continue
+        if names and job["name"] not in names:
+            continue
+        if accounts and job["account"] not in accounts:
+            continue
+        if qos and job["qos"] not in qos:
+            continue
+        lines.append(_format_squeue_line(args.format, job, now))
+    return "".join(f"{line}\n" for line in lines), "", 0
+
+
+def scontrol(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    positional = [a for a in argv if not a.startswith("-")]
+    if positional[:2] != ["show", "job"]:
+        return "", f"scontrol: error: unsupported command {' '.join(argv)}\n", 1
+    job_ids = positional[2:]
+    config = store.config
+    state = store.read()
+    now = store.now(state)
+    jobs = state["jobs"]
+    selected = []
+    for job_id in job_ids or list(jobs):
+        job = jobs.get(job_id)
+        if job is not None:
+            _, _, end = job_times(job)
+            if is_finished(job, now) and now > end + config.completed_retention:
+                job = None
+        if job is None:
+            if job_ids:
+                return "", "slurm_load_jobs error: Invalid job id specified\n", 1
+            continue
+        selected.append(job)
+    lines = [_scontrol_line(job, now) for job in selected]
+    if not lines and not job_ids:
+        return "No jobs in the system\n", "", 0
+    return "".join(f"{line}\n" for line in lines), "", 0
+
+
+def _scontrol_line(job: dict, now: float) -> str:
+    status = job_status(job, now)
+    submit, start, end = job_times(job)
+    workdir = job["workdir"] or "/tmp"
+    node_list = "(null)" if status == "PENDING" else job_node_list(job)
+    items = [
+        ("JobId", job["id"]),
+        ("JobName", job["name"]),
+        ("UserId", f"{job['user']}(1000)"),
+        ("GroupId", f"{job['user']}(1000)"),
+        ("Priority", 4294901497),
+        ("Account", job["account"] or "(null)"),
+        ("QOS", job["qos"]),
+        ("JobState", status),
+        ("Reason", "Priority" if status == "PENDING" else "None"),
+        ("ExitCode", f"{job_exit_code(job, now)}:0"),
+        ("RunTime", format_duration(job_elapsed(job, now))),
+        ("TimeLimit", format_duration(job["time_limit"])),
+        ("SubmitTime", _format_time(submit)),
+        ("StartTime", _format_time(start)),
+        ("EndTime", _format_time(end)),
+        ("Partition", job["partition"]),
+        ("NodeList", node_list),
+        ("NumNodes", job["nodes"]),
+        ("NumCPUs", _cpus(job)),
+        ("NumTasks", job["ntasks"]),
+        ("CPUs/Task", job["cpus_per_task"]),
+        ("MinMemoryCPU", f"{job['mem_per_cpu']}M"),
+        ("Command", f"{workdir}/submit.script"),
+        ("WorkDir", workdir),
+        ("StdOut", f"{workdir}/slurm-{job['id']}.out"),
+    ]
+    return " ".join(f"{k}={v}" for k, v in items)
+
+
+def _sacct_field(name: str, job: dict, now: float, step: str | None) -> str:
+    status = job_status(job, now)
+    submit, start, end = job_times(job)
+    name = name.lower()
+    if name in ("jobid", "jobidraw"):
+        return f"{job['id']}.{step}" if step else str(job["id"])
+    if name == "jobname":
+        return step or job["name"]
+    if name == "state":
+        return "CANCELLED by 1000" if status == "CANCELLED" and not step else status
+    if name == "exitcode":
+        return f"{job_exit_code(job, now)}:0"
+    if name == "elapsed":
+        return format_duration(job_elapsed(job, now))
+    if name == "totalcpu":
+        cpu_time = job_elapsed(job, now) * _cpus(job) * 0.9
+        minutes, seconds = divmod(cpu_time, 60)
+        return f"{int(minutes):02d}:{seconds:06.3f}"
+    if name == "maxrss":
+        if not step or status == "PENDING":
+            return ""
+        return f"{job['mem_per_cpu'] * 512}K"
+    if name == "nodelist":
+        return "None assigned" if status == "PENDING" else job_node_list(job)
+    if name == "partition":
+        return "" if step else job["partition"]
+    if name == "account":
+        return job["account"] or ""
+    if name == "qos":
+        return "" if step else job["qos"]
+    if name == "user":
+        return "" if step else job["user"]
+    if name == "timelimit":
+        return "" if step else format_duration(job["time_limit"])
+    if name == "nnodes":
+        return str(job["nodes"])
+    if name == "ncpus":
+        return str(_cpus(job))
+    if name == "submit":
+        return _format_time(submit)
+    if name == "start":
+        return _format_time(start)
+    if name == "end":
+        return _format_time(end) if is_finished(job, now) else "Unknown"
+    return ""
+
+
+def sacct(store: SimulatorStore, argv: list[str]) -> tuple[str, str, int]:
+    parser = argparse.ArgumentParser(prog="sacct", add_help=False)
+    parser.add_argument("-j", "--jobs", action="append")
+    parser.add_argument("-o", "--format", default="JobID,JobName,State,ExitCode")
+    parser.add_argument("-P", "--parsable2", action="store_true")
+    parser.add_argument("-n", "--noheader", action="store_true")
+    parser.add_argument("-X", "--allocations", action="store_true")
+    parser.add_argument("-u", "--user", action="append")
+    args, _ = parser.parse_known_args(argv)
+
+    fields = [f.split("%")[0] for f in args.format.split(",") if f]
+    job_ids = _split_list(args.jobs)
+    users = _split_list(args.user)
+    separator = "|" if args.parsable2 else " "
+
+    state = store.read()
+    now = store.now(state)
+    lines = []
+    if not args.noheader:
+        lines.append(separator.join(fields))
+    for job_id, job in state["jobs"].items():
+        if job_ids and job_id not in job_ids:
+            continue
+        if users and job["user"] not in users:
+            continue
+        steps: list[str | None] = [None]
+        if not args.allocations and job_status(job, now) != "PENDING":
+            steps.append("batch")
+        for step in steps:
+            values = [_sacct_field(f, job, now, step) for f in fields]
+            lines.append(separator.join(values))
+    return "".join(f"{line}\n" for line in lines), "", 0
+
+
+COMMANDS = {
+    "sbatch": sbatch,
+    "scancel": scancel,
+    "squeue": squeue,
+    "scontrol": scontrol,
+    "sacct": sacct,
+}
+
+TRANSIENT_ERRORS = {
+    "sbatch": "sbatch: error: Batch job submission failed: "
+    "Socket timed out on send/recv operation",
+    "scancel": "scancel: error: Kill job error: "
+    "Socket timed out on send/recv operation",
+    "squeue": "slurm_load_jobs error: Socket timed out on send/recv operation",
+    "scontrol": "slurm_load_jobs error: Socket timed out on send/recv operation",
+    "sacct": "sacct: error: slurmdbd: Socket timed out on send/recv operation",
+}
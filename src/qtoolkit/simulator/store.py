@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+STATE_FILENAME = "jobs.json"
+CONFIG_FILENAME = "config.json"
+LOCK_FILENAME = "lock"
+
+
+@dataclass
+class SimulatorConfig:
+    """Configuration of the simulated scheduler.
+
+    All the durations are in seconds. Durations related to the jobs are in
+    simulated time, that runs clock_speed times faster than the real time.
+    """
+
+    queue_time: float = 10.0
+    """Time spent by the jobs in the queue before starting."""
+
+    run_time: float = 60.0
+    """Execution time of the jobs."""
+
+    time_jitter: float = 0.0
+    """Relative random variation of queue_time and run_time."""
+
+    job_failure_rate: float = 0.0
+    """Fraction of the jobs ending with a non-zero exit code."""
+
+    completed_retention: float = 300.0
+    """Time for which finished jobs are still listed by squeue."""
+
+    clock_speed: float = 1.0
+    """Ratio between the simulated and the real time."""
+
+    command_latency: float = 0.0
+    """Real time spent by each command before answering."""
+
+    command_latency_jitter: float = 0.0
+    """Random additional latency, uniformly distributed in [0, jitter]."""
+
+    command_failure_rate: float = 0.0
+    """Fraction of the commands failing with a transient error."""
+
+    command_failure_rates: dict = field(default_factory=dict)
+    """Failure rate for specific commands, e.g. {"squeue": 0.5}."""
+
+    seed: int | None = None
+    """Seed of the random draws. Each job and each command get their own
+    generator, derived from the seed and from the job id or command number."""
+
+    server_name: str = "simserver"
+    """Name of the PBS server, used to build the job ids."""
+
+    user: str | None = None
+    """Owner of the jobs. Defaults to the current user."""
+
+    def failure_rate(self, command: str) -> float:
+        return self.command_failure_rates.get(command, self.command_failure_rate)
+
+
+class SimulatorStore:
+    """
+    Persistent state of the simulated scheduler, shared by all the
+    stand-in executables through a JSON file protected by a lock file.
+    """
+
+    def __init__(self, directory: str | Path, clock=None, files: dict | None = None):
+        """
+        Parameters
+        ----------
+        directory : str or Path
+            Directory containing the state and the configuration.
+        clock
+            Object with a time() method used instead of the real time,
+            e.g. the clock of a MockHost.
+        files : dict
+            In-memory files, by path, read instead of the files on disk when
+            submitting scripts (e.g. the files written to a MockHost).
+        """
+        self.directory = Path(directory)
+        self.clock = clock
+        self.files = files
+        self._config: SimulatorConfig | None = None
+
+    def initialize(self, config: SimulatorConfig | None = None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        config = config or SimulatorConfig()
+        (self.directory / CONFIG_FILENAME).write_text(json.dumps(asdict(config)))
+        self._config = None
+        with self.transaction() as state:
+            state.clear()
+            state.update(self._empty_state())
+
+    @property
+    def config(self) -> SimulatorConfig:
+        if self._config is None:
+            config_path = self.directory / CONFIG_FILENAME
+            if config_path.exists():
+                self._config = SimulatorConfig(**json.loads(config_path.read_text()))
+            else:
+                self._config = SimulatorConfig()
+        return self._config
+
+    def update_config(self, **kwargs) -> None:
+        config = asdict(self.config)
+        config.update(kwargs)
+        (self.directory / CONFIG_FILENAME).write_text(json.dumps(config))
+        self._config = None
+
+    def _time(self) -> float:
+        return self.clock.time() if self.clock is not None else time.time()
+
+    def _empty_state(self) -> dict:
+        return {"next_id": 1000, "next_command": 0, "epoch": self._time(), "jobs": {}}
+
+    def read_script(self, path: str | Path) -> str:
+        if self.files is not None and str(path) in self.files:
+            return self.files[str(path)]
+        return Path(path).read_text()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Lock the state, yield it as a dict and write it back when exiting
+        the context.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        state_path = self.directory / STATE_FILENAME
+        with open(self.directory / LOCK_FILENAME, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if state_path.exists():
+                    state = json.loads(state_path.read_text())
+                else:
+                    state = self._empty_state()
+                yield state
+                tmp_path = state_path.with_name(f"{STATE_FILENAME}.{os.getpid()}")
+                tmp_path.write_text(json.dumps(state))
+                tmp_path.replace(state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read(self) -> dict:
+        """Read-only snapshot of the state."""
+        state_path = self.directory / STATE_FILENAME
+        with open(self.directory / LOCK_FILENAME, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            try:
+                if state_path.exists():
+                    return json.loads(state_path.read_text())
+                return self._empty_state()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def next_command(self) -> int:
+        """Number of the next command, used to seed its random draws."""
+        with self.transaction() as state:
+            number = state.get("next_command", 0)
+            state["next_command"] = number + 1
+        return number
+
+    def now(self, state: dict) -> float:
+        """Current simulated time."""
+        epoch = state["epoch"]
+        return epoch + (self._time() - epoch) * self.config.clock_speed
+
+
+def get_rng(config: SimulatorConfig, *key) -> random.Random:
+    """
+    Random generator for the draws identified by key (e.g. a job id).
+    Without a seed in the configuration, the generator is not reproducible.
+    """
+    if config.seed is None:
+        return random.Random()
+    return random.Random(":".join(str(k) for k in (config.seed, *key)))
@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import importlib
 import os
+import sys
+from collections.abc import Mapping
 from contextlib import contextmanager
 from pathlib import Path
 
@@ -27,3 +30,53 @@ def cd(path: str | Path):
         yield
     finally:
         os.chdir(cwd)
+
+
+class LazyImportMapping(Mapping):
+    """
+    Read-only mapping whose values are objects imported only when accessed.
+
+    The values are defined as "module.path:ObjectName" strings, so that
+    building the mapping does not import any module.
+    """
+
+    def __init__(self, paths: dict[str, str]):
+        self._paths = dict(paths)
+        self._cache: dict = {}
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            self._cache[key] = import_object(self._paths[key])
+        return self._cache[key]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._paths!r})"
+
+
+def import_object(path: str):
+    """Import an object defined as a "module.path:ObjectName" string."""
+    module_name, _, obj_name = path.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, obj_name) if obj_name else module
+
+
+def lazy_module_getattr(module_name: str, paths: dict[str, str]):
+    """
+    Generate a module level __getattr__ importing the objects defined in
+    paths, as "module.path:ObjectName" strings, on first access.
+    """
+
+    def __getattr__(name):
+        if name in paths:
+            obj = import_object(paths[name])
+            setattr(sys.modules[module_name], name, obj)
+            return obj
+        raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+
+    return __getattr__
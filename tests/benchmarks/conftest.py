@@ -0,0 +1,85 @@
+"""
+Benchmarks of the parsers and of the generation of the submission scripts.
+
+They are skipped unless --run-benchmarks is passed. Timings are handled by
+pytest-benchmark, so the usual options apply, e.g. to store and compare
+against a baseline, failing for regressions larger than 10%:
+
+    pytest tests/benchmarks --run-benchmarks --benchmark-autosave
+    pytest tests/benchmarks --run-benchmarks --benchmark-compare \
+        --benchmark-compare-fail=mean:10%
+
+The peak memory of each benchmark is measured with tracemalloc and can be
+stored/compared with --bench-memory-save and --bench-memory-baseline.
+Larger outputs can be selected with --bench-sizes=10,1000,100000,1000000.
+"""
+
+import json
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks need --run-benchmarks to run")
+    for item in items:
+        if "benchmarks" in item.path.parts:
+            item.add_marker(skip)
+
+
+def pytest_generate_tests(metafunc):
+    if "n_rows" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--bench-sizes").split(",")]
+        metafunc.parametrize("n_rows", sizes, ids=[f"{s}rows" for s in sizes])
+
+
+_peak_memory: dict = {}
+
+
+@pytest.fixture(scope="session")
+def memory_baseline(request):
+    path = request.config.getoption("--bench-memory-baseline")
+    if not path:
+        return {}
+    return json.loads(Path(path).read_text())
+
+
+@pytest.fixture
+def measure(benchmark, request, memory_baseline):
+    """
+    Run the benchmark of a function and measure its peak memory, failing
+    if it exceeds the baseline by more than the threshold.
+    """
+    threshold = request.config.getoption("--bench-memory-threshold")
+
+    def _measure(func, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_kb = peak / 1024
+        benchmark.extra_info["peak_memory_kb"] = peak_kb
+        _peak_memory[request.node.nodeid] = peak_kb
+
+        result = benchmark(func, *args, **kwargs)
+
+        reference = memory_baseline.get(request.node.nodeid)
+        if reference and peak_kb > reference * (1 + threshold / 100):
+            pytest.fail(
+                f"Peak memory regression: {peak_kb:.1f} KiB vs "
+                f"{reference:.1f} KiB in the baseline (threshold {threshold}%)"
+            )
+        return result
+
+    return _measure
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption("--bench-memory-save")
+    if path and _peak_memory:
+        Path(path).write_text(json.dumps(_peak_memory, indent=2, sort_keys=True))
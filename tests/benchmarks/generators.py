@@ -0,0 +1,133 @@
+"""
+Generators of synthetic, but realistic, outputs of the scheduler commands
+used to benchmark the parsers at scale.
+"""
+
+from __future__ import annotations
+
+import random
+
+from qtoolkit.io.slurm import SlurmIO
+
+SLURM_STATES = ["PD", "R", "R", "R", "CG", "CD", "F", "TO", "CA", "S"]
+PBS_STATES = ["Q", "R", "R", "R", "H", "E", "F", "W"]
+SHELL_STATES = ["R", "S", "S", "D", "T", "Z"]
+
+
+def _time_str(rng: random.Random, max_seconds: int = 3 * 86400) -> str:
+    seconds = rng.randint(0, max_seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}-{hours:02d}:{minutes:02d}:{seconds:02d}"
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _squeue_values(job_id: int, rng: random.Random) -> dict:
+    state = rng.choice(SLURM_STATES)
+    return {
+        "job_id": str(job_id),
+        "state_raw": state,
+        "annotation": "Priority" if state == "PD" else "None",
+        "job_name": f"sweep-{job_id}",
+        "username": f"user{rng.randint(1, 200)}",
+        "partition": rng.choice(["main", "debug", "gpu", "long"]),
+        "time_limit": _time_str(rng),
+        "number_nodes": str(rng.randint(1, 64)),
+        "number_cpus": str(rng.randint(1, 4096)),
+        "time_used": "0:00" if state == "PD" else _time_str(rng),
+        "min_memory": f"{rng.randint(1, 512)}G",
+    }
+
+
+def generate_squeue_output(
+    n_jobs: int, slurm_io: SlurmIO | None = None, seed: int = 0
+) -> str:
+    """
+    Output of squeue with the format string used by SlurmIO.
+    Fields not known by the generator are filled with "N/A".
+    """
+    slurm_io = slurm_io or SlurmIO()
+    rng = random.Random(seed)
+    separator = f"{slurm_io.split_separator} "
+    names = [f[1] for f in slurm_io.squeue_fields]
+    lines = []
+    for i in range(n_jobs):
+        values = _squeue_values(100000 + i, rng)
+        lines.append(separator.join(values.get(name, "N/A") for name in names))
+    return "\n".join(lines) + "\n"
+
+
+def generate_scontrol_output(n_jobs: int, seed: int = 0) -> str:
+    """Output of "scontrol show job -o" with one line per job."""
+    rng = random.Random(seed)
+    slurm_states = ["PENDING", "RUNNING", "COMPLETED", "FAILED", "TIMEOUT"]
+    lines = []
+    for i in range(n_jobs):
+        job_id = 100000 + i
+        user = f"user{rng.randint(1, 200)}"
+        nodes = rng.randint(1, 64)
+        lines.append(
+            f"JobId={job_id} JobName=sweep-{job_id} UserId={user}(1001) "
+            f"GroupId={user}(1002) MCS_label=N/A Priority=4294901497 Nice=0 "
+            f"Account=project{rng.randint(1, 20)} QOS=normal "
+            f"JobState={rng.choice(slurm_states)} Reason=None Dependency=(null) "
+            "Requeue=1 Restarts=0 BatchFlag=1 Reboot=0 ExitCode=0:0 "
+            f"RunTime={_time_str(rng)} TimeLimit={_time_str(rng)} TimeMin=N/A "
+            "SubmitTime=2023-10-11T11:08:17 EligibleTime=2023-10-11T11:08:17 "
+            "StartTime=2023-10-11T11:08:17 EndTime=2023-10-11T11:13:17 "
+            f"Partition={rng.choice(['main', 'debug', 'gpu'])} "
+            f"NodeList=nid[{job_id % 4000:04d}-{job_id % 4000 + nodes:04d}] "
+            f"NumNodes={nodes} NumCPUs={nodes * 128} NumTasks={nodes * 128} "
+            "CPUs/Task=1 ReqB:S:C:T=0:0:*:* "
+            f"TRES=cpu={nodes * 128},mem={nodes * 256}G,node={nodes},billing=1 "
+            f"MinCPUsNode=1 MinMemoryCPU={rng.randint(1, 8)}G MinTmpDiskNode=0 "
+            f"Command=/home/{user}/run/submit.script "
+            f"WorkDir=/home/{user}/run StdErr=/home/{user}/run/slurm-{job_id}.out "
+            f"StdIn=/dev/null StdOut=/home/{user}/run/slurm-{job_id}.out Power="
+        )
+    return "\n".join(lines) + "\n"
+
+
+def generate_qstat_output(n_jobs: int, seed: int = 0) -> str:
+    """Output of "qstat -f" for PBS."""
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n_jobs):
+        job_id = 100000 + i
+        user = f"user{rng.randint(1, 200)}"
+        state = rng.choice(PBS_STATES)
+        used = (
+            "" if state == "Q" else f"    resources_used.walltime = {_time_str(rng)}\n"
+        )
+        chunks.append(
+            f"Job Id: {job_id}.pbs-server\n"
+            f"    Job_Name = sweep-{job_id}\n"
+            f"    Job_Owner = {user}@login01\n"
+            f"{used}"
+            f"    job_state = {state}\n"
+            f"    queue = {rng.choice(['workq', 'debug', 'long'])}\n"
+            "    server = pbs-server\n"
+            "    Checkpoint = u\n"
+            "    ctime = Wed Oct 11 11:08:17 2023\n"
+            f"    Resource_List.ncpus = {rng.randint(1, 256)}\n"
+            f"    Resource_List.nodect = {rng.randint(1, 16)}\n"
+            f"    Resource_List.mem = {rng.randint(1, 512)}gb\n"
+            f"    Resource_List.walltime = {rng.randint(1, 48)}:00:00\n"
+            f"    Variable_List = PBS_O_HOME=/home/{user},PBS_O_LANG=en_US.UTF-8,\n"
+            f"\tPBS_O_LOGNAME={user},PBS_O_WORKDIR=/home/{user}/run\n"
+        )
+    return "\n".join(chunks)
+
+
+def generate_ps_output(n_jobs: int, seed: int = 0) -> str:
+    """Output of "ps -o pid,user,etime,state,comm"."""
+    rng = random.Random(seed)
+    lines = ["    PID USER         ELAPSED S COMMAND"]
+    for i in range(n_jobs):
+        lines.append(
+            f"{1000 + i:7d} user{rng.randint(1, 20):<8d} {_time_str(rng):>11s} "
+            f"{rng.choice(SHELL_STATES)} bash"
+        )
+    return "\n".join(lines) + "\n"
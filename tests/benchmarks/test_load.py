@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from qtoolkit.io.pbs import PBSIO  # noqa: E402
+from qtoolkit.io.slurm import SlurmIO  # noqa: E402
+from qtoolkit.manager import QueueManager  # noqa: E402
+from qtoolkit.simulator import SimulatorConfig, install_simulator  # noqa: E402
+
+SCHEDULERS = {"slurm": SlurmIO, "pbs": PBSIO}
+
+
+@pytest.fixture
+def simulated_manager(request, tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    install_simulator(
+        bin_dir, tmp_path / "state", SimulatorConfig(queue_time=60, run_time=600)
+    )
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.chdir(tmp_path)
+    return QueueManager(scheduler_io=SCHEDULERS[request.param]())
+
+
+@pytest.mark.parametrize("simulated_manager", list(SCHEDULERS), indirect=True)
+def test_submit_throughput(benchmark, simulated_manager, tmp_path):
+    result = benchmark(simulated_manager.submit, commands="echo 1", work_dir=tmp_path)
+    assert result.job_id
+
+
+@pytest.mark.parametrize("simulated_manager", list(SCHEDULERS), indirect=True)
+def test_poll_cost(benchmark, simulated_manager, tmp_path, n_rows):
+    # limit the number of submissions, the poll cost only depends on the
+    # number of jobs in the store
+    store_size = min(n_rows, 1000)
+    job_ids = [
+        simulated_manager.submit(commands="echo 1", work_dir=tmp_path).job_id
+        for _ in range(store_size)
+    ]
+    jobs = benchmark(simulated_manager.get_jobs_list, jobs=job_ids)
+    assert len(jobs) == store_size
@@ -0,0 +1,137 @@
+from dataclasses import replace
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from qtoolkit.core.data_objects import QResources  # noqa: E402
+from qtoolkit.io.parallel import ParallelParser  # noqa: E402
+from qtoolkit.io.pbs import PBSIO  # noqa: E402
+from qtoolkit.io.shell import ShellIO  # noqa: E402
+from qtoolkit.io.slurm import SlurmIO  # noqa: E402
+from tests.benchmarks.generators import (  # noqa: E402
+    generate_ps_output,
+    generate_qstat_output,
+    generate_scontrol_output,
+    generate_squeue_output,
+)
+
+JOBS_LIST_CASES = {
+    "slurm": (SlurmIO, generate_squeue_output),
+    "pbs": (PBSIO, generate_qstat_output),
+    "shell": (ShellIO, generate_ps_output),
+}
+
+SUBMIT_OUTPUTS = {
+    "slurm": "Submitted batch job 1234567\n",
+    "pbs": "1234567.pbs-server\n",
+    "shell": "1234567\n",
+}
+
+CANCEL_OUTPUTS = {
+    "slurm": ("", "scancel: Terminating job 1234567\n"),
+    "pbs": ("", ""),
+    "shell": ("", ""),
+}
+
+
+@pytest.mark.parametrize("scheduler", list(JOBS_LIST_CASES))
+def test_parse_jobs_list_output(measure, scheduler, n_rows):
+    io_cls, generator = JOBS_LIST_CASES[scheduler]
+    scheduler_io = io_cls()
+    stdout = generator(n_rows)
+    jobs = measure(
+        scheduler_io.parse_jobs_list_output, exit_code=0, stdout=stdout, stderr=""
+    )
+    assert len(jobs) == n_rows
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4, 8])
+@pytest.mark.parametrize("scheduler", ["slurm", "pbs"])
+def test_parse_jobs_list_output_parallel(measure, scheduler, n_rows, workers):
+    # scaling of the parallel parser with the number of processes. The pool
+    # is started before the measure, as it is reused among the calls.
+    io_cls, generator = JOBS_LIST_CASES[scheduler]
+    scheduler_io = io_cls()
+    stdout = generator(n_rows)
+    with ParallelParser(workers=workers, threshold=0) as parser:
+        if workers > 1:
+            parser.parse_jobs_list_output(scheduler_io, 0, generator(workers), "")
+        jobs = measure(parser.parse_jobs_list_output, scheduler_io, 0, stdout, "")
+    assert len(jobs) == n_rows
+
+
+def test_parse_jobs_list_output_projection(measure, n_rows):
+    # minimal squeue output, as obtained with a projection on the state
+    scheduler_io = SlurmIO()
+    fields = scheduler_io.get_projection(["state"])
+    stdout = "".join(f"{i}<><> R\n" for i in range(n_rows))
+    jobs = measure(
+        scheduler_io.parse_jobs_list_output,
+        exit_code=0,
+        stdout=stdout,
+        stderr="",
+        fields=fields,
+    )
+    assert len(jobs) == n_rows
+
+
+@pytest.mark.parametrize("scheduler", list(JOBS_LIST_CASES))
+def test_parse_job_output(measure, scheduler):
+    io_cls, generator = JOBS_LIST_CASES[scheduler]
+    if scheduler == "slurm":
+        generator = generate_scontrol_output
+    stdout = generator(1)
+    job = measure(io_cls().parse_job_output, exit_code=0, stdout=stdout, stderr="")
+    assert job is not None
+
+
+@pytest.mark.parametrize("scheduler", list(JOBS_LIST_CASES))
+def test_parse_submit_output(measure, scheduler):
+    io_cls, _ = JOBS_LIST_CASES[scheduler]
+    result = measure(
+        io_cls().parse_submit_output,
+        exit_code=0,
+        stdout=SUBMIT_OUTPUTS[scheduler],
+        stderr="",
+    )
+    assert result.job_id is not None
+
+
+@pytest.mark.parametrize("scheduler", list(JOBS_LIST_CASES))
+def test_parse_cancel_output(measure, scheduler):
+    io_cls, _ = JOBS_LIST_CASES[scheduler]
+    stdout, stderr = CANCEL_OUTPUTS[scheduler]
+    measure(io_cls().parse_cancel_output, exit_code=0, stdout=stdout, stderr=stderr)
+
+
+@pytest.mark.parametrize("scheduler", ["slurm", "pbs"])
+def test_generate_header(measure, scheduler, maximalist_qresources):
+    if scheduler == "slurm":
+        scheduler_io = SlurmIO()
+        resources = replace(maximalist_qresources, rerunnable=None, project=None)
+    else:
+        scheduler_io = PBSIO()
+        resources = QResources(
+            queue_name="test_queue",
+            job_name="test_job",
+            nodes=4,
+            processes_per_node=16,
+            threads_per_process=2,
+            time_limit=100,
+            account="test_account",
+            priority=1,
+            project="test_project",
+            njobs=10,
+            email_address="test_email_address@email.address",
+        )
+    header = measure(scheduler_io.generate_header, resources)
+    assert header
+
+
+@pytest.mark.parametrize("n_commands", [1, 1000])
+def test_get_submission_script(measure, n_commands):
+    commands = [f"srun ./run_step {i}" for i in range(n_commands)]
+    options = {"partition": "main", "job_name": "bench", "nodes": 4}
+    script = measure(SlurmIO().get_submission_script, commands, options)
+    assert script.count("\n") >= n_commands
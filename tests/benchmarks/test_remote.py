@@ -0,0 +1,76 @@
+"""
+Benchmarks of the transfer of large outputs through the RemoteHost, with and
+without the compression of the SSH transport.
+
+The commands are executed by an in-process SSH server, reached through a
+proxy counting the bytes received by the client and optionally limiting the
+bandwidth to simulate a slow link. The bytes are stored in the extra_info of
+the benchmarks, e.g.:
+
+    pytest tests/benchmarks/test_remote.py --run-benchmarks \
+        --bench-sizes=1000,50000 --benchmark-json=remote.json
+"""
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("fabric")
+
+from qtoolkit.host.remote import RemoteConfig, RemoteHost  # noqa: E402
+from tests.benchmarks.generators import (  # noqa: E402
+    generate_qstat_output,
+    generate_squeue_output,
+)
+from tests.host.ssh_server import (  # noqa: E402
+    PASSWORD,
+    USER,
+    CountingProxy,
+    SSHServer,
+)
+
+OUTPUTS = {
+    "squeue": generate_squeue_output,
+    "qstat": generate_qstat_output,
+}
+
+# bytes per second, None for an unlimited link
+LINKS = {"local": None, "100Mbit": 100e6 / 8}
+
+
+@pytest.mark.parametrize("link", list(LINKS))
+@pytest.mark.parametrize("compress", [False, True], ids=["plain", "compressed"])
+@pytest.mark.parametrize("command", list(OUTPUTS))
+def test_transfer_output(benchmark, command, compress, link, n_rows):
+    output = OUTPUTS[command](n_rows).encode()
+    server = SSHServer(handler=lambda cmd: (output, b"", 0))
+    proxy = CountingProxy(server.port, bandwidth=LINKS[link])
+    config = RemoteConfig(
+        root_dir="/tmp",
+        host="127.0.0.1",
+        port=proxy.port,
+        user=USER,
+        connect_kwargs={
+            "password": PASSWORD,
+            "look_for_keys": False,
+            "allow_agent": False,
+        },
+        compress=compress,
+    )
+    host = RemoteHost(config)
+    try:
+        # the connection is opened before the measure
+        host.connect()
+
+        def run():
+            proxy.reset()
+            return host.execute(command)
+
+        stdout, _, _ = benchmark(run)
+        assert len(stdout) == len(output)
+        benchmark.extra_info["output_bytes"] = len(output)
+        benchmark.extra_info["transferred_bytes"] = proxy.bytes_received
+        benchmark.extra_info["ratio"] = proxy.bytes_received / len(output)
+    finally:
+        host.close()
+        proxy.close()
+        server.close()
@@ -9,6 +9,39 @@ test_dir = module_dir / "test_data"
 TEST_DIR = test_dir.resolve()
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup("qtoolkit benchmarks")
+    group.addoption(
+        "--run-benchmarks",
+        action="store_true",
+        default=False,
+        help="Run the benchmarks in tests/benchmarks.",
+    )
+    group.addoption(
+        "--bench-sizes",
+        default="10,1000",
+        help="Comma separated numbers of rows of the synthetic outputs, "
+        "e.g. 10,1000,100000,1000000.",
+    )
+    group.addoption(
+        "--bench-memory-baseline",
+        default=None,
+        help="JSON file with the reference peak memory of the benchmarks.",
+    )
+    group.addoption(
+        "--bench-memory-save",
+        default=None,
+        help="Save the peak memory of the benchmarks to this JSON file.",
+    )
+    group.addoption(
+        "--bench-memory-threshold",
+        default=10.0,
+        type=float,
+        help="Maximum allowed increase of the peak memory with respect "
+        "to the baseline, in percent.",
+    )
+
+
 @pytest.fixture(scope="session")
 def test_dir():
     return TEST_DIR
@@ -1,4 +1,5 @@
 """Unit tests for the core.data_objects module of QToolKit."""
+
 import pytest
 
 from qtoolkit.core.data_objects import (
@@ -6,6 +7,7 @@ from qtoolkit.core.data_objects import (
     CancelStatus,
     ProcessPlacement,
     QJob,
+    QJobFilter,
     QJobInfo,
     QResources,
     QState,
@@ -679,6 +681,7 @@ class TestQJob:
             cpus=4,
             threads_per_process=2,
             time_limit=3600,
+            partition="mymain",
         )
         qjob = QJob(
             name="job1",
@@ -690,5 +693,49 @@ class TestQJob:
             account="myacc",
             runtime=2541,
             queue_name="mymain",
+            username="me",
+            qos="normal",
         )
         assert test_utils.is_msonable(qjob)
+        qjob_dict = qjob.as_dict()
+        assert qjob_dict["username"] == "me"
+        assert qjob_dict["qos"] == "normal"
+        assert QJob.from_dict(qjob_dict) == qjob
+
+
+class TestQJobFilter:
+    def test_init(self):
+        f = QJobFilter(states="RUNNING", names="a", partitions=("p1", "p2"))
+        assert f.states == [QState.RUNNING]
+        assert f.names == ["a"]
+        assert f.partitions == ["p1", "p2"]
+        assert f.accounts is None
+        assert not f.is_empty()
+        assert QJobFilter().is_empty()
+        assert QJobFilter(names=["sweep-*"]).has_wildcard_names
+        assert not f.has_wildcard_names
+
+    def test_matches(self):
+        job = QJob(
+            name="sweep-12",
+            state=QState.RUNNING,
+            info=QJobInfo(),
+            account="acc",
+            queue_name="main",
+        )
+        assert QJobFilter().matches(job)
+        assert QJobFilter(states=[QState.RUNNING, QState.QUEUED]).matches(job)
+        assert not QJobFilter(states=[QState.QUEUED]).matches(job)
+        assert QJobFilter(names=["sweep-*"]).matches(job)
+        assert not QJobFilter(names=["sweep-1"]).matches(job)
+        assert QJobFilter(partitions=["main"], accounts="acc").matches(job)
+        assert not QJobFilter(partitions=["debug"]).matches(job)
+        assert not QJobFilter(qos=["high"]).matches(job)
+        job.qos = "high"
+        assert QJobFilter(qos=["high"]).matches(job)
+
+        # partition stored in the info, as for the slurm and pbs parsers
+        job = QJob(info=QJobInfo())
+        job.info.partition = "debug"
+        assert QJobFilter(partitions=["debug"]).matches(job)
+        assert not QJobFilter(names=["*"]).matches(job)
@@ -0,0 +1,242 @@
+"""
+Minimal in-process SSH server, based on paramiko, to test the RemoteHost.
+
+The server accepts password authentication, executes the commands in a
+local shell (or with a custom handler) and forwards the direct-tcpip
+channels, so that it can be used both as a remote host and as a gateway.
+"""
+
+from __future__ import annotations
+
+import socket
+import subprocess
+import threading
+import time
+
+import paramiko
+
+USER = "qtk"
+PASSWORD = "qtk"
+
+_HOST_KEY = None
+
+
+def _host_key() -> paramiko.PKey:
+    global _HOST_KEY
+    if _HOST_KEY is None:
+        _HOST_KEY = paramiko.RSAKey.generate(2048)
+    return _HOST_KEY
+
+
+def run_in_shell(command: str) -> tuple[bytes, bytes, int]:
+    process = subprocess.run(command, shell=True, capture_output=True)
+    return process.stdout, process.stderr, process.returncode
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, server: SSHServer):
+        self.server = server
+        self.forwards: dict[int, tuple[str, int]] = {}
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if username == USER and password == PASSWORD:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.forwards[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_env_request(self, channel, name, value):
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(
+            target=self.server._exec, args=(channel, command.decode()), daemon=True
+        ).start()
+        return True
+
+
+class SSHServer:
+    """
+    SSH server listening on a random port of localhost.
+
+    Parameters
+    ----------
+    handler : callable
+        Function executing a command, returning stdout, stderr (bytes) and
+        the exit code. Commands are run in a local shell by default.
+    compression : bool
+        Whether the server accepts zlib compression.
+    """
+
+    def __init__(self, handler=run_in_shell, compression: bool = True):
+        self.handler = handler
+        self.compression = compression
+        self.transports: list[paramiko.Transport] = []
+        self.commands: list[str] = []
+        self.forwarded: list[tuple[str, int]] = []
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+        self._closed = False
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        transport = paramiko.Transport(client)
+        transport.use_compression(self.compression)
+        transport.add_server_key(_host_key())
+        interface = _ServerInterface(self)
+        self.transports.append(transport)
+        try:
+            transport.start_server(server=interface)
+        except (paramiko.SSHException, EOFError):
+            return
+        while transport.is_active():
+            channel = transport.accept(timeout=0.5)
+            if channel is None:
+                continue
+            destination = interface.forwards.pop(channel.get_id(), None)
+            if destination is not None:
+                self.forwarded.append(destination)
+                threading.Thread(
+                    target=self._forward, args=(channel, destination), daemon=True
+                ).start()
+
+    def _exec(self, channel, command):
+        self.commands.append(command)
+        stdout, stderr, exit_code = self.handler(command)
+        channel.sendall(stdout)
+        channel.sendall_stderr(stderr)
+        channel.send_exit_status(exit_code)
+        # the channel is closed by the client: closing it here could happen
+        # before the reply to the exec request is sent
+        channel.shutdown_write()
+
+    @staticmethod
+    def _forward(channel, destination):
+        try:
+            sock = socket.create_connection(destination)
+        except OSError:
+            channel.close()
+            return
+
+        def pump(read, write, on_eof):
+            try:
+                while True:
+                    data = read(32768)
+                    if not data:
+                        break
+                    write(data)
+            except OSError:
+                pass
+            on_eof()
+
+        threading.Thread(
+            target=pump,
+            args=(sock.recv, channel.sendall, channel.close),
+            daemon=True,
+        ).start()
+        pump(channel.recv, sock.sendall, lambda: sock.close())
+
+    @property
+    def connection_count(self) -> int:
+        """Number of SSH connections accepted by the server."""
+        return len(self.transports)
+
+    def close(self):
+        self._closed = True
+        self._socket.close()
+        for transport in self.transports:
+            transport.close()
+
+
+class CountingProxy:
+    """
+    TCP proxy on a random port of localhost counting the bytes exchanged
+    with a server, optionally limiting the bandwidth to simulate a slow link.
+
+    Parameters
+    ----------
+    port : int
+        Port of the server on localhost.
+    bandwidth : float
+        Maximum bytes per second in each direction. Unlimited if None.
+    """
+
+    def __init__(self, port: int, bandwidth: float | None = None):
+        self.target = ("127.0.0.1", port)
+        self.bandwidth = bandwidth
+        self.bytes_received = 0
+        """Bytes sent by the server to the clients."""
+        self.bytes_sent = 0
+        """Bytes sent by the clients to the server."""
+        self._lock = threading.Lock()
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(16)
+        self.port = self._socket.getsockname()[1]
+        self._sockets: list[socket.socket] = []
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            server = socket.create_connection(self.target)
+            self._sockets.extend((client, server))
+            for source, dest, counter in (
+                (client, server, "bytes_sent"),
+                (server, client, "bytes_received"),
+            ):
+                threading.Thread(
+                    target=self._pump, args=(source, dest, counter), daemon=True
+                ).start()
+
+    def _pump(self, source, dest, counter):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if self.bandwidth:
+                    time.sleep(len(data) / self.bandwidth)
+                dest.sendall(data)
+                with self._lock:
+                    setattr(self, counter, getattr(self, counter) + len(data))
+        except OSError:
+            pass
+        try:
+            dest.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+
+    def reset(self):
+        with self._lock:
+            self.bytes_sent = self.bytes_received = 0
+
+    def close(self):
+        self._socket.close()
+        for sock in self._sockets:
+            sock.close()
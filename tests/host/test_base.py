@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.base import is_transient_error
+from qtoolkit.host.local import LocalHost
+
+
+def test_is_transient_error():
+    assert is_transient_error(
+        1, "", "squeue: error: slurm_load_jobs error: Socket timed out on send/recv"
+    )
+    assert is_transient_error(1, "", "Unable to contact slurm controller")
+    assert not is_transient_error(0, "", "slurm_load_jobs error")
+    assert not is_transient_error(1, "", "Invalid job id specified")
+
+
+class TestExecuteWithRetries:
+    @pytest.fixture
+    def host(self, mocker):
+        host = LocalHost()
+        mocker.patch.object(host, "_sleep")
+        return host
+
+    def test_retry_transient(self, host):
+        outputs = iter(
+            [
+                ("", "slurm_load_jobs error: Socket timed out on send/recv", 1),
+                ("", "slurm_load_jobs error: Socket timed out on send/recv", 1),
+                ("ok", "", 0),
+            ]
+        )
+        out = host.execute_with_retries(lambda: next(outputs), "cmd", retries=2)
+        assert out == ("ok", "", 0)
+        assert host._sleep.call_count == 2
+
+    def test_retries_exhausted(self, host):
+        def run_once():
+            return "", "Socket timed out on send/recv", 1
+
+        with pytest.raises(CommandFailedError) as exc_info:
+            host.execute_with_retries(run_once, "squeue", retries=1)
+        assert exc_info.value.attempts == 2
+        assert exc_info.value.exit_code == 1
+        assert exc_info.value.command == "squeue"
+        assert not exc_info.value.timed_out
+
+    def test_no_retry(self, host):
+        # without retries the output is returned as is, even if transient
+        out = host.execute_with_retries(
+            lambda: ("", "Socket timed out on send/recv", 1), "cmd", retries=0
+        )
+        assert out == ("", "Socket timed out on send/recv", 1)
+        # non transient errors are never retried
+        out = host.execute_with_retries(
+            lambda: ("", "Invalid job id", 1), "cmd", retries=3
+        )
+        assert out == ("", "Invalid job id", 1)
+        assert host._sleep.call_count == 0
+
+    def test_retry_timeout(self, host):
+        calls = []
+
+        def run_once():
+            calls.append(1)
+            raise CommandFailedError("timed out", timed_out=True)
+
+        with pytest.raises(CommandFailedError) as exc_info:
+            host.execute_with_retries(run_once, "cmd", retries=2)
+        assert len(calls) == 3
+        assert exc_info.value.attempts == 3
+        assert exc_info.value.timed_out
+
+    def test_cancel(self):
+        host = LocalHost()
+        cancel_event = threading.Event()
+        calls = []
+
+        def run_once():
+            calls.append(1)
+            # cancelled during the first attempt
+            cancel_event.set()
+            return "", "Socket timed out on send/recv", 1
+
+        start = time.monotonic()
+        with pytest.raises(CommandFailedError) as exc_info:
+            host.execute_with_retries(
+                run_once, "cmd", retries=3, backoff=100, cancel_event=cancel_event
+            )
+        # the backoff delay is interrupted
+        assert time.monotonic() - start < 5
+        assert len(calls) == 1
+        assert exc_info.value.cancelled
+        assert exc_info.value.attempts == 1
+
+    def test_backoff_delay(self):
+        for attempt in range(1, 5):
+            delay = LocalHost._backoff_delay(0.5, attempt)
+            assert 0 <= delay <= 0.5 * 2 ** (attempt - 1)
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.local import LocalHost
+
+
+@pytest.fixture(scope="module")
+def local_host():
+    return LocalHost()
+
+
+def test_execute(local_host, tmp_path):
+    stdout, stderr, exit_code = local_host.execute("pwd", workdir=tmp_path)
+    assert stdout.strip() == str(tmp_path)
+    assert stderr == ""
+    assert exit_code == 0
+
+    stdout, stderr, exit_code = local_host.execute(["echo", "hello"])
+    assert stdout == "hello\n"
+
+    stdout, stderr, exit_code = local_host.execute("echo err >&2; exit 3")
+    assert stderr == "err\n"
+    assert exit_code == 3
+
+
+def test_execute_timeout(local_host):
+    start = time.monotonic()
+    with pytest.raises(CommandFailedError, match="timed out") as exc_info:
+        # the sleep is executed in a subprocess of the shell, and should be
+        # killed as well, otherwise the pipes would remain open.
+        local_host.execute("echo started; sleep 10; echo done", timeout=0.5)
+    assert time.monotonic() - start < 5
+    assert exc_info.value.timed_out
+    assert exc_info.value.attempts == 1
+    assert exc_info.value.stdout == "started\n"
+
+
+def test_execute_cancel(local_host):
+    cancel_event = threading.Event()
+    timer = threading.Timer(0.3, cancel_event.set)
+    timer.start()
+    start = time.monotonic()
+    with pytest.raises(CommandFailedError, match="cancelled") as exc_info:
+        local_host.execute(
+            "echo started; sleep 10; echo done",
+            timeout=20,
+            retries=2,
+            cancel_event=cancel_event,
+        )
+    assert time.monotonic() - start < 5
+    assert exc_info.value.cancelled
+    assert not exc_info.value.timed_out
+    assert exc_info.value.attempts == 1
+    assert exc_info.value.stdout == "started\n"
+
+    # no attempt once cancelled
+    with pytest.raises(CommandFailedError) as exc_info:
+        local_host.execute("echo 1", cancel_event=cancel_event)
+    assert exc_info.value.attempts == 0
+
+    stdout, _, _ = local_host.execute("echo 1", cancel_event=threading.Event())
+    assert stdout == "1\n"
+
+
+def test_execute_retries(local_host, tmp_path, mocker):
+    mocker.patch.object(local_host, "_sleep")
+    counter = tmp_path / "counter"
+    # fail with a transient error the first two times
+    cmd = (
+        f"echo x >> {counter}; "
+        f'if [ $(wc -l < {counter}) -lt 3 ]; then echo "Socket timed out on '
+        f'send/recv operation" >&2; exit 1; fi; echo success'
+    )
+    stdout, stderr, exit_code = local_host.execute(cmd, retries=3, backoff=0.01)
+    assert stdout == "success\n"
+    assert exit_code == 0
+    assert local_host._sleep.call_count == 2
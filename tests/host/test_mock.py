@@ -0,0 +1,89 @@
+import pytest
+
+from qtoolkit.core.data_objects import QState, SubmissionStatus
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.mock import MockHost, VirtualClock, split_command
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.manager import QueueManager
+from qtoolkit.simulator import SimulatorConfig, SimulatorStore, simulator_handler
+
+
+def test_canned_responses():
+    host = MockHost()
+    host.add_response("echo 1", stdout="1\n")
+    host.add_response(r"^squeue", stderr="error\n", exit_code=1, regex=True)
+    assert host.execute("echo 1") == ("1\n", "", 0)
+    assert host.execute("squeue -u me") == ("", "error\n", 1)
+    stdout, stderr, exit_code = host.execute("unknown_cmd --opt")
+    assert exit_code == 127
+    assert len(host.calls) == 3
+
+
+def test_latency_bandwidth():
+    clock = VirtualClock()
+    host = MockHost(latency=0.1, bandwidth=1000, clock=clock)
+    host.add_response("cmd", stdout="x" * 997)
+    host.execute("cmd")
+    assert clock.time() == pytest.approx(0.1 + 1.0)
+    assert host.calls[0].bytes_transferred == 1000
+    host.write_text_file("/path/file", "y" * 500)
+    assert clock.time() == pytest.approx(1.1 + 0.1 + 0.5)
+    assert host.read_text_file("/path/file") == "y" * 500
+    assert host.total_time == pytest.approx(1.1)
+
+
+def test_jitter_deterministic():
+    def run():
+        host = MockHost(latency=0.1, jitter=0.5, seed=42)
+        host.add_response("cmd")
+        for _ in range(10):
+            host.execute("cmd")
+        return host.clock.time()
+
+    assert run() == run()
+    assert 1.0 <= run() <= 6.0
+
+
+def test_timeout_and_retries():
+    clock = VirtualClock()
+    host = MockHost(latency=5, clock=clock)
+    host.add_response("cmd")
+    with pytest.raises(CommandFailedError) as exc_info:
+        host.execute("cmd", timeout=1, retries=2, backoff=0)
+    assert exc_info.value.timed_out
+    assert exc_info.value.attempts == 3
+    assert clock.time() == pytest.approx(3)
+
+
+def test_mkdir():
+    host = MockHost()
+    assert host.mkdir("/a/b/c")
+    assert "/a/b" in host.directories
+    assert not host.mkdir("/a/b/c", exist_ok=False)
+    assert not host.mkdir("/x/y", recursive=False)
+
+
+def test_split_command():
+    assert split_command("SLURM_TIME_FORMAT='standard' squeue -o '%i %t'") == (
+        "squeue",
+        ["-o", "%i %t"],
+    )
+    assert split_command("") == ("", [])
+
+
+def test_simulator_handler(tmp_path):
+    host = MockHost(latency=0.2)
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+
+    qm = QueueManager(scheduler_io=SlurmIO(), host=host)
+    sr = qm.submit(commands="echo 1", work_dir="/remote/dir")
+    assert sr.status == SubmissionStatus.SUCCESSFUL
+    assert "/remote/dir/submit.script" in host.files
+
+    assert qm.get_jobs_list(jobs=[sr.job_id])[0].state == QState.QUEUED
+    host.clock.advance(20)
+    assert qm.get_jobs_list(jobs=[sr.job_id])[0].state == QState.RUNNING
+    host.clock.advance(200)
+    assert qm.get_job(sr.job_id).state == QState.DONE
@@ -0,0 +1,179 @@
+import threading
+
+import pytest
+
+pytest.importorskip("fabric")
+
+import paramiko  # noqa: E402
+
+from qtoolkit.host.remote import (  # noqa: E402
+    GatewayConfig,
+    GatewayPool,
+    RemoteConfig,
+    RemoteHost,
+)
+from tests.host.ssh_server import (  # noqa: E402
+    PASSWORD,
+    USER,
+    CountingProxy,
+    SSHServer,
+)
+
+CONNECT_KWARGS = {"password": PASSWORD, "look_for_keys": False, "allow_agent": False}
+
+
+@pytest.fixture
+def servers():
+    servers = {name: SSHServer() for name in ("bastion", "login1", "login2")}
+    yield servers
+    for server in servers.values():
+        server.close()
+
+
+def _config(server, gateway=None, **kwargs):
+    return RemoteConfig(
+        root_dir="/tmp",
+        host="127.0.0.1",
+        port=server.port,
+        user=USER,
+        connect_kwargs=dict(CONNECT_KWARGS),
+        gateway=gateway,
+        **kwargs,
+    )
+
+
+def _gateway(server):
+    return GatewayConfig(
+        host="127.0.0.1",
+        port=server.port,
+        user=USER,
+        connect_kwargs=dict(CONNECT_KWARGS),
+    )
+
+
+def test_execute(servers, tmp_path):
+    host = RemoteHost(_config(servers["login1"]))
+    try:
+        stdout, stderr, exit_code = host.execute("pwd", workdir=tmp_path)
+        assert stdout.strip() == str(tmp_path)
+        assert exit_code == 0
+        stdout, stderr, exit_code = host.execute("echo err >&2; exit 3")
+        assert stderr == "err\n"
+        assert exit_code == 3
+    finally:
+        host.close()
+    assert servers["login1"].connection_count == 1
+
+
+def test_shared_gateway(servers):
+    pool = GatewayPool()
+    gateway = _gateway(servers["bastion"])
+    hosts = [
+        RemoteHost(_config(servers[name], gateway=gateway), gateway_pool=pool)
+        for name in ("login1", "login2", "login1")
+    ]
+    assert len(pool) == 1
+
+    results = [None] * len(hosts)
+
+    def run(i):
+        results[i] = hosts[i].execute(f"echo {i}")
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(hosts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [r[0] for r in results] == ["0\n", "1\n", "2\n"]
+    # a single authenticated connection to the bastion, with one forwarded
+    # channel for each host
+    assert servers["bastion"].connection_count == 1
+    assert len(servers["bastion"].forwarded) == 3
+    assert servers["bastion"].commands == []
+    assert servers["login1"].connection_count == 2
+    assert servers["login2"].connection_count == 1
+
+    gateway_connection = pool.acquire(gateway)
+    pool.release(gateway)
+    hosts[0].close()
+    hosts[1].close()
+    assert len(pool) == 1
+    assert gateway_connection.is_connected
+    hosts[2].close()
+    hosts[2].close()
+    assert len(pool) == 0
+    assert not gateway_connection.is_connected
+
+
+def test_gateway_connection(servers):
+    import fabric
+
+    gateway = fabric.Connection(
+        "127.0.0.1",
+        user=USER,
+        port=servers["bastion"].port,
+        connect_kwargs=dict(CONNECT_KWARGS),
+    )
+    hosts = [
+        RemoteHost(_config(servers[name], gateway=gateway))
+        for name in ("login1", "login2")
+    ]
+    try:
+        assert hosts[0].execute("echo a")[0] == "a\n"
+        assert hosts[1].execute("echo b")[0] == "b\n"
+    finally:
+        for host in hosts:
+            host.close()
+        gateway.close()
+    assert servers["bastion"].connection_count == 1
+
+
+def test_transport_tuning():
+    output = b"JobId=1 JobState=RUNNING " * 20000
+    server = SSHServer(handler=lambda command: (output, b"", 0))
+    proxy = CountingProxy(server.port)
+    try:
+        sizes = {}
+        for compress in (False, True):
+            config = _config(
+                server,
+                compress=compress,
+                keepalive=30,
+                window_size=8 * 1024**2,
+                max_packet_size=64 * 1024,
+            )
+            config.port = proxy.port
+            host = RemoteHost(config)
+            try:
+                proxy.reset()
+                stdout, _, exit_code = host.execute("squeue")
+                assert stdout == output.decode()
+                transport = host.connection.transport
+                assert transport.local_compression == (
+                    "zlib@openssh.com" if compress else "none"
+                )
+                assert transport.default_window_size == 8 * 1024**2
+                assert transport.default_max_packet_size == 64 * 1024
+                sizes[compress] = proxy.bytes_received
+            finally:
+                host.close()
+        assert sizes[True] < sizes[False] / 10
+    finally:
+        proxy.close()
+        server.close()
+
+
+def test_connect_options(servers):
+    # the timeout cannot be given twice
+    config = _config(servers["login1"], connect_timeout=5)
+    config.connect_kwargs["timeout"] = 5
+    host = RemoteHost(config)
+    with pytest.raises(ValueError, match="timeout"):
+        host.connect()
+
+    config = _config(servers["login1"])
+    config.connect_kwargs["password"] = "wrong"
+    host = RemoteHost(config)
+    with pytest.raises(paramiko.AuthenticationException):
+        host.execute("echo 1")
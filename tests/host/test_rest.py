@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from qtoolkit.core.data_objects import (
+    CancelStatus,
+    QResources,
+    QState,
+    SubmissionStatus,
+)
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.rest import RestConfig, RestHost
+from qtoolkit.io.slurmrest import SlurmRestIO
+from qtoolkit.manager import QueueManager
+
+
+class FakeSlurmrestd(BaseHTTPRequestHandler):
+    """Minimal stand-in for slurmrestd, keeping the jobs in memory."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _record(self):
+        self.server.requests.append(
+            (self.command, self.path, self.headers.get("X-SLURM-USER-TOKEN"))
+        )
+        self.server.connections.add(self.client_address)
+
+    def do_POST(self):
+        self._record()
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not body.get("script", "").startswith("#!"):
+            self._send({"errors": [{"error": "invalid script"}]}, status=500)
+            return
+        job_id = 100 + len(self.server.jobs)
+        self.server.jobs[job_id] = body["job"]
+        self._send({"job_id": job_id, "errors": []})
+
+    def do_DELETE(self):
+        self._record()
+        job_id = int(self.path.rsplit("/", 1)[1])
+        if self.server.jobs.pop(job_id, None) is None:
+            self._send({"errors": [{"error": "Invalid job id"}]}, status=500)
+        else:
+            self._send({"errors": []})
+
+    def do_GET(self):
+        self._record()
+        if self.path.endswith("/sleep"):
+            time.sleep(0.5)
+        job_filter = None
+        if "/job/" in self.path:
+            job_filter = int(self.path.rsplit("/", 1)[1])
+        jobs = [
+            {
+                "job_id": job_id,
+                "name": job.get("name"),
+                "job_state": "RUNNING",
+                "user_name": "me",
+                "partition": job.get("partition"),
+                "time_limit": {"set": True, "infinite": False, "number": 60},
+                "node_count": {"set": True, "infinite": False, "number": 1},
+                "cpus": 4,
+                "memory_per_cpu": 1000,
+                "start_time": int(time.time()) - 10,
+            }
+            for job_id, job in self.server.jobs.items()
+            if job_filter is None or job_id == job_filter
+        ]
+        self._send({"jobs": jobs, "errors": []})
+
+
+class QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # e.g. broken pipes for the requests that timed out on the client side
+        pass
+
+
+@pytest.fixture
+def slurmrestd():
+    server = QuietServer(("127.0.0.1", 0), FakeSlurmrestd)
+    server.jobs = {}
+    server.requests = []
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def rest_host(slurmrestd):
+    host, port = slurmrestd.server_address
+    host = RestHost(
+        RestConfig(root_dir="/", url=f"http://{host}:{port}", user="me", token="tk")
+    )
+    yield host
+    host.close()
+
+
+def test_manager(slurmrestd, rest_host):
+    qm = QueueManager(SlurmRestIO(), host=rest_host)
+    resources = QResources(
+        queue_name="debug", job_name="test", time_limit=3600, processes=4
+    )
+    result = qm.submit("echo 1", options=resources, work_dir="/scratch/job")
+    assert result.status == SubmissionStatus.SUCCESSFUL
+    assert result.job_id == "100"
+    job_desc = slurmrestd.jobs[100]
+    assert job_desc["partition"] == "debug"
+    assert job_desc["time_limit"] == 60
+    assert job_desc["tasks"] == 4
+    assert job_desc["current_working_directory"] == "/scratch/job"
+
+    qm.submit("echo 2", work_dir="/scratch/job2")
+    jobs = qm.get_jobs_list()
+    assert [j.job_id for j in jobs] == ["100", "101"]
+    assert jobs[0].state == QState.RUNNING
+    assert jobs[0].info.time_limit == 3600
+    assert jobs[0].info.memory_per_cpu == 1000 * 1024
+    assert jobs[0].runtime >= 10
+    assert [j.job_id for j in qm.get_jobs_list(jobs=["101"])] == ["101"]
+    assert qm.get_jobs_list(user="other") == []
+
+    job = qm.get_job("101")
+    assert job.job_id == "101"
+
+    assert qm.cancel("100").status == CancelStatus.SUCCESSFUL
+    assert qm.cancel("100").status == CancelStatus.FAILED
+    assert list(slurmrestd.jobs) == [101]
+
+    # all the requests went through a single keep-alive connection
+    assert len(slurmrestd.requests) == 8
+    assert rest_host.connections_created == 1
+    assert len(slurmrestd.connections) == 1
+    assert {r[2] for r in slurmrestd.requests} == {"tk"}
+
+
+def test_stale_connection(slurmrestd, rest_host, monkeypatch):
+    # the server closes the idle connections after 0.1 s
+    monkeypatch.setattr(FakeSlurmrestd, "timeout", 0.1)
+    rest_host.execute({"method": "GET", "path": "/slurm/v0.0.39/jobs"})
+    time.sleep(0.3)
+    stdout, stderr, exit_code = rest_host.execute(
+        {"method": "GET", "path": "/slurm/v0.0.39/jobs"}
+    )
+    assert exit_code == 0
+    assert rest_host.connections_created == 2
+
+
+def test_timeout(slurmrestd, rest_host):
+    with pytest.raises(CommandFailedError) as excinfo:
+        rest_host.execute({"method": "GET", "path": "/sleep"}, timeout=0.1)
+    assert excinfo.value.timed_out
+
+
+def test_files():
+    host = RestHost(RestConfig(root_dir="/", url="http://localhost:1"))
+    assert host.mkdir("/some/dir")
+    host.write_text_file("/a/b", "content")
+    assert host.read_text_file("/a/b") == "content"
+    with pytest.raises(FileNotFoundError):
+        host.read_text_file("/c")
+    with pytest.raises(CommandFailedError):
+        host.execute({"method": "GET", "path": "/"}, timeout=1)
+    with pytest.raises(ValueError):
+        RestHost(RestConfig(root_dir="/", url="ftp://localhost"))
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.io.parallel import ParallelParser
+from qtoolkit.io.pbs import PBSIO
+from qtoolkit.io.shell import ShellIO
+from qtoolkit.io.slurm import SlurmIO
+from tests.benchmarks.generators import (
+    generate_ps_output,
+    generate_qstat_output,
+    generate_squeue_output,
+)
+
+
+@pytest.mark.parametrize(
+    "io_cls,generator",
+    [(SlurmIO, generate_squeue_output), (PBSIO, generate_qstat_output)],
+)
+def test_split_jobs_list_output(io_cls, generator):
+    scheduler_io = io_cls()
+    stdout = generator(50)
+    chunks = scheduler_io.split_jobs_list_output(stdout, 4)
+    assert len(chunks) == 4
+    assert "".join(chunks) == stdout
+    jobs = []
+    for chunk in chunks:
+        jobs.extend(scheduler_io.parse_jobs_list_output(0, chunk, ""))
+    assert jobs == scheduler_io.parse_jobs_list_output(0, stdout, "")
+
+    # more chunks than jobs
+    chunks = scheduler_io.split_jobs_list_output(generator(2), 8)
+    assert len(chunks) <= 2
+    assert scheduler_io.split_jobs_list_output(stdout, 1) == [stdout]
+
+
+def test_split_not_supported():
+    stdout = generate_ps_output(10)
+    assert ShellIO().split_jobs_list_output(stdout, 4) == [stdout]
+
+
+@pytest.mark.parametrize(
+    "io_cls,generator",
+    [(SlurmIO, generate_squeue_output), (PBSIO, generate_qstat_output)],
+)
+def test_parallel_parse(io_cls, generator):
+    scheduler_io = io_cls()
+    stdout = generator(100)
+    expected = scheduler_io.parse_jobs_list_output(0, stdout, "")
+    with ThreadPoolExecutor(3) as executor:
+        parser = ParallelParser(workers=3, threshold=0, executor=executor)
+        assert parser.use_parallel(scheduler_io, 0, stdout)
+        assert parser.parse_jobs_list_output(scheduler_io, 0, stdout, "") == expected
+        parser.close()
+        assert not executor._shutdown
+
+
+def test_parallel_parse_fallbacks(mocker):
+    slurm_io = SlurmIO()
+    executor = mocker.Mock()
+    parser = ParallelParser(workers=2, threshold=1000, executor=executor)
+    # small output
+    assert (
+        len(parser.parse_jobs_list_output(slurm_io, 0, generate_squeue_output(2), ""))
+        == 2
+    )
+    # failed command
+    with pytest.raises(CommandFailedError):
+        parser.parse_jobs_list_output(slurm_io, 1, "x" * 2000, "error")
+    # output that cannot be split
+    stdout = generate_ps_output(100)
+    assert not parser.use_parallel(ShellIO(), 0, stdout)
+    executor.map.assert_not_called()
+
+
+def test_process_pool():
+    slurm_io = SlurmIO()
+    slurm_io.register_job_field("start", "%S")
+    fields = slurm_io.get_projection(["state", "time_limit", "start"])
+    stdout = "".join(
+        f"{i}<><> R<><> 1:00:00<><> 2024-01-01T10:00:00\n" for i in range(200)
+    )
+    with ParallelParser(workers=2, threshold=0) as parser:
+        jobs = parser.parse_jobs_list_output(slurm_io, 0, stdout, "", fields)
+    assert [j.job_id for j in jobs] == [str(i) for i in range(200)]
+    assert jobs[-1].info.time_limit == 3600
+    assert jobs[-1].other_properties == {"start": "2024-01-01T10:00:00"}
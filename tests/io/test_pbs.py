@@ -0,0 +1,475 @@
+import json
+import os
+import stat
+
+import pytest
+
+from qtoolkit.core.data_objects import QJob, QJobFilter, QState
+from qtoolkit.core.exceptions import CommandFailedError, OutputParsingError
+from qtoolkit.io.pbs import PBSIO
+from qtoolkit.manager import QueueManager
+from tests.benchmarks.generators import generate_qstat_output
+
+
+@pytest.fixture(scope="module")
+def pbs_io():
+    return PBSIO()
+
+
+def test_get_jobs_list_cmd_filters(pbs_io):
+    assert pbs_io.get_jobs_list_cmd(None, "me") == "qstat -f -u me"
+
+    filters = QJobFilter(
+        states=[QState.RUNNING, QState.QUEUED], partitions="main", names="run"
+    )
+    cmd = pbs_io.get_jobs_list_cmd(None, "me", filters)
+    assert cmd == (
+        'ids=$(qselect -u me -s BEQRW -q main -N run) && { [ -z "$ids" ] || qstat -f $ids; }'
+    )
+    assert pbs_io.get_residual_filter(filters) is None
+
+    # single values, no wildcards and no qos for qselect
+    filters = QJobFilter(partitions=["a", "b"], names="run-*", qos="high")
+    assert pbs_io.get_jobs_list_cmd(None, None, filters) == "qstat -f"
+    assert pbs_io.get_residual_filter(filters) == filters
+
+    # the job ids cannot be selected with qselect
+    filters = QJobFilter(states=[QState.RUNNING])
+    assert pbs_io.get_jobs_list_cmd(["1", "2"], None, filters) == "qstat -f 1 2"
+    residual = pbs_io.get_residual_filter(filters, job_ids=["1", "2"])
+    assert residual == filters
+    jobs = [QJob(job_id="1", state=QState.RUNNING), QJob(job_id="2")]
+    assert pbs_io.filter_jobs_list(jobs, ["1", "2"], filters=filters) == jobs[:1]
+
+
+QSTAT_OUTPUT = """Job Id: 1.server
+    Job_Name = run
+    Job_Owner = me@host
+    job_state = R
+    queue = main
+    Resource_List.qos = high
+    Resource_List.walltime = 01:00:00
+    Variable_List = PBS_O_HOME=/home/me,
+\tPBS_O_PATH=/usr/bin
+
+Job Id: 2.server
+    Job_Name = other
+    job_state = Q
+    queue = main
+"""
+
+
+def test_jobs_list_projection(pbs_io):
+    fields = pbs_io.get_projection(["state", "time_limit"])
+    cmd = pbs_io.get_jobs_list_cmd(None, "me", fields=fields)
+    assert cmd == (
+        "qstat -f -u me | awk '/^Job Id:/{print;k=0;next} "
+        '/^ +[A-Za-z_.]+ = /{k=($1=="Resource_List.walltime"||$1=="job_state")} k\''
+    )
+    filters = QJobFilter(names="run")
+    cmd = pbs_io.get_jobs_list_cmd(None, None, filters, fields=["job_id"])
+    assert cmd.endswith("qstat -f $ids; } | awk '/^Job Id:/'")
+
+    jobs = pbs_io.parse_jobs_list_output(0, QSTAT_OUTPUT, "", fields=fields)
+    assert [j.job_id for j in jobs] == ["1.server", "2.server"]
+    assert jobs[0].state == QState.RUNNING
+    assert jobs[0].info.time_limit == 3600
+    assert jobs[1].state == QState.QUEUED
+    assert jobs[1].info.time_limit is None
+    assert jobs[0].name is None
+
+    # the quality of service is only defined by some PBS flavors
+    filters = QJobFilter(qos="high")
+    fields = pbs_io.get_projection(["state"], filters)
+    assert fields == ["job_id", "state", "qos"]
+    jobs = pbs_io.parse_jobs_list_output(0, QSTAT_OUTPUT, "", fields=fields)
+    assert pbs_io.filter_jobs_list(jobs, filters=filters) == jobs[:1]
+    assert jobs[0].qos == "high"
+
+
+def test_jobs_accounting(pbs_io):
+    assert pbs_io.get_jobs_accounting_cmd(["1.s", "2.s"]) == "qstat -x -f 1.s 2.s"
+    stdout = generate_qstat_output(3)
+    jobs = pbs_io.parse_jobs_accounting_output(0, stdout, "")
+    assert jobs == pbs_io.parse_jobs_list_output(0, stdout, "")
+    assert len(jobs) == 3
+
+
+def test_jobs_usage(pbs_io):
+    assert pbs_io.get_jobs_usage_cmd(["1.s"]) == "qstat -x -f 1.s"
+    stdout = """Job Id: 1.server
+    Job_Name = run
+    Job_Owner = me@host
+    resources_used.cput = 01:00:00
+    resources_used.mem = 2048kb
+    resources_used.walltime = 00:20:00
+    job_state = F
+    queue = main
+    exec_host = node1/0*4+node2/0*4
+    Resource_List.ncpus = 8
+    Resource_List.nodect = 2
+    Resource_List.walltime = 01:00:00
+    Exit_status = 3
+"""
+    job = pbs_io.parse_jobs_usage_output(0, stdout, "")[0]
+    assert job.exit_status == 3
+    assert job.info.max_rss == 2048
+    assert job.info.total_cpu == 3600
+    assert job.info.elapsed == 1200
+    assert job.info.node_list == "node1,node2"
+
+
+def test_cluster_state(pbs_io):
+    assert pbs_io.get_cluster_state_cmd() == (
+        "{ pbsnodes -a -F json && qstat -Q -f -F json && qstat -B -f -F json; } "
+        "2>/dev/null || { pbsnodes -a && qstat -Q -f && qstat -B -f; }"
+    )
+
+    def node(state, ncpus, assigned=0, queue="workq", **available):
+        data = {
+            "state": state,
+            "resources_available": {"ncpus": ncpus, "mem": "196608000kb", **available},
+            "resources_assigned": {"ncpus": assigned},
+        }
+        if queue is not None:
+            data["queue"] = queue
+        return data
+
+    nodes = {
+        "n1": node("free", 32),
+        "n2": node("free", 32, assigned=8),
+        "n3": node("job-busy", 32, assigned=32),
+        "n4": node("job-exclusive", 32, assigned=4),
+        "n5": node("down,offline", 32),
+        "g1": node("free", 16, queue="gpu", ngpus=4, mem="393216000kb"),
+        "s1": node("free", 8, queue=None),
+    }
+    stdout = json.dumps({"timestamp": 1, "pbs_version": "2022.1", "nodes": nodes})
+    state = pbs_io.parse_cluster_state_output(0, stdout, "")
+    assert [p.name for p in state.partitions] == ["workq", "gpu", None]
+    workq = state.get_partition("workq")
+    assert (workq.nodes_allocated, workq.nodes_idle, workq.nodes_other) == (3, 1, 1)
+    assert workq.nodes_total == 5
+    assert (workq.cpus_allocated, workq.cpus_idle, workq.cpus_other) == (72, 56, 32)
+    assert workq.cpus_total == 160
+    assert workq.memory_per_node == 196608000
+    assert workq.gres is None
+    gpu = state.get_partition("gpu")
+    assert gpu.gres == ["ngpus=4"]
+    assert gpu.memory_per_node == 393216000
+    assert state.get_partition(None).cpus_idle == 8
+    assert state.default_partition is None
+
+    # PBS Pro: the queue attribute is usually not set on the nodes, they are
+    # mapped to the queues with the default_chunk of the queues (e.g. Qlist)
+    nodes = {
+        "n1": node("free", 32, queue=None, Qlist="workq,long"),
+        "n2": node("free", 32, assigned=8, queue=None, Qlist="workq"),
+        "n3": node("job-busy", 32, assigned=32, queue=None, Qlist="long"),
+        "g1": node("free", 16, queue="gpu", ngpus=4),
+    }
+
+    def queue(walltime=None, started="True", hasnodes="False", **default_chunk):
+        data = {
+            "queue_type": "Execution",
+            "enabled": "True",
+            "started": started,
+            "hasnodes": hasnodes,
+        }
+        if walltime is not None:
+            data["resources_max"] = {"walltime": walltime}
+        if default_chunk:
+            data["default_chunk"] = {"ncpus": 1, **default_chunk}
+        return data
+
+    queues = {
+        "workq": queue("24:00:00", Qlist="workq"),
+        "long": queue("168:00:00", Qlist="long"),
+        "gpu": queue(hasnodes="True"),
+        "any": queue(started="False"),
+        "route": {"queue_type": "Route"},
+    }
+    stdout = "\n".join(
+        json.dumps(document)
+        for document in (
+            {"pbs_version": "2022.1", "nodes": nodes},
+            {"pbs_version": "2022.1", "Queue": queues},
+            {"pbs_version": "2022.1", "Server": {"pbs": {"default_queue": "workq"}}},
+        )
+    )
+    state = pbs_io.parse_cluster_state_output(0, stdout, "")
+    assert [p.name for p in state.partitions] == ["workq", "long", "gpu", "any"]
+    assert state.default_partition.name == "workq"
+    workq = state.get_partition("workq")
+    assert (workq.cpus_total, workq.cpus_idle) == (64, 56)
+    assert workq.time_limit == 86400
+    long = state.get_partition("long")
+    assert (long.cpus_total, long.cpus_idle, long.nodes_allocated) == (64, 32, 1)
+    assert state.get_partition("gpu").cpus_total == 16
+    # all the nodes not assigned to a queue
+    assert state.get_partition("any").cpus_total == 96
+    assert not state.get_partition("any").available
+
+    with pytest.raises(CommandFailedError):
+        pbs_io.parse_cluster_state_output(1, "", "pbsnodes: error")
+    with pytest.raises(OutputParsingError):
+        pbs_io.parse_cluster_state_output(0, "pbsnodes: not json", "")
+
+
+# Outputs of PBS Pro
+PBSNODES_TEXT = """node01
+     Mom = node01.cluster
+     ntype = PBS
+     state = free
+     pcpus = 32
+     resources_available.arch = linux
+     resources_available.host = node01
+     resources_available.mem = 196608000kb
+     resources_available.ncpus = 32
+     resources_available.Qlist = workq,long
+     resources_available.vnode = node01
+     resources_assigned.accelerator_memory = 0kb
+     resources_assigned.mem = 0kb
+     resources_assigned.naccelerators = 0
+     resources_assigned.ncpus = 8
+     resources_assigned.vmem = 0kb
+     resv_enable = True
+     sharing = default_shared
+     last_state_change_time = Mon Oct 16 10:21:04 2023
+
+node02
+     Mom = node02.cluster
+     ntype = PBS
+     state = down,offline
+     pcpus = 32
+     resources_available.arch = linux
+     resources_available.host = node02
+     resources_available.mem = 196608000kb
+     resources_available.ncpus = 32
+     resources_available.Qlist = long
+     resources_available.vnode = node02
+     resources_assigned.ncpus = 0
+     resv_enable = True
+     sharing = default_shared
+
+"""
+
+QSTAT_QUEUES_TEXT = """Queue: workq
+    queue_type = Execution
+    total_jobs = 3
+    state_count = Transit:0 Queued:1 Held:0 Waiting:0 Running:2 Exiting:0 Begun
+\t:0
+    resources_max.walltime = 24:00:00
+    default_chunk.Qlist = workq
+    default_chunk.ncpus = 1
+    resources_assigned.mem = 0kb
+    resources_assigned.ncpus = 8
+    resources_assigned.nodect = 1
+    hasnodes = False
+    enabled = True
+    started = True
+
+Queue: long
+    queue_type = Execution
+    total_jobs = 0
+    resources_max.walltime = 168:00:00
+    default_chunk.Qlist = long
+    hasnodes = False
+    enabled = True
+    started = False
+
+Queue: route
+    queue_type = Route
+    total_jobs = 0
+    route_destinations = workq,long
+    enabled = True
+    started = True
+
+"""
+
+QSTAT_SERVER_TEXT = """Server: pbsserver
+    server_state = Active
+    server_host = pbsserver.cluster
+    scheduling = True
+    total_jobs = 3
+    state_count = Transit:0 Queued:1 Held:0 Waiting:0 Running:2 Exiting:0 Begun
+\t:0
+    default_queue = workq
+    log_events = 511
+    pbs_version = 2022.1.1
+
+"""
+
+QSTAT_JOB_TEXT = """Job Id: 1234.pbsserver
+    Job_Name = relax_Si
+    Job_Owner = me@login01.cluster
+    resources_used.cpupercent = 795
+    resources_used.cput = 02:39:12
+    resources_used.mem = 1570284kb
+    resources_used.ncpus = 8
+    resources_used.walltime = 00:20:03
+    job_state = R
+    queue = workq
+    server = pbsserver
+    Account_Name = proj01
+    exec_host = node01/0*8
+    exec_vnode = (node01:ncpus=8)
+    Output_Path = login01.cluster:/home/me/calcs/relax_Si/relax_Si.o1234
+    Resource_List.mem = 16gb
+    Resource_List.ncpus = 8
+    Resource_List.nodect = 1
+    Resource_List.place = free
+    Resource_List.select = 1:ncpus=8:mem=16gb
+    Resource_List.walltime = 01:00:00
+    stime = Mon Oct 16 10:40:01 2023
+    session_id = 20517
+    Variable_List = PBS_O_HOME=/home/me,PBS_O_LANG=en_US.UTF-8,PBS_O_LOGNAME=m
+\te,PBS_O_PATH=/usr/bin:/bin,PBS_O_SHELL=/bin/bash,PBS_O_WORKDIR=/home/me/
+\tcalcs/relax_Si,PBS_O_QUEUE=workq,PBS_O_HOST=login01.cluster
+    comment = Job run at Mon Oct 16 at 10:40 on (node01:ncpus=8)
+    etime = Mon Oct 16 10:40:00 2023
+    Submit_arguments = submit.script
+    project = _pbs_project_default
+
+"""
+
+# Outputs of Torque, without the JSON format
+TORQUE_PBSNODES = """node01
+     state = job-exclusive
+     power_state = Running
+     np = 16
+     properties = batch
+     ntype = cluster
+     jobs = 0-15/1234.torque
+     status = opsys=linux,uname=Linux node01 3.10.0 #1 SMP x86_64,sessions=4521,\
+nsessions=1,nusers=1,idletime=1504,totmem=70000000kb,availmem=60000000kb,\
+physmem=65879084kb,ncpus=16,loadave=16.00,gres=,netload=1204512,state=free,\
+varattr= ,cpuclock=Fixed,version=6.1.2,rectime=1697450000,jobs=1234.torque
+     mom_service_port = 15002
+     mom_manager_port = 15003
+     total_sockets = 2
+     total_cores = 16
+     total_threads = 16
+
+node02
+     state = free
+     power_state = Running
+     np = 16
+     properties = batch,gpu
+     ntype = cluster
+     jobs = 0/1235.torque,1/1235.torque,4-5/1236.torque
+     status = opsys=linux,physmem=131758168kb,ncpus=16,state=free
+     mom_service_port = 15002
+     mom_manager_port = 15003
+     gpus = 2
+
+node03
+     state = down
+     power_state = Running
+     np = 16
+     ntype = cluster
+     mom_service_port = 15002
+     mom_manager_port = 15003
+
+"""
+
+TORQUE_QUEUES = """Queue: batch
+    queue_type = Execution
+    total_jobs = 3
+    state_count = Transit:0 Queued:0 Held:0 Waiting:0 Running:3 Exiting:0 Complete:0
+    resources_max.walltime = 48:00:00
+    resources_default.walltime = 01:00:00
+    mtime = 1697000000
+    enabled = True
+    started = True
+
+"""
+
+TORQUE_SERVER = """Server: torque
+    server_state = Active
+    scheduling = True
+    max_running = 300
+    total_jobs = 3
+    acl_hosts = torque
+    default_queue = batch
+    pbs_version = 6.1.2
+
+"""
+
+
+def test_cluster_state_text(pbs_io):
+    stdout = PBSNODES_TEXT + QSTAT_QUEUES_TEXT + QSTAT_SERVER_TEXT
+    state = pbs_io.parse_cluster_state_output(0, stdout, "")
+    assert [p.name for p in state.partitions] == ["workq", "long"]
+    assert state.default_partition.name == "workq"
+    workq = state.get_partition("workq")
+    assert (workq.nodes_total, workq.cpus_total, workq.cpus_allocated) == (1, 32, 8)
+    assert workq.memory_per_node == 196608000
+    assert workq.time_limit == 86400
+    assert workq.available
+    long = state.get_partition("long")
+    assert (long.nodes_total, long.nodes_other, long.cpus_idle) == (2, 1, 24)
+    assert not long.available
+
+    # without the queues, the nodes are grouped by their queue attribute
+    state = pbs_io.parse_cluster_state_output(0, PBSNODES_TEXT, "")
+    assert [p.name for p in state.partitions] == [None]
+    assert state.partitions[0].cpus_total == 64
+
+    with pytest.raises(OutputParsingError):
+        pbs_io.parse_cluster_state_output(0, "pbsnodes: Server has no node list", "")
+
+
+def test_cluster_state_torque(pbs_io):
+    stdout = TORQUE_PBSNODES + TORQUE_QUEUES + TORQUE_SERVER
+    state = pbs_io.parse_cluster_state_output(0, stdout, "")
+    (batch,) = state.partitions
+    assert batch.name == "batch"
+    assert state.default_partition is batch
+    assert batch.time_limit == 172800
+    assert batch.nodes_total == 3
+    assert (batch.nodes_allocated, batch.nodes_idle, batch.nodes_other) == (2, 0, 1)
+    assert (batch.cpus_allocated, batch.cpus_idle, batch.cpus_other) == (20, 12, 16)
+    assert batch.gres == ["ngpus=2"]
+
+    with pytest.raises(OutputParsingError):
+        pbs_io.parse_cluster_state_output(
+            0, "node01\n     np = 4\n     jobs = x/1.torque\n", ""
+        )
+
+
+def test_cluster_state_fallback(tmp_path, monkeypatch):
+    # stand-in commands of Torque, failing with the JSON format
+    outputs = {
+        "pbsnodes": TORQUE_PBSNODES,
+        "qstat": TORQUE_QUEUES + TORQUE_SERVER,
+    }
+    for name, output in outputs.items():
+        (tmp_path / f"{name}.out").write_text(output)
+        exe = tmp_path / name
+        exe.write_text(
+            "#!/bin/sh\n"
+            'case "$*" in *"-F json"*) echo "invalid option -- F" >&2; exit 2;; esac\n'
+            'case "$*" in *-B*) exit 0;; esac\n'
+            f"cat {tmp_path / name}.out\n"
+        )
+        exe.chmod(exe.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    state = QueueManager(PBSIO()).get_cluster_state()
+    assert [p.name for p in state.partitions] == ["batch"]
+    assert state.partitions[0].cpus_total == 48
+
+
+def test_parse_qstat_text(pbs_io):
+    (job,) = pbs_io.parse_jobs_list_output(0, QSTAT_JOB_TEXT, "")
+    assert job.job_id == "1234.pbsserver"
+    assert job.name == "relax_Si"
+    assert job.state == QState.RUNNING
+    assert job.username == "me@login01.cluster"
+    assert job.account == "proj01"
+    assert job.runtime == 1203
+    assert job.info.cpus == 8
+    assert job.info.nodes == 1
+    assert job.info.time_limit == 3600
+    assert job.info.partition == "workq"
@@ -9,6 +9,7 @@ from qtoolkit.core.data_objects import (
     CancelResult,
     CancelStatus,
     QJob,
+    QJobFilter,
     QResources,
     QState,
     SubmissionResult,
@@ -155,6 +156,23 @@ class TestShellIO:
                 jobs=[QJob(job_id=125), 126, "127"], user="johndoe"
             )
 
+    def test_get_jobs_list_cmd_filters(self, shell_io):
+        filters = QJobFilter(names=["bash", "sleep"], states=QState.RUNNING)
+        cmd = shell_io.get_jobs_list_cmd(jobs=None, user=None, filters=filters)
+        assert cmd == "ps -o pid,user,etime,state,comm -C bash,sleep"
+        assert shell_io.get_residual_filter(filters) == QJobFilter(
+            states=[QState.RUNNING]
+        )
+        # -C cannot be combined with the other selections
+        cmd = shell_io.get_jobs_list_cmd(jobs=None, user="me", filters=filters)
+        assert cmd == "ps -o pid,user,etime,state,comm -U me"
+        assert shell_io.get_residual_filter(filters, user="me") == filters
+        # the qos is evaluated on the parsed jobs
+        filters = QJobFilter(names=["bash"], qos="normal")
+        cmd = shell_io.get_jobs_list_cmd(jobs=None, user=None, filters=filters)
+        assert cmd == "ps -o pid,user,etime,state,comm -C bash"
+        assert shell_io.get_residual_filter(filters) == QJobFilter(qos="normal")
+
     def test_parse_jobs_list_output(self, shell_io):
         joblist = shell_io.parse_jobs_list_output(
             exit_code=0,
@@ -164,6 +182,7 @@ class TestShellIO:
         assert joblist == [
             QJob(
                 job_id="18092",
+                username="davidwa+",
                 runtime=292,
                 name="bash",
                 state=QState.RUNNING,
@@ -171,6 +190,7 @@ class TestShellIO:
             ),
             QJob(
                 job_id="18112",
+                username="davidwa+",
                 runtime=72,
                 name="bash",
                 state=QState.RUNNING,
@@ -4,8 +4,19 @@ from pathlib import Path
 import pytest
 from monty.serialization import loadfn
 
-from qtoolkit.core.data_objects import ProcessPlacement, QResources, QState
-from qtoolkit.core.exceptions import OutputParsingError, UnsupportedResourcesError
+from qtoolkit.core.data_objects import (
+    ProcessPlacement,
+    QJob,
+    QJobFilter,
+    QResources,
+    QState,
+)
+from qtoolkit.core.exceptions import (
+    CommandFailedError,
+    OutputParsingError,
+    UnsupportedResourcesError,
+)
+from qtoolkit.hostlist import HostList
 from qtoolkit.io.slurm import SlurmIO, SlurmState
 
 TEST_DIR = Path(__file__).resolve().parents[1] / "test_data"
@@ -116,23 +127,295 @@ class TestSlurmIO:
             "SLURM_TIME_FORMAT='standard' "
             "squeue --noheader -o '%i<><> %t<><> %r<><> "
             "%j<><> %u<><> %P<><> %l<><> %D<><> %C<><> "
-            "%M<><> %m' -u johndoe"
+            "%M<><> %m<><> %q' -u johndoe"
         )
         cmd = slurm_io._get_jobs_list_cmd(job_ids=["1", "3", "56", "15"])
         assert cmd == (
             "SLURM_TIME_FORMAT='standard' "
             "squeue --noheader -o '%i<><> %t<><> %r<><> "
             "%j<><> %u<><> %P<><> %l<><> %D<><> %C<><> "
-            "%M<><> %m' --jobs=1,3,56,15"
+            "%M<><> %m<><> %q' --jobs=1,3,56,15"
         )
         cmd = slurm_io._get_jobs_list_cmd(job_ids=["1"])
         assert cmd == (
             "SLURM_TIME_FORMAT='standard' "
             "squeue --noheader -o '%i<><> %t<><> %r<><> "
             "%j<><> %u<><> %P<><> %l<><> %D<><> %C<><> "
-            "%M<><> %m' --jobs=1,1"
+            "%M<><> %m<><> %q' --jobs=1,1"
         )
 
+    def test_get_jobs_list_cmd_filters(self, slurm_io):
+        filters = QJobFilter(
+            states=[QState.QUEUED], partitions=["a", "b"], names="x", qos="high"
+        )
+        cmd = slurm_io.get_jobs_list_cmd(None, "me", filters)
+        assert cmd.endswith("-u me -t CONFIGURING,PENDING -p a,b -n x -q high")
+        assert slurm_io.get_residual_filter(filters) is None
+
+        # names with wildcards are filtered on the parsed jobs
+        filters = QJobFilter(names=["sweep-*", "x"], accounts=["acc"])
+        cmd = slurm_io.get_jobs_list_cmd(None, None, filters)
+        assert cmd.endswith("-A acc")
+        assert slurm_io.get_residual_filter(filters) == QJobFilter(
+            names=["sweep-*", "x"]
+        )
+        jobs = [QJob(name="sweep-1"), QJob(name="x"), QJob(name="y")]
+        assert slurm_io.filter_jobs_list(jobs, filters=filters) == jobs[:2]
+
+    def test_tokenize_scontrol(self, slurm_io):
+        line = (
+            "JobId=1 JobName=my job UserId=me(1001) Reason=None "
+            "TRES=cpu=1,mem=4G,node=1 CPUs/Task=2 ReqB:S:C:T=0:0:*:* "
+            "Command=/home/me/run dir/submit.script --opt a Power="
+        )
+        data = slurm_io._tokenize_scontrol(line)
+        assert data["JobName"] == "my job"
+        assert data["TRES"] == "cpu=1,mem=4G,node=1"
+        assert data["CPUs/Task"] == "2"
+        assert data["ReqB:S:C:T"] == "0:0:*:*"
+        assert data["Command"] == "/home/me/run dir/submit.script --opt a"
+        assert data["Power"] == ""
+
+    def test_jobs_details(self, slurm_io):
+        assert slurm_io.get_jobs_details_cmd(None) == (
+            "SLURM_TIME_FORMAT='standard' scontrol show job -o"
+        )
+        assert slurm_io.get_jobs_details_cmd([1]).endswith("scontrol show job -o 1")
+        assert slurm_io.get_jobs_details_cmd([1, 2]).endswith("scontrol show job -o")
+
+        stdout = (
+            "JobId=1 JobName=a b UserId=me(1001) JobState=RUNNING Partition=main "
+            "TimeLimit=01:00:00 NumNodes=2 NumCPUs=8 CPUs/Task=4 MinMemoryCPU=2G\n"
+            "JobId=2 JobName=c UserId=you(1002) JobState=PENDING Partition=gpu "
+            "TimeLimit=UNLIMITED NumNodes=1 NumCPUs=1 CPUs/Task=1\n"
+        )
+        jobs = slurm_io.parse_jobs_details_output(0, stdout, "")
+        assert [j.job_id for j in jobs] == ["1", "2"]
+        assert jobs[0].name == "a b"
+        assert jobs[0].state == QState.RUNNING
+        assert jobs[0].username == "me"
+        assert jobs[0].info.nodes == 2
+        assert jobs[0].info.cpus == 8
+        assert jobs[0].info.threads_per_process == 4
+        assert jobs[0].info.memory_per_cpu == 2 * 1024**2
+        assert jobs[0].info.time_limit == 3600
+        assert jobs[1].info.time_limit is None
+        assert jobs[1].info.memory_per_cpu is None
+        assert jobs[1].queue_name == "gpu"
+
+        assert (
+            slurm_io.parse_jobs_details_output(0, "No jobs in the system\n", "") == []
+        )
+        stderr = "slurm_load_jobs error: Invalid job id specified"
+        assert slurm_io.parse_jobs_details_output(1, "", stderr) == []
+        with pytest.raises(CommandFailedError):
+            slurm_io.parse_jobs_details_output(1, "", "Socket timed out")
+        with pytest.raises(OutputParsingError):
+            slurm_io.parse_jobs_details_output(0, "JobId=1 JobState=XX", "")
+
+    def test_jobs_accounting(self, slurm_io):
+        cmd = slurm_io.get_jobs_accounting_cmd(["1", "2"])
+        assert cmd.startswith("SLURM_TIME_FORMAT='standard' sacct -X -n -P -o JobID,")
+        assert cmd.endswith(" -j 1,2")
+        with pytest.raises(ValueError):
+            slurm_io.get_jobs_accounting_cmd([])
+
+        stdout = (
+            "1|run|COMPLETED|0:0|me|proj|main|normal|01:00:00|00:10:00|1|4\n"
+            "2|other|CANCELLED by 1000|0:15|me||gpu||Partition_Limit|00:00:00|2|8\n"
+            "3|failed|FAILED|2:0|me|proj|main|high|UNLIMITED|1-00:00:00|1|1\n"
+        )
+        jobs = slurm_io.parse_jobs_accounting_output(0, stdout, "")
+        assert [j.job_id for j in jobs] == ["1", "2", "3"]
+        assert jobs[0].state == QState.DONE
+        assert jobs[0].exit_status == 0
+        assert jobs[0].runtime == 600
+        assert jobs[0].info.time_limit == 3600
+        assert jobs[0].info.cpus == 4
+        assert jobs[0].qos == "normal"
+        assert jobs[1].sub_state == SlurmState.CANCELLED
+        assert jobs[1].account is None
+        assert jobs[1].info.time_limit is None
+        assert jobs[1].qos is None
+        assert jobs[2].state == QState.FAILED
+        assert jobs[2].exit_status == 2
+        assert jobs[2].runtime == 86400
+
+        with pytest.raises(OutputParsingError):
+            slurm_io.parse_jobs_accounting_output(0, "1|run|COMPLETED", "")
+        with pytest.raises(CommandFailedError):
+            slurm_io.parse_jobs_accounting_output(1, "", "slurmdbd: error")
+
+        sacct_io = SlurmIO(get_job_executable="sacct")
+        assert sacct_io.get_job_cmd("3").endswith(" -j 3")
+        job = sacct_io.parse_job_output(0, stdout.splitlines()[2], "")
+        assert job.job_id == "3"
+
+    def test_jobs_usage(self, slurm_io):
+        cmd = slurm_io.get_jobs_usage_cmd(["1", "2"])
+        assert " -X " not in cmd
+        assert "-o JobID,State,ExitCode,Elapsed,TotalCPU,MaxRSS,NodeList -j 1,2" in cmd
+
+        stdout = (
+            "1|COMPLETED|0:0|00:10:00|38:12.600||nid[001-002]\n"
+            "1.batch|COMPLETED|0:0|00:10:00|00:12.100|1.50G|nid001\n"
+            "1.0|COMPLETED|0:0|00:09:00|38:00.400|2048K|nid[001-002]\n"
+            "2|RUNNING|0:0|00:01:00|00:00:00||nid003\n"
+            "3|PENDING|0:0|00:00:00|00:00:00||None assigned\n"
+        )
+        jobs = slurm_io.parse_jobs_usage_output(0, stdout, "")
+        assert [j.job_id for j in jobs] == ["1", "2", "3"]
+        assert jobs[0].exit_status == 0
+        assert jobs[0].info.elapsed == 600
+        assert jobs[0].info.total_cpu == 2293
+        assert jobs[0].info.max_rss == int(1.5 * 1024**2)
+        assert jobs[0].info.node_list == "nid[001-002]"
+        assert jobs[1].state == QState.RUNNING
+        assert jobs[1].info.max_rss is None
+        assert jobs[2].info.node_list is None
+
+        assert (
+            slurm_io.get_live_usage_cmd(["2"]) == "sstat -a -n -P -o JobID,MaxRSS -j 2"
+        )
+        usage = slurm_io.parse_live_usage_output(
+            0, "2.batch|1024K\n2.0|10M\n2.extern|0\n", ""
+        )
+        assert usage == {"2": {"max_rss": 10 * 1024}}
+        with pytest.raises(CommandFailedError):
+            slurm_io.parse_live_usage_output(1, "", "sstat: error")
+
+    def test_convert_usage(self, slurm_io):
+        assert slurm_io._convert_usage_time("01:02.600") == 63
+        assert slurm_io._convert_usage_time("1-00:00:01") == 86401
+        assert slurm_io._convert_usage_time("") is None
+        assert slurm_io._convert_rss("2048") == 2
+        assert slurm_io._convert_rss("3K") == 3
+        assert slurm_io._convert_rss("1T") == 1024**3
+        assert slurm_io._convert_rss("") is None
+
+    def test_cluster_state(self, slurm_io):
+        assert slurm_io.get_cluster_state_cmd() == "sinfo -h -o '%P|%a|%l|%F|%C|%m|%G'"
+        stdout = (
+            "main*|up|1-00:00:00|10/2/1/13|400/112/32/544|192000|(null)\n"
+            "main*|up|1-00:00:00|0/4/0/4|0/128/0/128|96000+|(null)\n"
+            "gpu|up|12:00:00|2/1/0/3|64/32/0/96|384000|gpu:a100:4(S:0,1),mps:400\n"
+            "gpu|up|12:00:00|1/0/0/1|32/0/0/32|384000|gpu:v100:2\n"
+            "debug|down|infinite|0/0/2/2|0/0/64/64|192000|(null)\n"
+        )
+        state = slurm_io.parse_cluster_state_output(0, stdout, "")
+        assert [p.name for p in state.partitions] == ["main", "gpu", "debug"]
+        main = state.get_partition("main")
+        assert state.default_partition is main
+        assert main.available
+        assert main.time_limit == 86400
+        assert (main.nodes_allocated, main.nodes_idle, main.nodes_other) == (10, 6, 1)
+        assert main.nodes_total == 17
+        assert (main.cpus_allocated, main.cpus_idle, main.cpus_other) == (400, 240, 32)
+        assert main.cpus_total == 672
+        assert main.memory_per_node == 96000 * 1024
+        assert main.gres is None
+        gpu = state.get_partition("gpu")
+        assert not gpu.default
+        assert gpu.gres == ["gpu:a100:4(S:0,1)", "mps:400", "gpu:v100:2"]
+        assert gpu.cpus_idle == 32
+        debug = state.get_partition("debug")
+        assert not debug.available
+        assert debug.time_limit is None
+        assert state.get_partition("other") is None
+
+        with pytest.raises(CommandFailedError):
+            slurm_io.parse_cluster_state_output(1, "", "sinfo: error")
+        with pytest.raises(OutputParsingError, match="Wrong number of fields"):
+            slurm_io.parse_cluster_state_output(0, "main|up\n", "")
+        with pytest.raises(OutputParsingError, match="partition main"):
+            slurm_io.parse_cluster_state_output(0, "main|up|1:00|1/2|1/2|1|\n", "")
+
+    def test_pending_jobs(self, slurm_io):
+        stdout = "1|main|4|UNLIMITED|1700000000\n2|main,gpu||1:00:00|N/A\n"
+        jobs = slurm_io.parse_pending_jobs_output(0, stdout, "")
+        assert jobs[0].time_limit is None
+        assert jobs[0].start_time == 1700000000
+        assert jobs[1].partitions == ["main", "gpu"]
+        assert jobs[1].cpus is None
+        with pytest.raises(CommandFailedError):
+            slurm_io.parse_pending_jobs_output(1, "", "squeue: error")
+        with pytest.raises(OutputParsingError, match="Wrong number of fields"):
+            slurm_io.parse_pending_jobs_output(0, "1|main\n", "")
+
+    def test_jobs_list_projection(self):
+        slurm_io = SlurmIO()
+        fields = slurm_io.get_projection(["state", "time_limit"])
+        assert fields == ["job_id", "state", "time_limit"]
+        cmd = slurm_io.get_jobs_list_cmd(["1", "2"], None, fields=fields)
+        assert "-o '%i<><> %t<><> %l'" in cmd
+
+        stdout = "1<><> R<><> 1:00:00\n2<><> PD<><> UNLIMITED\n"
+        jobs = slurm_io.parse_jobs_list_output(0, stdout, "", fields=fields)
+        assert [j.job_id for j in jobs] == ["1", "2"]
+        assert jobs[0].state == QState.RUNNING
+        assert jobs[0].sub_state == SlurmState.RUNNING
+        assert jobs[0].info.time_limit == 3600
+        assert jobs[1].state == QState.QUEUED
+        assert jobs[1].info.time_limit is None
+        assert jobs[0].name is None
+
+        # only the job id
+        jobs = slurm_io.parse_jobs_list_output(0, "1\n2\n", "", fields=["job_id"])
+        assert [j.job_id for j in jobs] == ["1", "2"]
+
+        # fields needed by the filters are added
+        filters = QJobFilter(names="sweep-*")
+        assert slurm_io.get_projection(["state"], filters) == [
+            "job_id",
+            "state",
+            "name",
+        ]
+
+        with pytest.raises(ValueError, match="Unknown fields: foo"):
+            slurm_io.get_projection(["foo"])
+        with pytest.raises(OutputParsingError):
+            slurm_io.parse_jobs_list_output(0, "1<><> XX", "", fields=fields[:2])
+
+    def test_node_lists(self, slurm_io):
+        fields = slurm_io.get_projection(["node_list"])
+        assert "-o '%i<><> %N'" in slurm_io.get_jobs_list_cmd(None, "me", fields=fields)
+        stdout = "1<><> nid[0001-0004,0010]\n2<><> \n"
+        jobs = slurm_io.parse_jobs_list_output(0, stdout, "", fields=fields)
+        assert jobs[0].info.node_list == "nid[0001-0004,0010]"
+        assert len(jobs[0].info.hostlist) == 5
+        assert jobs[1].info.node_list is None
+
+        stdout = "JobId=1 JobState=PENDING NodeList=(null)\n"
+        assert (
+            slurm_io.parse_jobs_details_output(0, stdout, "")[0].info.hostlist is None
+        )
+
+        # lists of nodes are compressed in the header
+        header = slurm_io.generate_header(
+            {"exclude_nodes": ["nid0003", "nid0001", "nid0002"], "nodelist": "n1"}
+        )
+        assert "--exclude=nid[0001-0003]" in header
+        assert "--nodelist=n1" in header
+        res = QResources(
+            processes=2,
+            scheduler_kwargs={"exclude_nodes": HostList("nid[0001-0010]") - "nid0005"},
+        )
+        header_dict = slurm_io.check_convert_qresources(res)
+        assert header_dict["exclude_nodes"] == "nid[0001-0004,0006-0010]"
+
+    def test_register_job_field(self):
+        slurm_io = SlurmIO()
+        slurm_io.register_job_field("start", "%S")
+        assert "start" not in SlurmIO.job_fields
+        fields = slurm_io.get_projection(["start"])
+        cmd = slurm_io.get_jobs_list_cmd(None, "me", fields=fields)
+        assert "-o '%i<><> %S'" in cmd
+        jobs = slurm_io.parse_jobs_list_output(
+            0, "1<><> 2024-01-01T10:00:00\n2<><> N/A\n", "", fields=fields
+        )
+        assert jobs[0].other_properties == {"start": "2024-01-01T10:00:00"}
+        assert jobs[1].other_properties == {"start": "N/A"}
+
     def test_convert_str_to_time(self, slurm_io):
         time_seconds = slurm_io._convert_str_to_time(None)
         assert time_seconds is None
@@ -0,0 +1,264 @@
+import json
+
+import pytest
+
+from qtoolkit.core.data_objects import (
+    CancelStatus,
+    QJobFilter,
+    QResources,
+    QState,
+    SubmissionStatus,
+)
+from qtoolkit.core.exceptions import (
+    CommandFailedError,
+    OutputParsingError,
+    UnsupportedResourcesError,
+)
+from qtoolkit.io.slurm import SlurmIO, SlurmState
+from qtoolkit.io.slurmrest import SlurmRestIO
+
+
+@pytest.fixture
+def slurm_rest_io():
+    return SlurmRestIO(api_version="v0.0.40")
+
+
+def test_submission_script(slurm_rest_io):
+    resources = QResources(
+        queue_name="debug",
+        time_limit=90,
+        nodes=2,
+        processes_per_node=8,
+        gpus_per_job=1,
+        memory_per_thread=1000,
+        scheduler_kwargs={"constraint": "gpu"},
+    )
+    payload = json.loads(
+        slurm_rest_io.get_submission_script(["echo 1"], resources, marker_dir="/m")
+    )
+    assert payload["script"].startswith("#!/bin/bash\n_qtk_marker_dir=/m")
+    assert "#SBATCH" not in payload["script"]
+    assert payload["job"] == {
+        "environment": ["PATH=/bin:/usr/bin:/usr/local/bin"],
+        "partition": "debug",
+        "memory_per_cpu": 1000,
+        "time_limit": 2,
+        "tasks_per_node": 8,
+        "minimum_nodes": 2,
+        "maximum_nodes": 2,
+        "tres_per_job": "gres/gpu:1",
+        "constraint": "gpu",
+    }
+
+    # dict with the keys of the SlurmIO header
+    job = slurm_rest_io.generate_job_description({"job_name": "a", "time": "1:00:00"})
+    assert job == {"name": "a", "time_limit": 60}
+
+    job = slurm_rest_io.generate_job_description(
+        {"exclude_nodes": "nid[01-02]", "nodelist": ["n2", "n1"]}
+    )
+    assert job == {"excluded_nodes": ["nid01", "nid02"], "required_nodes": ["n1", "n2"]}
+
+
+def test_commands(slurm_rest_io):
+    cmd = json.loads(slurm_rest_io.get_submit_cmd("/path/submit.script"))
+    assert cmd == {
+        "method": "POST",
+        "path": "/slurm/v0.0.40/job/submit",
+        "body_file": "/path/submit.script",
+    }
+    cmd = json.loads(slurm_rest_io.get_cancel_cmd(12))
+    assert cmd == {"method": "DELETE", "path": "/slurm/v0.0.40/job/12"}
+    with pytest.raises(ValueError):
+        slurm_rest_io.get_cancel_cmd("")
+    cmd = json.loads(slurm_rest_io.get_job_cmd(12))
+    assert cmd["path"] == "/slurm/v0.0.40/job/12"
+    with pytest.raises(ValueError):
+        slurm_rest_io.get_jobs_list_cmd(jobs=[1], user="me")
+    cmd = json.loads(slurm_rest_io.get_jobs_list_cmd(jobs=[1, "2"], user=None))
+    assert cmd == {"method": "GET", "path": "/slurm/v0.0.40/job/1,2"}
+    cmd = json.loads(slurm_rest_io.get_jobs_list_cmd(jobs=None, user="me"))
+    assert cmd == {"method": "GET", "path": "/slurm/v0.0.40/jobs"}
+    with pytest.raises(NotImplementedError, match="state of the cluster"):
+        slurm_rest_io.get_cluster_state_cmd()
+
+
+def test_parse_outputs(slurm_rest_io):
+    result = slurm_rest_io.parse_submit_output(0, '{"job_id": 5, "errors": []}', "")
+    assert result.status == SubmissionStatus.SUCCESSFUL
+    assert result.job_id == "5"
+    result = slurm_rest_io.parse_submit_output(
+        0, '{"errors": [{"error": "bad partition"}]}', ""
+    )
+    assert result.status == SubmissionStatus.FAILED
+    assert result.stderr == "bad partition"
+    with pytest.raises(OutputParsingError):
+        slurm_rest_io.parse_submit_output(0, "not json", "")
+
+    stdout = json.dumps(
+        {
+            "jobs": [
+                {
+                    "job_id": 5,
+                    "job_state": ["PENDING"],
+                    "time_limit": {"set": False, "infinite": True, "number": 0},
+                    "node_count": {"set": True, "infinite": False, "number": 2},
+                    "qos": "normal",
+                }
+            ]
+        }
+    )
+    (job,) = slurm_rest_io.parse_jobs_list_output(0, stdout, "")
+    assert job.state == QState.QUEUED
+    assert job.info.time_limit is None
+    assert job.info.nodes == 2
+    assert job.runtime is None
+    assert slurm_rest_io.filter_jobs_list([job], filters=QJobFilter(qos="normal"))
+    assert not slurm_rest_io.filter_jobs_list([job], filters=QJobFilter(qos="high"))
+
+    with pytest.raises(OutputParsingError):
+        slurm_rest_io.parse_jobs_list_output(
+            0, '{"jobs": [{"job_id": 1, "job_state": "XX"}]}', ""
+        )
+    with pytest.raises(CommandFailedError):
+        slurm_rest_io.parse_jobs_list_output(1, "", "HTTP 500")
+    assert slurm_rest_io.parse_job_output(0, '{"jobs": []}', "") is None
+
+
+def test_base_class(slurm_rest_io):
+    assert not isinstance(slurm_rest_io, SlurmIO)
+    assert slurm_rest_io.job_id_expression == "$SLURM_JOB_ID"
+    with pytest.raises(UnsupportedResourcesError):
+        slurm_rest_io.generate_job_description(QResources(processes=2, nodes=3))
+    # the details are the ones of the list of the jobs
+    cmd = json.loads(slurm_rest_io.get_jobs_details_cmd([3]))
+    assert cmd == {"method": "GET", "path": "/slurm/v0.0.40/job/3"}
+    with pytest.raises(NotImplementedError):
+        slurm_rest_io.get_jobs_accounting_cmd([3])
+    with pytest.raises(NotImplementedError):
+        slurm_rest_io.get_pending_jobs_cmd()
+
+
+def test_parse_jobs_list_output(slurm_rest_io):
+    stdout = json.dumps(
+        {
+            "jobs": [
+                {
+                    "job_id": 10,
+                    "name": "relax",
+                    "job_state": "RUNNING",
+                    "user_name": "me",
+                    "account": "proj",
+                    "partition": "debug",
+                    "qos": "high",
+                    "node_count": 2,
+                    "cpus": 16,
+                    "cpus_per_task": 2,
+                    "memory_per_cpu": 1000,
+                    "time_limit": 30,
+                    "nodes": "nid[001-002]",
+                    "start_time": 1,
+                },
+                {
+                    "job_id": 11,
+                    "name": "static",
+                    "job_state": ["COMPLETED"],
+                    "user_name": "other",
+                    "partition": "main",
+                    "memory_per_cpu": {"set": False, "infinite": False, "number": 0},
+                    "nodes": "",
+                },
+            ],
+            "errors": [],
+        }
+    )
+    jobs = slurm_rest_io.parse_jobs_list_output(0, stdout.encode(), b"")
+    assert [j.job_id for j in jobs] == ["10", "11"]
+    job = jobs[0]
+    assert job.name == "relax"
+    assert job.state == QState.RUNNING
+    assert job.sub_state == SlurmState.RUNNING
+    assert job.username == "me"
+    assert job.account == "proj"
+    assert job.queue_name == "debug"
+    assert job.qos == "high"
+    assert job.runtime > 0
+    assert job.info.nodes == 2
+    assert job.info.cpus == 16
+    assert job.info.threads_per_process == 2
+    assert job.info.memory_per_cpu == 1024000
+    assert job.info.time_limit == 1800
+    assert job.info.partition == "debug"
+    assert list(job.info.hostlist) == ["nid001", "nid002"]
+    assert jobs[1].state == QState.DONE
+    assert jobs[1].info.memory_per_cpu is None
+    assert jobs[1].info.node_list is None
+
+    assert slurm_rest_io.filter_jobs_list(jobs, job_ids=["11"]) == [jobs[1]]
+    assert slurm_rest_io.filter_jobs_list(jobs, user="me") == [jobs[0]]
+    filters = QJobFilter(partitions=["main"])
+    assert slurm_rest_io.filter_jobs_list(jobs, filters=filters) == [jobs[1]]
+
+    # error payload of a failed request
+    stdout = json.dumps({"jobs": [], "errors": [{"error": "Invalid user"}]})
+    with pytest.raises(CommandFailedError, match="Invalid user"):
+        slurm_rest_io.parse_jobs_list_output(1, stdout, "HTTP 400")
+    with pytest.raises(OutputParsingError):
+        slurm_rest_io.parse_jobs_list_output(0, "<html>", "")
+
+
+def test_parse_job_output(slurm_rest_io):
+    stdout = json.dumps(
+        {"jobs": [{"job_id": 7, "job_state": "PENDING", "partition": "debug"}]}
+    )
+    (job,) = slurm_rest_io.parse_jobs_details_output(0, stdout, "")
+    assert job.job_id == "7"
+    job = slurm_rest_io.parse_job_output(0, stdout, "")
+    assert job.job_id == "7"
+    assert job.state == QState.QUEUED
+    assert job.info.partition == "debug"
+
+    stdout = json.dumps({"errors": [{"error": "Invalid job id specified"}]})
+    with pytest.raises(CommandFailedError, match="Invalid job id specified"):
+        slurm_rest_io.parse_job_output(1, stdout, "HTTP 500")
+
+
+def test_parse_submit_output(slurm_rest_io):
+    result = slurm_rest_io.parse_submit_output(
+        0, b'{"job_id": 42, "step_id": "batch", "errors": []}', b""
+    )
+    assert result.status == SubmissionStatus.SUCCESSFUL
+    assert result.job_id == "42"
+    result = slurm_rest_io.parse_submit_output(0, '{"errors": []}', "")
+    assert result.status == SubmissionStatus.JOB_ID_UNKNOWN
+
+    stdout = json.dumps(
+        {
+            "errors": [
+                {"error": "Invalid account", "error_number": 2045},
+                {"description": "Batch job submission failed"},
+            ]
+        }
+    )
+    result = slurm_rest_io.parse_submit_output(1, stdout, "")
+    assert result.status == SubmissionStatus.FAILED
+    assert result.stderr == "Invalid account; Batch job submission failed"
+    result = slurm_rest_io.parse_submit_output(1, "", "connection refused")
+    assert result.status == SubmissionStatus.FAILED
+    assert result.stderr == "connection refused"
+
+
+def test_parse_cancel_output(slurm_rest_io):
+    result = slurm_rest_io.parse_cancel_output(0, '{"errors": []}', "")
+    assert result.status == CancelStatus.SUCCESSFUL
+    result = slurm_rest_io.parse_cancel_output(0, "", "")
+    assert result.status == CancelStatus.SUCCESSFUL
+
+    stdout = json.dumps({"errors": [{"error": "Job has already finished"}]})
+    result = slurm_rest_io.parse_cancel_output(0, stdout, "")
+    assert result.status == CancelStatus.FAILED
+    assert result.stderr == "Job has already finished"
+    # the body of the error responses is not always JSON
+    result = slurm_rest_io.parse_cancel_output(1, "<html>", "HTTP 404")
+    assert result.status == CancelStatus.FAILED
+    assert result.stderr == "HTTP 404"
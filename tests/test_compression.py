@@ -0,0 +1,99 @@
+import importlib.util
+import stat
+
+import pytest
+
+from qtoolkit.compression import COMPRESSED_HEADER, OutputCompression
+from qtoolkit.core.exceptions import OutputParsingError
+from qtoolkit.host.local import LocalHost
+from qtoolkit.host.mock import MockHost
+from qtoolkit.host.rest import RestConfig, RestHost
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.io.slurmrest import SlurmRestIO
+from qtoolkit.manager import QueueManager
+from tests.benchmarks.generators import generate_squeue_output
+
+HAS_ZSTANDARD = importlib.util.find_spec("zstandard") is not None
+
+
+@pytest.fixture
+def compression():
+    return OutputCompression(["gzip"])
+
+
+def test_wrap_command(compression):
+    host = LocalHost()
+    command = "printf 'a\\nb'; echo err >&2; exit 3"
+    stdout, stderr, exit_code = host.execute(compression.wrap_command(command))
+    assert stdout.startswith(f"{COMPRESSED_HEADER} gzip\n")
+    assert exit_code == 0
+    assert compression.unwrap_output(stdout, stderr, exit_code) == ("a\nb", "err\n", 3)
+
+    output = "".join(f"line {i}\n" for i in range(100000))
+    stdout, stderr, exit_code = host.execute(
+        compression.wrap_command("seq 0 99999 | sed 's/^/line /'")
+    )
+    assert len(stdout) < len(output) / 3
+    assert compression.unwrap_output(stdout, stderr, exit_code) == (output, "", 0)
+
+
+def test_fallback(compression):
+    host = LocalHost()
+    # no compressor available on the host
+    wrapped = compression.wrap_command("printf 'a\\n'; exit 2")
+    stdout, stderr, exit_code = host.execute(f"PATH=/nonexistent; {wrapped}")
+    assert compression.unwrap_output(stdout, stderr, exit_code) == ("a\n", "", 2)
+
+    # zstd needs the zstandard package to decompress the outputs
+    expected = ["zstd", "gzip"] if HAS_ZSTANDARD else ["gzip"]
+    assert OutputCompression().compressors == expected
+    if not HAS_ZSTANDARD:
+        assert OutputCompression(["zstd"]).wrap_command("ls") == "ls"
+
+    with pytest.raises(ValueError, match="Unsupported compressors: xz"):
+        OutputCompression(["xz"])
+
+
+def test_invalid_output(compression):
+    with pytest.raises(OutputParsingError, match="Could not decompress"):
+        compression.unwrap_output(f"{COMPRESSED_HEADER} gzip\nnot gzip\n", "", 0)
+    with pytest.raises(OutputParsingError, match="Cannot decompress"):
+        compression.unwrap_output(f"{COMPRESSED_HEADER} xz\nAAAA\n", "", 0)
+
+
+def test_manager(compression, tmp_path, monkeypatch):
+    squeue_output = tmp_path / "squeue.out"
+    squeue_output.write_text(generate_squeue_output(200))
+    squeue = tmp_path / "squeue"
+    squeue.write_text(f"#!/bin/sh\ncat {squeue_output}\n")
+    squeue.chmod(squeue.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}:/usr/bin:/bin")
+
+    plain = QueueManager(SlurmIO(), LocalHost())
+    compressed = QueueManager(SlurmIO(), LocalHost(), output_compression=compression)
+    jobs = compressed.get_jobs_list(user="me")
+    assert len(jobs) == 200
+    assert jobs == plain.get_jobs_list(user="me")
+
+    # not applied to the hosts not executing shell commands
+    rest_host = RestHost(RestConfig(root_dir="/", url="http://localhost"))
+    requests = []
+
+    def request(method, path, payload, timeout, description):
+        requests.append(description)
+        return '{"jobs": []}', "", 0
+
+    monkeypatch.setattr(rest_host, "_request", request)
+    rest_manager = QueueManager(
+        SlurmRestIO(api_version="v0.0.40"),
+        rest_host,
+        output_compression=compression,
+    )
+    assert rest_manager.get_jobs_list(user="me") == []
+    assert requests == ["GET /slurm/v0.0.40/jobs"]
+
+    mock_host = MockHost()
+    mock_host.add_response("squeue", stdout="", regex=True)
+    mock_manager = QueueManager(SlurmIO(), mock_host, output_compression=compression)
+    assert mock_manager.get_jobs_list(user="me") == []
+    assert mock_host.calls[-1].command.startswith("SLURM_TIME_FORMAT")
@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+from qtoolkit.core.data_objects import QJob, QJobFilter, QResources, QState
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.federation import FederatedQueueManager, split_job_id
+from qtoolkit.host.mock import MockHost, RealClock
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.manager import QueueManager
+from qtoolkit.simulator import SimulatorConfig, SimulatorStore, simulator_handler
+
+
+def _sinfo(allocated, idle, partition="main"):
+    cpus = f"{allocated}/{idle}/0/{allocated + idle}"
+    return f"{partition}*|up|1-00:00:00|1/1/0/2|{cpus}|192000|(null)\n"
+
+
+def _cluster(tmp_path, name, sinfo, squeue_start="", clock=None):
+    host = MockHost(clock=clock)
+    host.add_response("sinfo", stdout=sinfo, regex=True)
+    host.add_response("squeue --start", stdout=squeue_start, regex=True)
+    store = SimulatorStore(tmp_path / name, clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+    return QueueManager(SlurmIO(), host=host)
+
+
+@pytest.fixture
+def federation(tmp_path):
+    managers = {
+        # full, with a queue of 64 CPUs: load 1.5
+        "alpha": _cluster(
+            tmp_path, "alpha", _sinfo(128, 0), "1|main|64|01:00:00|N/A\n"
+        ),
+        # half full: load 0.5
+        "beta": _cluster(tmp_path, "beta", _sinfo(64, 64)),
+        # 3/4 full: load 0.75
+        "gamma": _cluster(tmp_path, "gamma", _sinfo(96, 32)),
+    }
+    with FederatedQueueManager(managers) as federation:
+        yield federation
+
+
+def test_job_ids():
+    assert split_job_id("alpha:12.server") == ("alpha", "12.server")
+    assert split_job_id(QJob(job_id="beta:3:1")) == ("beta", "3:1")
+    for job_id in ("12", ":12", "alpha:"):
+        with pytest.raises(ValueError, match="not a cluster-qualified job id"):
+            split_job_id(job_id)
+
+    manager = QueueManager(SlurmIO())
+    with pytest.raises(ValueError, match="Invalid cluster names: a:b"):
+        FederatedQueueManager({"a:b": manager})
+    with pytest.raises(ValueError, match="unknown clusters: c"):
+        FederatedQueueManager({"a": manager}, weights={"c": 1})
+    with pytest.raises(ValueError, match="positive"):
+        FederatedQueueManager({"a": manager}, weights={"a": 0})
+
+
+def test_placement(federation):
+    decision = federation.select_cluster(QResources(processes=4))
+    assert decision.scores == {"alpha": 1.5, "beta": 0.5, "gamma": 0.75}
+    assert decision.selected == "beta"
+
+    # weighted by the size (or the priority) of the clusters
+    federation.weights["gamma"] = 2
+    assert federation.select_cluster().selected == "gamma"
+
+    # clusters without the requested partition are excluded
+    assert (
+        federation.select_cluster(QResources(processes=4, queue_name="gpu")).scores
+        == {}
+    )
+
+    # the state is cached
+    host = federation.managers["alpha"].host
+    n_calls = len(host.calls)
+    federation.select_cluster()
+    assert len(host.calls) == n_calls
+
+
+def test_submit_and_list(federation):
+    result = federation.submit("echo 1", options=QResources(processes=1), work_dir="/d")
+    assert result.job_id.startswith("beta:")
+    assert federation.decisions[-1].selected == "beta"
+    other = federation.submit("echo 2", work_dir="/d", cluster="alpha")
+    assert other.job_id.startswith("alpha:")
+
+    jobs = federation.get_jobs_list()
+    assert [j.job_id for j in jobs] == [other.job_id, result.job_id]
+    assert all(j.username for j in jobs)
+    job = federation.get_job(result.job_id)
+    assert job.job_id == result.job_id
+    assert job.username == jobs[1].username
+
+    # only the clusters of the jobs are queried
+    gamma_calls = len(federation.managers["gamma"].host.calls)
+    jobs = federation.get_jobs_list(jobs=[result.job_id])
+    assert [j.job_id for j in jobs] == [result.job_id]
+    assert len(federation.managers["gamma"].host.calls) == gamma_calls
+
+    jobs = federation.get_jobs_list(filters=QJobFilter(states=[QState.RUNNING]))
+    assert jobs == []
+
+    assert federation.cancel(result.job_id).status.value == "SUCCESSFUL"
+    with pytest.raises(ValueError, match="Unknown cluster delta"):
+        federation.get_job("delta:1")
+
+
+def test_errors(federation):
+    broken = federation.managers["gamma"].host
+    broken.responses[0].exit_code = 1
+    broken.add_response("squeue", exit_code=1, stderr="squeue: error", regex=True)
+
+    decision = federation.select_cluster()
+    assert "gamma" in decision.errors
+    assert set(decision.scores) == {"alpha", "beta"}
+
+    with pytest.raises(CommandFailedError):
+        federation.get_jobs_list()
+    assert federation.get_jobs_list(ignore_errors=True) == []
+
+
+def test_parallel_queries(tmp_path):
+    clock = RealClock()
+    managers = {
+        name: _cluster(tmp_path, name, _sinfo(1, 1), clock=clock)
+        for name in ("a", "b", "c", "d")
+    }
+    threads = set()
+    for manager in managers.values():
+        manager.host.latency = 0.2
+        handler = manager.host.handler
+
+        def record(command, workdir, handler=handler):
+            threads.add(threading.get_ident())
+            return handler(command, workdir)
+
+        manager.host.handler = record
+
+    with FederatedQueueManager(managers) as federation:
+        start = time.monotonic()
+        assert federation.get_jobs_list() == []
+        assert time.monotonic() - start < 0.6
+    assert len(threads) == 4
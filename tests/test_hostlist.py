@@ -0,0 +1,105 @@
+import pytest
+
+from qtoolkit.core.data_objects import QJobInfo
+from qtoolkit.hostlist import HostList, RangeSet, compress_hostlist, expand_hostlist
+
+
+class TestRangeSet:
+    def test_merge(self):
+        ranges = RangeSet([(4, 7), (1, 2), (3, 3), (10, 12), (11, 15)])
+        assert ranges.intervals == ((1, 7), (10, 15))
+        assert len(ranges) == 13
+        assert 7 in ranges
+        assert 8 not in ranges
+        assert 0 not in ranges
+        assert ranges.format(2) == "01-07,10-15"
+        with pytest.raises(ValueError):
+            RangeSet([(3, 1)])
+
+    def test_set_operations(self):
+        a = RangeSet([(1, 100), (200, 300)])
+        b = RangeSet([(50, 250), (290, 290)])
+        assert a.union(b).intervals == ((1, 300),)
+        assert a.intersection(b).intervals == ((50, 100), (200, 250), (290, 290))
+        assert a.difference(b).intervals == ((1, 49), (251, 289), (291, 300))
+        assert b.difference(a).intervals == ((101, 199),)
+        assert a.difference(RangeSet()) == a
+        assert not a.intersection(RangeSet([(101, 199)]))
+        below, above = a.split(250)
+        assert below.intervals == ((1, 100), (200, 249))
+        assert above.intervals == ((250, 300),)
+
+
+class TestHostList:
+    def test_expand(self):
+        assert expand_hostlist("nid[0001-0003,0010],login1") == [
+            "nid0001",
+            "nid0002",
+            "nid0003",
+            "nid0010",
+            "login1",
+        ]
+        assert expand_hostlist("rack[1-2]-node[01-02]-ib") == [
+            "rack1-node01-ib",
+            "rack1-node02-ib",
+            "rack2-node01-ib",
+            "rack2-node02-ib",
+        ]
+        # order and duplicates are preserved
+        assert expand_hostlist("b1,a1,b1") == ["b1", "a1", "b1"]
+        assert expand_hostlist("") == []
+
+    @pytest.mark.parametrize(
+        "expression",
+        ["nid[0001", "nid]1", "nid[[1]]", "nid[a-b]", "nid[5-1]", "nid[1-]"],
+    )
+    def test_invalid(self, expression):
+        with pytest.raises(ValueError):
+            HostList(expression)
+
+    def test_compress(self):
+        assert compress_hostlist(["c1", "c3", "c2", "c10"]) == "c[1-3,10]"
+        assert compress_hostlist("nid0001") == "nid0001"
+        assert compress_hostlist(["gpu", "n1-ib", "n2-ib"]) == "gpu,n[1-2]-ib"
+        # the padding of the numbers is kept
+        assert compress_hostlist(["n08", "n09", "n10", "n100"]) == "n[08-10,100]"
+        assert compress_hostlist(["n1", "n01"]) == "n01,n1"
+        # multi-dimensional expressions
+        hosts = HostList("rack1-node[01-04],rack2-node[01-04],rack3-node01")
+        assert hosts.compress() == "rack3-node01,rack[1-2]-node[01-04]"
+        assert str(HostList("x[1-2]y[1-2]z[1-2]")) == "x[1-2]y[1-2]z[1-2]"
+
+    def test_hosts(self):
+        hosts = HostList("nid[0001-4096,5000],login1")
+        assert len(hosts) == 4098
+        assert "nid0001" in hosts
+        assert "nid4096" in hosts
+        assert "nid4097" not in hosts
+        assert "nid1" not in hosts
+        assert "login1" in hosts
+        assert list(HostList("n[08-11],m")) == ["m", "n08", "n09", "n10", "n11"]
+        assert HostList("n[001-100]") == HostList(["n100", "n[001-099]"])
+        assert "n100" in HostList("n[001-100]")
+        assert not HostList()
+        assert not HostList("")
+
+    def test_set_operations(self):
+        # large lists are never expanded
+        nodes = HostList("nid[000001-100000]")
+        excluded = HostList("nid[000010-000020,050000],nid000099,login1")
+        remaining = nodes - excluded
+        assert str(remaining) == (
+            "nid[000001-000009,000021-000098,000100-049999,050001-100000]"
+        )
+        assert len(remaining) == 100000 - 13
+        assert remaining <= nodes
+        assert remaining.isdisjoint(excluded)
+        assert str(nodes & excluded) == "nid[000010-000020,000099,050000]"
+        assert str(nodes | "login[1-2]") == "login[1-2],nid[000001-100000]"
+        assert nodes.union("nid100001", ["nid100002"]) == HostList("nid[000001-100002]")
+        assert not excluded.issubset(nodes)
+
+    def test_job_info(self):
+        assert QJobInfo().hostlist is None
+        info = QJobInfo(node_list="nid[0001-0004]")
+        assert len(info.hostlist) == 4
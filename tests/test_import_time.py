@@ -0,0 +1,48 @@
+import subprocess
+import sys
+
+import pytest
+
+# Budget for the cold import of the qtoolkit package and of the registries,
+# in microseconds. Generous to avoid failures on slow machines, but much
+# lower than the time needed to import monty, numpy or fabric.
+COLD_START_BUDGET_US = 150_000
+
+HEAVY_MODULES = {"monty", "numpy", "fabric", "paramiko", "invoke"}
+
+
+def import_times(statement: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of each module imported."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import qtoolkit, qtoolkit.io, qtoolkit.host",
+        "from qtoolkit.io import scheduler_mapping",
+        "from qtoolkit.host import host_mapping",
+    ],
+)
+def test_cold_start(statement):
+    times = import_times(statement)
+    imported_heavy = {name.split(".")[0] for name in times} & HEAVY_MODULES
+    assert not imported_heavy
+    assert times["qtoolkit"] < COLD_START_BUDGET_US
+
+
+def test_remote_config_without_fabric():
+    times = import_times("from qtoolkit.host.remote import RemoteConfig")
+    assert not {name.split(".")[0] for name in times} & {"fabric", "paramiko"}
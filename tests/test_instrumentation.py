@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from qtoolkit.instrumentation import Histogram, Instrument, LatencyCollector, span
+from qtoolkit.io.shell import ShellIO
+from qtoolkit.manager import QueueManager
+
+
+class RecordingInstrument(Instrument):
+    def __init__(self):
+        self.events = []
+
+    def pre(self, operation, tags):
+        self.events.append(("pre", operation))
+
+    def post(self, operation, duration, tags, error=None):
+        self.events.append(("post", operation, error))
+
+
+def test_span():
+    instrument = RecordingInstrument()
+    with span([instrument], "op", scheduler="s"):
+        pass
+    assert instrument.events == [("pre", "op"), ("post", "op", None)]
+
+    with pytest.raises(ValueError):
+        with span([instrument], "failing"):
+            raise ValueError("error")
+    assert instrument.events[-1][1] == "failing"
+    assert isinstance(instrument.events[-1][2], ValueError)
+
+    # no instruments
+    with span(None, "op"):
+        pass
+
+
+def test_histogram():
+    h = Histogram(buckets=(0.1, 1.0))
+    h.observe(0.05)
+    h.observe(0.5)
+    h.observe(5, error=True)
+    assert h.counts == [1, 1, 1]
+    assert h.count == 3
+    assert h.min == 0.05
+    assert h.max == 5
+    assert h.errors == 1
+    assert h.mean == pytest.approx(5.55 / 3)
+
+
+def test_latency_collector(tmp_path):
+    collector = LatencyCollector(buckets=(0.1, 1.0))
+    collector.post("get_job.execute", 0.05, {"scheduler": "SlurmIO"})
+    collector.post("get_job.execute", 0.5, {"scheduler": "SlurmIO"})
+    collector.post("get_job.execute", 0.5, {"scheduler": "PBSIO"})
+    assert collector.get("get_job.execute", "SlurmIO").count == 2
+
+    collector.export_json(tmp_path / "metrics.json")
+    data = json.loads((tmp_path / "metrics.json").read_text())
+    assert len(data) == 2
+    assert data[1]["scheduler"] == "SlurmIO"
+    assert data[1]["counts"] == [1, 1, 0]
+
+    collector.export_prometheus(tmp_path / "metrics.prom")
+    prom = (tmp_path / "metrics.prom").read_text()
+    labels = 'operation="get_job.execute",scheduler="SlurmIO"'
+    assert f'qtoolkit_operation_seconds_bucket{{{labels},le="0.1"}} 1' in prom
+    assert f'qtoolkit_operation_seconds_bucket{{{labels},le="+Inf"}} 2' in prom
+    assert f"qtoolkit_operation_seconds_count{{{labels}}} 2" in prom
+
+
+def test_queue_manager_instrumentation(tmp_path):
+    collector = LatencyCollector()
+    qm = QueueManager(scheduler_io=ShellIO(blocking=True), instruments=[collector])
+    qm.submit(commands="echo 1", work_dir=tmp_path)
+    for phase in ("submit", "submit.render", "submit.write", "submit.execute"):
+        assert collector.get(phase, "ShellIO").count == 1
+    assert collector.get("submit.parse", "ShellIO").count == 1
+
+    qm.get_jobs_list(jobs=[999999999])
+    assert collector.get("get_jobs_list.execute", "ShellIO").count == 1
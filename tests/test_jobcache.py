@@ -0,0 +1,145 @@
+import pytest
+
+from qtoolkit.core.data_objects import QJob, QJobFilter, QJobInfo, QState
+from qtoolkit.host.mock import MockHost, VirtualClock
+from qtoolkit.io.slurm import SlurmIO, SlurmState
+from qtoolkit.jobcache import TerminalStateCache
+from qtoolkit.manager import QueueManager
+from qtoolkit.simulator import SimulatorConfig, SimulatorStore, simulator_handler
+
+
+def _job(job_id, state, **kwargs):
+    return QJob(job_id=job_id, state=state, **kwargs)
+
+
+class TestTerminalStateCache:
+    def test_store(self):
+        cache = TerminalStateCache()
+        job = _job(
+            "1",
+            QState.DONE,
+            sub_state=SlurmState.COMPLETED,
+            info=QJobInfo(nodes=2),
+            other_properties={"reason": "None"},
+        )
+        stored = cache.store([job, _job("2", QState.RUNNING)], "squeue")
+        assert stored == 1
+        assert len(cache) == 1
+        cached = cache.get("1")
+        assert cached.job == job
+        assert cached.source == "squeue"
+        assert cache.get("2") is None
+
+        # the information from the scheduler is kept
+        assert cache.store([_job("1", QState.FAILED)], "marker", overwrite=False) == 0
+        assert cache.get("1").job.state == QState.DONE
+
+        cache.remove(["1"])
+        assert cache.get_many(["1", "2"]) == {}
+
+    def test_parsed_attributes(self, tmp_path):
+        job = _job("1", QState.DONE, info=QJobInfo(cpus=4))
+        # set by the parsers, not fields of the dataclasses
+        job.username = "me"
+        job.qos = "normal"
+        job.info.partition = "main"
+        cache = TerminalStateCache(tmp_path / "jobs.json")
+        cache.store([job], "squeue")
+        cached = TerminalStateCache(tmp_path / "jobs.json").get("1").job
+        assert cached == job
+        assert cached.username == "me"
+        assert cached.qos == "normal"
+        assert cached.info.partition == "main"
+        assert QJobFilter(partitions="main", qos="normal").matches(cached)
+        assert not QJobFilter(partitions="gpu").matches(cached)
+
+    def test_retention(self):
+        clock = VirtualClock()
+        cache = TerminalStateCache(retention=100, clock=clock)
+        cache.store([_job("1", QState.DONE)], "squeue")
+        clock.advance(50)
+        cache.store([_job("2", QState.FAILED)], "squeue")
+        clock.advance(60)
+        assert list(cache.get_many(["1", "2"])) == ["2"]
+        assert cache.purge() == 1
+        assert len(cache) == 1
+
+    def test_file(self, tmp_path):
+        path = tmp_path / "cache" / "jobs.json"
+        cache = TerminalStateCache(path)
+        cache.store([_job("1", QState.DONE, sub_state=SlurmState.COMPLETED)], "sacct")
+        # shared with other instances, e.g. in other processes
+        other = TerminalStateCache(path)
+        assert other.get("1").job.sub_state == SlurmState.COMPLETED
+        other.store([_job("2", QState.DONE)], "squeue")
+        assert set(cache.get_many(["1", "2"])) == {"1", "2"}
+        cache.clear()
+        assert len(other) == 0
+
+
+@pytest.fixture
+def simulated_manager(tmp_path):
+    host = MockHost()
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(
+        SimulatorConfig(queue_time=10, run_time=100, completed_retention=50)
+    )
+    host.handler = simulator_handler(store)
+    cache = TerminalStateCache(clock=host.clock)
+    return QueueManager(SlurmIO(), host=host, terminal_cache=cache)
+
+
+def test_manager(simulated_manager):
+    qm = simulated_manager
+    host = qm.host
+    ids = [qm.submit("echo 1", work_dir="/dir").job_id for _ in range(2)]
+    host.clock.advance(20)
+    jobs = qm.get_jobs_list(ids)
+    assert [j.state for j in jobs] == [QState.RUNNING] * 2
+    assert len(qm.terminal_cache) == 0
+
+    host.clock.advance(100)
+    jobs = qm.get_jobs_list(ids)
+    assert [j.state for j in jobs] == [QState.DONE] * 2
+    assert len(qm.terminal_cache) == 2
+
+    # the jobs are not listed by squeue anymore, but no command is executed
+    host.clock.advance(100)
+    n_calls = len(host.calls)
+    assert [j.job_id for j in qm.get_jobs_list(ids)] == ids
+    assert qm.get_job(ids[0]).state == QState.DONE
+    assert [j.job_id for j in qm.get_jobs_details(ids[::-1])] == ids[::-1]
+    assert len(host.calls) == n_calls
+    assert qm.get_jobs_list(ids, filters=QJobFilter(states=QState.FAILED)) == []
+    # the partition and the quality of service are kept in the cache
+    jobs = qm.get_jobs_list(ids, filters=QJobFilter(partitions="main"))
+    assert [j.job_id for j in jobs] == ids
+    assert qm.get_jobs_list(ids, filters=QJobFilter(partitions="gpu")) == []
+    assert all(j.username for j in qm.get_jobs_list(ids))
+    jobs = qm.get_jobs_list(ids, filters=QJobFilter(qos="normal"))
+    assert [j.job_id for j in jobs] == ids
+    assert qm.get_jobs_list(ids, filters=QJobFilter(qos="high")) == []
+
+    # only the unknown jobs are requested
+    new_id = qm.submit("echo 1", work_dir="/dir").job_id
+    jobs = qm.get_jobs_list([ids[0], new_id])
+    assert [j.job_id for j in jobs] == [ids[0], new_id]
+    requested = host.calls[-1].command.split("--jobs=")[1].split(",")
+    assert set(requested) == {new_id}
+
+
+def test_manager_markers():
+    host = MockHost()
+    host.add_response(
+        "find",
+        stdout='./1.done:{"exit_code": 2, "start": 10, "end": 20}\n',
+        regex=True,
+    )
+    cache = TerminalStateCache()
+    qm = QueueManager(SlurmIO(), host=host, marker_dir="/m", terminal_cache=cache)
+    qm.check_completed()
+    job = qm.get_job("1")
+    assert job.state == QState.FAILED
+    assert job.exit_status == 2
+    assert cache.get("1").source == "marker"
+    assert len(host.calls) == 1
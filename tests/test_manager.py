@@ -0,0 +1,375 @@
+import logging
+import subprocess
+
+import pytest
+
+from qtoolkit.core.data_objects import QJobFilter, QState
+from qtoolkit.core.exceptions import CommandFailedError, OutputParsingError
+from qtoolkit.host.mock import MockHost
+from qtoolkit.io.shell import ShellIO
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.jobcache import TerminalStateCache
+from qtoolkit.manager import QueueManager
+from qtoolkit.simulator import SimulatorConfig, SimulatorStore, simulator_handler
+
+
+class TestCompletionMarkers:
+    def test_script(self):
+        script = SlurmIO().get_submission_script(["echo 1"], marker_dir="/markers")
+        assert "trap '_qtk_write_marker $?' EXIT" in script
+        assert "_qtk_job_id=$SLURM_JOB_ID" in script
+        assert script.endswith(
+            "echo 1\n_qtk_rc=$?\n_qtk_write_marker $_qtk_rc\ntrap - EXIT"
+        )
+        # the post commands do not change the exit code in the marker
+        script = SlurmIO().get_submission_script(
+            ["false"], marker_dir="/markers", post_commands="cp a b"
+        )
+        assert script.endswith(
+            "false\n_qtk_rc=$?\ncp a b\n_qtk_write_marker $_qtk_rc\ntrap - EXIT"
+        )
+
+        script = SlurmIO().get_submission_script(["echo 1"])
+        assert "_qtk_write_marker" not in script
+
+    @pytest.mark.parametrize(
+        "commands,exit_code", [("true", 0), ("false", 1), ("exit 3", 3)]
+    )
+    def test_local(self, tmp_path, commands, exit_code):
+        marker_dir = tmp_path / "markers"
+        qm = QueueManager(ShellIO(blocking=True), marker_dir=str(marker_dir))
+        assert qm.check_completed() == {}
+
+        qm.submit(commands, work_dir=tmp_path)
+        markers = qm.check_completed()
+        assert len(markers) == 1
+        marker = next(iter(markers.values()))
+        assert marker.exit_code == exit_code
+        assert marker.start <= marker.end
+        # no temporary file left
+        assert len(list(marker_dir.iterdir())) == 1
+
+        assert qm.check_completed(jobs=["0"]) == {}
+
+    def test_post_run(self, tmp_path):
+        marker_dir = tmp_path / "markers"
+        qm = QueueManager(ShellIO(blocking=True), marker_dir=str(marker_dir))
+        script = qm.get_submission_script("false", post_run="true")
+        (tmp_path / "job.sh").write_text(script)
+        subprocess.run(["sh", str(tmp_path / "job.sh")], cwd=tmp_path)
+        (marker,) = qm.check_completed().values()
+        assert marker.exit_code == 1
+
+    def test_malformed(self):
+        host = MockHost()
+        host.add_response(
+            "find",
+            stdout=(
+                './1.done:{"exit_code": 0, "start": 10, "end": 20, "host": "n1"}\n'
+                './2.done:{"exit_code": "x"}\n'
+                "./3.done:[1]\n"
+                "./4.done:{\n"
+            ),
+            regex=True,
+        )
+        qm = QueueManager(SlurmIO(), host=host, marker_dir="/markers")
+        markers = qm.check_completed()
+        assert markers["1"].exit_code == 0
+        assert [markers[i].exit_code for i in "234"] == [None] * 3
+
+    def test_remote(self):
+        host = MockHost()
+        host.add_response(
+            "find",
+            stdout=(
+                './1.done:{"exit_code": 0, "start": 10, "end": 20}\n'
+                './2.done:{"exit_code": 1, "start": 10, "end": 30}\n'
+            ),
+            regex=True,
+        )
+        qm = QueueManager(SlurmIO(), host=host, marker_dir="/markers")
+        markers = qm.check_completed(jobs=["1", "3"])
+        assert list(markers) == ["1"]
+        assert markers["1"].end == 20
+        assert len(host.calls) == 1
+        assert len(qm.check_completed()) == 2
+
+        qm = QueueManager(SlurmIO(), host=host)
+        with pytest.raises(ValueError):
+            qm.check_completed()
+
+
+class TestHeartbeats:
+    def test_script(self):
+        qm = QueueManager(SlurmIO(), heartbeat_dir="/hb", heartbeat_interval=5)
+        script = qm.get_submission_script("run", pre_run="echo pre", post_run="end")
+        assert "_qtk_heartbeat_file=/hb/$SLURM_JOB_ID.heartbeat" in script
+        assert "sleep 5" in script
+        assert script.index("_qtk_heartbeat_pid=$!") < script.index("echo pre")
+        assert script.endswith("end\nkill $_qtk_heartbeat_pid 2>/dev/null")
+
+        qm = QueueManager(SlurmIO())
+        assert "heartbeat" not in qm.get_submission_script("run")
+
+    def test_local(self, tmp_path):
+        heartbeat_dir = tmp_path / "hb"
+        qm = QueueManager(ShellIO(blocking=True), heartbeat_dir=str(heartbeat_dir))
+        assert qm.check_heartbeats() == {}
+        qm.submit("sleep 0.2", work_dir=tmp_path)
+
+        statuses = qm.check_heartbeats()
+        assert len(statuses) == 1
+        status = next(iter(statuses.values()))
+        assert not status.stalled
+        assert status.age < 60
+        assert qm.check_heartbeats(stall_after=-1)[status.job_id].stalled
+
+    @pytest.mark.parametrize("post_run", [None, "true"])
+    def test_failed_job(self, tmp_path, post_run):
+        # the kill of the heartbeat does not hide the exit code of the job
+        qm = QueueManager(
+            ShellIO(blocking=True),
+            heartbeat_dir=str(tmp_path / "hb"),
+            marker_dir=str(tmp_path / "markers"),
+            terminal_cache=TerminalStateCache(),
+        )
+        script = qm.get_submission_script("(exit 2)", post_run=post_run)
+        assert script.index("_qtk_rc=$?") < script.index("kill $_qtk_heartbeat_pid")
+        (tmp_path / "job.sh").write_text(script)
+        subprocess.run(["sh", str(tmp_path / "job.sh")], cwd=tmp_path, check=False)
+
+        ((job_id, marker),) = qm.check_completed().items()
+        assert marker.exit_code == 2
+        assert qm.terminal_cache.get(job_id).job.state == QState.FAILED
+
+    def test_remote(self):
+        host = MockHost()
+        host.add_response(
+            "find",
+            stdout="1000\n1.heartbeat 990.5\n2.heartbeat 700.0\n",
+            regex=True,
+        )
+        qm = QueueManager(
+            SlurmIO(), host=host, heartbeat_dir="/hb", heartbeat_interval=60
+        )
+        statuses = qm.check_heartbeats()
+        assert statuses["1"].age == 9.5
+        assert not statuses["1"].stalled
+        assert statuses["2"].stalled
+        assert list(qm.check_heartbeats(jobs=[2])) == ["2"]
+        assert len(host.calls) == 2
+
+        host.responses.clear()
+        host.add_response("find", stdout="garbage\n", regex=True)
+        with pytest.raises(OutputParsingError):
+            qm.check_heartbeats()
+
+
+def test_get_jobs_list_filters(tmp_path):
+    host = MockHost()
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+    qm = QueueManager(SlurmIO(), host=host)
+    for name in ("sweep-1", "sweep-2", "other"):
+        qm.submit("echo 1", options={"job_name": name}, work_dir="/dir")
+    host.clock.advance(20)
+    qm.submit("echo 1", options={"job_name": "sweep-3"}, work_dir="/dir")
+
+    filters = QJobFilter(states=[QState.RUNNING], names=["sweep-*"])
+    jobs = qm.get_jobs_list(filters=filters)
+    assert sorted(j.name for j in jobs) == ["sweep-1", "sweep-2"]
+    # the state is applied by squeue, the names on the parsed jobs
+    assert "-t " in host.calls[-1].command
+    assert "-n " not in host.calls[-1].command
+
+    jobs = qm.get_jobs_list(filters=QJobFilter(names="other"))
+    assert [j.name for j in jobs] == ["other"]
+    assert "-n other" in host.calls[-1].command
+
+
+def test_get_jobs_details(tmp_path):
+    host = MockHost()
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+    qm = QueueManager(SlurmIO(), host=host)
+    assert qm.get_jobs_details() == []
+
+    ids = [
+        qm.submit("echo 1", options={"job_name": f"run-{i}"}, work_dir="/dir").job_id
+        for i in range(3)
+    ]
+    jobs = qm.get_jobs_details([ids[0], ids[2]])
+    assert [j.job_id for j in jobs] == [ids[0], ids[2]]
+    assert jobs[1].name == "run-2"
+    assert host.calls[-1].command.endswith("scontrol show job -o")
+
+    jobs = qm.get_jobs_details([ids[1]])
+    assert [j.job_id for j in jobs] == [ids[1]]
+    assert qm.get_jobs_details(["12345"]) == []
+    assert len(qm.get_jobs_details()) == 3
+
+
+def test_resolve_jobs(tmp_path):
+    host = MockHost()
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(
+        SimulatorConfig(queue_time=10, run_time=100, completed_retention=50)
+    )
+    host.handler = simulator_handler(store)
+    qm = QueueManager(SlurmIO(), host=host, job_sources=["list", "accounting"])
+    old_id = qm.submit("echo 1", work_dir="/dir").job_id
+    host.clock.advance(200)
+    new_id = qm.submit("echo 1", work_dir="/dir").job_id
+
+    # the finished job is not listed by squeue, one sacct call is made for it
+    n_calls = len(host.calls)
+    jobs = qm.resolve_jobs([old_id, new_id, "5000"])
+    assert [j.job_id for j in jobs] == [old_id, new_id]
+    assert jobs[0].state == QState.DONE
+    assert jobs[0].exit_status == 0
+    assert jobs[1].state == QState.QUEUED
+    commands = [c.command for c in host.calls[n_calls:]]
+    assert len(commands) == 2
+    assert "squeue" in commands[0]
+    assert "sacct" in commands[1] and f"-j {old_id},5000" in commands[1]
+    # only the finished jobs found by a later source are pinned to it
+    assert qm.resolved_sources == {old_id: "accounting"}
+
+    # the resolution of the old job starts from sacct
+    n_calls = len(host.calls)
+    assert qm.get_job(old_id).state == QState.DONE
+    assert len(host.calls) == n_calls + 1
+    assert "sacct" in host.calls[-1].command
+    assert qm.get_job("5000") is None
+
+    with pytest.raises(ValueError, match="Unknown job sources"):
+        qm.resolve_jobs([old_id], sources=["foo"])
+
+    # a queued job found in the accounting is asked again to squeue
+    host.add_response("squeue", stdout="", regex=True)
+    assert qm.resolve_jobs([new_id])[0].state == QState.QUEUED
+    assert new_id not in qm.resolved_sources
+    host.responses.clear()
+
+    # the entries of the jobs in the terminal cache are removed
+    qm.terminal_cache = TerminalStateCache(clock=host.clock)
+    qm.resolve_jobs([old_id])
+    assert qm.terminal_cache.get(old_id) is not None
+    qm.resolve_jobs([old_id])
+    assert qm.resolved_sources == {}
+
+
+def test_resolve_jobs_errors(tmp_path, caplog):
+    host = MockHost()
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+    qm = QueueManager(SlurmIO(), host=host)
+    ids = [qm.submit("echo 1", work_dir="/dir").job_id for _ in range(2)]
+    host.add_response("sacct", stderr="sacct: error: slurmdbd", exit_code=1, regex=True)
+
+    # the jobs found by squeue are returned even if sacct fails
+    with caplog.at_level(logging.WARNING, logger="qtoolkit.manager"):
+        jobs = qm.resolve_jobs(ids + ["5000"])
+    assert [j.job_id for j in jobs] == ids
+    assert "Could not get the jobs from accounting" in caplog.text
+
+    # all the sources failed
+    host.add_response("squeue", stderr="squeue: error", exit_code=1, regex=True)
+    with pytest.raises(CommandFailedError, match="squeue"):
+        qm.resolve_jobs(ids)
+
+
+def test_get_jobs_usage(tmp_path):
+    host = MockHost()
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+    qm = QueueManager(SlurmIO(), host=host)
+    done_id = qm.submit("echo 1", work_dir="/dir").job_id
+    host.clock.advance(150)
+    running_id = qm.submit("echo 1", work_dir="/dir").job_id
+    host.clock.advance(20)
+
+    n_calls = len(host.calls)
+    done, running = qm.get_jobs_usage([done_id, running_id])
+    assert len(host.calls) == n_calls + 1
+    assert "sacct" in host.calls[-1].command
+    assert done.exit_status == 0
+    assert done.info.elapsed == 100
+    assert done.info.max_rss > 0
+    assert done.info.total_cpu > 0
+    assert done.info.node_list
+    assert running.state == QState.RUNNING
+    assert running.info.elapsed == 10
+
+
+def test_get_jobs_live_usage():
+    # memory of the running steps not available in sacct
+    host = MockHost()
+    host.add_response(
+        "sacct",
+        stdout="1|RUNNING|0:0|00:01:00|00:00:00||nid001\n2|PENDING|0:0|00:00:00|00:00:00||\n",
+        regex=True,
+    )
+    host.add_response("sstat", stdout="1.batch|4096K\n1.0|1M\n", regex=True)
+    qm = QueueManager(SlurmIO(), host=host)
+    running, pending = qm.get_jobs_usage(["1", "2"])
+    assert running.info.max_rss == 4096
+    assert pending.info.max_rss is None
+    assert host.calls[-1].command.endswith("sstat -a -n -P -o JobID,MaxRSS -j 1")
+
+    running, _ = qm.get_jobs_usage(["1", "2"], live=False)
+    assert running.info.max_rss is None
+    assert len(host.calls) == 3
+
+
+def test_get_cluster_state():
+    host = MockHost()
+    host.add_response(
+        "sinfo",
+        stdout="main*|up|1-00:00:00|1/2/0/3|32/64/0/96|192000|(null)\n",
+        regex=True,
+    )
+    qm = QueueManager(SlurmIO(), host=host, cluster_state_ttl=30, clock=host.clock)
+    state = qm.get_cluster_state()
+    assert state.get_partition("main").cpus_idle == 64
+    assert state.timestamp == host.clock.time()
+
+    # the cached state is reused until it expires
+    host.clock.advance(20)
+    assert qm.get_cluster_state() is state
+    assert len(host.calls) == 1
+    assert qm.get_cluster_state(max_age=10) is not state
+    assert len(host.calls) == 2
+    host.clock.advance(40)
+    qm.get_cluster_state()
+    assert len(host.calls) == 3
+
+    qm.cluster_state_ttl = None
+    qm.get_cluster_state()
+    assert len(host.calls) == 4
+
+    with pytest.raises(NotImplementedError, match="ShellIO does not support"):
+        QueueManager(ShellIO(), host=host).get_cluster_state()
+
+
+def test_submit_not_retried():
+    # sbatch may have queued the job even if the reply was lost
+    host = MockHost()
+    host.add_response(
+        "sbatch",
+        stderr="sbatch: error: Batch job submission failed: "
+        "Socket timed out on send/recv operation\n",
+        exit_code=1,
+        regex=True,
+    )
+    host.add_response(
+        "squeue", stderr="squeue: error: Socket timed out on send/recv\n", exit_code=1
+    )
+    qm = QueueManager(SlurmIO(), host=host, retries=3, backoff=0)
+    result = qm.submit("echo 1", work_dir="/dir")
+    assert result.exit_code == 1
+    assert [c.command for c in host.calls] == ["sbatch /dir/submit.script"]
@@ -0,0 +1,146 @@
+import pytest
+
+from qtoolkit.core.data_objects import QJob, QJobInfo, QState
+from qtoolkit.host.mock import VirtualClock
+from qtoolkit.polling import PollingPolicy, PollScheduler
+
+
+class FakeManager:
+    def __init__(self):
+        self.states = {}
+        self.calls = []
+
+    def get_jobs_list(self, jobs=None, user=None):
+        self.calls.append(list(jobs))
+        return [
+            QJob(job_id=job_id, **self.states[job_id])
+            for job_id in jobs
+            if job_id in self.states
+        ]
+
+
+@pytest.fixture
+def setup():
+    clock = VirtualClock()
+    manager = FakeManager()
+    policy = PollingPolicy(
+        min_interval=10,
+        max_interval=1000,
+        queued_interval=60,
+        running_interval=30,
+        backoff_factor=2,
+        end_margin=5,
+    )
+    return clock, manager, PollScheduler(manager, policy=policy, clock=clock)
+
+
+def test_batching_and_finished(setup):
+    clock, manager, scheduler = setup
+    manager.states = {
+        "1": {"state": QState.QUEUED},
+        "2": {"state": QState.DONE},
+    }
+    scheduler.add_job("1")
+    scheduler.add_job(QJob(job_id="2"))
+    scheduler.add_job(3)
+    assert scheduler.due_jobs() == []
+    assert scheduler.next_check_time() == 10
+
+    clock.advance(10)
+    result = scheduler.poll()
+    # a single call for all the due jobs
+    assert manager.calls == [["1", "2", "3"]]
+    assert [j.job_id for j in result.finished] == ["2"]
+    assert result.missing == ["3"]
+    assert list(scheduler.records) == ["1"]
+    assert scheduler.next_check_time() == 70
+
+    # nothing due
+    assert scheduler.poll().jobs == []
+    assert len(manager.calls) == 1
+
+
+def test_backoff_and_reset(setup):
+    clock, manager, scheduler = setup
+    manager.states = {"1": {"state": QState.QUEUED}}
+    scheduler.add_job("1", delay=0)
+    intervals = []
+    for _ in range(4):
+        clock.advance(scheduler.next_check_time() - clock.time())
+        scheduler.poll()
+        intervals.append(scheduler.records["1"].next_check - clock.time())
+    assert intervals == [60, 120, 240, 480]
+
+    # transition resets the interval
+    manager.states = {"1": {"state": QState.RUNNING}}
+    clock.advance(scheduler.next_check_time() - clock.time())
+    scheduler.poll()
+    assert scheduler.records["1"].next_check - clock.time() == 30
+    assert [s for _, s in scheduler.records["1"].transitions] == [
+        QState.QUEUED,
+        QState.RUNNING,
+    ]
+    assert scheduler.expected_queue_wait() == 900
+
+
+def test_time_limit(setup):
+    clock, manager, scheduler = setup
+    job = QJob(
+        job_id="1", state=QState.RUNNING, runtime=3590, info=QJobInfo(time_limit=3600)
+    )
+    scheduler.add_job("1")
+    record = scheduler.records["1"]
+    record.unchanged = 5
+    record.state = QState.RUNNING
+    record.last_check = 0
+    assert scheduler.next_interval(record, job) == 15
+
+    job.runtime = 3600 + 10
+    assert scheduler.next_interval(record, job) == 10  # min interval
+
+
+def test_queue_wait_history(setup):
+    clock, manager, scheduler = setup
+    scheduler.queue_waits = [2000, 2000]
+    manager.states = {"1": {"state": QState.QUEUED}}
+    scheduler.add_job("1", delay=0)
+    scheduler.poll()
+    # half of the expected remaining wait, capped by max_interval
+    assert scheduler.records["1"].next_check == 1000
+
+
+def test_run(setup):
+    clock, manager, scheduler = setup
+    manager.states = {"1": {"state": QState.RUNNING}, "2": {"state": QState.QUEUED}}
+    scheduler.add_job("1")
+    scheduler.add_job("2")
+    results = []
+
+    def finish(result):
+        results.append(result)
+        if len(results) == 2:
+            manager.states = {
+                "1": {"state": QState.DONE},
+                "2": {"state": QState.FAILED},
+            }
+
+    scheduler.run(callback=finish)
+    assert not scheduler.records
+    assert sum(len(r.finished) for r in results) == 2
+    scheduler.remove_job("1")
+
+
+def test_backoff_cap(setup):
+    clock, manager, scheduler = setup
+    scheduler.add_job("1")
+    record = scheduler.records["1"]
+    # the growth would overflow a float without the cap on the exponent
+    scheduler.policy.backoff_factor = 1.5
+    record.unchanged = 5000
+    assert scheduler.next_interval(record, QJob(state=QState.QUEUED)) == 1000
+    assert scheduler.next_interval(record, QJob(state=QState.RUNNING)) == 1000
+
+    scheduler.policy.backoff_factor = 1.0001
+    assert scheduler.next_interval(record, QJob(state=QState.RUNNING)) < 1000
+    record.unchanged = 10**7
+    assert scheduler.next_interval(record, QJob(state=QState.RUNNING)) == 1000
@@ -0,0 +1,156 @@
+import multiprocessing
+import subprocess
+import sys
+
+import pytest
+
+from qtoolkit.core.exceptions import CommandFailedError, RateLimitExceededError
+from qtoolkit.host.mock import MockHost, VirtualClock
+from qtoolkit.instrumentation import LatencyCollector
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.manager import QueueManager
+from qtoolkit.ratelimit import RateLimit, RateLimiter
+
+
+def test_rate_limit_validation():
+    with pytest.raises(ValueError):
+        RateLimit(rate=0)
+    with pytest.raises(ValueError):
+        RateLimit(rate=1, burst=0.5)
+    with pytest.raises(ValueError):
+        RateLimiter(mode="unknown")
+
+
+def test_wait_mode():
+    clock = VirtualClock()
+    limiter = RateLimiter(limits={"query": RateLimit(rate=2, burst=2)}, clock=clock)
+
+    # burst available immediately
+    assert limiter.acquire("query") == 0
+    assert limiter.acquire("query") == 0
+    # then one token every 0.5 s
+    assert limiter.acquire("query") == pytest.approx(0.5)
+    assert clock.time() == pytest.approx(0.5)
+    clock.advance(10)
+    assert limiter.acquire("query") == 0
+
+    # not limited
+    assert limiter.acquire("submit") == 0
+
+    stats = limiter.get_stats()
+    assert stats["query"]["acquired"] == 4
+    assert stats["query"]["waited"] == 1
+    assert stats["query"]["max_wait"] == pytest.approx(0.5)
+    assert "submit" not in stats
+    limiter.reset_stats()
+    assert limiter.get_stats() == {}
+
+
+def test_fail_mode():
+    clock = VirtualClock()
+    limiter = RateLimiter(
+        limits={"cancel": RateLimit(rate=1)}, mode="fail", clock=clock
+    )
+    limiter.acquire("cancel")
+    with pytest.raises(RateLimitExceededError) as excinfo:
+        limiter.acquire("cancel")
+    assert excinfo.value.command_class == "cancel"
+    assert excinfo.value.retry_after == pytest.approx(1)
+    assert limiter.get_stats()["cancel"]["rejected"] == 1
+    clock.advance(1)
+    limiter.acquire("cancel")
+
+
+def test_max_wait():
+    clock = VirtualClock()
+    limiter = RateLimiter(
+        limits={"query": RateLimit(rate=0.1)}, max_wait=5, clock=clock
+    )
+    limiter.acquire("query")
+    with pytest.raises(RateLimitExceededError):
+        limiter.acquire("query")
+    assert clock.time() == 0
+
+
+def test_host_limits():
+    clock = VirtualClock()
+    limiter = RateLimiter(
+        limits={"query": RateLimit(rate=1)},
+        host_limits={"cluster": {"query": RateLimit(rate=1, burst=3)}},
+        mode="fail",
+        clock=clock,
+    )
+    assert limiter.get_limit("query", "cluster").burst == 3
+    for _ in range(3):
+        limiter.acquire("query", "cluster")
+    # buckets are separated by host
+    limiter.acquire("query", "other")
+    with pytest.raises(RateLimitExceededError):
+        limiter.acquire("query", "other")
+
+
+def _acquire_from_process(lock_file):
+    limiter = RateLimiter(
+        limits={"query": RateLimit(rate=0.001, burst=3)},
+        mode="fail",
+        lock_file=lock_file,
+    )
+    try:
+        limiter.acquire("query")
+    except RateLimitExceededError:
+        return False
+    return True
+
+
+def test_lock_file_shared_among_processes(tmp_path):
+    lock_file = tmp_path / "ratelimit.lock"
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(3) as pool:
+        results = pool.map(_acquire_from_process, [lock_file] * 5)
+    assert sorted(results) == [False, False, True, True, True]
+
+
+def test_queue_manager():
+    clock = VirtualClock()
+    host = MockHost(clock=clock)
+    host.add_response("squeue", stdout="", regex=True)
+    collector = LatencyCollector()
+    limiter = RateLimiter(limits={"query": RateLimit(rate=1)}, clock=clock)
+    qm = QueueManager(
+        SlurmIO(), host=host, instruments=[collector], rate_limiter=limiter
+    )
+    qm.get_jobs_list(user="me")
+    qm.get_jobs_list(user="me")
+    assert clock.time() == pytest.approx(1)
+    assert limiter.get_stats()["query"]["acquired"] == 2
+    assert collector.get("ratelimit.query", "SlurmIO").count == 2
+    # commands without a class are not limited
+    qm.execute_cmd("squeue")
+    assert limiter.get_stats()["query"]["acquired"] == 2
+
+
+def test_retries_rate_limited():
+    clock = VirtualClock()
+    host = MockHost(clock=clock)
+    host.add_response(
+        "squeue",
+        stderr="squeue: error: Socket timed out on send/recv\n",
+        exit_code=1,
+        regex=True,
+    )
+    limiter = RateLimiter(limits={"query": RateLimit(rate=1)}, clock=clock)
+    qm = QueueManager(SlurmIO(), host=host, rate_limiter=limiter, retries=2, backoff=0)
+    with pytest.raises(CommandFailedError, match="after 3 attempts"):
+        qm.get_jobs_list(user="me")
+    assert len(host.calls) == 3
+    assert limiter.get_stats()["query"]["acquired"] == 3
+    assert [c.start for c in host.calls] == pytest.approx([0, 1, 2])
+
+
+def test_import_without_fcntl():
+    # e.g. on Windows: fcntl is only needed by the lock files
+    code = (
+        "import sys; sys.modules['fcntl'] = None; "
+        "import qtoolkit.manager, qtoolkit.ratelimit, qtoolkit.jobcache"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,220 @@
+import json
+import logging
+import math
+
+import pytest
+
+from qtoolkit.core.data_objects import PartitionState, PendingJob, QResources
+from qtoolkit.host.mock import MockHost
+from qtoolkit.io.pbs import PBSIO
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.manager import QueueManager
+from qtoolkit.routing import PartitionRouter
+from qtoolkit.simulator import SimulatorConfig, SimulatorStore, simulator_handler
+
+SINFO = (
+    "main*|up|1-00:00:00|8/0/0/8|256/0/0/256|192000|(null)\n"
+    "short|up|02:00:00|2/2/0/4|64/64/0/128|192000|(null)\n"
+    "gpu|up|1-00:00:00|1/1/0/2|32/32/0/64|384000|gpu:a100:4\n"
+    "debug|down|00:30:00|0/2/0/2|0/64/0/64|192000|(null)\n"
+)
+
+
+def _squeue_start(now):
+    return (
+        f"101|main|64|1-00:00:00|{int(now) + 7200}\n"
+        f"102|main,short|16|01:00:00|{int(now) + 600}\n"
+        "103|short|8|01:00:00|N/A\n"
+    )
+
+
+@pytest.fixture
+def host(tmp_path):
+    host = MockHost()
+    host.clock.advance(1_700_000_000)
+    host.add_response("sinfo", stdout=SINFO, regex=True)
+    host.add_response(
+        "squeue --start", stdout=_squeue_start(host.clock.time()), regex=True
+    )
+    store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+    store.initialize(SimulatorConfig(queue_time=10, run_time=100))
+    host.handler = simulator_handler(store)
+    return host
+
+
+def _router_manager(host, **kwargs):
+    router = PartitionRouter(clock=host.clock, **kwargs)
+    qm = QueueManager(SlurmIO(), host=host, clock=host.clock, router=router)
+    return qm, router
+
+
+def test_pending_jobs(host):
+    qm = QueueManager(SlurmIO(), host=host)
+    jobs = qm.get_pending_jobs()
+    assert host.calls[-1].command == (
+        "SLURM_TIME_FORMAT=%s squeue --start --noheader -t PD -o '%i|%P|%C|%l|%S'"
+    )
+    assert jobs[1] == PendingJob(
+        job_id="102",
+        partitions=["main", "short"],
+        cpus=16,
+        time_limit=3600,
+        start_time=host.clock.time() + 600,
+    )
+    assert jobs[2].start_time is None
+
+
+def test_expected_wait():
+    router = PartitionRouter(default_runtime=1000)
+    partition = PartitionState(name="p", cpus_allocated=60, cpus_idle=40)
+    pending = [
+        PendingJob(job_id="1", partitions=["p"], cpus=30),
+        PendingJob(job_id="2", partitions=["q"], cpus=100),
+    ]
+    # enough idle CPUs for the waiting jobs and the new one
+    assert router.expected_wait(partition, pending, 10, now=0) == 0
+    # 20 CPUs in excess, run by 100 CPUs in 1000 s each
+    assert router.expected_wait(partition, pending, 30, now=0) == 200
+    pending[0].time_limit = 500
+    assert router.expected_wait(partition, pending, 30, now=0) == 100
+    # the estimates of the scheduler are preferred
+    pending.append(PendingJob(job_id="3", partitions=["p"], cpus=1, start_time=50))
+    assert router.expected_wait(partition, pending, 30, now=20) == 30
+    assert router.expected_wait(partition, pending, 30, now=80) == 0
+
+    partition.available = False
+    assert router.expected_wait(partition, pending, 1, now=0) == math.inf
+
+
+def test_route_submission(host, caplog):
+    qm, router = _router_manager(host)
+    resources = QResources(processes=16, time_limit=3600)
+    with caplog.at_level(logging.INFO, logger="qtoolkit.routing"):
+        result = qm.submit("echo 1", options=resources, work_dir="/dir")
+    # main is full with a long queue, short has idle CPUs for 103 and the job
+    decision = router.decisions[-1]
+    assert decision.requested is None
+    assert decision.selected == "short"
+    assert decision.waits["short"] == 0
+    assert decision.waits["main"] == 7200
+    # same wait in gpu, with less idle CPUs. The time limit of debug is too short
+    assert decision.waits["gpu"] == 0
+    assert "debug" not in decision.waits
+    assert "Partition short selected (requested: None)" in caplog.text
+    assert resources.queue_name is None
+    assert "--partition=short" in host.files["/dir/submit.script"]
+    job = qm.get_job(result.job_id)
+    assert job.queue_name == "short"
+
+    # cached queries for the next submissions
+    n_calls = len(host.calls)
+    resources = QResources(processes=16, time_limit=4 * 3600, queue_name="main")
+    qm.submit("echo 1", options=resources, work_dir="/dir")
+    decision = router.decisions[-1]
+    assert "short" not in decision.waits
+    assert decision.waits["gpu"] == 0
+    assert decision.selected == "gpu"
+    assert decision.rerouted
+    # only the submission
+    assert len(host.calls) == n_calls + 1
+
+    host.clock.advance(120)
+    qm.submit("echo 1", options=resources, work_dir="/dir")
+    commands = [c.command for c in host.calls[n_calls + 1 :]]
+    assert any("sinfo" in c for c in commands)
+    assert any("squeue --start" in c for c in commands)
+
+
+def test_candidates(host):
+    qm, router = _router_manager(host, partitions=["main", "short"])
+    # not rerouted outside of the candidates
+    resources = QResources(processes=1, queue_name="gpu")
+    assert router.route(qm, resources) is resources
+    assert router.decisions[-1].reason == "requested partition is not a candidate"
+
+    routed = router.route(qm, QResources(processes=1, queue_name="main"))
+    assert routed.queue_name == "short"
+    assert set(router.decisions[-1].waits) == {"main", "short"}
+
+    # too many CPUs for any candidate
+    resources = QResources(processes=1000, queue_name="main")
+    assert router.route(qm, resources).queue_name == "main"
+    assert router.decisions[-1].reason == "no compatible candidate partition"
+
+    # the time limit is too long for short: main is selected even if full
+    resources = QResources(processes=1, time_limit=4 * 3600, queue_name="main")
+    host.responses[1].stdout = ""
+    router.max_age = 0
+    assert router.route(qm, resources).queue_name == "main"
+    assert router.decisions[-1].waits == {"main": 3600 / 256}
+
+
+PBSNODES = {
+    "nodes": {
+        "n1": {
+            "state": "free",
+            "resources_available": {"ncpus": 32, "Qlist": "workq"},
+            "resources_assigned": {"ncpus": 24},
+        },
+        "n2": {
+            "state": "free",
+            "resources_available": {"ncpus": 32, "Qlist": "long"},
+            "resources_assigned": {"ncpus": 16},
+        },
+    }
+}
+
+QSTAT_QUEUES = {
+    "Queue": {
+        name: {
+            "queue_type": "Execution",
+            "enabled": "True",
+            "started": "True",
+            "default_chunk": {"Qlist": name},
+        }
+        for name in ("workq", "long")
+    }
+}
+
+QSTAT_SERVER = {"Server": {"pbs": {"default_queue": "workq"}}}
+
+QSTAT_QUEUED = """Job Id: 7.pbs
+    Job_Name = queued
+    Job_Owner = me@host
+    job_state = Q
+    queue = workq
+    Resource_List.ncpus = 16
+    Resource_List.nodect = 1
+    Resource_List.walltime = 01:00:00
+"""
+
+
+def test_pbs():
+    host = MockHost()
+    documents = (PBSNODES, QSTAT_QUEUES, QSTAT_SERVER)
+    stdout = "".join(f"{json.dumps(d)}\n" for d in documents)
+    host.add_response("pbsnodes", stdout=stdout, regex=True)
+    host.add_response("qselect", stdout=QSTAT_QUEUED, regex=True)
+    router = PartitionRouter()
+    qm = QueueManager(PBSIO(), host=host, router=router)
+    routed = router.route(qm, QResources(processes=8))
+    # no estimates of the start times in PBS: the queued jobs are listed
+    assert "qselect -s Q" in host.calls[-1].command
+    decision = router.decisions[-1]
+    assert decision.waits["long"] == 0
+    # 16 CPUs in excess in workq, run by 32 CPUs in 1 hour
+    assert decision.waits["workq"] == 1800
+    assert routed.queue_name == "long"
+    assert decision.rerouted
+
+
+def test_unsupported(caplog):
+    host = MockHost()
+    host.add_response("pbsnodes", stdout="not json", regex=True)
+    router = PartitionRouter()
+    qm = QueueManager(PBSIO(), host=host, router=router)
+    resources = QResources(processes=1, queue_name="workq")
+    with caplog.at_level(logging.WARNING, logger="qtoolkit.routing"):
+        assert router.route(qm, resources) is resources
+    assert "Could not get the state of the queues" in caplog.text
+    assert router.decisions[-1].reason.startswith("state of the queues not available")
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from qtoolkit.core.data_objects import (
+    CancelStatus,
+    QResources,
+    QState,
+    SubmissionStatus,
+)
+from qtoolkit.core.exceptions import CommandFailedError
+from qtoolkit.host.mock import MockHost
+from qtoolkit.io.pbs import PBSIO
+from qtoolkit.io.slurm import SlurmIO
+from qtoolkit.manager import QueueManager
+from qtoolkit.simulator import (
+    SimulatorConfig,
+    SimulatorStore,
+    install_simulator,
+    simulator_handler,
+)
+
+
+@pytest.fixture
+def simulator(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    store = install_simulator(
+        bin_dir, tmp_path / "state", SimulatorConfig(queue_time=1000, run_time=1000)
+    )
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.chdir(tmp_path)
+    return store
+
+
+def test_slurm(simulator, tmp_path):
+    qm = QueueManager(scheduler_io=SlurmIO())
+    resources = QResources(job_name="myjob", processes=4, time_limit=600)
+    sr = qm.submit(commands="echo hi", options=resources, work_dir=tmp_path)
+    assert sr.status == SubmissionStatus.SUCCESSFUL
+    job_id = sr.job_id
+
+    jobs = qm.get_jobs_list(jobs=[job_id])
+    assert len(jobs) == 1
+    assert jobs[0].state == QState.QUEUED
+    assert jobs[0].name == "myjob"
+    assert jobs[0].info.time_limit == 600
+    assert jobs[0].info.cpus == 4
+
+    cr = qm.cancel(job_id)
+    assert cr.status == CancelStatus.SUCCESSFUL
+    assert cr.job_id == job_id
+
+    job = qm.get_job(job_id)
+    assert job.job_id == job_id
+    assert job.state == QState.FAILED
+
+    simulator.update_config(queue_time=0, run_time=0)
+    sr = qm.submit(commands="echo hi", work_dir=tmp_path)
+    job = qm.get_job(sr.job_id)
+    assert job.state == QState.DONE
+
+
+def test_pbs(simulator, tmp_path):
+    qm = QueueManager(scheduler_io=PBSIO())
+    resources = QResources(job_name="myjob", nodes=2, processes_per_node=8)
+    sr = qm.submit(commands="echo hi", options=resources, work_dir=tmp_path)
+    assert sr.status == SubmissionStatus.SUCCESSFUL
+    assert sr.job_id.endswith(".simserver")
+
+    job = qm.get_job(sr.job_id)
+    assert job.state == QState.QUEUED
+    assert job.name == "myjob"
+    assert job.info.nodes == 2
+    assert job.info.cpus == 16
+
+    cr = qm.cancel(sr.job_id)
+    assert cr.status == CancelStatus.SUCCESSFUL
+    assert qm.get_jobs_list(jobs=[sr.job_id]) == []
+
+
+def test_failure_injection(simulator, tmp_path, mocker):
+    simulator.update_config(command_failure_rate=1.0)
+    qm = QueueManager(scheduler_io=SlurmIO(), retries=2, backoff=0)
+    with pytest.raises(CommandFailedError) as exc_info:
+        qm.get_jobs_list(user="someone")
+    assert exc_info.value.attempts == 3
+    assert "Socket timed out" in exc_info.value.stderr
+
+
+def test_seed(tmp_path):
+    def run(seed):
+        host = MockHost()
+        store = SimulatorStore(tmp_path / "state", clock=host.clock, files=host.files)
+        store.initialize(
+            SimulatorConfig(
+                time_jitter=0.5,
+                job_failure_rate=0.5,
+                command_failure_rate=0.5,
+                seed=seed,
+            )
+        )
+        host.handler = simulator_handler(store)
+        qm = QueueManager(SlurmIO(), host=host)
+        for _ in range(10):
+            qm.submit("echo 1", work_dir="/dir")
+        jobs = store.read()["jobs"].values()
+        return [(j["run_time"], j["exit_code"]) for j in jobs], len(host.calls)
+
+    draws, n_calls = run(seed=1)
+    # some submissions fail, and each job gets its own draws
+    assert 1 < len(draws) < 10
+    assert len(set(draws)) == len(draws)
+    assert len({exit_code for _, exit_code in draws}) == 2
+    assert run(seed=1) == (draws, n_calls)
+    assert run(seed=2)[0] != draws